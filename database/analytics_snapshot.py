@@ -0,0 +1,399 @@
+import importlib.util
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from database.archive import attach_history, has_history, history_attached
+
+
+# The snapshot is only used when numpy is installed; callers fall back to SQL
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+STUDENT_COLUMNS_SQL = '''
+    SELECT s.reg_number, s.age, s.gender, s.programme_id, COALESCE(pr.name, s.programme),
+           s.schedule, COALESCE(s.status, 'Active'), s.programme_fee,
+           COALESCE(b.total_paid, 0), COALESCE(b.payment_count, 0)
+    FROM students s
+    LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+    LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+'''
+
+# Activity kinds that account for one students or payments version bump each
+STUDENT_ACTIVITY = ('registration', 'status_change', 'student_deleted')
+PAYMENT_ACTIVITY = ('payment', 'payment_deleted')
+
+
+class Dictionary:
+    """Dictionary encoding for a low-cardinality text column"""
+    
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+    
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def display_order(values):
+    """Sort group labels the way SQLite's GROUP BY would, NULL first"""
+    return sorted(values, key=lambda value: (value is not None, str(value)))
+
+
+def stored_age(age):
+    """An age from the float age column as SQLite returns it: whole ages as int"""
+    return int(age) if age.is_integer() else age
+
+
+class AnalyticsSnapshot:
+    """Students and their payment totals held as NumPy columns for reports
+    
+    Programme, schedule, gender and status are dictionary encoded, so every
+    grouped report is a bincount over a code column instead of a scan of
+    SQLite. Monthly payment totals are kept alongside.
+    
+    Before answering, the snapshot compares the table_versions counters
+    with the ones it was built from. New activity_log entries are applied
+    incrementally when they account for every change counted (students they
+    touch are re-read in one query); anything else, such as an edited
+    student, payment or programme, reloads the snapshot. All reads use a
+    read-only connection.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+    """
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._versions = None
+        self._last_activity = 0
+    
+    def _connection(self):
+        # Students were archived for the first time, or the last ones restored
+        if self._conn is not None and history_attached(self._conn) != has_history(self._conn):
+            self.close()
+        if self._conn is None:
+            self._conn = sqlite3.connect(f"file:{pathname2url(self.db_path)}?mode=ro",
+                                         uri=True, check_same_thread=False)
+            # Reports cover archived students too
+            attach_history(self._conn, self.db_path, read_only=True)
+        return self._conn
+    
+    def _read_versions(self, cursor):
+        cursor.execute('SELECT table_name, version FROM table_versions')
+        return dict(cursor.fetchall())
+    
+    def _refresh(self):
+        """Bring the snapshot up to date; False means fall back to SQL"""
+        if not NUMPY_AVAILABLE:
+            return False
+        
+        conn = self._connection()
+        cursor = conn.cursor()
+        try:
+            # One read transaction, so counters and log agree with each other
+            cursor.execute('BEGIN')
+            versions = self._read_versions(cursor)
+            if versions == self._versions:
+                return True
+            
+            if self._versions is None:
+                self._load(cursor, versions)
+                return True
+            
+            cursor.execute('''
+                SELECT activity_id, occurred_at, kind, reg_number, amount
+                FROM activity_log
+                WHERE activity_id > ?
+                ORDER BY activity_id
+            ''', (self._last_activity,))
+            activity = cursor.fetchall()
+            
+            def moved(table):
+                return versions.get(table, 0) - self._versions.get(table, 0)
+            
+            explained = (
+                moved('programmes') == 0 and
+                moved('students') == sum(1 for row in activity if row[2] in STUDENT_ACTIVITY) and
+                moved('payments') == sum(1 for row in activity if row[2] in PAYMENT_ACTIVITY)
+            )
+            if explained:
+                self._apply(cursor, activity)
+                self._versions = versions
+            else:
+                self._load(cursor, versions)
+            return True
+        
+        except sqlite3.Error as e:
+            print(f"Error refreshing analytics snapshot: {e}")
+            self.close()
+            return False
+        
+        finally:
+            if self._conn is not None:
+                self._conn.rollback()
+    
+    def _load(self, cursor, versions):
+        import numpy as np
+        
+        cursor.execute('SELECT COALESCE(MAX(activity_id), 0) FROM activity_log')
+        self._last_activity = cursor.fetchone()[0]
+        
+        cursor.execute(STUDENT_COLUMNS_SQL)
+        rows = cursor.fetchall()
+        
+        self.genders = Dictionary()
+        self.programmes = Dictionary()
+        self.schedules = Dictionary()
+        self.statuses = Dictionary()
+        self.positions = {}
+        
+        self.size = 0
+        capacity = max(len(rows), 64)
+        self.age = np.full(capacity, np.nan)
+        self.gender = np.zeros(capacity, dtype=np.int32)
+        self.programme = np.zeros(capacity, dtype=np.int32)
+        self.schedule = np.zeros(capacity, dtype=np.int32)
+        self.status = np.zeros(capacity, dtype=np.int32)
+        self.fee = np.zeros(capacity)
+        self.paid = np.zeros(capacity)
+        self.payment_count = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        
+        for row in rows:
+            self._store(row)
+        
+        self._load_months(cursor)
+        self._versions = versions
+    
+    def _load_months(self, cursor):
+        cursor.execute('''
+            SELECT strftime('%Y-%m', payment_date), COUNT(*), SUM(amount)
+            FROM payments
+            GROUP BY 1
+        ''')
+        self.months = {month: [count, total] for month, count, total in cursor.fetchall()}
+    
+    def _store(self, row):
+        """Write one student row, appending it if it is new"""
+        import numpy as np
+        
+        reg_number, age, gender, programme_id, programme, schedule, status, fee, paid, count = row
+        position = self.positions.get(reg_number)
+        if position is None:
+            if self.size == len(self.alive):
+                self._grow()
+            position = self.positions[reg_number] = self.size
+            self.size += 1
+        
+        try:
+            self.age[position] = float(age) if age is not None else np.nan
+        except (TypeError, ValueError):
+            self.age[position] = np.nan
+        self.gender[position] = self.genders.encode(gender)
+        # Grouped as the SQL reports group: by catalogue id and displayed name
+        self.programme[position] = self.programmes.encode((programme_id, programme))
+        self.schedule[position] = self.schedules.encode(schedule)
+        self.status[position] = self.statuses.encode(status)
+        self.fee[position] = fee if fee is not None else np.nan
+        self.paid[position] = paid
+        self.payment_count[position] = count
+        self.alive[position] = True
+    
+    def _grow(self):
+        import numpy as np
+        
+        extra = len(self.alive)
+        self.age = np.concatenate([self.age, np.full(extra, np.nan)])
+        for column in ('gender', 'programme', 'schedule', 'status', 'fee', 'paid',
+                       'payment_count', 'alive'):
+            array = getattr(self, column)
+            setattr(self, column, np.concatenate([array, np.zeros(extra, dtype=array.dtype)]))
+    
+    def _apply(self, cursor, activity):
+        """Fold new activity_log entries into the snapshot"""
+        touched = set()
+        reload_months = False
+        
+        for activity_id, occurred_at, kind, reg_number, amount in activity:
+            touched.add(reg_number)
+            if kind == 'payment':
+                month = str(occurred_at)[:7] if occurred_at else None
+                totals = self.months.setdefault(month, [0, 0.0])
+                totals[0] += 1
+                totals[1] += amount or 0
+            elif kind == 'payment_deleted':
+                # The log only has the deletion time, not the payment's month
+                reload_months = True
+            self._last_activity = activity_id
+        
+        # Re-read touched students as they are now; missing ones were deleted
+        touched = list(touched)
+        found = set()
+        for start in range(0, len(touched), 500):
+            batch = touched[start:start + 500]
+            cursor.execute(STUDENT_COLUMNS_SQL +
+                           f" WHERE s.reg_number IN ({', '.join('?' * len(batch))})", batch)
+            for row in cursor.fetchall():
+                self._store(row)
+                found.add(row[0])
+        
+        for reg_number in touched:
+            position = self.positions.get(reg_number)
+            if reg_number not in found and position is not None:
+                self.alive[position] = False
+        
+        if reload_months:
+            self._load_months(cursor)
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._versions = None
+    
+    def _live(self):
+        return self.alive[:self.size]
+    
+    def _counts(self, codes, dictionary, mask=None, weights=None):
+        """Per-code totals over live students (optionally filtered and weighted)"""
+        import numpy as np
+        
+        keep = self._live() if mask is None else self._live() & mask[:self.size]
+        return np.bincount(codes[:self.size][keep],
+                           weights=None if weights is None else weights[:self.size][keep],
+                           minlength=len(dictionary.values))
+    
+    def _by_programme(self):
+        """
+        (code, name) per programme with students, ordered as the SQL reports'
+        ORDER BY programme, programme_id (NULLs first)
+        """
+        counts = self._counts(self.programme, self.programmes)
+        groups = sorted((key for code, key in enumerate(self.programmes.values) if counts[code]),
+                        key=lambda key: (key[1] is not None, str(key[1]),
+                                         key[0] is not None, key[0] or 0))
+        return [(self.programmes.codes[key], key[1]) for key in groups], counts
+    
+    def _status_mask(self, status):
+        import numpy as np
+        
+        code = self.statuses.codes.get(status)
+        if code is None:
+            return np.zeros(len(self.status), dtype=bool)
+        return self.status == code
+    
+    def student_ages(self):
+        """Ages of all students that have one"""
+        import numpy as np
+        
+        with self._lock:
+            if not self._refresh():
+                return None
+            ages = self.age[:self.size][self._live()]
+            return [stored_age(age) for age in ages[~np.isnan(ages)].tolist()]
+    
+    def gender_distribution(self):
+        """Student count per gender"""
+        with self._lock:
+            if not self._refresh():
+                return None
+            counts = self._counts(self.gender, self.genders)
+            return {gender: int(counts[self.genders.codes[gender]])
+                    for gender in display_order(self.genders.values)
+                    if counts[self.genders.codes[gender]]}
+    
+    def monthly_revenue(self):
+        """Revenue per payment month, in month order"""
+        with self._lock:
+            if not self._refresh():
+                return None
+            return {month: self.months[month][1]
+                    for month in display_order(self.months) if self.months[month][0]}
+    
+    def payment_trends(self):
+        """Payment count and total per month, in month order"""
+        with self._lock:
+            if not self._refresh():
+                return None
+            return [{'month': month,
+                     'payment_count': self.months[month][0],
+                     'total_amount': self.months[month][1]}
+                    for month in display_order(self.months) if self.months[month][0]]
+    
+    def programme_enrollment(self):
+        """Students and graduates per programme"""
+        with self._lock:
+            if not self._refresh():
+                return None
+            programmes, totals = self._by_programme()
+            graduated = self._counts(self.programme, self.programmes,
+                                     mask=self._status_mask('Graduated'))
+            return [{'programme': name,
+                     'total_students': int(totals[code]),
+                     'graduated_students': int(graduated[code])}
+                    for code, name in programmes]
+    
+    def programme_revenue(self):
+        """Payments received and students per programme"""
+        with self._lock:
+            if not self._refresh():
+                return None
+            programmes, totals = self._by_programme()
+            revenue = self._counts(self.programme, self.programmes, weights=self.paid)
+            return [{'programme': name,
+                     'total_revenue': float(revenue[code]),
+                     'total_students': int(totals[code])}
+                    for code, name in programmes]
+    
+    def programme_completion(self):
+        """Graduation rate per programme"""
+        with self._lock:
+            if not self._refresh():
+                return None
+            programmes, totals = self._by_programme()
+            graduated = self._counts(self.programme, self.programmes,
+                                     mask=self._status_mask('Graduated'))
+            return [{'programme': name,
+                     'total_students': int(totals[code]),
+                     'graduated_students': int(graduated[code]),
+                     'completion_rate': round(float(graduated[code]) * 100.0 / int(totals[code]), 2)}
+                    for code, name in programmes]
+    
+    def retention(self):
+        """Retained and dropped-out students per programme"""
+        with self._lock:
+            if not self._refresh():
+                return None
+            programmes, totals = self._by_programme()
+            dropped = self._counts(self.programme, self.programmes,
+                                   mask=self._status_mask('Dropped Out'))
+            return [{'programme': name,
+                     'retained': int(totals[code] - dropped[code]),
+                     'dropped': int(dropped[code])}
+                    for code, name in programmes]
+    
+    def performance(self):
+        """Age, fee, amount paid and graduation flag for every student"""
+        import numpy as np
+        
+        with self._lock:
+            if not self._refresh():
+                return None
+            live = self._live()
+            ages = self.age[:self.size][live]
+            fees = self.fee[:self.size][live]
+            paid = self.paid[:self.size][live]
+            counts = self.payment_count[:self.size][live]
+            graduated = self._status_mask('Graduated')[:self.size][live]
+            return [{'age': None if np.isnan(age) else stored_age(age),
+                     'programme_fee': None if np.isnan(fee) else fee,
+                     'total_paid': total if count else None,
+                     'graduated': int(flag)}
+                    for age, fee, total, count, flag in zip(ages.tolist(), fees.tolist(),
+                                                             paid.tolist(), counts.tolist(),
+                                                             graduated.tolist())]
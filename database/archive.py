@@ -0,0 +1,397 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+
+# Tables moved to the archive, in the order they are copied
+ARCHIVED_TABLES = ('students', 'payments', 'notifications', 'student_balances')
+
+# Activity triggers paused while rows move between databases; the move is
+# logged as one 'archived' or 'restored' entry per student instead
+MOVE_TRIGGERS = ('trg_activity_student_insert', 'trg_activity_student_delete',
+                 'trg_activity_payment_insert', 'trg_activity_payment_delete')
+
+ARCHIVE_STATUSES = ('Graduated', 'Dropped Out')
+
+
+def archive_path_for(db_path):
+    return os.path.join(os.path.dirname(db_path), "archive.db")
+
+
+def table_columns(conn, schema, table):
+    """(name, type, pk) for each column of schema.table, empty if it does not exist"""
+    cursor = conn.execute(f"PRAGMA {schema}.table_info({table})")
+    return [(row[1], row[2], row[5]) for row in cursor.fetchall()]
+
+
+def has_history(conn):
+    """True when students have been moved out to the archive"""
+    try:
+        return conn.execute("SELECT EXISTS (SELECT 1 FROM main.archived_students)").fetchone()[0] == 1
+    except sqlite3.Error:
+        return False
+
+
+def history_attached(conn):
+    """True when attach_history() attached the archive to `conn`"""
+    return any(row[1] == 'archive' for row in conn.execute("PRAGMA database_list"))
+
+
+def attach_history(conn, db_path, read_only=False):
+    """
+    Attach the archive and shadow the hot tables with union views
+    
+    TEMP views named students, payments, notifications and student_balances
+    take precedence over the main tables for unqualified names, so existing
+    report SQL run on `conn` sees hot and archived rows alike. The connection
+    must have been opened with uri=True. Writes should not go through it.
+    
+    Until a student has been archived there is nothing to add, and `conn`
+    is returned as it is, so reports read the main tables directly.
+    """
+    path = archive_path_for(db_path)
+    if not os.path.exists(path) or not has_history(conn):
+        return conn
+    
+    uri = f"file:{pathname2url(path)}" + ("?mode=ro" if read_only else "")
+    conn.execute("ATTACH DATABASE ? AS archive", [uri])
+    
+    for table in ARCHIVED_TABLES:
+        columns = [name for name, _, _ in table_columns(conn, 'main', table)]
+        archived = {name for name, _, _ in table_columns(conn, 'archive', table)}
+        if not columns or not archived.issuperset(columns):
+            continue
+        
+        column_list = ", ".join(columns)
+        conn.execute(f'''
+            CREATE TEMP VIEW IF NOT EXISTS {table} AS
+            SELECT {column_list} FROM main.{table}
+            UNION ALL
+            SELECT {column_list} FROM archive.{table}
+        ''')
+    return conn
+
+
+class ArchiveManager:
+    """Move long-finished students out of the hot database
+    
+    Graduated and dropped-out students with no activity since a cutoff are
+    moved, with their payments, notifications and balance, into archive.db
+    next to the main database. A stub (name, programme, status) stays in
+    archived_students so they can still be found and restored. Reports that
+    need history open their connection with attach_history(), which makes
+    the archive transparent to their SQL.
+    
+    Args:
+        db_path (str): Path to the main SQLite database
+    """
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.archive_path = archive_path_for(db_path)
+        # archive.db is created by the first archive_students(); once it
+        # exists, keep its columns in step with the main tables
+        if os.path.exists(self.archive_path):
+            self.ensure_schema()
+    
+    def connect(self, history=False):
+        """Connection to the main database with the archive attached as `archive`"""
+        conn = sqlite3.connect(f"file:{pathname2url(self.db_path)}", uri=True)
+        if history:
+            return attach_history(conn, self.db_path)
+        
+        conn.execute("ATTACH DATABASE ? AS archive",
+                     [f"file:{pathname2url(self.archive_path)}"])
+        return conn
+    
+    def ensure_schema(self):
+        """Create archive tables, adding any columns the main tables have gained"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            for table in ARCHIVED_TABLES:
+                columns = table_columns(conn, 'main', table)
+                if not columns:
+                    continue
+                
+                existing = {name for name, _, _ in table_columns(conn, 'archive', table)}
+                if not existing:
+                    keys = [name for name, _, pk in columns if pk]
+                    definitions = [f"{name} {kind}" + (" PRIMARY KEY" if keys == [name] else "")
+                                   for name, kind, _ in columns]
+                    cursor.execute(f'''
+                        CREATE TABLE archive.{table} (
+                            {", ".join(definitions)},
+                            archived_at TIMESTAMP
+                        )
+                    ''')
+                    if 'reg_number' not in keys:
+                        cursor.execute(f'''
+                            CREATE INDEX IF NOT EXISTS archive.idx_{table}_reg_number
+                            ON {table}(reg_number)
+                        ''')
+                else:
+                    for name, kind, _ in columns:
+                        if name not in existing:
+                            cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {kind}")
+            
+            conn.commit()
+        
+        except sqlite3.Error as e:
+            print(f"Error preparing archive: {e}")
+        
+        finally:
+            conn.close()
+    
+    def cutoff(self, years):
+        """Date string `years` before today"""
+        return (datetime.now() - timedelta(days=365 * years)).strftime('%Y-%m-%d')
+    
+    def candidates(self, cursor, before, include_outstanding=False):
+        """Fill temp.archive_batch with students eligible for archiving"""
+        cursor.execute("DROP TABLE IF EXISTS temp.archive_batch")
+        cursor.execute("CREATE TEMP TABLE archive_batch (reg_number TEXT PRIMARY KEY)")
+        
+        placeholders = ", ".join("?" for _ in ARCHIVE_STATUSES)
+        settled = "" if include_outstanding else \
+            "AND COALESCE(b.total_paid, 0) >= COALESCE(s.programme_fee, 0)"
+        cursor.execute(f'''
+            INSERT INTO temp.archive_batch (reg_number)
+            SELECT s.reg_number
+            FROM main.students s
+            LEFT JOIN main.student_balances b ON b.reg_number = s.reg_number
+            LEFT JOIN (
+                SELECT reg_number, MAX(occurred_at) AS changed_at
+                FROM main.activity_log
+                WHERE kind = 'status_change'
+                GROUP BY reg_number
+            ) c ON c.reg_number = s.reg_number
+            WHERE s.status IN ({placeholders})
+              AND COALESCE(s.registration_date, '') < ?
+              AND COALESCE(b.last_payment_date, '') < ?
+              AND COALESCE(c.changed_at, '') < ?
+              {settled}
+        ''', list(ARCHIVE_STATUSES) + [before] * 3)
+        
+        cursor.execute("SELECT COUNT(*) FROM temp.archive_batch")
+        return cursor.fetchone()[0]
+    
+    def count_candidates(self, before, include_outstanding=False):
+        """Number of students archive_students() would move"""
+        conn = sqlite3.connect(self.db_path)
+        
+        try:
+            return self.candidates(conn.cursor(), before, include_outstanding)
+        
+        except sqlite3.Error as e:
+            print(f"Error counting archive candidates: {e}")
+            return 0
+        
+        finally:
+            conn.close()
+    
+    def archive_students(self, before, include_outstanding=False, task=None):
+        """
+        Move finished students inactive since `before` into the archive
+        
+        Args:
+            before (str): Cutoff date (YYYY-MM-DD); registration, last payment
+                and last status change must all predate it
+            include_outstanding (bool, optional): Also archive students who
+                still owe fees (they then leave the outstanding payments list)
+            task (Task, optional): Background task to report progress to
+        
+        Returns:
+            int: Number of students archived
+        """
+        # Creates archive.db on first use, with copies of any tables added since
+        self.ensure_schema()
+        
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            count = self.candidates(cursor, before, include_outstanding)
+            if not count:
+                conn.rollback()
+                return 0
+            
+            self.set_change_source(cursor, 'archive')
+            activity_triggers = self.drop_triggers(cursor, MOVE_TRIGGERS)
+            archived_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO main.archived_students (
+                    reg_number, name, programme, status, registration_date, archived_at
+                )
+                SELECT reg_number, name, programme, status, registration_date, ?
+                FROM main.students
+                WHERE reg_number IN (SELECT reg_number FROM temp.archive_batch)
+            ''', [archived_at])
+            
+            tables = self.tables(cursor)
+            for done, table in enumerate(tables):
+                if task is not None:
+                    task.report(done, len(tables) * 2, "Archiving students...")
+                columns = ", ".join(name for name, _, _ in table_columns(conn, 'main', table))
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO archive.{table} ({columns}, archived_at)
+                    SELECT {columns}, ? FROM main.{table}
+                    WHERE reg_number IN (SELECT reg_number FROM temp.archive_batch)
+                ''', [archived_at])
+            
+            # The search trigger scans the whole index for each deleted student;
+            # drop it for the move and clear the batch from the index in one pass
+            search_trigger = self.drop_trigger(cursor, 'trg_students_fts_delete')
+            if search_trigger:
+                cursor.execute('''
+                    DELETE FROM main.students_fts
+                    WHERE reg_number IN (SELECT reg_number FROM temp.archive_batch)
+                ''')
+            
+            # Children first; deleting students also clears their balances
+            for done, table in enumerate(('notifications', 'payments', 'students')):
+                if task is not None:
+                    task.report(len(tables) + done, len(tables) * 2, "Archiving students...")
+                if table in tables:
+                    cursor.execute(f'''
+                        DELETE FROM main.{table}
+                        WHERE reg_number IN (SELECT reg_number FROM temp.archive_batch)
+                    ''')
+            
+            if search_trigger:
+                cursor.execute(search_trigger)
+            
+            cursor.execute('''
+                INSERT INTO main.activity_log (occurred_at, kind, reg_number, name, detail)
+                SELECT ?, 'archived', reg_number, name, programme
+                FROM main.archived_students
+                WHERE reg_number IN (SELECT reg_number FROM temp.archive_batch)
+            ''', [archived_at])
+            for trigger in activity_triggers:
+                cursor.execute(trigger)
+            
+            self.set_change_source(cursor, None)
+            conn.commit()
+            return count
+        
+        except Exception:
+            conn.rollback()
+            raise
+        
+        finally:
+            conn.close()
+    
+    def restore_student(self, reg_number):
+        """
+        Move an archived student, with payments and notifications, back
+        
+        Returns:
+            bool: True if the student was restored
+        """
+        if not os.path.exists(self.archive_path):
+            return False
+        
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT 1 FROM archive.students WHERE reg_number = ?", [reg_number])
+            if cursor.fetchone() is None:
+                conn.rollback()
+                return False
+            
+            self.set_change_source(cursor, 'restore')
+            activity_triggers = self.drop_triggers(cursor, MOVE_TRIGGERS)
+            
+            # Balances are rebuilt by the payment triggers as payments return
+            for table in ('students', 'payments', 'notifications'):
+                if table not in self.tables(cursor):
+                    continue
+                columns = ", ".join(name for name, _, _ in table_columns(conn, 'main', table))
+                cursor.execute(f'''
+                    INSERT INTO main.{table} ({columns})
+                    SELECT {columns} FROM archive.{table} WHERE reg_number = ?
+                ''', [reg_number])
+            
+            for table in ARCHIVED_TABLES:
+                cursor.execute(f"DELETE FROM archive.{table} WHERE reg_number = ?", [reg_number])
+            cursor.execute("DELETE FROM main.archived_students WHERE reg_number = ?", [reg_number])
+            
+            cursor.execute('''
+                INSERT INTO main.activity_log (occurred_at, kind, reg_number, name, detail)
+                SELECT datetime('now', 'localtime'), 'restored', reg_number, name, programme
+                FROM main.students
+                WHERE reg_number = ?
+            ''', [reg_number])
+            for trigger in activity_triggers:
+                cursor.execute(trigger)
+            
+            self.set_change_source(cursor, None)
+            conn.commit()
+            return True
+        
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error restoring student: {e}")
+            return False
+        
+        finally:
+            conn.close()
+    
+    def search(self, search_term, limit=50):
+        """Archived students whose name or registration number matches"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT reg_number, name, programme, status, registration_date, archived_at
+                FROM archived_students
+                WHERE name LIKE ? OR reg_number LIKE ?
+                ORDER BY name COLLATE NOCASE
+                LIMIT ?
+            ''', [f"%{search_term}%"] * 2 + [limit])
+            
+            return [{
+                'reg_number': row[0],
+                'name': row[1],
+                'programme': row[2],
+                'status': row[3],
+                'registration_date': row[4],
+                'archived_at': row[5]
+            } for row in cursor.fetchall()]
+        
+        except sqlite3.Error as e:
+            print(f"Error searching archive: {e}")
+            return []
+        
+        finally:
+            conn.close()
+    
+    def tables(self, cursor):
+        """Archived tables present in both databases"""
+        return [table for table in ARCHIVED_TABLES
+                if table_columns(cursor.connection, 'main', table)
+                and table_columns(cursor.connection, 'archive', table)]
+    
+    def drop_trigger(self, cursor, name):
+        """Drop a trigger inside the current transaction, returning its SQL to recreate it"""
+        cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'trigger' AND name = ?", [name])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute(f"DROP TRIGGER main.{name}")
+        return row[0]
+    
+    def drop_triggers(self, cursor, names):
+        """Drop each trigger that exists, returning the SQL to recreate them"""
+        return [sql for sql in (self.drop_trigger(cursor, name) for name in names) if sql]
+    
+    def set_change_source(self, cursor, source):
+        """Label change_log entries written by this transaction"""
+        cursor.execute("UPDATE main.change_source SET source = ? WHERE id = 1", [source])
@@ -0,0 +1,216 @@
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from database.chunk_store import ChunkStore
+from database.archive import archive_path_for
+
+
+class BackupError(Exception):
+    """Raised when a backup cannot be taken or fails verification"""
+
+
+class BackupEngine:
+    """Online, verified, rotated backups of the database and receipts
+    
+    The database (and the student archive, once there is one) is copied
+    with SQLite's online backup API a few pages at a time, so other
+    connections can keep reading and writing between steps. Each copy is
+    checked with PRAGMA integrity_check, zipped together with the receipts
+    folder, tested again as an archive, and only then moved into place. Older archives beyond `keep` are removed.
+    
+    With `incremental` set, the verified copy and the receipts go into a
+    deduplicating ChunkStore under backup_dir/store instead, so each backup
+    only adds the chunks that changed since the last one.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        receipts_path (str): Folder of generated receipts to include
+        backup_dir (str): Where backup archives are written
+        keep (int, optional): Number of archives to retain
+        incremental (bool, optional): Store deduplicated snapshots, not zips
+    """
+    
+    PREFIX = "impactech_backup_"
+    NAME_PATTERN = re.compile(r"^impactech_backup_(\d{8}_\d{6})\.zip$")
+    
+    # Pages copied per step, and the pause between steps (seconds)
+    STEP_PAGES = 256
+    STEP_SLEEP = 0.005
+    
+    def __init__(self, db_path, receipts_path, backup_dir, keep=10, incremental=False):
+        self.db_path = db_path
+        self.receipts_path = receipts_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.incremental = incremental
+        self.store = ChunkStore(os.path.join(backup_dir, "store"))
+    
+    @classmethod
+    def configured(cls, app_path, db, backup_dir=None, keep=None, incremental=None):
+        """Engine for the location and retention in settings, unless given"""
+        from utils.settings import load_settings, get_setting
+        settings = load_settings(app_path)
+        backup_dir = backup_dir or get_setting(settings, 'backup_path') \
+            or os.path.join(app_path, "backups")
+        try:
+            keep = int(keep or get_setting(settings, 'backup_keep'))
+        except ValueError:
+            keep = 10
+        if incremental is None:
+            incremental = get_setting(settings, 'backup_incremental')
+        return cls(db.db_path, db.receipts_path, backup_dir, keep=keep, incremental=incremental)
+    
+    def backup(self, task=None):
+        """
+        Take a backup
+        
+        Args:
+            task (Task, optional): Background task to report progress to
+        
+        Returns:
+            str: Path of the new archive, or id of the new snapshot
+        """
+        if self.incremental:
+            return self.snapshot(task)
+        
+        os.makedirs(self.backup_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        archive = os.path.join(self.backup_dir, f"{self.PREFIX}{timestamp}.zip")
+        
+        with tempfile.TemporaryDirectory() as workdir:
+            snapshots = self.copy_databases(workdir, task)
+            
+            if task is not None:
+                task.report(0, None, "Compressing backup...")
+            partial = archive + ".part"
+            try:
+                self.write_archive(partial, snapshots, task)
+                self.verify_archive(partial)
+                os.replace(partial, archive)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+        
+        self.rotate()
+        return archive
+    
+    def snapshot(self, task=None):
+        """Take an incremental backup into the chunk store"""
+        with tempfile.TemporaryDirectory() as workdir:
+            files = self.copy_databases(workdir, task)
+            files.update({f"receipts/{name}": path for name, path in self.receipt_files()})
+            manifest = self.store.snapshot(files, task)
+        
+        problems = self.store.verify(manifest['id'])
+        if problems:
+            raise BackupError(f"Snapshot {manifest['id']} is incomplete: {problems[0]}")
+        
+        self.store.prune(self.keep)
+        return manifest['id']
+    
+    def receipt_files(self):
+        """(archive name, path) for every file under the receipts folder"""
+        if not os.path.isdir(self.receipts_path):
+            return []
+        return [(os.path.relpath(os.path.join(folder, name), self.receipts_path).replace(os.sep, "/"),
+                 os.path.join(folder, name))
+                for folder, _, files in os.walk(self.receipts_path)
+                for name in files]
+    
+    def copy_databases(self, workdir, task=None):
+        """
+        Copy and check the main database and, once created, the student archive
+        
+        Returns:
+            dict: Archive name -> path of the verified copy in workdir
+        """
+        copies = {}
+        for path in (self.db_path, archive_path_for(self.db_path)):
+            if not os.path.exists(path):
+                continue
+            name = os.path.basename(path)
+            copies[name] = os.path.join(workdir, name)
+            self.copy_database(path, copies[name], task)
+            self.verify_database(copies[name])
+        return copies
+    
+    def copy_database(self, path, target, task=None):
+        """Copy a live database with the online backup API"""
+        def progress(status, remaining, total):
+            if task is not None:
+                task.report(total - remaining, total, "Copying database...")
+        
+        source = sqlite3.connect(path)
+        destination = sqlite3.connect(target)
+        try:
+            source.backup(destination, pages=self.STEP_PAGES, progress=progress,
+                          sleep=self.STEP_SLEEP)
+        except sqlite3.Error as e:
+            raise BackupError(f"Could not copy database: {e}")
+        finally:
+            destination.close()
+            source.close()
+    
+    def verify_database(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        except sqlite3.Error as e:
+            raise BackupError(f"Could not check backup: {e}")
+        finally:
+            conn.close()
+        
+        if result != "ok":
+            raise BackupError(f"Backup failed integrity check: {result}")
+    
+    def write_archive(self, archive, snapshots, task=None):
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, path in snapshots.items():
+                zf.write(path, name)
+            
+            receipts = self.receipt_files()
+            for done, (name, path) in enumerate(receipts):
+                if task is not None and done % 50 == 0:
+                    task.report(done, len(receipts), "Adding receipts...")
+                zf.write(path, f"receipts/{name}")
+    
+    def verify_archive(self, archive):
+        with zipfile.ZipFile(archive) as zf:
+            bad = zf.testzip()
+        if bad is not None:
+            raise BackupError(f"Backup archive is corrupt at {bad}")
+    
+    def backups(self):
+        """Existing archives (or snapshots), newest first, as (taken_at, path or id) pairs"""
+        if self.incremental:
+            return [(datetime.strptime(snapshot_id[:15], '%Y%m%d_%H%M%S'), snapshot_id)
+                    for snapshot_id in self.store.snapshots()]
+        
+        if not os.path.isdir(self.backup_dir):
+            return []
+        
+        found = []
+        for name in os.listdir(self.backup_dir):
+            match = self.NAME_PATTERN.match(name)
+            if match:
+                taken_at = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+                found.append((taken_at, os.path.join(self.backup_dir, name)))
+        return sorted(found, reverse=True)
+    
+    def rotate(self):
+        """Delete archives beyond the retention count"""
+        for _, path in self.backups()[self.keep:]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error removing old backup {path}: {e}")
+    
+    def is_due(self, frequency_days):
+        """True when the newest archive is older than `frequency_days`"""
+        backups = self.backups()
+        if not backups:
+            return True
+        return datetime.now() - backups[0][0] >= timedelta(days=frequency_days)
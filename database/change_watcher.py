@@ -0,0 +1,106 @@
+import sqlite3
+
+
+class ChangeWatcher:
+    """Tell live views which tables changed since they last looked
+    
+    A single long-lived connection polls PRAGMA data_version, which only
+    moves when another connection commits (every Database method and every
+    other front-desk instance counts as another connection). That check does
+    not read any table; the table_versions counters are only read when it
+    moves, and subscribers are called for the tables whose counter changed.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        interval (int, optional): Polling interval in milliseconds
+    """
+    
+    def __init__(self, db_path, interval=2000):
+        self.db_path = db_path
+        self.interval = interval
+        self.subscribers = []
+        self.versions = {}
+        self._conn = None
+        self._data_version = None
+        self._widget = None
+        self._job = None
+    
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path)
+            self._data_version = self._read_data_version()
+            self.versions = self._read_versions()
+        return self._conn
+    
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _read_versions(self):
+        return dict(self._conn.execute("SELECT table_name, version FROM table_versions"))
+    
+    def subscribe(self, tables, callback):
+        """
+        Call `callback(changed_tables)` whenever any of `tables` changes
+        
+        Returns:
+            tuple: Token for unsubscribe()
+        """
+        token = (frozenset(tables), callback)
+        self.subscribers.append(token)
+        return token
+    
+    def unsubscribe(self, token):
+        if token in self.subscribers:
+            self.subscribers.remove(token)
+    
+    def poll(self):
+        """Return the set of tables changed since the last poll"""
+        try:
+            self._connection()
+            data_version = self._read_data_version()
+            if data_version == self._data_version:
+                return set()
+            self._data_version = data_version
+            
+            versions = self._read_versions()
+            changed = {table for table, version in versions.items()
+                       if self.versions.get(table) != version}
+            self.versions = versions
+            return changed
+        
+        except sqlite3.Error as e:
+            print(f"Error checking for changes: {e}")
+            self.close()
+            return set()
+    
+    def notify(self, changed):
+        for tables, callback in list(self.subscribers):
+            affected = tables & changed
+            if affected:
+                try:
+                    callback(affected)
+                except Exception as e:
+                    print(f"Error in change subscriber: {e}")
+    
+    def start(self, widget):
+        """Poll on `widget`'s event loop until stop() is called"""
+        self._widget = widget
+        self._connection()
+        self._job = widget.after(self.interval, self._tick)
+    
+    def stop(self):
+        if self._job is not None and self._widget is not None:
+            self._widget.after_cancel(self._job)
+        self._job = None
+        self.close()
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def _tick(self):
+        changed = self.poll()
+        if changed:
+            self.notify(changed)
+        self._job = self._widget.after(self.interval, self._tick)
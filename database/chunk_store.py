@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime
+
+
+class ChunkStoreError(Exception):
+    """Raised when a snapshot is missing, incomplete or corrupt"""
+
+
+class ChunkStore:
+    """Deduplicating, content-addressed store of backup snapshots
+    
+    Files are cut into fixed-size chunks named by their SHA-256 and stored
+    zlib-compressed under chunks/, so a chunk shared by any two snapshots
+    (or two files) is written once. The chunk size is a whole number of
+    SQLite pages, which keeps unchanged pages of the database in unchanged
+    chunks between snapshots. Each snapshot is a JSON manifest under
+    snapshots/ listing every file's size and chunk hashes; it is written
+    last, so a snapshot only exists once all of its chunks do.
+    
+    Layout:
+        chunks/ab/abcdef...     compressed chunk
+        snapshots/<id>.json     manifest
+    
+    Args:
+        root (str): Folder holding the store
+        chunk_size (int, optional): Bytes per chunk
+    """
+    
+    CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, root, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.chunks_dir = os.path.join(root, "chunks")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+    
+    def snapshot(self, files, task=None):
+        """
+        Store a snapshot of the given files
+        
+        Args:
+            files (dict): Archive name -> path on disk
+            task (Task, optional): Background task to report progress to
+        
+        Returns:
+            dict: The snapshot manifest, including 'id' and byte counts
+        """
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        
+        # Files whose size and mtime match the last snapshot reuse its chunk list
+        previous = self.latest()
+        known = previous['files'] if previous else {}
+        
+        entries = {}
+        stored = 0
+        for done, (name, path) in enumerate(sorted(files.items())):
+            if task is not None and done % 50 == 0:
+                task.report(done, len(files), "Storing backup...")
+            
+            stat = os.stat(path)
+            entry = known.get(name)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns \
+                    and all(self.has_chunk(digest) for digest in entry['chunks']):
+                entries[name] = entry
+                continue
+            
+            chunks = []
+            with open(path, 'rb') as f:
+                while True:
+                    data = f.read(self.chunk_size)
+                    if not data:
+                        break
+                    digest = hashlib.sha256(data).hexdigest()
+                    if self.put_chunk(digest, data):
+                        stored += len(data)
+                    chunks.append(digest)
+            entries[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunks': chunks}
+        
+        manifest = {
+            'id': self.new_id(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'files': entries,
+            'total_bytes': sum(entry['size'] for entry in entries.values()),
+            'new_bytes': stored
+        }
+        self.write_json(self.manifest_path(manifest['id']), manifest)
+        return manifest
+    
+    def restore(self, snapshot_id, target_dir, task=None):
+        """
+        Rebuild every file of a snapshot under target_dir, checking each chunk
+        
+        Returns:
+            list: Paths written
+        """
+        manifest = self.manifest(snapshot_id)
+        written = []
+        for done, (name, entry) in enumerate(sorted(manifest['files'].items())):
+            if task is not None and done % 50 == 0:
+                task.report(done, len(manifest['files']), "Restoring backup...")
+            
+            path = os.path.join(target_dir, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = path + ".part"
+            with open(partial, 'wb') as f:
+                for digest in entry['chunks']:
+                    f.write(self.get_chunk(digest))
+            os.replace(partial, path)
+            written.append(path)
+        return written
+    
+    def verify(self, snapshot_id, deep=False):
+        """
+        Check a snapshot can be restored
+        
+        The quick check confirms every chunk is present; a deep check also
+        decompresses and re-hashes each one.
+        
+        Returns:
+            list: Problems found (empty when the snapshot is sound)
+        """
+        problems = []
+        checked = set()
+        for name, entry in self.manifest(snapshot_id)['files'].items():
+            for digest in entry['chunks']:
+                if digest in checked:
+                    continue
+                checked.add(digest)
+                if not self.has_chunk(digest):
+                    problems.append(f"{name}: missing chunk {digest}")
+                elif deep:
+                    try:
+                        self.get_chunk(digest)
+                    except ChunkStoreError as e:
+                        problems.append(f"{name}: {e}")
+        return problems
+    
+    def snapshots(self):
+        """Snapshot ids, newest first"""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        ids = [name[:-5] for name in os.listdir(self.snapshots_dir) if name.endswith(".json")]
+        return sorted(ids, reverse=True)
+    
+    def latest(self):
+        ids = self.snapshots()
+        return self.manifest(ids[0]) if ids else None
+    
+    def manifest(self, snapshot_id):
+        try:
+            with open(self.manifest_path(snapshot_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise ChunkStoreError(f"Cannot read snapshot {snapshot_id}: {e}")
+    
+    def prune(self, keep):
+        """
+        Keep the newest `keep` snapshots and delete chunks no longer referenced
+        
+        Returns:
+            int: Number of chunks removed
+        """
+        for snapshot_id in self.snapshots()[keep:]:
+            os.remove(self.manifest_path(snapshot_id))
+        
+        referenced = set()
+        for snapshot_id in self.snapshots():
+            for entry in self.manifest(snapshot_id)['files'].values():
+                referenced.update(entry['chunks'])
+        
+        removed = 0
+        if not os.path.isdir(self.chunks_dir):
+            return removed
+        for folder, _, names in os.walk(self.chunks_dir):
+            for name in names:
+                if name not in referenced:
+                    os.remove(os.path.join(folder, name))
+                    removed += 1
+        return removed
+    
+    def has_chunk(self, digest):
+        return os.path.exists(self.chunk_path(digest))
+    
+    def put_chunk(self, digest, data):
+        """Store a chunk unless present; True if it was new"""
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            return False
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = path + ".part"
+        with open(partial, 'wb') as f:
+            f.write(zlib.compress(data, 6))
+        os.replace(partial, path)
+        return True
+    
+    def get_chunk(self, digest):
+        try:
+            with open(self.chunk_path(digest), 'rb') as f:
+                data = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise ChunkStoreError(f"Cannot read chunk {digest}: {e}")
+        
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ChunkStoreError(f"Chunk {digest} is corrupt")
+        return data
+    
+    def chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+    
+    def manifest_path(self, snapshot_id):
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+    
+    def new_id(self):
+        base = datetime.now().strftime('%Y%m%d_%H%M%S')
+        snapshot_id, n = base, 1
+        while os.path.exists(self.manifest_path(snapshot_id)):
+            snapshot_id = f"{base}_{n}"
+            n += 1
+        return snapshot_id
+    
+    def write_json(self, path, data):
+        partial = path + ".part"
+        with open(partial, 'w') as f:
+            json.dump(data, f)
+        os.replace(partial, path)
@@ -0,0 +1,107 @@
+from datetime import datetime
+
+
+def month_index(dates):
+    """Months since year 0 for a datetime Series (NaT stays NaN)"""
+    return dates.dt.year * 12 + dates.dt.month - 1
+
+
+def cohort_matrices(extract, today=None, max_months=36):
+    """
+    Build registration cohort x months-since-start matrices
+    
+    Every student belongs to the cohort of the month they registered in.
+    Cell (cohort, k) is measured k months after that month: the share of
+    the cohort not dropped out, the share graduated, and the share of the
+    cohort's fees collected so far. Cells a cohort has not reached yet are
+    NaN. Everything is computed with whole-array operations over one
+    extract, so the cost grows with the data, not with the number of cohorts.
+    
+    Dropout and graduation dates come from the status changes in the
+    activity log. Students whose change predates the log are counted as
+    dropped out from the start, or graduated after their programme duration.
+    
+    Args:
+        extract (dict): As returned by Database.get_cohort_extract()
+        today (datetime, optional): Month to measure up to
+        max_months (int, optional): Widest months-since-start column
+    
+    Returns:
+        dict: 'sizes' (Series) and 'retention', 'graduation' and
+            'collection' (DataFrames of percentages)
+    """
+    import numpy as np
+    import pandas as pd
+    
+    students = pd.DataFrame(extract['students'], columns=[
+        'reg_number', 'registration_date', 'status', 'programme_fee', 'duration'
+    ])
+    students['registered'] = pd.to_datetime(students['registration_date'], errors='coerce')
+    students = students[students['registered'].notna()].reset_index(drop=True)
+    
+    if students.empty:
+        empty = pd.DataFrame()
+        return {'sizes': pd.Series(dtype=int), 'retention': empty,
+                'graduation': empty, 'collection': empty}
+    
+    today = pd.Timestamp(today or datetime.now())
+    start = month_index(students['registered']).to_numpy()
+    age = today.year * 12 + today.month - 1 - start
+    offsets = np.arange(min(max(int(age.max()), 0), max_months - 1) + 1)
+    cohort = start
+    
+    # Month of the latest change into each status, per student
+    changes = pd.DataFrame(extract['status_changes'],
+                           columns=['reg_number', 'occurred_at', 'status'])
+    changes['month'] = month_index(pd.to_datetime(changes['occurred_at'], errors='coerce'))
+    
+    def changed_at(status, fallback):
+        months = changes[changes['status'] == status].groupby('reg_number')['month'].max()
+        offset = students['reg_number'].map(months).to_numpy(dtype=float) - start
+        offset = np.where(np.isnan(offset), fallback, np.clip(offset, 0, None))
+        return np.where(students['status'].to_numpy() == status, offset, np.inf)
+    
+    duration = students['duration'].astype(str).str.extract(r'(\d+)', expand=False)
+    dropped_at = changed_at('Dropped Out', 0)
+    graduated_at = changed_at('Graduated', duration.astype(float).fillna(0).to_numpy())
+    
+    # Students x offsets flags, averaged within each cohort
+    observed = offsets[None, :] <= age[:, None]
+    
+    def cohort_rate(flags):
+        hits = pd.DataFrame(flags & observed, columns=offsets).groupby(cohort).sum()
+        seen = pd.DataFrame(observed, columns=offsets).groupby(cohort).sum()
+        return hits / seen.where(seen > 0) * 100
+    
+    retention = cohort_rate(dropped_at[:, None] > offsets[None, :])
+    graduation = cohort_rate(graduated_at[:, None] <= offsets[None, :])
+    
+    # Cumulative payments by months since the payer's registration
+    payments = pd.DataFrame(extract['payments'], columns=['reg_number', 'payment_date', 'amount'])
+    position = pd.Series(students.index, index=students['reg_number'])
+    payments['student'] = payments['reg_number'].map(position)
+    payments['month'] = month_index(pd.to_datetime(payments['payment_date'], errors='coerce'))
+    payments = payments.dropna(subset=['student', 'month', 'amount'])
+    
+    payer = payments['student'].to_numpy(dtype=int)
+    offset = np.clip(payments['month'].to_numpy() - start[payer], 0, offsets[-1]).astype(int)
+    paid = (pd.DataFrame({'cohort': cohort[payer], 'offset': offset,
+                          'amount': payments['amount'].to_numpy(dtype=float)})
+            .pivot_table(index='cohort', columns='offset', values='amount',
+                         aggfunc='sum', fill_value=0)
+            .reindex(index=retention.index, columns=offsets, fill_value=0)
+            .rename_axis(columns=None)
+            .cumsum(axis=1))
+    
+    fees = students.groupby(cohort)['programme_fee'].sum().reindex(retention.index)
+    collection = paid.div(fees.where(fees > 0), axis=0) * 100
+    collection = collection.where(retention.notna())
+    
+    sizes = pd.Series(cohort).value_counts().reindex(retention.index)
+    
+    # Label cohorts by month only once everything is grouped
+    def label(month):
+        return f"{month // 12}-{month % 12 + 1:02d}"
+    
+    return {'sizes': sizes.rename(label), 'retention': retention.rename(label),
+            'graduation': graduation.rename(label), 'collection': collection.rename(label)}
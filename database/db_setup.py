@@ -1,8 +1,19 @@
 from datetime import datetime, timedelta
 import sqlite3
+import json
 import os
+import re
+import threading
 from utils.constants import SCHEDULES
 from utils.receipt_generator import ReceiptGenerator
+from database.programme_catalogue import ProgrammeCatalogue
+from database.programme_summary import ProgrammeSummary
+from database.paging import SqlPageSource
+from database.analytics_snapshot import AnalyticsSnapshot
+from database.archive import ArchiveManager
+from database.integrity import IntegrityChecker
+from database.report_session import ReportSession
+from database.write_policy import WritePolicy, is_busy
 
 class Database:
     def __init__(self, db_path):
@@ -12,19 +23,188 @@ class Database:
         self.receipts_path = os.path.join(self.base_path, "receipts")
         self.receipt_generator = ReceiptGenerator(self.base_path)
         
+        # Set by the database service to share pooled connections
+        self.pool = None
+        
+        # Busy timeout and retries for writes that meet another desk's lock
+        self.write_policy = WritePolicy.configured(self.base_path)
+        
+        # The report session (if any) each thread is reading through
+        self.report_local = threading.local()
+        
         # Create tables if they don't exist
         self.create_tables()
         
         # Check if migration is needed
         if not self.check_status_column():
             from database.migrations import migrate_database
-            migrate_database(self.db_path)
+            migrate_database(self.db_path, self.write_policy)
+        
+        # Seed the programme catalogue and link students by programme_id
+        from database.migrations import migrate_programmes
+        migrate_programmes(self.db_path, self.write_policy)
+        
+        # Maintain per-student payment totals via triggers
+        from database.migrations import migrate_student_balances
+        migrate_student_balances(self.db_path, self.write_policy)
+        
+        # Indexes behind the list pages' default and column sorts
+        from database.migrations import migrate_sort_indexes
+        migrate_sort_indexes(self.db_path, self.write_policy)
+        
+        # Full-text index for live student search (False means LIKE fallback)
+        from database.migrations import migrate_student_search
+        self.student_search_fts = migrate_student_search(self.db_path, self.write_policy)
+        
+        # Per-table change counters for live views and other front-desk instances
+        from database.migrations import migrate_table_versions
+        migrate_table_versions(self.db_path, self.write_policy)
+        
+        # Append-only feed of registrations, payments, status changes and deletions
+        from database.migrations import migrate_activity_log
+        migrate_activity_log(self.db_path, self.write_policy)
+        
+        # Keys that make saving the same payment twice record it once (before
+        # the change log and archive, which pick up the new column)
+        from database.migrations import migrate_payment_idempotency
+        migrate_payment_idempotency(self.db_path, self.write_policy)
+        
+        # Trigger-fed audit trail of every student and payment write
+        from database.migrations import migrate_change_log
+        migrate_change_log(self.db_path, self.write_policy)
+        
+        # Stubs for students moved to archive.db, and the archive itself
+        from database.migrations import migrate_archive
+        migrate_archive(self.db_path, self.write_policy)
+        self.archive = ArchiveManager(self.db_path)
+        
+        # Marks left by each integrity check for the next incremental one
+        from database.migrations import migrate_integrity_runs
+        migrate_integrity_runs(self.db_path, self.write_policy)
+        
+        # Payment reminders and progress updates sent to students
+        from database.migrations import migrate_notifications
+        migrate_notifications(self.db_path, self.write_policy)
+        
+        # Desk prefix and peer watermarks for syncing with other desks
+        from database.migrations import migrate_sync
+        migrate_sync(self.db_path, self.write_policy)
+        
+        # Cached programme lookups shared by all pages
+        self.programmes = ProgrammeCatalogue(self)
+        
+        # Cached per-programme statistics for the programmes page and exports
+        self.programme_summary = ProgrammeSummary(self)
+        
+        # In-memory columns behind the grouped reports, loaded on first use
+        self.analytics = AnalyticsSnapshot(self.db_path)
+    
+    def invalidate_caches(self):
+        """Drop cached aggregates after a write so the next read is fresh"""
+        self.programme_summary.invalidate()
+    
+    def get_table_versions(self):
+        """
+        Read the per-table change counters maintained by triggers
+        
+        Returns:
+            tuple: Sorted (table_name, version) pairs, usable as a cache key
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT table_name, version FROM table_versions ORDER BY table_name')
+            return tuple(cursor.fetchall())
+        
+        except sqlite3.Error as e:
+            print(f"Error reading table versions: {e}")
+            return None
+        
+        finally:
+            conn.close()
+    
+    def connect(self):
+        """Connection to the database, from the pool when one is set"""
+        if self.pool is not None:
+            return self.pool.connect()
+        return sqlite3.connect(self.db_path, timeout=self.write_policy.busy_timeout)
+    
+    def connect_history(self):
+        """Connection whose students, payments and balances include archived rows (read only)
+        
+        Inside a report_session() block this is the session's snapshot.
+        """
+        session = getattr(self.report_local, 'session', None)
+        if session is not None:
+            return session.connection()
+        return self.archive.connect(history=True)
+    
+    def report_session(self, copy=None):
+        """
+        Snapshot the database for a long report
+        
+        Report methods called on this thread inside the `with` block read one
+        consistent snapshot and never hold up payments being saved meanwhile.
+        
+        Example:
+            with db.report_session():
+                summary = db.get_financial_summary()
+                cohorts = db.get_cohort_extract()
+        
+        Args:
+            copy (bool, optional): See ReportSession
+        
+        Returns:
+            ReportSession: Use as a context manager
+        """
+        return ReportSession(self.db_path, copy, owner=self)
+    
+    def student_search_condition(self, search_term, alias=None):
+        """
+        Build a WHERE fragment matching students by name or registration number
+        
+        Uses word-prefix matching on the full-text index when it is available,
+        and a substring LIKE otherwise.
+        
+        Args:
+            search_term (str): Text typed by the user
+            alias (str, optional): Alias of the students table in the query
+        
+        Returns:
+            tuple: (sql, params)
+        """
+        column = f"{alias}." if alias else ""
+        words = re.findall(r'\w+', search_term)
+        
+        if self.student_search_fts and words:
+            match = " ".join(f'"{word}"*' for word in words)
+            return (f"({column}reg_number IN ("
+                    f"SELECT reg_number FROM students_fts WHERE students_fts MATCH ?"
+                    f") OR {column}reg_number LIKE ?)",
+                    [match, f"{search_term}%"])
+        
+        return (f"({column}name LIKE ? OR {column}reg_number LIKE ?)",
+                [f"%{search_term}%"] * 2)
     
     def create_tables(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
+            # Create Programmes catalogue
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS programmes (
+                    programme_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                    code TEXT NOT NULL,
+                    default_fee REAL DEFAULT 0,
+                    durations TEXT,
+                    schedules TEXT,
+                    description TEXT
+                )
+            ''')
+            
             # Create Students table with additional fields
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS students (
@@ -33,6 +213,7 @@ class Database:
                     age INTEGER,
                     gender TEXT,
                     programme TEXT,
+                    programme_id INTEGER REFERENCES programmes(programme_id),
                     start_date DATE,
                     duration TEXT,
                     schedule TEXT,
@@ -66,57 +247,106 @@ class Database:
         finally:
             conn.close()
     
+    def desk_prefix(self):
+        """Letters identifying this desk in new numbers ('' when not syncing)"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT prefix FROM sync_desk WHERE id = 1')
+            row = cursor.fetchone()
+            return row[0] if row and row[0] else ''
+        
+        except sqlite3.Error:
+            return ''
+        finally:
+            conn.close()
+    
     def generate_serial_number(self, programme, year):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
-        # Prepare the programme code
-        prog_code = ''.join(word[0] for word in programme.split()[:3]).upper()
+        # Use the programme code stored in the catalogue
+        prog_code = self.programmes.get_code(programme)
+        
+        # Serials carry this desk's prefix so desks that sync never collide
+        prefix = self.desk_prefix()
         
-        # Get the last registration number for this programme and year
+        # Get the last registration number for this programme, year and desk,
+        # archived students included so their numbers are never reused
         cursor.execute('''
-            SELECT reg_number FROM students 
-            WHERE reg_number LIKE ? 
+            SELECT reg_number FROM students WHERE reg_number GLOB ?
+            UNION ALL
+            SELECT reg_number FROM archived_students WHERE reg_number GLOB ?
             ORDER BY reg_number DESC LIMIT 1
-        ''', [f'IMPTECH-{prog_code}-{year}%'])
+        ''', [f'IMPTECH-{prog_code}-{year}-{prefix}[0-9]*'] * 2)
         
         result = cursor.fetchone()
         
         if result:
             # Extract the serial number from the last registration number
-            last_serial = int(result[0].split('-')[-1])
+            last_serial = int(result[0].split('-')[-1][len(prefix):])
             new_serial = str(last_serial + 1).zfill(3)
         else:
             new_serial = '001'
         
         conn.close()
-        return new_serial
+        return prefix + new_serial
     
     def save_student(self, student_data):
-        conn = sqlite3.connect(self.db_path)
+        """
+        Register a student, with their first payment when there is one
+        
+        Returns:
+            tuple: (success, receipt_path, error)
+        """
+        try:
+            payment_data = self.write_policy.run(self.insert_student, student_data)
+        except ValueError as e:
+            return False, None, str(e)
+        except sqlite3.IntegrityError:
+            return False, None, "Duplicate registration number or database constraint violation"
+        except sqlite3.Error as e:
+            return False, None, self.write_error(e)
+        
+        self.invalidate_caches()
+        
+        # The receipt is written once the student is committed, so a retried
+        # save never leaves a receipt for a payment that was not recorded
+        if payment_data is None:
+            return True, None, None
+        return True, self.write_receipt(payment_data, student_data), None
+    
+    def insert_student(self, student_data):
+        """One attempt at save_student's transaction; returns the initial payment, if any"""
+        conn = self.connect()
         cursor = conn.cursor()
-        receipt_path = None
         
         try:
+            # Take the write lock before checking, so the registration and
+            # receipt numbers cannot be taken by another desk before the insert
+            cursor.execute('BEGIN IMMEDIATE')
+            
             # Check if registration number already exists
             cursor.execute('SELECT COUNT(*) FROM students WHERE reg_number = ?', (student_data['reg_number'],))
             if cursor.fetchone()[0] > 0:
-                return False, None, "Registration number already exists. Please regenerate."
+                raise ValueError("Registration number already exists. Please regenerate.")
             
             # Insert student record with current timestamp and Active status
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             cursor.execute('''
                 INSERT INTO students (
-                    reg_number, name, age, gender, programme, 
+                    reg_number, name, age, gender, programme, programme_id,
                     start_date, duration, schedule, programme_fee,
                     registration_date, status, scholarship
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'Active', 0)
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'Active', 0)
             ''', (
                 student_data['reg_number'],
                 student_data['name'],
                 student_data['age'],
                 student_data['gender'],
                 student_data['programme'],
+                self.programmes.get_id(student_data['programme']),
                 student_data['start_date'],
                 student_data['duration'],
                 student_data['schedule'],
@@ -124,76 +354,96 @@ class Database:
                 current_time
             ))
             
-            # Insert initial payment record and generate receipt
+            # Insert initial payment record
+            payment_data = None
             if student_data['initial_payment'] > 0:
-                receipt_number = self.generate_receipt_number()
+                receipt_number = self.generate_receipt_number(cursor)
+                # Dated in local time like the registration, not the column's
+                # UTC default, so the activity feed keeps the two in order
                 cursor.execute('''
                     INSERT INTO payments (
-                        reg_number, amount, receipt_number
-                    ) VALUES (?, ?, ?)
+                        reg_number, amount, receipt_number, payment_date
+                    ) VALUES (?, ?, ?, ?)
                 ''', (
                     student_data['reg_number'],
                     student_data['initial_payment'],
-                    receipt_number
+                    receipt_number,
+                    current_time
                 ))
                 
-                # Generate receipt PDF
                 payment_data = {
                     'receipt_number': receipt_number,
-                    'payment_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'payment_date': current_time,
                     'amount': student_data['initial_payment']
                 }
-                
-                receipt_path = self.receipt_generator.generate_receipt(payment_data, student_data)
             
             conn.commit()
-            return True, receipt_path, None
-            
-        except sqlite3.IntegrityError as e:
-            conn.rollback()
-            return False, None, "Duplicate registration number or database constraint violation"
-        except sqlite3.Error as e:
+            return payment_data
+        
+        except Exception:
             conn.rollback()
-            return False, None, str(e)
-            
+            raise
+        
         finally:
             conn.close()
     
-    def generate_receipt_number(self):
-        # Generate receipt number format: RCP-YYYYMMDD-XXXX
+    def write_receipt(self, payment_data, student_data):
+        """Generate a committed payment's receipt PDF; None if that fails"""
+        try:
+            return self.receipt_generator.generate_receipt(payment_data, student_data)
+        except Exception as e:
+            # The payment stands; `python -m impactech regen-receipts` rebuilds the PDF
+            print(f"Payment {payment_data['receipt_number']} saved, but its receipt failed: {e}")
+            return None
+    
+    def write_error(self, error):
+        """Message for a failed write, plainer when another desk held the lock"""
+        if is_busy(error):
+            return "The database is busy with another desk's changes. Please try again."
+        return str(error)
+    
+    def generate_receipt_number(self, cursor=None):
+        # Generate receipt number format: RCP-YYYYMMDD-XXXX, with the
+        # desk prefix (RCP-YYYYMMDD-BXXXX) when syncing with other desks.
+        # Pass the cursor of an open BEGIN IMMEDIATE transaction to keep the
+        # number from being issued elsewhere before the payment is inserted.
+        if cursor is None:
+            conn = self.connect()
+            try:
+                return self.generate_receipt_number(conn.cursor())
+            finally:
+                conn.close()
+        
         now = datetime.now()
         date_part = now.strftime('%Y%m%d')
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        prefix = self.desk_prefix()
         
         # Get the last receipt number for today
         cursor.execute('''
             SELECT receipt_number FROM payments 
-            WHERE receipt_number LIKE ? 
+            WHERE receipt_number GLOB ? 
             ORDER BY receipt_number DESC LIMIT 1
-        ''', [f'RCP-{date_part}%'])
+        ''', [f'RCP-{date_part}-{prefix}[0-9]*'])
         
         result = cursor.fetchone()
-        conn.close()
         
         if result:
-            last_number = int(result[0].split('-')[-1])
+            last_number = int(result[0].split('-')[-1][len(prefix):])
             serial = str(last_number + 1).zfill(4)
         else:
             serial = '0001'
             
-        return f'RCP-{date_part}-{serial}'
+        return f'RCP-{date_part}-{prefix}{serial}'
     
     def get_student(self, reg_number):
         """Get student details by registration number"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT reg_number, name, age, gender, programme, 
                    start_date, duration, schedule, programme_fee,
-                   registration_date
+                   registration_date, programme_id
             FROM students 
             WHERE reg_number = ?
         ''', [reg_number])
@@ -212,12 +462,13 @@ class Database:
                 'duration': student[6] or '',
                 'schedule': student[7] or '',
                 'programme_fee': student[8] or 0,
-                'registration_date': student[9] or ''
+                'registration_date': student[9] or '',
+                'programme_id': student[10]
             }
         return None
     
     def get_student_payments(self, reg_number):
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -238,7 +489,7 @@ class Database:
     
     def get_student_receipts(self, reg_number):
         """Get all receipt paths for a student"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -267,21 +518,80 @@ class Database:
         
         return receipt_list
     
-    def save_payment(self, reg_number, amount, payment_note=''):
-        """Save a new payment with comment and generate receipt"""
-        conn = sqlite3.connect(self.db_path)
+    def save_payment(self, reg_number, amount, payment_note='', idempotency_key=None):
+        """
+        Save a new payment with comment and generate receipt
+        
+        Saving again with the same idempotency_key (a retry, a double click)
+        records nothing new and returns the first save's receipt. Reusing a
+        key for another student or amount fails.
+        
+        Args:
+            reg_number (str): Student paying
+            amount (float): Amount paid
+            payment_note (str, optional): Comment printed on the receipt
+            idempotency_key (str, optional): Unique key for this payment
+        
+        Returns:
+            tuple: (success, receipt_path, error)
+        """
+        try:
+            payment_data, student_data, created = self.write_policy.run(
+                self.insert_payment, reg_number, amount, payment_note, idempotency_key)
+        except (sqlite3.Error, ValueError) as e:
+            return False, None, self.write_error(e)
+        
+        if not created:
+            filepath = os.path.join(self.receipts_path, f"receipt_{payment_data['receipt_number']}.pdf")
+            if os.path.exists(filepath):
+                return True, filepath, None
+        
+        self.invalidate_caches()
+        
+        # Written after the commit, so a retried save never leaves a receipt
+        # for a payment that was not recorded
+        return True, self.write_receipt(payment_data, student_data), None
+    
+    def insert_payment(self, reg_number, amount, payment_note, idempotency_key):
+        """
+        One attempt at save_payment's transaction
+        
+        Returns:
+            tuple: (payment_data, student_data, created), created being False
+                when the key's payment was already recorded
+        """
+        conn = self.connect()
         cursor = conn.cursor()
-        receipt_path = None
         
         try:
+            # Take the write lock before reading, so the balance and receipt
+            # number cannot change before the insert
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            # A payment already saved under this key is described, not repeated
+            existing = None
+            if idempotency_key is not None:
+                cursor.execute('''
+                    SELECT p.reg_number, p.amount, p.receipt_number, p.payment_date,
+                           p.payment_note,
+                           (SELECT SUM(amount) FROM payments
+                            WHERE reg_number = p.reg_number AND payment_id <= p.payment_id)
+                    FROM payments p
+                    WHERE p.idempotency_key = ?
+                ''', [idempotency_key])
+                existing = cursor.fetchone()
+                # A key reused for another student or amount is a caller's
+                # mistake, never the same payment
+                if existing and (existing[0] != reg_number or existing[1] != float(amount)):
+                    raise ValueError("This payment key was already used for a different payment")
+            
             # Get student data first
             cursor.execute('''
-                SELECT name, programme, reg_number, programme_fee,
-                       (SELECT COALESCE(SUM(amount), 0) 
-                        FROM payments 
-                        WHERE reg_number = s.reg_number) as total_paid
+                SELECT s.name, s.programme, s.reg_number, s.programme_fee,
+                       COALESCE(b.total_paid, 0) as total_paid
                 FROM students s
-                WHERE reg_number = ?
+                LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+                WHERE s.reg_number = ?
             ''', [reg_number])
             
             student = cursor.fetchone()
@@ -291,20 +601,23 @@ class Database:
             # Extract student info and current total paid
             name, programme, reg_num, programme_fee, previous_payments = student
             
-            # Calculate new total and balance
-            new_total_paid = previous_payments + amount
-            balance = programme_fee - new_total_paid
-            
-            # Generate receipt number and save payment with note
-            receipt_number = self.generate_receipt_number()
-            payment_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            cursor.execute('''
-                INSERT INTO payments (
-                    reg_number, amount, receipt_number, 
-                    payment_date, payment_note
-                ) VALUES (?, ?, ?, ?, ?)
-            ''', (reg_number, amount, receipt_number, payment_date, payment_note))
+            if existing:
+                _, amount, receipt_number, payment_date, payment_note, new_total_paid = existing
+                conn.rollback()
+            else:
+                # Calculate new total, then number and save the payment with its note
+                new_total_paid = previous_payments + amount
+                receipt_number = self.generate_receipt_number(cursor)
+                payment_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                
+                cursor.execute('''
+                    INSERT INTO payments (
+                        reg_number, amount, receipt_number, 
+                        payment_date, payment_note, idempotency_key
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                ''', (reg_number, amount, receipt_number, payment_date, payment_note,
+                      idempotency_key))
+                conn.commit()
             
             # Prepare data for receipt generation
             student_data = {
@@ -319,26 +632,21 @@ class Database:
                 'payment_date': str(payment_date),
                 'amount': float(amount),
                 'total_paid': float(new_total_paid),
-                'balance': float(balance),
+                'balance': float(programme_fee - new_total_paid),
                 'payment_note': payment_note
             }
-            
-            # Generate receipt
-            receipt_path = self.receipt_generator.generate_receipt(payment_data, student_data)
-            
-            conn.commit()
-            return True, receipt_path, None
-            
-        except (sqlite3.Error, ValueError) as e:
+            return payment_data, student_data, not existing
+        
+        except Exception:
             conn.rollback()
-            return False, None, str(e)
-            
+            raise
+        
         finally:
             conn.close()
     
     def get_total_payments(self, reg_number):
         """Get total amount paid by a student"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -354,13 +662,14 @@ class Database:
     
     def get_payment_history(self, reg_number):
         """Get detailed payment history for a student"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT amount, payment_date, receipt_number,
                    (SELECT programme_fee FROM students WHERE reg_number = p.reg_number) as total_fee,
-                   (SELECT SUM(amount) FROM payments WHERE reg_number = p.reg_number AND payment_date <= p.payment_date) as running_total
+                   (SELECT SUM(amount) FROM payments WHERE reg_number = p.reg_number AND payment_date <= p.payment_date) as running_total,
+                   payment_id
             FROM payments p
             WHERE reg_number = ?
             ORDER BY payment_date DESC
@@ -374,17 +683,18 @@ class Database:
             'payment_date': payment[1],
             'receipt_number': payment[2],
             'total_fee': payment[3],
-            'balance': payment[3] - payment[4]  # total_fee - running_total
+            'balance': payment[3] - payment[4],  # total_fee - running_total
+            'payment_id': payment[5]
         } for payment in payments]
     
     def get_all_students(self):
         """Get all students from database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT reg_number, name, programme, start_date, 
-                   programme_fee, duration, schedule
+                   programme_fee, duration, schedule, programme_id
             FROM students
             ORDER BY registration_date DESC
         ''')
@@ -399,17 +709,74 @@ class Database:
             'start_date': student[3],
             'programme_fee': student[4],
             'duration': student[5],
-            'schedule': student[6]
+            'schedule': student[6],
+            'programme_id': student[7]
         } for student in students]
     
-    def export_students_to_excel(self):
-        """Export student records to Excel"""
+    def get_student_page_source(self, programme_id=None, schedule=None, search_term=None):
+        """
+        Build a paged view of the student list for the virtual tables
+        
+        Args:
+            programme_id (int, optional): Only students on this programme
+            schedule (str, optional): Only students on this schedule
+            search_term (str, optional): Match against name or registration number
+        
+        Returns:
+            SqlPageSource: Page source yielding student dicts
+        """
+        conditions = []
+        params = []
+        
+        if programme_id is not None:
+            conditions.append("programme_id = ?")
+            params.append(programme_id)
+        if schedule:
+            conditions.append("schedule = ?")
+            params.append(schedule)
+        if search_term:
+            condition, condition_params = self.student_search_condition(search_term)
+            conditions.append(condition)
+            params.extend(condition_params)
+        
+        query = '''
+            SELECT reg_number, name, programme, schedule, start_date,
+                   programme_fee, programme_id
+            FROM students
+        '''
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        return SqlPageSource(
+            self.db_path, query, params,
+            columns=['reg_number', 'name', 'programme', 'schedule', 'start_date',
+                     'programme_fee', 'programme_id'],
+            sort_columns={
+                'reg_number': 'reg_number',
+                'name': 'name COLLATE NOCASE',
+                'programme': 'programme COLLATE NOCASE',
+                'schedule': 'schedule',
+                'start_date': 'start_date'
+            },
+            order_by='registration_date DESC, reg_number'
+        )
+    
+    def export_students_to_excel(self, progress=None):
+        """
+        Export student records to Excel
+        
+        Args:
+            progress (callable, optional): progress(done, total) called as rows are gathered
+        """
         try:
             import pandas as pd
             
             # Get all students with payment info
             students = []
-            for student in self.get_all_students():
+            all_students = self.get_all_students()
+            for done, student in enumerate(all_students):
+                if progress and done % 200 == 0:
+                    progress(done, len(all_students))
                 total_paid = self.get_total_payments(student['reg_number'])
                 students.append({
                     'Registration Number': student['reg_number'],
@@ -444,7 +811,7 @@ class Database:
     
     def get_schedule_statistics(self):
         """Get detailed statistics for each schedule"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         stats = []
@@ -483,7 +850,7 @@ class Database:
     
     def get_schedule_payment_analysis(self):
         """Get payment analysis for each schedule"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         analysis = []
@@ -514,7 +881,7 @@ class Database:
     
     def get_schedule_trends(self):
         """Get month-over-month trends for each schedule"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         current_month = datetime.now().strftime('%Y-%m')
@@ -547,68 +914,39 @@ class Database:
         conn.close()
         return trends
     
-    def check_and_fix_database(self):
-        """Check database structure and fix if needed"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def check_and_fix_database(self, full=None, task=None):
+        """
+        Check database consistency and repair what can be repaired safely
         
+        Args:
+            full (bool, optional): Force a full or incremental check; by
+                default incremental, with a full check when one is due
+            task (Task, optional): Background task to report progress to
+        
+        Returns:
+            IntegrityReport: Issues found, or None if the check failed
+        """
         try:
-            # Update schema if needed
-            cursor.execute('''
-                UPDATE students 
-                SET status = 'Active' 
-                WHERE status IS NULL
-            ''')
-            
-            cursor.execute('''
-                UPDATE students 
-                SET scholarship = 0 
-                WHERE scholarship IS NULL
-            ''')
-            
-            conn.commit()
-            
+            checker = IntegrityChecker(self.db_path, self.write_policy)
+            report = checker.run(full=full, repair=True, task=task)
         except sqlite3.Error as e:
-            print(f"Error fixing database: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+            print(f"Error checking database: {e}")
+            return None
+        
+        if any(issue.repaired for issue in report.issues):
+            self.invalidate_caches()
+        return report
     
     def verify_database_structure(self):
         """Verify that the database has the correct structure"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
-            # Check students table structure
-            cursor.execute("PRAGMA table_info(students)")
-            students_columns = {column[1] for column in cursor.fetchall()}
-            
-            # Check payments table structure
-            cursor.execute("PRAGMA table_info(payments)")
-            payments_columns = {column[1] for column in cursor.fetchall()}
-            
-            # Verify required columns exist
-            required_students_columns = {
-                'reg_number', 'name', 'age', 'gender', 'programme',
-                'start_date', 'duration', 'schedule', 'programme_fee',
-                'registration_date'
-            }
-            
-            required_payments_columns = {
-                'payment_id', 'reg_number', 'amount', 'payment_date',
-                'receipt_number'
-            }
-            
-            if not required_students_columns.issubset(students_columns):
-                print("Students table missing columns")
-                return False
-            
-            if not required_payments_columns.issubset(payments_columns):
-                print("Payments table missing columns")
-                return False
-            
-            return True
+            issues = IntegrityChecker(self.db_path).check_structure(cursor)
+            for issue in issues:
+                print(f"Database structure: {issue.detail}")
+            return not issues
             
         except sqlite3.Error as e:
             print(f"Error verifying database structure: {e}")
@@ -618,11 +956,12 @@ class Database:
     
     def get_all_payments(self):
         """Get all payments with student names and programmes"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT p.payment_date, s.name, p.amount, p.receipt_number, s.programme
+            SELECT p.payment_date, s.name, p.amount, p.receipt_number, s.programme,
+                   s.programme_id
             FROM payments p
             JOIN students s ON p.reg_number = s.reg_number
             ORDER BY p.payment_date DESC
@@ -636,12 +975,91 @@ class Database:
             'student_name': payment[1],
             'amount': payment[2],
             'receipt_number': payment[3],
-            'programme': payment[4]
+            'programme': payment[4],
+            'programme_id': payment[5]
         } for payment in payments]
     
+    def get_payment_page_source(self, programme_id=None, search_term=None,
+                                from_date=None, to_date=None):
+        """
+        Build a paged view of all payments for the virtual tables
+        
+        Args:
+            programme_id (int, optional): Only payments by students on this programme
+            search_term (str, optional): Match against student name or programme
+            from_date (str, optional): Earliest payment date (YYYY-MM-DD)
+            to_date (str, optional): Latest payment date (YYYY-MM-DD), inclusive
+        
+        Returns:
+            SqlPageSource: Page source yielding payment dicts
+        """
+        conditions = []
+        params = []
+        
+        if programme_id is not None:
+            conditions.append("s.programme_id = ?")
+            params.append(programme_id)
+        if search_term:
+            condition, condition_params = self.student_search_condition(search_term, "s")
+            conditions.append(f"({condition} OR s.programme LIKE ?)")
+            params.extend(condition_params + [f"{search_term}%"])
+        if from_date:
+            conditions.append("date(p.payment_date) >= date(?)")
+            params.append(from_date)
+        if to_date:
+            conditions.append("date(p.payment_date) <= date(?)")
+            params.append(to_date)
+        
+        query = '''
+            SELECT p.payment_id, p.payment_date, s.name, p.amount,
+                   p.receipt_number, s.programme, s.programme_id, p.reg_number
+            FROM payments p
+            JOIN students s ON p.reg_number = s.reg_number
+        '''
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        return SqlPageSource(
+            self.db_path, query, params,
+            columns=['payment_id', 'payment_date', 'student_name', 'amount',
+                     'receipt_number', 'programme', 'programme_id', 'reg_number'],
+            sort_columns={
+                'date': 'p.payment_date',
+                'student': 's.name COLLATE NOCASE',
+                'amount': 'p.amount',
+                'receipt': 'p.receipt_number'
+            },
+            order_by='p.payment_date DESC, p.payment_id DESC'
+        )
+    
+    def get_programme_student_source(self, programme_id):
+        """Build a paged view of one programme's students with amounts paid"""
+        query = '''
+            SELECT s.reg_number, s.name, s.schedule, s.start_date, s.status,
+                   s.programme_fee, COALESCE(b.total_paid, 0) as paid_amount
+            FROM students s
+            LEFT JOIN student_balances b ON s.reg_number = b.reg_number
+            WHERE s.programme_id = ?
+        '''
+        
+        return SqlPageSource(
+            self.db_path, query, [programme_id],
+            columns=['reg_number', 'name', 'schedule', 'start_date', 'status',
+                     'programme_fee', 'paid_amount'],
+            sort_columns={
+                'reg_number': 's.reg_number',
+                'name': 's.name COLLATE NOCASE',
+                'schedule': 's.schedule',
+                'start_date': 's.start_date',
+                'status': "COALESCE(s.status, 'Active')",
+                'payment': 'COALESCE(b.total_paid, 0) / NULLIF(s.programme_fee, 0)'
+            },
+            order_by='s.name COLLATE NOCASE, s.reg_number'
+        )
+    
     def get_receipt_by_number(self, receipt_number):
         """Get receipt details by receipt number"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
@@ -678,10 +1096,15 @@ class Database:
     
     def update_student(self, reg_number, updates):
         """Update student details"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
+            # Keep programme_id in step with the programme name
+            if 'programme' in updates:
+                updates = dict(updates)
+                updates['programme_id'] = self.programmes.get_id(updates['programme'])
+            
             # Build update query
             update_fields = []
             values = []
@@ -700,6 +1123,7 @@ class Database:
             ''', values)
             
             conn.commit()
+            self.invalidate_caches()
             return True
             
         except sqlite3.Error as e:
@@ -712,7 +1136,7 @@ class Database:
     
     def get_payment_statistics(self):
         """Get overall payment statistics"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -780,11 +1204,13 @@ class Database:
         try:
             import pandas as pd
             
+            programme_id = self.programmes.get_id(programme) if programme else None
+            
             # Get all payments with additional info
             payments = []
             for payment in self.get_all_payments():
                 # Apply filters
-                if programme and payment['programme'] != programme:
+                if programme and payment['programme_id'] != programme_id:
                     continue
                     
                 if search_term and search_term.lower() not in payment['student_name'].lower() and \
@@ -826,34 +1252,43 @@ class Database:
         except Exception as e:
             raise Exception(f"Export failed: {str(e)}")
     
-    def get_outstanding_payments(self):
-        """Get list of students with outstanding payments"""
-        conn = sqlite3.connect(self.db_path)
+    def get_outstanding_payments(self, programme_id=None, search_term=None):
+        """
+        Get list of students with outstanding payments
+        
+        Args:
+            programme_id (int, optional): Only students on this programme
+            search_term (str, optional): Match against name or registration number
+        """
+        conditions = ["COALESCE(b.total_paid, 0) < s.programme_fee"]
+        params = []
+        
+        if programme_id is not None:
+            conditions.append("s.programme_id = ?")
+            params.append(programme_id)
+        if search_term:
+            condition, condition_params = self.student_search_condition(search_term, "s")
+            conditions.append(condition)
+            params.extend(condition_params)
+        
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                WITH StudentPayments AS (
-                    SELECT 
-                        s.reg_number,
-                        s.name,
-                        s.programme,
-                        s.programme_fee,
-                        COALESCE(SUM(p.amount), 0) as amount_paid
-                    FROM students s
-                    LEFT JOIN payments p ON s.reg_number = p.reg_number
-                    GROUP BY s.reg_number, s.name, s.programme, s.programme_fee
-                    HAVING amount_paid < programme_fee
-                )
+            cursor.execute(f'''
                 SELECT 
-                    name,
-                    programme,
-                    programme_fee,
-                    amount_paid,
-                    (programme_fee - amount_paid) as balance
-                FROM StudentPayments
+                    s.name,
+                    s.programme,
+                    s.programme_fee,
+                    COALESCE(b.total_paid, 0) as amount_paid,
+                    (s.programme_fee - COALESCE(b.total_paid, 0)) as balance,
+                    s.programme_id,
+                    s.reg_number
+                FROM students s
+                LEFT JOIN student_balances b ON s.reg_number = b.reg_number
+                WHERE {" AND ".join(conditions)}
                 ORDER BY balance DESC
-            ''')
+            ''', params)
             
             results = cursor.fetchall()
             return [{
@@ -861,7 +1296,9 @@ class Database:
                 'programme': result[1],
                 'programme_fee': result[2],
                 'amount_paid': result[3],
-                'balance': result[4]
+                'balance': result[4],
+                'programme_id': result[5],
+                'reg_number': result[6]
             } for result in results]
             
         except sqlite3.Error as e:
@@ -872,7 +1309,7 @@ class Database:
     
     def get_student_statistics(self):
         """Get student statistics"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -918,9 +1355,121 @@ class Database:
         finally:
             conn.close()
     
+    def get_recent_activity(self, before=None, limit=10):
+        """
+        Read the activity feed newest first, one page at a time
+        
+        Args:
+            before (tuple, optional): (occurred_at, activity_id) of the last
+                entry already shown; None starts from the newest
+            limit (int, optional): Maximum number of entries to return
+        
+        Returns:
+            list: Activity dictionaries, newest first
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            # Keyset pagination: seek past the last entry instead of OFFSET
+            if before is None:
+                cursor.execute('''
+                    SELECT activity_id, occurred_at, kind, reg_number, name, amount, detail
+                    FROM activity_log
+                    ORDER BY occurred_at DESC, activity_id DESC
+                    LIMIT ?
+                ''', (limit,))
+            else:
+                cursor.execute('''
+                    SELECT activity_id, occurred_at, kind, reg_number, name, amount, detail
+                    FROM activity_log
+                    WHERE (occurred_at, activity_id) < (?, ?)
+                    ORDER BY occurred_at DESC, activity_id DESC
+                    LIMIT ?
+                ''', (*before, limit))
+            
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        
+        except sqlite3.Error as e:
+            print(f"Error fetching recent activity: {e}")
+            return []
+        
+        finally:
+            conn.close()
+    
+    def get_change_seq(self):
+        """Sequence number of the newest change_log entry (0 if none)"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log')
+            return cursor.fetchone()[0]
+        
+        except sqlite3.Error as e:
+            print(f"Error reading change log: {e}")
+            return 0
+        finally:
+            conn.close()
+    
+    def get_changes_since(self, seq=0, limit=1000, tables=None):
+        """
+        Read change_log entries after a sequence number, oldest first
+        
+        Callers keep the seq of the last entry they processed and pass it
+        back to get the next batch; fewer than `limit` entries means they
+        have caught up.
+        
+        Args:
+            seq (int, optional): Return entries with a greater seq
+            limit (int, optional): Maximum number of entries
+            tables (iterable, optional): Only these tables ('students', 'payments')
+        
+        Returns:
+            list: Dicts with seq, changed_at, table, key, operation, old and
+                new (dicts, or None) and source
+        """
+        conditions = ["seq > ?"]
+        params = [seq]
+        if tables:
+            tables = list(tables)
+            conditions.append(f"table_name IN ({', '.join('?' for _ in tables)})")
+            params.extend(tables)
+        
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(f'''
+                SELECT seq, changed_at, table_name, row_key, operation,
+                       old_values, new_values, source
+                FROM change_log
+                WHERE {" AND ".join(conditions)}
+                ORDER BY seq
+                LIMIT ?
+            ''', params + [limit])
+            
+            return [{
+                'seq': row[0],
+                'changed_at': row[1],
+                'table': row[2],
+                'key': row[3],
+                'operation': row[4],
+                'old': json.loads(row[5]) if row[5] else None,
+                'new': json.loads(row[6]) if row[6] else None,
+                'source': row[7]
+            } for row in cursor.fetchall()]
+        
+        except sqlite3.Error as e:
+            print(f"Error reading change log: {e}")
+            return []
+        finally:
+            conn.close()
+    
     def check_status_column(self):
         """Check if status column exists in students table"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
@@ -937,7 +1486,7 @@ class Database:
     
     def update_student_status(self, reg_number, status):
         """Update student status"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
@@ -948,6 +1497,7 @@ class Database:
             ''', (status, reg_number))
             
             conn.commit()
+            self.invalidate_caches()
             return True
         
         except sqlite3.Error as e:
@@ -959,7 +1509,12 @@ class Database:
     
     def get_student_ages(self):
         """Fetch all student ages"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.student_ages()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -974,7 +1529,12 @@ class Database:
     
     def get_gender_distribution(self):
         """Get count of students by gender"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.gender_distribution()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -988,7 +1548,12 @@ class Database:
     
     def get_monthly_revenue(self):
         """Calculate monthly revenue"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.monthly_revenue()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -1009,7 +1574,12 @@ class Database:
     
     def generate_payment_trends_report(self):
         """Generate payment trends report"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.payment_trends()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -1037,17 +1607,24 @@ class Database:
     
     def generate_programme_enrollment_report(self):
         """Generate programme enrollment report"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.programme_enrollment()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
                 SELECT 
-                    programme, 
+                    COALESCE(pr.name, s.programme) as programme, 
                     COUNT(*) as total_students,
-                    COUNT(CASE WHEN status = 'Graduated' THEN 1 END) as graduated_students
-                FROM students
-                GROUP BY programme
+                    COUNT(CASE WHEN s.status = 'Graduated' THEN 1 END) as graduated_students
+                FROM students s
+                LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+                GROUP BY s.programme_id, COALESCE(pr.name, s.programme)
+                ORDER BY programme, s.programme_id
             ''')
             return [
                 {
@@ -1064,18 +1641,25 @@ class Database:
     
     def generate_programme_revenue_report(self):
         """Generate programme revenue breakdown"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.programme_revenue()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
                 SELECT 
-                    s.programme, 
-                    SUM(p.amount) as total_revenue,
+                    COALESCE(pr.name, s.programme) as programme, 
+                    COALESCE(SUM(p.amount), 0.0) as total_revenue,
                     COUNT(DISTINCT s.reg_number) as total_students
                 FROM students s
                 LEFT JOIN payments p ON s.reg_number = p.reg_number
-                GROUP BY s.programme
+                LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+                GROUP BY s.programme_id, COALESCE(pr.name, s.programme)
+                ORDER BY programme, s.programme_id
             ''')
             return [
                 {
@@ -1092,18 +1676,25 @@ class Database:
     
     def generate_programme_completion_report(self):
         """Generate programme completion rates"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.programme_completion()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
                 SELECT 
-                    programme, 
+                    COALESCE(pr.name, s.programme) as programme, 
                     COUNT(*) as total_students,
-                    COUNT(CASE WHEN status = 'Graduated' THEN 1 END) as graduated_students,
-                    ROUND(COUNT(CASE WHEN status = 'Graduated' THEN 1 END) * 100.0 / COUNT(*), 2) as completion_rate
-                FROM students
-                GROUP BY programme
+                    COUNT(CASE WHEN s.status = 'Graduated' THEN 1 END) as graduated_students,
+                    ROUND(COUNT(CASE WHEN s.status = 'Graduated' THEN 1 END) * 100.0 / COUNT(*), 2) as completion_rate
+                FROM students s
+                LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+                GROUP BY s.programme_id, COALESCE(pr.name, s.programme)
+                ORDER BY programme, s.programme_id
             ''')
             return [
                 {
@@ -1121,7 +1712,12 @@ class Database:
     
     def get_student_performance_data(self):
         """Fetch comprehensive student performance data for correlation analysis"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.performance()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -1144,17 +1740,24 @@ class Database:
     
     def get_student_retention_data(self):
         """Fetch student retention data by programme"""
-        conn = sqlite3.connect(self.db_path)
+        # Answered in memory when the analytics snapshot is available
+        result = self.analytics.retention()
+        if result is not None:
+            return result
+        
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
                 SELECT 
-                    programme,
-                    COUNT(CASE WHEN status != 'Dropped Out' THEN 1 END) as retained,
-                    COUNT(CASE WHEN status = 'Dropped Out' THEN 1 END) as dropped
-                FROM students
-                GROUP BY programme
+                    COALESCE(pr.name, s.programme) as programme,
+                    COUNT(CASE WHEN COALESCE(s.status, 'Active') != 'Dropped Out' THEN 1 END) as retained,
+                    COUNT(CASE WHEN s.status = 'Dropped Out' THEN 1 END) as dropped
+                FROM students s
+                LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+                GROUP BY s.programme_id, COALESCE(pr.name, s.programme)
+                ORDER BY programme, s.programme_id
             ''')
             return [
                 {
@@ -1172,7 +1775,7 @@ class Database:
     
     def get_student_cohort_data(self):
         """Fetch student cohort progression data"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -1199,9 +1802,52 @@ class Database:
         finally:
             conn.close()
     
+    def get_cohort_extract(self):
+        """
+        Read everything the cohort engine needs in one pass
+        
+        Returns:
+            dict: 'students' (reg_number, registration_date, status,
+                programme_fee, duration), 'payments' (reg_number,
+                payment_date, amount) and 'status_changes' (reg_number,
+                occurred_at, status) row lists
+        """
+        conn = self.connect_history()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT reg_number, registration_date, COALESCE(status, 'Active'),
+                       COALESCE(programme_fee, 0), duration
+                FROM students
+            ''')
+            students = cursor.fetchall()
+            
+            cursor.execute('SELECT reg_number, payment_date, amount FROM payments')
+            payments = cursor.fetchall()
+            
+            cursor.execute('''
+                SELECT reg_number, occurred_at, detail
+                FROM activity_log
+                WHERE kind = 'status_change'
+            ''')
+            status_changes = cursor.fetchall()
+            
+            return {
+                'students': students,
+                'payments': payments,
+                'status_changes': status_changes
+            }
+        
+        except sqlite3.Error as e:
+            print(f"Error fetching cohort extract: {e}")
+            return {'students': [], 'payments': [], 'status_changes': []}
+        finally:
+            conn.close()
+    
     def get_financial_summary(self):
         """Generate comprehensive financial summary"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect_history()
         cursor = conn.cursor()
         
         try:
@@ -1244,7 +1890,7 @@ class Database:
         Returns:
             bool: True if deletion was successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
@@ -1262,6 +1908,7 @@ class Database:
             
             # Commit the transaction
             conn.commit()
+            self.invalidate_caches()
             
             return True
         
@@ -1284,7 +1931,7 @@ class Database:
         Returns:
             bool: True if deletion was successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.connect()
         cursor = conn.cursor()
         
         try:
@@ -1292,6 +1939,7 @@ class Database:
             cursor.execute('DELETE FROM payments WHERE payment_id = ?', (payment_id,))
             
             conn.commit()
+            self.invalidate_caches()
             return True
         
         except sqlite3.Error as e:
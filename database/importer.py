@@ -0,0 +1,140 @@
+import csv
+import gzip
+import sqlite3
+from datetime import datetime
+
+
+# Columns read from each kind of file; the first ones are required.
+# They match the student and payment extracts, so exports can be re-imported.
+STUDENT_COLUMNS = ['reg_number', 'name', 'programme', 'programme_fee',
+                   'age', 'gender', 'start_date', 'duration', 'schedule',
+                   'registration_date', 'status']
+STUDENT_REQUIRED = 4
+
+PAYMENT_COLUMNS = ['reg_number', 'amount', 'receipt_number',
+                   'payment_date', 'payment_note']
+PAYMENT_REQUIRED = 3
+
+
+class CsvImportError(Exception):
+    """Raised when an import file cannot be read"""
+
+
+class CsvImporter:
+    """Load students or payments from CSV files (optionally gzipped)
+    
+    Rows are added in one transaction, so a failed import leaves nothing
+    behind. Students whose registration number is already taken (archived
+    ones included) and payments whose receipt number exists are skipped,
+    which makes re-running an import safe. Payments for unknown students
+    are rejected.
+    
+    Args:
+        db (Database): Database to import into
+    """
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def import_students(self, path, task=None):
+        """
+        Returns:
+            dict: Counts of 'imported', 'skipped' and 'rejected' rows
+        """
+        rows = self.read(path, STUDENT_COLUMNS, STUDENT_REQUIRED)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return self.insert(rows, STUDENT_COLUMNS[:STUDENT_REQUIRED], task, self.student_values(now), '''
+            INSERT INTO students (
+                reg_number, name, programme, programme_fee, age, gender,
+                start_date, duration, schedule, registration_date, status,
+                programme_id, scholarship
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+        ''', '''
+            SELECT 1 FROM students WHERE reg_number = ?
+            UNION ALL
+            SELECT 1 FROM archived_students WHERE reg_number = ?
+        ''', lambda row: [row['reg_number']] * 2)
+    
+    def import_payments(self, path, task=None):
+        """
+        Returns:
+            dict: Counts of 'imported', 'skipped' and 'rejected' rows
+        """
+        rows = self.read(path, PAYMENT_COLUMNS, PAYMENT_REQUIRED)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return self.insert(rows, PAYMENT_COLUMNS[:PAYMENT_REQUIRED], task, self.payment_values(now), '''
+            INSERT INTO payments (reg_number, amount, receipt_number, payment_date, payment_note)
+            SELECT ?, ?, ?, ?, ?
+            WHERE EXISTS (SELECT 1 FROM students WHERE reg_number = ?1)
+        ''', 'SELECT 1 FROM payments WHERE receipt_number = ?',
+            lambda row: [row['receipt_number']])
+    
+    def student_values(self, now):
+        def values(row):
+            return [
+                row['reg_number'], row['name'], row['programme'], float(row['programme_fee']),
+                int(row['age']) if row.get('age') else None,
+                row.get('gender') or None, row.get('start_date') or None,
+                row.get('duration') or None, row.get('schedule') or None,
+                row.get('registration_date') or now, row.get('status') or 'Active',
+                self.db.programmes.get_id(row['programme'])
+            ]
+        return values
+    
+    def payment_values(self, now):
+        def values(row):
+            return [row['reg_number'], float(row['amount']), row['receipt_number'],
+                    row.get('payment_date') or now, row.get('payment_note') or '']
+        return values
+    
+    def read(self, path, columns, required):
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', newline='', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                missing = [column for column in columns[:required]
+                           if column not in (reader.fieldnames or [])]
+                if missing:
+                    raise CsvImportError(f"{path} has no {', '.join(missing)} column")
+                return [{column: (row.get(column) or '').strip() for column in columns}
+                        for row in reader]
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            raise CsvImportError(f"Cannot read {path}: {e}")
+    
+    def insert(self, rows, required, task, values, insert_sql, exists_sql, exists_params):
+        counts = {'imported': 0, 'skipped': 0, 'rejected': 0}
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for done, row in enumerate(rows):
+                if task is not None and done % 500 == 0:
+                    task.report(done, len(rows), "Importing...")
+                
+                if not all(row[column] for column in required):
+                    counts['rejected'] += 1
+                    continue
+                
+                cursor.execute(exists_sql, exists_params(row))
+                if cursor.fetchone():
+                    counts['skipped'] += 1
+                    continue
+                try:
+                    cursor.execute(insert_sql, values(row))
+                except (ValueError, KeyError, sqlite3.IntegrityError) as e:
+                    print(f"Rejected row {done + 2}: {e}")
+                    counts['rejected'] += 1
+                    continue
+                counts['imported' if cursor.rowcount else 'rejected'] += 1
+            
+            conn.commit()
+            self.db.invalidate_caches()
+            return counts
+        
+        except Exception:
+            conn.rollback()
+            raise
+        
+        finally:
+            conn.close()
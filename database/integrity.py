@@ -0,0 +1,309 @@
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from database.write_policy import WritePolicy
+
+
+IntegrityIssue = namedtuple('IntegrityIssue', 'check count detail repaired')
+
+IntegrityReport = namedtuple('IntegrityReport', 'mode checked issues seconds')
+
+REQUIRED_COLUMNS = {
+    'students': {
+        'reg_number', 'name', 'age', 'gender', 'programme',
+        'start_date', 'duration', 'schedule', 'programme_fee',
+        'registration_date'
+    },
+    'payments': {
+        'payment_id', 'reg_number', 'amount', 'payment_date',
+        'receipt_number'
+    }
+}
+
+# Balances within this of the summed payments are treated as equal
+BALANCE_TOLERANCE = 0.005
+
+# Incremental runs fall back to a full run once the last one is this old
+FULL_CHECK_INTERVAL = timedelta(days=7)
+
+
+class IntegrityChecker:
+    """Consistency checks, and safe repairs, for the student database
+    
+    A full run checks the file itself (PRAGMA quick_check), foreign keys,
+    the required columns, and every student and payment. An incremental
+    run only looks at students with activity since the previous run, found
+    through the activity log, plus payments added since then, so a nightly
+    check stays fast however large the database grows.
+    
+    Only derived or defaulted data is repaired: stored balances are rebuilt
+    from the payments, and missing status and scholarship values get their
+    defaults. Orphan payments, duplicate receipt numbers and file-level
+    corruption are reported, never changed, because fixing them needs a
+    person (or a backup).
+    
+    The checks only read, one statement at a time, so other desks keep
+    saving while they run. Repairs are queued and applied, with the record
+    of the run, in one short BEGIN IMMEDIATE transaction at the end; each
+    re-evaluates its condition then, so changes made meanwhile are not lost.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        policy (WritePolicy, optional): Busy timeout and retries for that write
+    """
+    
+    def __init__(self, db_path, policy=None):
+        self.db_path = db_path
+        self.policy = policy or WritePolicy()
+    
+    def run(self, full=None, repair=False, task=None):
+        """
+        Run the checks
+        
+        Args:
+            full (bool, optional): Force a full (True) or incremental (False)
+                run; by default incremental unless a full run is due
+            repair (bool, optional): Fix what can be fixed safely
+            task (Task, optional): Background task to report progress to
+        
+        Returns:
+            IntegrityReport: Mode, number of students checked (None for all),
+                issues found, and elapsed seconds
+        """
+        started = time.perf_counter()
+        # Autocommit: no read transaction is held between statements
+        conn = sqlite3.connect(self.db_path, timeout=self.policy.busy_timeout,
+                               isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            last = self.last_run(cursor)
+            if full is None:
+                full = last is None or datetime.now() - last['full_at'] >= FULL_CHECK_INTERVAL
+            
+            cursor.execute('SELECT COALESCE(MAX(activity_id), 0) FROM activity_log')
+            activity_mark = cursor.fetchone()[0]
+            cursor.execute('SELECT COALESCE(MAX(payment_id), 0) FROM payments')
+            payment_mark = cursor.fetchone()[0]
+            
+            if full:
+                scope, checked = "", None
+                new_payments = ""
+            else:
+                checked = self.build_scope(cursor, last['activity_id'], activity_mark)
+                scope = "AND {alias}reg_number IN (SELECT reg_number FROM temp.integrity_scope)"
+                new_payments = f"AND payment_id > {int(last['payment_id'])}"
+            
+            repairs = [] if repair else None
+            checks = [
+                lambda: self.check_null_defaults(cursor, scope, repairs),
+                lambda: self.check_balances(cursor, scope, repairs),
+                lambda: self.check_orphan_payments(cursor, scope),
+                lambda: self.check_duplicate_receipts(cursor, new_payments),
+            ]
+            if full:
+                checks[:0] = [
+                    lambda: self.check_file(cursor),
+                    lambda: self.check_structure(cursor),
+                    lambda: self.check_foreign_keys(cursor),
+                ]
+            
+            issues = []
+            for done, check in enumerate(checks):
+                if task is not None:
+                    task.report(done, len(checks), "Checking database...")
+                issues.extend(check())
+            
+            mode = "full" if full else "incremental"
+            self.policy.run(self.save, conn, repairs or [], mode, activity_mark, payment_mark,
+                            issues)
+            
+            return IntegrityReport(mode, checked, issues, time.perf_counter() - started)
+        
+        finally:
+            conn.close()
+    
+    def save(self, conn, repairs, mode, activity_mark, payment_mark, issues):
+        """Apply the queued repairs and record the run in one write transaction"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            if repairs:
+                # Repairs show up in the change log as the checker's
+                cursor.execute("UPDATE change_source SET source = 'integrity' WHERE id = 1")
+                for sql, params in repairs:
+                    cursor.execute(sql, params)
+                cursor.execute("UPDATE change_source SET source = NULL WHERE id = 1")
+            
+            self.record_run(cursor, mode, activity_mark, payment_mark, issues)
+            cursor.execute('COMMIT')
+        
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+    
+    def build_scope(self, cursor, since_activity, until_activity):
+        """Fill temp.integrity_scope with students touched since the last run"""
+        cursor.execute('DROP TABLE IF EXISTS temp.integrity_scope')
+        cursor.execute('CREATE TEMP TABLE integrity_scope (reg_number TEXT PRIMARY KEY)')
+        cursor.execute('''
+            INSERT OR IGNORE INTO temp.integrity_scope (reg_number)
+            SELECT reg_number FROM activity_log
+            WHERE activity_id > ? AND activity_id <= ? AND reg_number IS NOT NULL
+        ''', [since_activity, until_activity])
+        cursor.execute('SELECT COUNT(*) FROM temp.integrity_scope')
+        return cursor.fetchone()[0]
+    
+    def check_file(self, cursor):
+        cursor.execute('PRAGMA quick_check')
+        problems = [row[0] for row in cursor.fetchall() if row[0] != 'ok']
+        if problems:
+            return [IntegrityIssue('quick_check', len(problems), problems[0], False)]
+        return []
+    
+    def check_structure(self, cursor):
+        issues = []
+        for table, required in REQUIRED_COLUMNS.items():
+            cursor.execute(f'PRAGMA table_info({table})')
+            missing = required - {column[1] for column in cursor.fetchall()}
+            if missing:
+                issues.append(IntegrityIssue('structure', len(missing),
+                                             f"{table} missing {', '.join(sorted(missing))}",
+                                             False))
+        return issues
+    
+    def check_foreign_keys(self, cursor):
+        # payments -> students is reported by check_orphan_payments instead
+        cursor.execute('PRAGMA foreign_key_check')
+        violations = {}
+        for table, _, parent, _ in cursor.fetchall():
+            if (table, parent) != ('payments', 'students'):
+                violations[(table, parent)] = violations.get((table, parent), 0) + 1
+        
+        return [IntegrityIssue('foreign_key', count, f"{table} rows without a matching {parent}", False)
+                for (table, parent), count in sorted(violations.items())]
+    
+    def check_null_defaults(self, cursor, scope, repairs):
+        issues = []
+        for column, default in (('status', 'Active'), ('scholarship', 0)):
+            condition = f"{column} IS NULL {scope.format(alias='')}"
+            cursor.execute(f'SELECT COUNT(*) FROM students WHERE {condition}')
+            count = cursor.fetchone()[0]
+            if not count:
+                continue
+            
+            if repairs is not None:
+                repairs.append((f'UPDATE students SET {column} = ? WHERE {condition}', [default]))
+            issues.append(IntegrityIssue(f'null_{column}', count,
+                                         f"students with no {column} (default {default!r})",
+                                         repairs is not None))
+        return issues
+    
+    def check_balances(self, cursor, scope, repairs):
+        """Compare student_balances with the payments they summarise"""
+        cursor.execute('DROP TABLE IF EXISTS temp.integrity_balances')
+        cursor.execute(f'''
+            CREATE TEMP TABLE integrity_balances AS
+            SELECT a.reg_number
+            FROM (
+                SELECT reg_number, SUM(amount) AS total, COUNT(*) AS n,
+                       MAX(payment_date) AS last
+                FROM payments
+                WHERE 1 {scope.format(alias='')}
+                GROUP BY reg_number
+            ) a
+            LEFT JOIN student_balances b ON b.reg_number = a.reg_number
+            WHERE b.reg_number IS NULL
+               OR ABS(b.total_paid - a.total) > {BALANCE_TOLERANCE}
+               OR b.payment_count != a.n
+               OR b.last_payment_date IS NOT a.last
+            UNION
+            SELECT b.reg_number
+            FROM student_balances b
+            WHERE NOT EXISTS (SELECT 1 FROM payments p WHERE p.reg_number = b.reg_number)
+              AND (b.total_paid != 0 OR b.payment_count != 0
+                   OR b.last_payment_date IS NOT NULL
+                   OR NOT EXISTS (SELECT 1 FROM students s WHERE s.reg_number = b.reg_number))
+              {scope.format(alias='b.')}
+        ''')
+        cursor.execute('SELECT COUNT(*) FROM temp.integrity_balances')
+        count = cursor.fetchone()[0]
+        if not count:
+            return []
+        
+        # Rebuilt from the payments as they are when the repair runs
+        if repairs is not None:
+            repairs.append(('''
+                DELETE FROM student_balances
+                WHERE reg_number IN (SELECT reg_number FROM temp.integrity_balances)
+            ''', []))
+            repairs.append(('''
+                INSERT INTO student_balances (reg_number, total_paid, payment_count, last_payment_date)
+                SELECT reg_number, SUM(amount), COUNT(*), MAX(payment_date)
+                FROM payments
+                WHERE reg_number IN (SELECT reg_number FROM temp.integrity_balances)
+                GROUP BY reg_number
+            ''', []))
+        return [IntegrityIssue('balances', count, "stored balances that disagree with payments",
+                               repairs is not None)]
+    
+    def check_orphan_payments(self, cursor, scope):
+        cursor.execute(f'''
+            SELECT COUNT(*), COALESCE(SUM(p.amount), 0)
+            FROM payments p
+            WHERE NOT EXISTS (SELECT 1 FROM students s WHERE s.reg_number = p.reg_number)
+              {scope.format(alias='p.')}
+        ''')
+        count, amount = cursor.fetchone()
+        if count:
+            return [IntegrityIssue('orphan_payments', count,
+                                   f"payments totalling {amount:,.2f} for unknown students", False)]
+        return []
+    
+    def check_duplicate_receipts(self, cursor, new_payments):
+        cursor.execute(f'''
+            SELECT receipt_number, COUNT(*)
+            FROM payments
+            WHERE receipt_number IN (
+                SELECT receipt_number FROM payments
+                WHERE receipt_number IS NOT NULL {new_payments}
+            )
+            GROUP BY receipt_number
+            HAVING COUNT(*) > 1
+        ''')
+        duplicates = cursor.fetchall()
+        if duplicates:
+            return [IntegrityIssue('duplicate_receipts', len(duplicates),
+                                   f"receipt numbers used more than once, e.g. {duplicates[0][0]}",
+                                   False)]
+        return []
+    
+    def last_run(self, cursor):
+        """Marks left by the previous run, or None if there has not been one"""
+        cursor.execute('''
+            SELECT last_activity_id, last_payment_id,
+                   (SELECT MAX(run_at) FROM integrity_runs WHERE mode = 'full')
+            FROM integrity_runs
+            ORDER BY run_id DESC LIMIT 1
+        ''')
+        row = cursor.fetchone()
+        if row is None or row[2] is None:
+            return None
+        return {
+            'activity_id': row[0],
+            'payment_id': row[1],
+            'full_at': datetime.strptime(row[2], '%Y-%m-%d %H:%M:%S')
+        }
+    
+    def record_run(self, cursor, mode, activity_mark, payment_mark, issues):
+        cursor.execute('''
+            INSERT INTO integrity_runs (
+                run_at, mode, last_activity_id, last_payment_id, issues, repaired
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S'), mode, activity_mark, payment_mark,
+            sum(issue.count for issue in issues),
+            sum(issue.count for issue in issues if issue.repaired)
+        ])
@@ -1,15 +1,79 @@
 import sqlite3
+import json
 from datetime import datetime
+from database.write_policy import WritePolicy
 
-def migrate_database(db_path):
-    """Safely migrate database to new schema while preserving data"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+
+def table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {column[1] for column in cursor.fetchall()}
+
+
+def has_objects(cursor, kind, names):
+    """True if every named table, index or trigger exists"""
+    cursor.execute(f'''
+        SELECT COUNT(*) FROM sqlite_master
+        WHERE type = ? AND name IN ({", ".join("?" for _ in names)})
+    ''', [kind] + list(names))
+    return cursor.fetchone()[0] == len(names)
+
+
+def run_migration(db_path, failure, applied, apply, policy=None):
+    """
+    Run apply(cursor) unless applied(cursor) says it is not needed
     
-    try:
-        # Start transaction
-        cursor.execute("BEGIN TRANSACTION")
+    The check is a plain read, so an up-to-date database is opened without
+    taking the write lock. Otherwise apply runs in a BEGIN IMMEDIATE
+    transaction, after checking again in case another desk starting at the
+    same moment has just applied it, and is retried under `policy` while
+    the database is busy.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        failure (str): Message printed, with the error, if the migration fails
+        applied (callable): applied(cursor) -> bool
+        apply (callable): apply(cursor) makes the changes, without committing
+        policy (WritePolicy, optional): Busy timeout and retries
+    
+    Returns:
+        bool: True once the migration is in place, False if it failed
+    """
+    policy = policy or WritePolicy()
+    
+    def attempt():
+        conn = sqlite3.connect(db_path, timeout=policy.busy_timeout)
+        cursor = conn.cursor()
+        
+        try:
+            if applied(cursor):
+                return True
+            
+            cursor.execute("BEGIN IMMEDIATE")
+            if not applied(cursor):
+                apply(cursor)
+            conn.commit()
+            return True
+        
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
         
+        finally:
+            conn.close()
+    
+    try:
+        return policy.run(attempt)
+    except sqlite3.Error as e:
+        print(f"{failure}: {e}")
+        return False
+
+def migrate_database(db_path, policy=None):
+    """Safely migrate database to new schema while preserving data"""
+    def applied(cursor):
+        return 'status' in table_columns(cursor, 'students')
+    
+    def apply(cursor):
         # 1. Create temporary table with new schema
         cursor.execute('''
             CREATE TABLE students_new (
@@ -50,17 +114,637 @@ def migrate_database(db_path):
         
         # 5. Add indexes if needed
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_students_status ON students(status)')
-        
-        # Commit transaction
-        conn.commit()
         print("Migration completed successfully")
+    
+    return run_migration(db_path, "Migration failed", applied, apply, policy)
+
+
+def migrate_programmes(db_path, policy=None):
+    """Seed the programmes table and link students to it by programme_id"""
+    from utils.constants import PROGRAMMES, DURATIONS, SCHEDULES
+    from database.programme_catalogue import make_programme_code
+    
+    def applied(cursor):
+        if 'programme_id' not in table_columns(cursor, 'students') \
+                or not has_objects(cursor, 'index', ['idx_students_programme_id']):
+            return False
+        cursor.execute('''
+            SELECT EXISTS (SELECT 1 FROM programmes)
+               AND NOT EXISTS (SELECT 1 FROM students
+                               WHERE programme_id IS NULL
+                                 AND programme IS NOT NULL AND programme != '')
+        ''')
+        return bool(cursor.fetchone()[0])
+    
+    def apply(cursor):
+        # 1. Add programme_id column to students if this is an older database
+        cursor.execute("PRAGMA table_info(students)")
+        columns = {column[1] for column in cursor.fetchall()}
+        if 'programme_id' not in columns:
+            cursor.execute('''
+                ALTER TABLE students 
+                ADD COLUMN programme_id INTEGER REFERENCES programmes(programme_id)
+            ''')
+        
+        # 2. Seed the catalogue with the default programmes and any free-text
+        #    programme names already used by students
+        cursor.execute('''
+            SELECT DISTINCT programme FROM students
+            WHERE programme IS NOT NULL AND programme != ''
+        ''')
+        names = list(PROGRAMMES) + [row[0] for row in cursor.fetchall()]
+        
+        for name in names:
+            cursor.execute('''
+                INSERT OR IGNORE INTO programmes (
+                    name, code, default_fee, durations, schedules
+                ) VALUES (?, ?, 0, ?, ?)
+            ''', (name, make_programme_code(name),
+                  json.dumps(DURATIONS), json.dumps(SCHEDULES)))
+        
+        # 3. Backfill programme_id from the programme name
+        cursor.execute('''
+            UPDATE students
+            SET programme_id = (
+                SELECT programme_id FROM programmes
+                WHERE programmes.name = students.programme
+            )
+            WHERE programme_id IS NULL
+        ''')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_students_programme_id ON students(programme_id)')
+    
+    return run_migration(db_path, "Programme migration failed", applied, apply, policy)
+
+
+def migrate_student_balances(db_path, policy=None):
+    """Create the trigger-maintained student_balances table and backfill it"""
+    def applied(cursor):
+        return has_objects(cursor, 'table', ['student_balances']) and has_objects(cursor, 'trigger', [
+            'trg_payments_balance_insert', 'trg_payments_balance_delete',
+            'trg_payments_balance_update', 'trg_students_balance_delete'])
+    
+    def apply(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS student_balances (
+                reg_number TEXT PRIMARY KEY,
+                total_paid REAL NOT NULL DEFAULT 0,
+                payment_count INTEGER NOT NULL DEFAULT 0,
+                last_payment_date TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            SELECT COUNT(*) FROM sqlite_master
+            WHERE type = 'trigger' AND name = 'trg_payments_balance_insert'
+        ''')
+        needs_backfill = cursor.fetchone()[0] == 0
+        
+        # 1. Keep balances in step with every payment write
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_payments_balance_insert
+            AFTER INSERT ON payments
+            BEGIN
+                INSERT INTO student_balances (
+                    reg_number, total_paid, payment_count, last_payment_date
+                ) VALUES (NEW.reg_number, NEW.amount, 1, NEW.payment_date)
+                ON CONFLICT(reg_number) DO UPDATE SET
+                    total_paid = total_paid + excluded.total_paid,
+                    payment_count = payment_count + 1,
+                    last_payment_date = MAX(COALESCE(last_payment_date, ''),
+                                            excluded.last_payment_date);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_payments_balance_delete
+            AFTER DELETE ON payments
+            BEGIN
+                UPDATE student_balances SET
+                    total_paid = total_paid - OLD.amount,
+                    payment_count = payment_count - 1,
+                    last_payment_date = (
+                        SELECT MAX(payment_date) FROM payments
+                        WHERE reg_number = OLD.reg_number
+                    )
+                WHERE reg_number = OLD.reg_number;
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_payments_balance_update
+            AFTER UPDATE OF reg_number, amount, payment_date ON payments
+            BEGIN
+                INSERT OR IGNORE INTO student_balances (reg_number)
+                VALUES (NEW.reg_number);
+                
+                UPDATE student_balances SET
+                    total_paid = (
+                        SELECT COALESCE(SUM(amount), 0) FROM payments
+                        WHERE reg_number = student_balances.reg_number
+                    ),
+                    payment_count = (
+                        SELECT COUNT(*) FROM payments
+                        WHERE reg_number = student_balances.reg_number
+                    ),
+                    last_payment_date = (
+                        SELECT MAX(payment_date) FROM payments
+                        WHERE reg_number = student_balances.reg_number
+                    )
+                WHERE reg_number IN (OLD.reg_number, NEW.reg_number);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_students_balance_delete
+            AFTER DELETE ON students
+            BEGIN
+                DELETE FROM student_balances WHERE reg_number = OLD.reg_number;
+            END
+        ''')
+        
+        # 2. Backfill from existing payments the first time the triggers are installed
+        if needs_backfill:
+            cursor.execute('DELETE FROM student_balances')
+            cursor.execute('''
+                INSERT INTO student_balances (
+                    reg_number, total_paid, payment_count, last_payment_date
+                )
+                SELECT reg_number, SUM(amount), COUNT(*), MAX(payment_date)
+                FROM payments
+                GROUP BY reg_number
+            ''')
+    
+    return run_migration(db_path, "Student balance migration failed", applied, apply, policy)
+
+
+def migrate_sort_indexes(db_path, policy=None):
+    """Index the columns the list pages order by so sorting happens in SQLite"""
+    def applied(cursor):
+        return has_objects(cursor, 'index', [
+            'idx_students_registration_date', 'idx_students_name_nocase',
+            'idx_payments_payment_date', 'idx_payments_reg_number', 'idx_payments_amount'])
+    
+    def apply(cursor):
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_students_registration_date ON students(registration_date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_students_name_nocase ON students(name COLLATE NOCASE)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_payments_payment_date ON payments(payment_date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_payments_reg_number ON payments(reg_number)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_payments_amount ON payments(amount)')
+    
+    return run_migration(db_path, "Sort index migration failed", applied, apply, policy)
+
+
+def migrate_student_search(db_path, policy=None):
+    """Create the FTS5 index behind search-as-you-type on student names
+    
+    Returns:
+        bool: True if the full-text index is available, False to fall back to LIKE
+    """
+    def applied(cursor):
+        if not (has_objects(cursor, 'table', ['students_fts']) and has_objects(cursor, 'trigger', [
+                'trg_students_fts_insert', 'trg_students_fts_update', 'trg_students_fts_delete'])):
+            return False
+        cursor.execute('SELECT (SELECT COUNT(*) FROM students_fts) = (SELECT COUNT(*) FROM students)')
+        return bool(cursor.fetchone()[0])
+    
+    def apply(cursor):
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+                reg_number, name, tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+        
+        # 1. Keep the index in step with student writes
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_students_fts_insert
+            AFTER INSERT ON students
+            BEGIN
+                INSERT INTO students_fts (reg_number, name)
+                VALUES (NEW.reg_number, NEW.name);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_students_fts_update
+            AFTER UPDATE OF reg_number, name ON students
+            BEGIN
+                DELETE FROM students_fts WHERE reg_number = OLD.reg_number;
+                INSERT INTO students_fts (reg_number, name)
+                VALUES (NEW.reg_number, NEW.name);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_students_fts_delete
+            AFTER DELETE ON students
+            BEGIN
+                DELETE FROM students_fts WHERE reg_number = OLD.reg_number;
+            END
+        ''')
+        
+        # 2. Rebuild when the index and the table disagree (first run or restored data)
+        cursor.execute('SELECT (SELECT COUNT(*) FROM students_fts) = (SELECT COUNT(*) FROM students)')
+        if not cursor.fetchone()[0]:
+            cursor.execute('DELETE FROM students_fts')
+            cursor.execute('''
+                INSERT INTO students_fts (reg_number, name)
+                SELECT reg_number, name FROM students
+            ''')
+    
+    return run_migration(db_path, "Full-text student search unavailable, using LIKE",
+                         applied, apply, policy)
+
+
+# Tables with a change counter in table_versions
+VERSIONED_TABLES = ['students', 'payments', 'programmes']
+
+
+def migrate_table_versions(db_path, policy=None):
+    """Create the trigger-maintained change counters polled by ChangeWatcher"""
+    def applied(cursor):
+        if not has_objects(cursor, 'table', ['table_versions']) or not has_objects(cursor, 'trigger', [
+                f'trg_{table}_version_{event}' for table in VERSIONED_TABLES
+                for event in ('insert', 'update', 'delete')]):
+            return False
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM table_versions
+            WHERE table_name IN ({", ".join("?" for _ in VERSIONED_TABLES)})
+        ''', VERSIONED_TABLES)
+        return cursor.fetchone()[0] == len(VERSIONED_TABLES)
+    
+    def apply(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        # One counter per watched table, bumped by every insert, update and delete
+        for table in VERSIONED_TABLES:
+            cursor.execute('INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)', (table,))
+            
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE table_versions SET version = version + 1
+                        WHERE table_name = '{table}';
+                    END
+                ''')
+    
+    return run_migration(db_path, "Table version migration failed", applied, apply, policy)
+
+
+def migrate_activity_log(db_path, policy=None):
+    """Create the append-only activity feed shown on the home page
+    
+    Triggers record registrations, payments, status changes and deletions as
+    they happen. The first run backfills registrations and payments that
+    already exist so the feed is not empty on upgraded databases.
+    """
+    def applied(cursor):
+        return has_objects(cursor, 'table', ['activity_log']) \
+            and has_objects(cursor, 'index', ['idx_activity_log_occurred']) \
+            and has_objects(cursor, 'trigger', [
+                'trg_activity_student_insert', 'trg_activity_student_status',
+                'trg_activity_student_delete', 'trg_activity_payment_insert',
+                'trg_activity_payment_delete'])
+    
+    def apply(cursor):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='activity_log'")
+        needs_backfill = cursor.fetchone() is None
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS activity_log (
+                activity_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                occurred_at TIMESTAMP NOT NULL,
+                kind TEXT NOT NULL,
+                reg_number TEXT,
+                name TEXT,
+                amount REAL,
+                detail TEXT
+            )
+        ''')
+        
+        # The feed is read newest first, a page at a time
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_activity_log_occurred
+            ON activity_log(occurred_at, activity_id)
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_activity_student_insert
+            AFTER INSERT ON students
+            BEGIN
+                INSERT INTO activity_log (occurred_at, kind, reg_number, name, detail)
+                VALUES (COALESCE(NEW.registration_date, datetime('now', 'localtime')),
+                        'registration', NEW.reg_number, NEW.name, NEW.programme);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_activity_student_status
+            AFTER UPDATE OF status ON students
+            WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                INSERT INTO activity_log (occurred_at, kind, reg_number, name, detail)
+                VALUES (datetime('now', 'localtime'), 'status_change',
+                        NEW.reg_number, NEW.name, NEW.status);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_activity_student_delete
+            AFTER DELETE ON students
+            BEGIN
+                INSERT INTO activity_log (occurred_at, kind, reg_number, name, detail)
+                VALUES (datetime('now', 'localtime'), 'student_deleted',
+                        OLD.reg_number, OLD.name, OLD.programme);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_activity_payment_insert
+            AFTER INSERT ON payments
+            BEGIN
+                INSERT INTO activity_log (occurred_at, kind, reg_number, name, amount, detail)
+                VALUES (COALESCE(NEW.payment_date, datetime('now', 'localtime')), 'payment',
+                        NEW.reg_number,
+                        (SELECT name FROM students WHERE reg_number = NEW.reg_number),
+                        NEW.amount, NEW.receipt_number);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_activity_payment_delete
+            AFTER DELETE ON payments
+            BEGIN
+                INSERT INTO activity_log (occurred_at, kind, reg_number, name, amount, detail)
+                VALUES (datetime('now', 'localtime'), 'payment_deleted',
+                        OLD.reg_number,
+                        (SELECT name FROM students WHERE reg_number = OLD.reg_number),
+                        OLD.amount, OLD.receipt_number);
+            END
+        ''')
+        
+        if needs_backfill:
+            # Oldest first, so activity_id order matches time order
+            cursor.execute('''
+                INSERT INTO activity_log (occurred_at, kind, reg_number, name, amount, detail)
+                SELECT occurred_at, kind, reg_number, name, amount, detail
+                FROM (
+                    SELECT registration_date AS occurred_at, 'registration' AS kind,
+                           reg_number, name, NULL AS amount, programme AS detail
+                    FROM students
+                    WHERE registration_date IS NOT NULL
+                    UNION ALL
+                    SELECT p.payment_date, 'payment', p.reg_number, s.name,
+                           p.amount, p.receipt_number
+                    FROM payments p
+                    LEFT JOIN students s ON p.reg_number = s.reg_number
+                    WHERE p.payment_date IS NOT NULL
+                )
+                ORDER BY occurred_at
+            ''')
+    
+    return run_migration(db_path, "Activity log migration failed", applied, apply, policy)
+
+
+def migrate_archive(db_path, policy=None):
+    """Create the stub table left behind for students moved to archive.db"""
+    def applied(cursor):
+        return has_objects(cursor, 'table', ['archived_students']) \
+            and has_objects(cursor, 'index', ['idx_archived_students_name'])
+    
+    def apply(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archived_students (
+                reg_number TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                programme TEXT,
+                status TEXT,
+                registration_date TIMESTAMP,
+                archived_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_archived_students_name
+            ON archived_students(name COLLATE NOCASE)
+        ''')
+    
+    return run_migration(db_path, "Archive migration failed", applied, apply, policy)
+
+
+def migrate_integrity_runs(db_path, policy=None):
+    """Create the log of integrity checks, whose marks drive incremental runs"""
+    def applied(cursor):
+        return has_objects(cursor, 'table', ['integrity_runs'])
+    
+    def apply(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS integrity_runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_at TIMESTAMP NOT NULL,
+                mode TEXT NOT NULL,
+                last_activity_id INTEGER NOT NULL,
+                last_payment_id INTEGER NOT NULL,
+                issues INTEGER NOT NULL DEFAULT 0,
+                repaired INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+    
+    return run_migration(db_path, "Integrity log migration failed", applied, apply, policy)
+
+
+def migrate_notifications(db_path, policy=None):
+    """Create the notifications table, so reminders can be listed and
+    exported before NotificationSystem has sent any"""
+    def applied(cursor):
+        return has_objects(cursor, 'table', ['notifications'])
+    
+    def apply(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                reg_number TEXT NOT NULL,
+                message TEXT NOT NULL,
+                type TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_read BOOLEAN DEFAULT 0,
+                FOREIGN KEY (reg_number) REFERENCES students(reg_number)
+            )
+        ''')
+    
+    return run_migration(db_path, "Notifications migration failed", applied, apply, policy)
+
+
+def migrate_payment_idempotency(db_path, policy=None):
+    """Add payments.idempotency_key, unique when set, so a payment saved
+    twice (a retry, a double click) is only recorded once"""
+    def applied(cursor):
+        return 'idempotency_key' in table_columns(cursor, 'payments') \
+            and has_objects(cursor, 'index', ['idx_payments_idempotency_key'])
+    
+    def apply(cursor):
+        cursor.execute("PRAGMA table_info(payments)")
+        if 'idempotency_key' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE payments ADD COLUMN idempotency_key TEXT")
+        
+        # NULLs never clash, so older payments and imports need no key
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_idempotency_key
+            ON payments(idempotency_key)
+        ''')
+    
+    return run_migration(db_path, "Payment idempotency migration failed", applied, apply, policy)
+
+
+# Tables whose writes are recorded in change_log, with the column keying each row
+CHANGE_LOG_TABLES = {'students': 'reg_number', 'payments': 'payment_id'}
+
+
+def change_log_triggers(cursor, table, key):
+    """CREATE TRIGGER statements feeding change_log from `table`"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [column[1] for column in cursor.fetchall()]
+    
+    def row_json(row):
+        return "json_object(" + ", ".join(f"'{column}', {row}.{column}" for column in columns) + ")"
+    
+    # Updates keep only the columns that changed, old and new
+    pairs = "\n                    UNION ALL ".join(
+        f"SELECT '{column}' AS k, OLD.{column} AS o, NEW.{column} AS n" for column in columns)
+    changed = f'''(
+                    SELECT json_group_object(k, {{side}}) FROM (
+                    {pairs}
+                    ) WHERE o IS NOT n
+                )'''
+    any_changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+    
+    insert = '''INSERT INTO change_log (changed_at, table_name, row_key, operation,
+                                        old_values, new_values, source)'''
+    source = "(SELECT source FROM change_source WHERE id = 1)"
+    
+    return {
+        f"trg_{table}_change_insert": f'''CREATE TRIGGER trg_{table}_change_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                {insert}
+                VALUES (datetime('now', 'localtime'), '{table}', NEW.{key}, 'insert',
+                        NULL, {row_json('NEW')}, {source});
+            END''',
+        f"trg_{table}_change_update": f'''CREATE TRIGGER trg_{table}_change_update
+            AFTER UPDATE ON {table}
+            WHEN {any_changed}
+            BEGIN
+                {insert}
+                VALUES (datetime('now', 'localtime'), '{table}', NEW.{key}, 'update',
+                        {changed.format(side='o')}, {changed.format(side='n')}, {source});
+            END''',
+        f"trg_{table}_change_delete": f'''CREATE TRIGGER trg_{table}_change_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                {insert}
+                VALUES (datetime('now', 'localtime'), '{table}', OLD.{key}, 'delete',
+                        {row_json('OLD')}, NULL, {source});
+            END'''
+    }
+
+
+def migrate_change_log(db_path, policy=None):
+    """Create the append-only change log for students and payments
+    
+    Every insert, update and delete is recorded by triggers with the row's
+    key and its old and/or new values as JSON (only the changed columns for
+    updates), numbered by a monotonically increasing seq. Triggers are
+    rebuilt whenever the tables gain columns. The one-row change_source
+    table lets a writer label its changes (e.g. 'archive') for the triggers.
+    """
+    def applied(cursor):
+        if not has_objects(cursor, 'table', ['change_log', 'change_source']):
+            return False
+        for table, key in CHANGE_LOG_TABLES.items():
+            for name, sql in change_log_triggers(cursor, table, key).items():
+                cursor.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,))
+                existing = cursor.fetchone()
+                if not existing or existing[0] != sql:
+                    return False
         return True
+    
+    def apply(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                changed_at TIMESTAMP NOT NULL,
+                table_name TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                old_values TEXT,
+                new_values TEXT,
+                source TEXT
+            )
+        ''')
         
-    except sqlite3.Error as e:
-        # Rollback in case of error
-        conn.rollback()
-        print(f"Migration failed: {e}")
-        return False
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_source (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                source TEXT
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO change_source (id, source) VALUES (1, NULL)")
         
-    finally:
-        conn.close() 
\ No newline at end of file
+        for table, key in CHANGE_LOG_TABLES.items():
+            for name, sql in change_log_triggers(cursor, table, key).items():
+                cursor.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,))
+                existing = cursor.fetchone()
+                if existing and existing[0] == sql:
+                    continue
+                
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(sql)
+    
+    return run_migration(db_path, "Change log migration failed", applied, apply, policy)
+
+
+def migrate_sync(db_path, policy=None):
+    """Create this desk's sync identity, per-peer watermarks, and the change
+    log index used to resolve conflicts row by row"""
+    def applied(cursor):
+        if not (has_objects(cursor, 'table', ['sync_desk', 'sync_peers'])
+                and has_objects(cursor, 'index', ['idx_change_log_row'])):
+            return False
+        cursor.execute('SELECT 1 FROM sync_desk WHERE id = 1')
+        return cursor.fetchone() is not None
+    
+    def apply(cursor):
+        # prefix: letters put into this desk's registration and receipt numbers;
+        # exported_seq: last change_log seq written to the shared sync folder
+        # (NULL until the first file, which holds every row)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_desk (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                prefix TEXT,
+                exported_seq INTEGER
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO sync_desk (id) VALUES (1)")
+        
+        # Last seq of each peer's changes applied here
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_peers (
+                prefix TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL DEFAULT 0,
+                last_sync_at TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_change_log_row
+            ON change_log(table_name, row_key, changed_at)
+        ''')
+    
+    return run_migration(db_path, "Sync migration failed", applied, apply, policy)
+
@@ -0,0 +1,197 @@
+import sqlite3
+from datetime import datetime
+
+# Column kinds understood by typed_key
+TEXT = 'text'
+NUMBER = 'number'
+DATE = 'date'
+
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+
+def typed_key(field, kind=TEXT):
+    """Build a sort key that compares a row field by its real type
+    
+    Text compares case-insensitively, numbers numerically (formatted amounts
+    such as "₦1,500.00" included) and dates chronologically. Values that
+    cannot be converted give None, which page sources sort last.
+    
+    Args:
+        field (str): Row key to sort on
+        kind (str, optional): TEXT, NUMBER or DATE
+    
+    Returns:
+        callable: Key function for ListPageSource.sort_keys
+    """
+    if kind == NUMBER:
+        def key(row):
+            value = row.get(field)
+            if isinstance(value, (int, float)):
+                return value
+            try:
+                return float(str(value).replace('₦', '').replace(',', '').strip())
+            except ValueError:
+                return None
+    elif kind == DATE:
+        def key(row):
+            value = row.get(field)
+            if not value:
+                return None
+            for date_format in DATE_FORMATS:
+                try:
+                    return datetime.strptime(str(value), date_format)
+                except ValueError:
+                    continue
+            return None
+    else:
+        def key(row):
+            value = row.get(field)
+            return None if value is None else str(value).casefold()
+    return key
+
+
+class SqlPageSource:
+    """Serve rows from a SELECT one page at a time using LIMIT/OFFSET
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        query (str): SELECT statement without ORDER BY or LIMIT
+        params (list, optional): Parameters for the query
+        columns (list, optional): Keys for the returned row dicts, in SELECT order
+        sort_columns (dict, optional): Maps a column name to the SQL expression used to sort it
+        order_by (str, optional): Default ORDER BY clause
+    """
+    
+    def __init__(self, db_path, query, params=(), columns=None,
+                 sort_columns=None, order_by=None):
+        self.db_path = db_path
+        self.query = query
+        self.params = list(params)
+        self.columns = columns
+        self.sort_columns = sort_columns or {}
+        self.default_order = order_by
+        self.order_by = order_by
+        self._count = None
+        self._conn = None
+        self._interrupted = False
+    
+    def _connect(self):
+        self._conn = sqlite3.connect(self.db_path)
+        return self._conn
+    
+    def _report(self, message, error):
+        # An interrupted statement was cancelled on purpose; stay quiet
+        if not self._interrupted:
+            print(f"{message}: {error}")
+    
+    def count(self):
+        """Return the number of rows the query produces"""
+        if self._count is None:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COUNT(*) FROM ({self.query})", self.params)
+                self._count = cursor.fetchone()[0]
+            except sqlite3.Error as e:
+                self._report("Error counting rows", e)
+                return 0
+            finally:
+                self._conn = None
+                conn.close()
+        return self._count
+    
+    def fetch(self, offset, limit):
+        """Return up to `limit` rows starting at `offset`"""
+        sql = self.query
+        if self.order_by:
+            sql += f" ORDER BY {self.order_by}"
+        sql += " LIMIT ? OFFSET ?"
+        
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, self.params + [limit, offset])
+            rows = cursor.fetchall()
+            if self.columns:
+                return [dict(zip(self.columns, row)) for row in rows]
+            return rows
+        except sqlite3.Error as e:
+            self._report("Error fetching rows", e)
+            return []
+        finally:
+            self._conn = None
+            conn.close()
+    
+    def can_sort(self, column):
+        return column in self.sort_columns
+    
+    def sort(self, column, reverse=False):
+        """Order by one of the sortable columns"""
+        direction = "DESC" if reverse else "ASC"
+        order = f"{self.sort_columns[column]} {direction}"
+        
+        # Keep the default order as a tie-breaker so paging stays stable
+        if self.default_order:
+            order += f", {self.default_order}"
+        self.order_by = order
+    
+    def interrupt(self):
+        """Abort the statement currently running, from any thread"""
+        self._interrupted = True
+        conn = self._conn
+        if conn is not None:
+            conn.interrupt()
+    
+    def invalidate(self):
+        """Forget the cached row count after the underlying data changed"""
+        self._count = None
+
+
+class ListPageSource:
+    """Serve rows that are already in memory through the page-source interface
+    
+    Sort keys are computed once per column and the resulting order is kept,
+    so re-sorting or flipping direction never re-evaluates a key.
+    
+    Args:
+        rows (list): Row dicts
+        sort_keys (dict, optional): Maps a column name to a key function for sorting
+    """
+    
+    def __init__(self, rows, sort_keys=None):
+        self.rows = list(rows)
+        self.sort_keys = sort_keys or {}
+        self._base = self.rows
+        self._orders = {}
+    
+    def count(self):
+        return len(self.rows)
+    
+    def fetch(self, offset, limit):
+        return self.rows[offset:offset + limit]
+    
+    def can_sort(self, column):
+        return column in self.sort_keys
+    
+    def sort(self, column, reverse=False):
+        if column not in self._orders:
+            key = self.sort_keys[column]
+            keyed = [(key(row), index) for index, row in enumerate(self._base)]
+            present = sorted((item for item in keyed if item[0] is not None),
+                             key=lambda item: item[0])
+            self._orders[column] = (
+                [index for _, index in present],
+                [index for value, index in keyed if value is None]
+            )
+        
+        # None sorts last regardless of direction
+        present, missing = self._orders[column]
+        if reverse:
+            present = present[::-1]
+        self.rows = [self._base[index] for index in present + missing]
+    
+    def interrupt(self):
+        pass
+    
+    def invalidate(self):
+        pass
@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection that goes back to its pool on close() instead of closing"""
+    
+    def close(self):
+        self.pool.release(self)
+
+
+class ConnectionPool:
+    """Reusable WAL-mode connections to one database
+    
+    Opening a connection (and running its setup pragmas) costs more than
+    most of the queries the service answers, so closed connections are
+    kept and handed out again. WAL lets readers run alongside a writer, so
+    reports requested by one desk do not block payments taken at another.
+    Connections are not limited: one is opened whenever none is idle, and
+    at most `size` idle ones are kept. A connection may be used from any
+    thread, but by one at a time.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        size (int, optional): Idle connections to keep
+        busy_timeout (float, optional): Seconds a write waits for the lock
+    """
+    
+    def __init__(self, db_path, size=4, busy_timeout=5.0):
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        self.closed = False
+        
+        # journal_mode is stored in the file, so setting it once is enough
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+        finally:
+            conn.close()
+    
+    def connect(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                               check_same_thread=False, factory=PooledConnection)
+        conn.pool = self
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def release(self, conn):
+        """Reset a connection and keep it, unless enough are idle already"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            sqlite3.Connection.close(conn)
+            return
+        
+        with self.lock:
+            if not self.closed and len(self.idle) < self.size and conn not in self.idle:
+                self.idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
+    
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
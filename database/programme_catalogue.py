@@ -0,0 +1,198 @@
+import sqlite3
+import json
+from utils.constants import DURATIONS, SCHEDULES
+
+
+def make_programme_code(name):
+    """Build the registration-number prefix for a programme name"""
+    return ''.join(word[0] for word in name.split()[:3]).upper()
+
+
+class ProgrammeCatalogue:
+    """In-process cache of the programmes table, invalidated on every edit
+    
+    Args:
+        db (Database): Database whose connect() reads and writes the table
+    """
+    
+    def __init__(self, db):
+        self.db = db
+        self._programmes = None
+        self._by_id = {}
+        self._by_name = {}
+    
+    def _load(self):
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT programme_id, name, code, default_fee,
+                       durations, schedules, description
+                FROM programmes
+                ORDER BY name
+            ''')
+            
+            programmes = []
+            for row in cursor.fetchall():
+                programmes.append({
+                    'programme_id': row[0],
+                    'name': row[1],
+                    'code': row[2],
+                    'default_fee': row[3] or 0,
+                    'durations': (json.loads(row[4]) if row[4] else None) or list(DURATIONS),
+                    'schedules': (json.loads(row[5]) if row[5] else None) or list(SCHEDULES),
+                    'description': row[6] or ''
+                })
+        except sqlite3.Error as e:
+            print(f"Error loading programmes: {e}")
+            programmes = []
+        finally:
+            conn.close()
+        
+        self._programmes = programmes
+        self._by_id = {p['programme_id']: p for p in programmes}
+        self._by_name = {p['name'].lower(): p for p in programmes}
+    
+    def invalidate(self):
+        """Drop the cached catalogue so the next lookup reloads it"""
+        self._programmes = None
+    
+    def all(self):
+        """Return all programmes ordered by name"""
+        if self._programmes is None:
+            self._load()
+        return self._programmes
+    
+    def names(self):
+        """Return programme names ordered alphabetically"""
+        return [p['name'] for p in self.all()]
+    
+    def get(self, programme_id):
+        """Get a programme by its id"""
+        self.all()
+        return self._by_id.get(programme_id)
+    
+    def get_by_name(self, name):
+        """Get a programme by name (case-insensitive)"""
+        if not name:
+            return None
+        self.all()
+        return self._by_name.get(name.strip().lower())
+    
+    def get_id(self, name):
+        """Get the programme_id for a programme name, or None"""
+        programme = self.get_by_name(name)
+        return programme['programme_id'] if programme else None
+    
+    def get_code(self, name):
+        """Get the stored registration code prefix for a programme"""
+        programme = self.get_by_name(name)
+        return programme['code'] if programme else make_programme_code(name)
+    
+    def add_programme(self, name, code=None, default_fee=0,
+                      durations=None, schedules=None, description=''):
+        """
+        Add a new programme to the catalogue
+        
+        Args:
+            name (str): Name of the new programme
+            code (str, optional): Registration code prefix, derived from name if omitted
+            default_fee (float, optional): Default programme fee
+            durations (list, optional): Allowed durations
+            schedules (list, optional): Allowed schedules
+            description (str, optional): Programme description
+        
+        Returns:
+            bool: True if programme was added successfully, False if it already exists
+        """
+        name = name.strip().title()
+        if not name or self.get_by_name(name):
+            return False
+        
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO programmes (
+                    name, code, default_fee, durations, schedules, description
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                name,
+                (code or make_programme_code(name)).upper(),
+                default_fee or 0,
+                json.dumps(durations or DURATIONS),
+                json.dumps(schedules or SCHEDULES),
+                description
+            ))
+            
+            conn.commit()
+            return True
+        
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return False
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error adding programme: {e}")
+            return False
+        
+        finally:
+            conn.close()
+            self.invalidate()
+    
+    def update_programme(self, programme_id, updates):
+        """
+        Update programme details
+        
+        Args:
+            programme_id (int): ID of the programme to update
+            updates (dict): Fields to change (name, code, default_fee,
+                durations, schedules, description)
+        
+        Returns:
+            bool: True if update was successful, False otherwise
+        """
+        allowed = ('name', 'code', 'default_fee', 'durations', 'schedules', 'description')
+        fields = []
+        values = []
+        for key, value in updates.items():
+            if key not in allowed:
+                continue
+            if key in ('durations', 'schedules'):
+                value = json.dumps(value)
+            fields.append(f"{key} = ?")
+            values.append(value)
+        
+        if not fields:
+            return False
+        
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(f'''
+                UPDATE programmes
+                SET {", ".join(fields)}
+                WHERE programme_id = ?
+            ''', values + [programme_id])
+            
+            # Keep the denormalised programme name on students in step
+            if 'name' in updates:
+                cursor.execute('''
+                    UPDATE students SET programme = ?
+                    WHERE programme_id = ?
+                ''', (updates['name'], programme_id))
+            
+            conn.commit()
+            return True
+        
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error updating programme: {e}")
+            return False
+        
+        finally:
+            conn.close()
+            self.invalidate()
@@ -0,0 +1,82 @@
+import sqlite3
+
+
+class ProgrammeSummary:
+    """Per-programme dashboard figures computed in a single grouped query.
+    
+    The result is cached as a snapshot shared by the programme cards and the
+    programme exports, and dropped by Database.invalidate_caches() on every write.
+    Figures include archived students.
+    
+    Args:
+        db (Database): Database to read, through its connect_history()
+    """
+    
+    def __init__(self, db):
+        self.db = db
+        self._snapshot = None
+    
+    def _load(self):
+        conn = self.db.connect_history()
+        cursor = conn.cursor()
+        
+        try:
+            # One pass over programmes -> students -> pre-aggregated balances
+            cursor.execute('''
+                SELECT
+                    pr.programme_id,
+                    pr.name,
+                    pr.code,
+                    COUNT(s.reg_number) as total,
+                    SUM(CASE WHEN s.reg_number IS NOT NULL AND
+                                  COALESCE(s.status, 'Active') = 'Active'
+                        THEN 1 ELSE 0 END) as active,
+                    SUM(CASE WHEN s.status = 'Graduated' THEN 1 ELSE 0 END) as completed,
+                    SUM(CASE WHEN s.status = 'Dropped Out' THEN 1 ELSE 0 END) as dropped,
+                    COALESCE(SUM(s.programme_fee), 0) as total_fees,
+                    COALESCE(SUM(b.total_paid), 0) as paid_amount
+                FROM programmes pr
+                LEFT JOIN students s ON s.programme_id = pr.programme_id
+                LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+                GROUP BY pr.programme_id
+                ORDER BY pr.name
+            ''')
+            
+            snapshot = []
+            for row in cursor.fetchall():
+                snapshot.append({
+                    'programme_id': row[0],
+                    'programme': row[1],
+                    'code': row[2],
+                    'total_students': row[3] or 0,
+                    'active_students': row[4] or 0,
+                    'completed': row[5] or 0,
+                    'dropped_out': row[6] or 0,
+                    'total_revenue': row[8],
+                    'outstanding': row[7] - row[8]
+                })
+            return snapshot
+        
+        except sqlite3.Error as e:
+            print(f"Error loading programme summary: {e}")
+            return []
+        
+        finally:
+            conn.close()
+    
+    def invalidate(self):
+        """Drop the cached snapshot so the next read re-runs the query"""
+        self._snapshot = None
+    
+    def all(self):
+        """Return statistics for every programme, ordered by name"""
+        if self._snapshot is None:
+            self._snapshot = self._load()
+        return self._snapshot
+    
+    def get(self, programme_id):
+        """Return statistics for one programme from the cached snapshot"""
+        for stats in self.all():
+            if stats['programme_id'] == programme_id:
+                return stats
+        return None
@@ -0,0 +1,116 @@
+import http.client
+import json
+import os
+import threading
+from urllib.parse import quote, urlsplit
+
+from database.service import DB_METHODS, NOTIFICATION_METHODS, TOKEN_HEADER
+
+
+class RemoteError(Exception):
+    """Raised when the database service rejects or fails a call"""
+
+
+class RemoteDatabase:
+    """Client for DatabaseService with the same methods as Database
+    
+    Each call is sent to the service and its result returned, so pages can
+    use one in place of a local Database; tuples come back as lists, which
+    unpack the same way. Notification calls go through `notifications`.
+    Each thread keeps its own keep-alive connection.
+    
+    Args:
+        url (str): Service address, e.g. http://127.0.0.1:8765
+        token (str, optional): Shared secret the service was started with
+        timeout (float, optional): Seconds to wait for a reply
+    """
+    
+    def __init__(self, url, token='', timeout=60):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.token = token
+        self.timeout = timeout
+        self.local = threading.local()
+        self.notifications = RemoteNotifications(self)
+    
+    def __getattr__(self, name):
+        if name not in DB_METHODS:
+            raise AttributeError(f"RemoteDatabase has no method {name}")
+        return lambda *args, **kwargs: self.call(f'/api/{name}', args, kwargs)
+    
+    def call(self, path, args=(), kwargs=None):
+        body = json.dumps({'args': list(args), 'kwargs': kwargs or {}})
+        status, data = self.request('POST', path, body.encode('utf-8'))
+        try:
+            reply = json.loads(data)
+        except ValueError:
+            raise RemoteError(f"Unexpected reply from the service ({status})")
+        if status != 200:
+            raise RemoteError(reply.get('error', f"Service error {status}"))
+        return reply['result']
+    
+    def download_receipt(self, filepath, target_dir):
+        """
+        Copy a receipt PDF named in a result (e.g. save_payment's) to target_dir
+        
+        Returns:
+            str: Path of the local copy
+        """
+        filename = os.path.basename(filepath)
+        status, data = self.request('GET', f'/receipts/{quote(filename)}')
+        if status != 200:
+            raise RemoteError(f"Receipt {filename} is not available")
+        
+        os.makedirs(target_dir, exist_ok=True)
+        path = os.path.join(target_dir, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+    
+    def ping(self):
+        status, _ = self.request('GET', '/health')
+        return status == 200
+    
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        
+        # A kept-alive connection the service has since closed is retried once
+        for attempt in range(2):
+            conn = self.connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+    
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+    
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+class RemoteNotifications:
+    """NotificationSystem methods of a RemoteDatabase's service"""
+    
+    def __init__(self, remote):
+        self.remote = remote
+    
+    def __getattr__(self, name):
+        if name not in NOTIFICATION_METHODS:
+            raise AttributeError(f"RemoteNotifications has no method {name}")
+        return lambda *args, **kwargs: self.remote.call(f'/api/notifications/{name}', args, kwargs)
@@ -0,0 +1,498 @@
+import csv
+import gzip
+import io
+import os
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.request import pathname2url
+from database.archive import attach_history
+from database.report_session import ReportSession
+
+
+# One worksheet of the report pack: its query, column headings and an
+# optional (chart report name, shape function) pair for an embedded chart
+ReportSheet = namedtuple('ReportSheet', 'name headers sql chart')
+
+
+def student_status_data(rows):
+    values = dict(rows)
+    return {
+        'active_students': values['Active Students'],
+        'graduated_students': values['Graduated Students'],
+        'dropouts': values['Dropped Out']
+    }
+
+
+def monthly_revenue_data(rows):
+    return {row[0]: row[2] for row in rows}
+
+
+def programme_revenue_data(rows):
+    return [{'programme': row[0], 'total_students': row[1], 'total_revenue': row[4]}
+            for row in rows]
+
+
+def cohort_data(rows):
+    return [{'cohort': row[0], 'period': row[1], 'students': row[2]} for row in rows]
+
+
+STUDENTS_SQL = '''
+    SELECT s.reg_number, s.name, s.gender, s.age,
+           COALESCE(pr.name, s.programme), s.schedule, s.duration,
+           s.start_date, s.registration_date, COALESCE(s.status, 'Active'),
+           s.programme_fee, COALESCE(b.total_paid, 0),
+           s.programme_fee - COALESCE(b.total_paid, 0)
+    FROM students s
+    LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+    LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+    ORDER BY s.reg_number
+'''
+
+PAYMENTS_SQL = '''
+    SELECT p.payment_id, p.payment_date, p.reg_number, s.name, p.amount,
+           p.receipt_number, p.payment_note
+    FROM payments p
+    LEFT JOIN students s ON s.reg_number = p.reg_number
+    ORDER BY p.payment_date, p.payment_id
+'''
+
+
+SHEETS = [
+    ReportSheet('Summary', ['Metric', 'Value'], '''
+        SELECT 'Total Students', COUNT(*) FROM students
+        UNION ALL
+        SELECT 'Active Students', COUNT(*) FROM students
+        WHERE status = 'Active' OR status IS NULL
+        UNION ALL
+        SELECT 'Graduated Students', COUNT(*) FROM students WHERE status = 'Graduated'
+        UNION ALL
+        SELECT 'Dropped Out', COUNT(*) FROM students WHERE status = 'Dropped Out'
+        UNION ALL
+        SELECT 'Scholarships', COUNT(*) FROM students WHERE scholarship = 1
+        UNION ALL
+        SELECT 'Total Programme Fees', COALESCE(SUM(programme_fee), 0) FROM students
+        UNION ALL
+        SELECT 'Total Revenue', COALESCE(SUM(amount), 0) FROM payments
+        UNION ALL
+        SELECT 'Total Outstanding',
+               COALESCE(SUM(s.programme_fee - COALESCE(b.total_paid, 0)), 0)
+        FROM students s
+        LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+    ''', ('student_status_report', student_status_data)),
+    
+    ReportSheet('Students', [
+        'Registration Number', 'Name', 'Gender', 'Age', 'Programme', 'Schedule',
+        'Duration', 'Start Date', 'Registration Date', 'Status', 'Programme Fee',
+        'Total Paid', 'Balance'
+    ], STUDENTS_SQL, None),
+    
+    ReportSheet('Payments', [
+        'Payment ID', 'Date', 'Registration Number', 'Name', 'Amount',
+        'Receipt Number', 'Note'
+    ], PAYMENTS_SQL, None),
+    
+    ReportSheet('Outstanding', [
+        'Registration Number', 'Name', 'Programme', 'Programme Fee',
+        'Amount Paid', 'Balance'
+    ], '''
+        SELECT s.reg_number, s.name, COALESCE(pr.name, s.programme),
+               s.programme_fee, COALESCE(b.total_paid, 0),
+               s.programme_fee - COALESCE(b.total_paid, 0) as balance
+        FROM students s
+        LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+        LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+        WHERE COALESCE(b.total_paid, 0) < s.programme_fee
+        ORDER BY balance DESC
+    ''', None),
+    
+    ReportSheet('Monthly Revenue', ['Month', 'Payments', 'Total Amount'], '''
+        SELECT strftime('%Y-%m', payment_date) as month, COUNT(*), SUM(amount)
+        FROM payments
+        GROUP BY month
+        ORDER BY month
+    ''', ('monthly_revenue_report', monthly_revenue_data)),
+    
+    ReportSheet('Programmes', [
+        'Programme', 'Students', 'Graduated', 'Completion Rate (%)',
+        'Revenue', 'Outstanding'
+    ], '''
+        SELECT COALESCE(pr.name, s.programme),
+               COUNT(*),
+               COUNT(CASE WHEN s.status = 'Graduated' THEN 1 END),
+               ROUND(COUNT(CASE WHEN s.status = 'Graduated' THEN 1 END) * 100.0 / COUNT(*), 2),
+               COALESCE(SUM(b.total_paid), 0),
+               COALESCE(SUM(s.programme_fee - COALESCE(b.total_paid, 0)), 0)
+        FROM students s
+        LEFT JOIN programmes pr ON pr.programme_id = s.programme_id
+        LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+        GROUP BY s.programme_id, COALESCE(pr.name, s.programme)
+        ORDER BY 1, s.programme_id
+    ''', ('programme_revenue_report', programme_revenue_data)),
+    
+    ReportSheet('Schedules', [
+        'Schedule', 'Students', 'Fully Paid', 'Part Paid', 'Unpaid',
+        'Expected Revenue', 'Received Revenue', 'Outstanding', 'Collection Rate (%)'
+    ], '''
+        SELECT s.schedule,
+               COUNT(*),
+               SUM(CASE WHEN COALESCE(b.total_paid, 0) >= s.programme_fee THEN 1 ELSE 0 END),
+               SUM(CASE WHEN COALESCE(b.total_paid, 0) > 0
+                         AND COALESCE(b.total_paid, 0) < s.programme_fee THEN 1 ELSE 0 END),
+               SUM(CASE WHEN COALESCE(b.total_paid, 0) = 0 THEN 1 ELSE 0 END),
+               COALESCE(SUM(s.programme_fee), 0),
+               COALESCE(SUM(b.total_paid), 0),
+               COALESCE(SUM(s.programme_fee), 0) - COALESCE(SUM(b.total_paid), 0),
+               ROUND(COALESCE(SUM(b.total_paid), 0) * 100.0 / NULLIF(SUM(s.programme_fee), 0), 2)
+        FROM students s
+        LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+        GROUP BY s.schedule
+        ORDER BY s.schedule
+    ''', None),
+    
+    ReportSheet('Cohorts', ['Cohort', 'Period', 'Students'], '''
+        SELECT strftime('%Y', registration_date) as cohort,
+               strftime('%Y-%m', registration_date) as period,
+               COUNT(*)
+        FROM students
+        GROUP BY cohort, period
+        ORDER BY period
+    ''', ('cohort_progression_report', cohort_data))
+]
+
+
+# Flat extracts for loading into other tools: typed columns and a query
+Extract = namedtuple('Extract', 'name columns sql')
+
+EXTRACTS = {
+    'students': Extract('students', [
+        ('reg_number', 'text'), ('name', 'text'), ('gender', 'text'),
+        ('age', 'integer'), ('programme', 'text'), ('schedule', 'text'),
+        ('duration', 'text'), ('start_date', 'text'), ('registration_date', 'text'),
+        ('status', 'text'), ('programme_fee', 'real'), ('total_paid', 'real'),
+        ('balance', 'real')
+    ], STUDENTS_SQL),
+    
+    'payments': Extract('payments', [
+        ('payment_id', 'integer'), ('payment_date', 'text'), ('reg_number', 'text'),
+        ('name', 'text'), ('amount', 'real'), ('receipt_number', 'text'),
+        ('payment_note', 'text')
+    ], PAYMENTS_SQL),
+    
+    'notifications': Extract('notifications', [
+        ('id', 'integer'), ('reg_number', 'text'), ('name', 'text'),
+        ('type', 'text'), ('message', 'text'), ('created_at', 'text'),
+        ('is_read', 'integer')
+    ], '''
+        SELECT n.id, n.reg_number, s.name, n.type, n.message, n.created_at, n.is_read
+        FROM notifications n
+        LEFT JOIN students s ON s.reg_number = n.reg_number
+        ORDER BY n.created_at, n.id
+    ''')
+}
+
+
+class StreamingWorkbook:
+    """Shared clean-up for the row-streaming workbook writers"""
+    
+    def discard(self):
+        """Release the writer and its temporary files, leaving no partial workbook"""
+        try:
+            self.close()
+        except Exception as e:
+            print(f"Error closing unfinished workbook: {e}")
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+class XlsxWriterWorkbook(StreamingWorkbook):
+    """Row-streaming workbook on xlsxwriter's constant_memory mode"""
+    
+    def __init__(self, filepath):
+        import xlsxwriter
+        self.filepath = filepath
+        self.workbook = xlsxwriter.Workbook(filepath, {'constant_memory': True})
+        self.bold = self.workbook.add_format({'bold': True})
+        self.next_row = {}
+    
+    def add_sheet(self, name, headers):
+        worksheet = self.workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, headers, self.bold)
+        self.next_row[name] = 1
+        return worksheet
+    
+    def append(self, worksheet, row):
+        worksheet.write_row(self.next_row[worksheet.name], 0, row)
+        self.next_row[worksheet.name] += 1
+    
+    def insert_image(self, worksheet, column, png):
+        worksheet.insert_image(0, column, f"{worksheet.name}.png",
+                               {'image_data': io.BytesIO(png)})
+    
+    def close(self):
+        self.workbook.close()
+
+
+class OpenpyxlWorkbook(StreamingWorkbook):
+    """Row-streaming workbook on openpyxl's write_only mode"""
+    
+    def __init__(self, filepath):
+        from openpyxl import Workbook
+        self.filepath = filepath
+        self.workbook = Workbook(write_only=True)
+    
+    def add_sheet(self, name, headers):
+        worksheet = self.workbook.create_sheet(name)
+        worksheet.append(headers)
+        return worksheet
+    
+    def append(self, worksheet, row):
+        worksheet.append(row)
+    
+    def insert_image(self, worksheet, column, png):
+        from openpyxl.drawing.image import Image
+        from openpyxl.utils import get_column_letter
+        worksheet.add_image(Image(io.BytesIO(png)), f"{get_column_letter(column + 1)}1")
+    
+    def close(self):
+        self.workbook.save(self.filepath)
+
+
+def open_workbook(filepath):
+    """Open a streaming workbook writer, preferring xlsxwriter"""
+    try:
+        return XlsxWriterWorkbook(filepath)
+    except ImportError:
+        pass
+    
+    try:
+        return OpenpyxlWorkbook(filepath)
+    except ImportError:
+        raise Exception("Please install xlsxwriter: pip install xlsxwriter")
+
+
+class ReportExporter:
+    """Write the multi-sheet report pack without holding it in memory
+    
+    Every sheet is read on its own connection in a thread pool, all from
+    one ReportSession snapshot so the sheets agree with each other, and rows are handed to the writer in chunks through a small bounded
+    queue per sheet, so the queries overlap with writing but memory stays
+    flat however large the tables are. Sheets with a chart have it drawn in
+    a process pool while the remaining sheets are written.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        chunk_size (int, optional): Rows fetched per chunk
+        max_workers (int, optional): Sheets read at the same time
+    """
+    
+    QUEUE_CHUNKS = 4
+    
+    def __init__(self, db_path, chunk_size=2000, max_workers=4):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+    
+    def connect_read_only(self, session=None):
+        if session is not None:
+            return session.connect_new()
+        conn = sqlite3.connect(f"file:{pathname2url(self.db_path)}?mode=ro", uri=True)
+        return attach_history(conn, self.db_path, read_only=True)
+    
+    def export(self, filepath, sheets=None, charts=True, task=None):
+        """
+        Write the report pack to an XLSX file
+        
+        Args:
+            filepath (str): Destination workbook
+            sheets (list, optional): Sheet names to include; defaults to all of SHEETS
+            charts (bool, optional): Embed charts next to the sheets that have one
+            task (Task, optional): Background task to report progress to
+        
+        Returns:
+            str: filepath
+        """
+        selected = [sheet for sheet in SHEETS if sheets is None or sheet.name in sheets]
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.QUEUE_CHUNKS) for _ in selected]
+        workbook = open_workbook(filepath)
+        
+        try:
+            # Sheets are read on several connections, so they share one copy
+            with ReportSession(self.db_path, copy=True) as session, \
+                    ThreadPoolExecutor(max_workers=self.max_workers) as readers:
+                for sheet, chunks in zip(selected, queues):
+                    readers.submit(self._read_sheet, sheet, chunks, stop, session)
+                
+                chart_pool = self._chart_pool() if charts else None
+                try:
+                    pending = []
+                    for done, (sheet, chunks) in enumerate(zip(selected, queues)):
+                        if task is not None:
+                            task.report(done, len(selected), f"Writing {sheet.name}...")
+                        
+                        worksheet = workbook.add_sheet(sheet.name, sheet.headers)
+                        keep = chart_pool is not None and sheet.chart is not None
+                        rows = self._write_sheet(workbook, worksheet, chunks, keep=keep,
+                                                 progress=(done, len(selected), task))
+                        
+                        if rows is not None:
+                            report_name, shape = sheet.chart
+                            pending.append((sheet.name, worksheet, len(sheet.headers) + 1,
+                                            self._render(chart_pool, report_name, shape(rows))))
+                    
+                    for name, worksheet, column, future in pending:
+                        try:
+                            workbook.insert_image(worksheet, column, future.result())
+                        except Exception as e:
+                            print(f"Could not draw chart for {name}: {e}")
+                
+                finally:
+                    # Unblock readers still waiting on a full queue
+                    stop.set()
+                    if chart_pool is not None:
+                        chart_pool.shutdown(wait=False, cancel_futures=True)
+            
+            workbook.close()
+        
+        except BaseException:
+            # A failed or cancelled export leaves no half-written workbook
+            workbook.discard()
+            raise
+        return filepath
+    
+    def export_extract(self, name, filepath, format='csv', compress=False, task=None):
+        """
+        Stream one of EXTRACTS straight from a cursor to CSV or Parquet
+        
+        Args:
+            name (str): Key into EXTRACTS
+            filepath (str): Destination file
+            format (str, optional): 'csv' or 'parquet'
+            compress (bool, optional): gzip the CSV, or use zstd instead of
+                snappy for Parquet
+            task (Task, optional): Background task to report progress to
+        
+        Returns:
+            str: filepath
+        """
+        extract = EXTRACTS[name]
+        if format == 'csv':
+            write = self._write_csv
+        elif format == 'parquet':
+            write = self._write_parquet
+        else:
+            raise ValueError(f"Unknown extract format: {format}")
+        
+        with ReportSession(self.db_path) as session:
+            conn = session.connection()
+            cursor = conn.execute(extract.sql)
+            write(extract, self._chunks(cursor, extract, task), filepath, compress)
+        return filepath
+    
+    def _chunks(self, cursor, extract, task):
+        written = 0
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            yield rows
+            written += len(rows)
+            if task is not None:
+                task.report(written, None, f"Exported {written:,} {extract.name} rows...")
+    
+    def _write_csv(self, extract, chunks, filepath, compress):
+        opener = gzip.open if compress else open
+        with opener(filepath, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([column for column, _ in extract.columns])
+            for rows in chunks:
+                writer.writerows(rows)
+    
+    def _write_parquet(self, extract, chunks, filepath, compress):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Please install pyarrow: pip install pyarrow")
+        
+        types = {'text': pa.string(), 'integer': pa.int64(), 'real': pa.float64()}
+        schema = pa.schema([(column, types[kind]) for column, kind in extract.columns])
+        
+        with pq.ParquetWriter(filepath, schema,
+                              compression='zstd' if compress else 'snappy') as writer:
+            for rows in chunks:
+                # SQLite columns are loosely typed; coerce to the declared type
+                arrays = [pa.array(self._coerce(values, kind), type=types[kind])
+                          for values, (_, kind) in zip(zip(*rows), extract.columns)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    
+    def _coerce(self, values, kind):
+        convert = {'text': str, 'integer': int, 'real': float}[kind]
+        coerced = []
+        for value in values:
+            if value is None or (value == '' and kind != 'text'):
+                coerced.append(None)
+                continue
+            try:
+                coerced.append(convert(value))
+            except (TypeError, ValueError):
+                coerced.append(None)
+        return coerced
+    
+    def _read_sheet(self, sheet, chunks, stop, session=None):
+        """Stream a sheet's rows into its queue (runs on a reader thread)"""
+        try:
+            conn = self.connect_read_only(session)
+            try:
+                cursor = conn.execute(sheet.sql)
+                while not stop.is_set():
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not self._put(chunks, rows, stop) or not rows:
+                        return
+            finally:
+                conn.close()
+        except Exception as e:
+            # Hand the error to the writer rather than leaving it waiting
+            self._put(chunks, e, stop)
+    
+    def _put(self, chunks, item, stop):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _write_sheet(self, workbook, worksheet, chunks, keep, progress):
+        """Append rows as they arrive; return them if a chart needs them"""
+        kept = [] if keep else None
+        done, total, task = progress
+        
+        while True:
+            rows = chunks.get()
+            if isinstance(rows, Exception):
+                raise rows
+            if not rows:
+                return kept
+            
+            for row in rows:
+                workbook.append(worksheet, row)
+            if kept is not None:
+                kept.extend(rows)
+            if task is not None:
+                task.report(done, total)
+    
+    def _chart_pool(self):
+        try:
+            return ProcessPoolExecutor(max_workers=2)
+        except (OSError, NotImplementedError) as e:
+            print(f"Process pool unavailable, drawing charts on a thread: {e}")
+            return ThreadPoolExecutor(max_workers=1)
+    
+    def _render(self, pool, report_name, data):
+        from utils.report_charts import render_chart
+        return pool.submit(render_chart, report_name, data)
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from urllib.request import pathname2url
+from database.archive import attach_history
+
+
+class SessionConnection:
+    """A session's connection that callers may close() like their own"""
+    
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def close(self):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class ReportSession:
+    """
+    A consistent, read-only view of the database for long-running reports
+    
+    Every query run through a session sees the data as it was at the
+    session's first read, however long the report takes and whatever is
+    saved meanwhile, and never holds a lock a cashier's write would wait on.
+    Nothing is opened until a connection is asked for, so reports answered
+    elsewhere (the analytics snapshot, plain connect() reads) cost nothing.
+    
+    On a WAL-mode database (as served by DatabaseService) the session is a
+    read transaction: WAL readers see a fixed snapshot and never block the
+    writer. Otherwise the database is copied with the backup API into a
+    temporary file, deleted when the session closes; the copy holds a read
+    lock only while it is made, and keeps memory use flat however large the
+    database is. A copy can also be asked for on WAL, when a report reads on
+    several threads: connect_new() connections then share one snapshot.
+    
+    Once students have been archived, the archive is attached to every
+    connection, so the union views of attach_history() apply as they do
+    for Database.connect_history().
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        copy (bool, optional): Force (True) or avoid (False) the temporary
+            copy; by default it is used unless the database is in WAL mode
+        owner (Database, optional): Database whose connect_history() should
+            hand out this session's connection while it is entered
+    """
+    
+    def __init__(self, db_path, copy=None, owner=None):
+        self.db_path = db_path
+        self.copy = copy
+        self.owner = owner
+        self.conn = None
+        self.copy_path = None
+        self.previous = None
+        self.lock = threading.Lock()
+    
+    def open(self):
+        """Take the snapshot now, if no connection has done so yet"""
+        with self.lock:
+            if self.conn is None:
+                self.take_snapshot()
+        return self
+    
+    def take_snapshot(self):
+        source = sqlite3.connect(f"file:{pathname2url(self.db_path)}?mode=ro", uri=True,
+                                 check_same_thread=False)
+        try:
+            wal = source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+            if self.copy is None:
+                self.copy = not wal
+            
+            if not self.copy:
+                # ATTACH is not allowed inside a transaction, so attach first,
+                # then pin the snapshot with a read
+                attach_history(source, self.db_path, read_only=True)
+                source.execute('BEGIN')
+                source.execute('SELECT COUNT(*) FROM main.sqlite_master').fetchone()
+                self.conn = source
+                return
+            
+            handle, self.copy_path = tempfile.mkstemp(prefix='impactech-report-', suffix='.db')
+            os.close(handle)
+            copy = sqlite3.connect(f"file:{pathname2url(self.copy_path)}", uri=True,
+                                   check_same_thread=False)
+            try:
+                # One step, so the copy cannot restart when a write lands mid-way
+                source.backup(copy)
+            except Exception:
+                copy.close()
+                raise
+            source.close()
+            self.conn = attach_history(copy, self.db_path, read_only=True)
+        
+        except Exception:
+            source.close()
+            self.remove_copy()
+            raise
+    
+    def connection(self):
+        """The session's connection; closing it leaves the session open"""
+        self.open()
+        return SessionConnection(self.conn)
+    
+    def connect_new(self):
+        """
+        A separate connection for another thread (close it when done)
+        
+        Connections to the copy share its snapshot; on WAL without a copy
+        each new connection takes its own snapshot.
+        """
+        self.open()
+        if self.copy_path is not None:
+            conn = sqlite3.connect(f"file:{pathname2url(self.copy_path)}?mode=ro", uri=True,
+                                   check_same_thread=False)
+        else:
+            conn = sqlite3.connect(f"file:{pathname2url(self.db_path)}?mode=ro", uri=True)
+        return attach_history(conn, self.db_path, read_only=True)
+    
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                # Ends the read transaction, or lets go of the copy
+                self.conn.close()
+                self.conn = None
+            self.remove_copy()
+    
+    def remove_copy(self):
+        if self.copy_path is not None:
+            try:
+                os.remove(self.copy_path)
+            except OSError as e:
+                print(f"Could not remove report copy: {e}")
+            self.copy_path = None
+    
+    def __enter__(self):
+        if self.owner is not None:
+            self.previous = getattr(self.owner.report_local, 'session', None)
+            self.owner.report_local.session = self
+        return self
+    
+    def __exit__(self, *exc):
+        if self.owner is not None:
+            self.owner.report_local.session = self.previous
+        self.close()
+        return False
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+
+DEFAULT_PORT = 8765
+
+TOKEN_HEADER = 'x-impactech-token'
+
+# Database methods served at /api/<name>
+DB_METHODS = (
+    # Students
+    'generate_serial_number', 'save_student', 'get_student', 'get_all_students',
+    'update_student', 'update_student_status', 'delete_student',
+    'get_student_statistics', 'get_outstanding_payments', 'get_recent_activity',
+    # Payments and receipts
+    'save_payment', 'get_student_payments', 'get_total_payments', 'get_payment_history',
+    'get_all_payments', 'get_payment_statistics', 'delete_payment_record',
+    'get_student_receipts', 'get_receipt_by_number',
+    # Reports
+    'get_schedule_statistics', 'get_schedule_payment_analysis', 'get_schedule_trends',
+    'get_student_ages', 'get_gender_distribution', 'get_monthly_revenue',
+    'generate_payment_trends_report', 'generate_programme_enrollment_report',
+    'generate_programme_revenue_report', 'generate_programme_completion_report',
+    'get_student_performance_data', 'get_student_retention_data',
+    'get_student_cohort_data', 'get_cohort_extract', 'get_financial_summary',
+    # Change tracking, for clients keeping their own caches fresh
+    'get_table_versions', 'get_change_seq', 'get_changes_since'
+)
+
+# NotificationSystem methods served at /api/notifications/<name>
+NOTIFICATION_METHODS = (
+    'send_payment_reminder', 'send_course_progress_notification',
+    'get_student_notifications', 'mark_notification_as_read', 'send_bulk_notification'
+)
+
+# Calls that write run one at a time: SQLite has a single writer anyway,
+# and numbering (serials, receipts) reads then writes
+WRITE_METHODS = {
+    'save_student', 'update_student', 'update_student_status', 'delete_student',
+    'save_payment', 'delete_payment_record',
+    'send_payment_reminder', 'send_course_progress_notification',
+    'mark_notification_as_read', 'send_bulk_notification'
+}
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+MAX_BODY = 16 * 1024 * 1024
+
+
+class DatabaseService:
+    """JSON over HTTP front for one shared database
+    
+    Lets several front desks work on one authoritative database held by
+    this process, instead of each opening the same SQLite file over a
+    network share. Requests are read on an asyncio loop and the Database
+    and NotificationSystem calls behind them run on a small thread pool,
+    sharing pooled WAL-mode connections. Reads run side by side; writes
+    take turns.
+    
+    Routes:
+        POST /api/<method>                  body {"args": [...], "kwargs": {...}}
+        GET  /api/<method>?name=value       string keyword arguments only
+        POST /api/notifications/<method>    as above, for NotificationSystem
+        GET  /receipts/<file>               a generated receipt PDF
+        GET  /health
+    
+    Replies are {"result": ...} or {"error": "..."}. Tuples come back as
+    lists. When a token is set, every request must send it in the
+    X-Impactech-Token header.
+    
+    Args:
+        app_path (str): Folder holding impactech.db and receipts/
+        host (str, optional): Address to listen on (localhost by default)
+        port (int, optional): Port to listen on
+        workers (int, optional): Concurrent database calls
+        token (str, optional): Shared secret clients must send
+    """
+    
+    def __init__(self, app_path, host='127.0.0.1', port=DEFAULT_PORT, workers=4, token=''):
+        from database.db_setup import Database
+        from database.pool import ConnectionPool
+        from utils.notifications import NotificationSystem
+        
+        self.host = host
+        self.port = port
+        self.token = token
+        self.db = Database(app_path)
+        self.db.pool = ConnectionPool(self.db.db_path, size=workers,
+                                      busy_timeout=self.db.write_policy.busy_timeout)
+        self.notifications = NotificationSystem(self)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="impactech-service")
+        self.write_lock = threading.Lock()
+        self.server = None
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+    
+    async def serve_forever(self):
+        await self.start()
+        print(f"Impactech service listening on http://{self.host}:{self.port}")
+        async with self.server:
+            await self.server.serve_forever()
+    
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=True)
+        self.db.pool.close()
+    
+    async def handle_client(self, reader, writer):
+        """Answer requests on one keep-alive connection until the client leaves"""
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, content_type, payload = await self.dispatch(method, target, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                
+                writer.write((
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                ).encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def read_request(self, reader):
+        """Read one request; None once the client has closed the connection"""
+        line = await reader.readline()
+        if not line:
+            return None
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+    
+    async def dispatch(self, method, target, headers, body):
+        if self.token and headers.get(TOKEN_HEADER) != self.token:
+            return self.reply(401, {'error': "Missing or wrong token"})
+        
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        
+        if parts == ['health']:
+            return self.reply(200, {'result': True})
+        
+        if len(parts) == 2 and parts[0] == 'receipts' and method == 'GET':
+            return await self.receipt(parts[1])
+        
+        if parts[0] != 'api' or len(parts) not in (2, 3):
+            return self.reply(404, {'error': f"No route for {url.path}"})
+        
+        if len(parts) == 3 and parts[1] == 'notifications' and parts[2] in NOTIFICATION_METHODS:
+            target_object, name = self.notifications, parts[2]
+        elif len(parts) == 2 and parts[1] in DB_METHODS:
+            target_object, name = self.db, parts[1]
+        else:
+            return self.reply(404, {'error': f"Unknown method {'/'.join(parts[1:])}"})
+        
+        if method == 'GET':
+            args, kwargs = [], dict(parse_qsl(url.query))
+        elif method == 'POST':
+            try:
+                call = json.loads(body or b'{}')
+                args, kwargs = list(call.get('args', [])), dict(call.get('kwargs', {}))
+            except (ValueError, TypeError, AttributeError) as e:
+                return self.reply(400, {'error': f"Bad request body: {e}"})
+        else:
+            return self.reply(405, {'error': f"{method} is not supported"})
+        
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor, self.call, getattr(target_object, name), args, kwargs)
+        except TypeError as e:
+            return self.reply(400, {'error': str(e)})
+        except Exception as e:
+            print(f"Error in {name}: {e}")
+            return self.reply(500, {'error': str(e)})
+        return self.reply(200, {'result': result})
+    
+    def call(self, method, args, kwargs):
+        if method.__name__ in WRITE_METHODS:
+            with self.write_lock:
+                return method(*args, **kwargs)
+        return method(*args, **kwargs)
+    
+    async def receipt(self, filename):
+        path = os.path.join(self.db.receipts_path, os.path.basename(filename))
+        if not filename.endswith('.pdf') or not os.path.isfile(path):
+            return self.reply(404, {'error': f"No receipt {filename}"})
+        
+        loop = asyncio.get_running_loop()
+        with open(path, 'rb') as f:
+            data = await loop.run_in_executor(self.executor, f.read)
+        return 200, 'application/pdf', data
+    
+    def reply(self, status, message):
+        return status, 'application/json', json.dumps(message, default=str).encode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Impactech database to other desks")
+    parser.add_argument('--app-path', help="Folder holding impactech.db (default: ~/Documents/Impactech)")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent database calls")
+    parser.add_argument('--token', default=os.environ.get('IMPACTECH_SERVICE_TOKEN', ''),
+                        help="Shared secret clients must send")
+    options = parser.parse_args(argv)
+    
+    if options.app_path is None:
+        from utils.folder_setup import create_app_folders
+        options.app_path = create_app_folders()
+    
+    service = DatabaseService(options.app_path, options.host, options.port,
+                              options.workers, options.token)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
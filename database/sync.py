@@ -0,0 +1,614 @@
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import socket
+import socketserver
+import sqlite3
+import struct
+import threading
+import zlib
+from datetime import datetime
+
+
+FORMAT = 1
+
+# Desk prefixes are put into registration and receipt numbers
+PREFIX_PATTERN = re.compile(r'^[A-Z]{1,3}$')
+
+# Rows are matched between desks by these keys; payment_ids are local
+SYNC_KEYS = {'students': 'reg_number', 'payments': 'receipt_number'}
+
+# change_log keys rows by reg_number and payment_id
+LOG_KEYS = {'students': 'reg_number', 'payments': 'payment_id'}
+
+# Programme columns sent between desks; programme_ids are local, so
+# programmes are matched by name and students carry their programme's name
+PROGRAMME_COLUMNS = ['name', 'code', 'default_fee', 'durations', 'schedules', 'description']
+
+# Largest message, compressed or unpacked, accepted over a socket: before
+# the peer has proven the key only the small handshake messages, after it
+# whole changesets (the first holds every row)
+HANDSHAKE_LIMIT = 64 * 1024
+MESSAGE_LIMIT = 256 * 1024 * 1024
+
+# Seconds a served connection may sit idle before it is dropped
+SERVE_TIMEOUT = 60
+
+
+class SyncError(Exception):
+    """Raised when desks cannot sync (no prefix, bad changeset, wrong key)"""
+
+
+class SyncEngine:
+    """Replicate students and payments between front-desk databases
+    
+    Each desk keeps its own database and a short letter prefix that goes
+    into the registration and receipt numbers it issues, so numbers are
+    unique across desks. Changes are exchanged as changesets: one entry per
+    row changed by a person at this desk since the receiving side's
+    watermark, with the row's current values and when each changed column
+    was last set. Changes that arrived by sync, archive moves and integrity repairs are
+    never sent on. The first changeset for a peer also carries every
+    existing row, to be inserted where missing, so two desks that were
+    started separately converge.
+    
+    Conflicts are resolved column by column, last writer wins: a remote
+    value is applied unless this desk changed the same column later
+    (ties go to the higher prefix). A remote delete loses to later local
+    edits, and a student delete also loses to payments taken for them here
+    since; the kept rows are then offered back to the desk that deleted
+    them. Rows for students archived here are skipped. Every changeset also
+    lists the sending desk's programmes, which are added here by name when
+    missing, and students are linked to the local programme of that name.
+    
+    Changesets travel as files in a shared folder (each desk writes to its
+    own subfolder and reads the others') or directly over a socket. Socket
+    peers prove they hold the shared key (an HMAC of random nonces) before
+    anything else is exchanged; the key itself is never sent.
+    
+    Args:
+        db_path (str): Path to this desk's SQLite database
+        key (str, optional): Shared secret desks must agree on over sockets
+    """
+    
+    def __init__(self, db_path, key=''):
+        self.db_path = db_path
+        self.key = key
+    
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+    
+    def prefix(self):
+        conn = self.connect()
+        try:
+            row = conn.execute('SELECT prefix FROM sync_desk WHERE id = 1').fetchone()
+            return row[0] if row and row[0] else ''
+        finally:
+            conn.close()
+    
+    def set_prefix(self, prefix):
+        """Set this desk's prefix (1-3 capital letters, unique among desks)"""
+        prefix = prefix.strip().upper()
+        if not PREFIX_PATTERN.match(prefix):
+            raise SyncError("Desk prefix must be 1 to 3 letters")
+        
+        conn = self.connect()
+        try:
+            conn.execute('UPDATE sync_desk SET prefix = ? WHERE id = 1', [prefix])
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def require_prefix(self):
+        prefix = self.prefix()
+        if not prefix:
+            raise SyncError("Set this desk's prefix before syncing")
+        return prefix
+    
+    def watermarks(self):
+        """Last seq applied from each peer, by prefix"""
+        conn = self.connect()
+        try:
+            return dict(conn.execute('SELECT prefix, last_seq FROM sync_peers').fetchall())
+        finally:
+            conn.close()
+    
+    def export_changes(self, since_seq=None):
+        """
+        Build a changeset of this desk's changes after since_seq, or of
+        every row (for a peer that has never synced with this desk)
+        
+        Returns:
+            dict: Changeset with 'desk', 'from_seq', 'to_seq' and 'changes'
+        """
+        prefix = self.require_prefix()
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            # One read transaction, so rows match the log up to to_seq
+            cursor.execute('BEGIN')
+            cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log')
+            to_seq = cursor.fetchone()[0]
+            
+            changes = {}
+            if since_seq is None:
+                for table in SYNC_KEYS:
+                    for row in self.rows(cursor, self.select_sql(table)):
+                        self.add_upsert(changes, table, row, {}, None)
+            
+            for change in self.collect(cursor, since_seq or 0, to_seq):
+                changes[(change['table'], change['key'])] = change
+            
+            programmes = self.rows(cursor, f"SELECT {', '.join(PROGRAMME_COLUMNS)} FROM programmes")
+            
+            # Students first, so their payments find them
+            ordered = sorted(changes.values(), key=lambda change: change['table'] != 'students')
+            return {
+                'format': FORMAT,
+                'desk': prefix,
+                'from_seq': since_seq,
+                'to_seq': to_seq,
+                'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'programmes': programmes,
+                'changes': ordered
+            }
+        
+        finally:
+            conn.close()
+    
+    def collect(self, cursor, since_seq, to_seq):
+        """Fold this desk's change_log entries into one change per row"""
+        cursor.execute('''
+            SELECT table_name, row_key, operation, changed_at, old_values, new_values
+            FROM change_log
+            WHERE seq > ? AND seq <= ? AND source IS NULL
+            ORDER BY seq
+        ''', [since_seq, to_seq])
+        
+        touched = {}
+        for table, row_key, operation, changed_at, old_values, new_values in cursor.fetchall():
+            if table not in SYNC_KEYS:
+                continue
+            entry = touched.setdefault((table, row_key), {'columns': {}})
+            entry.update(operation=operation, changed_at=changed_at)
+            if operation == 'delete':
+                entry['old'] = json.loads(old_values)
+            else:
+                for column in json.loads(new_values or '{}'):
+                    entry['columns'][column] = changed_at
+        
+        changes = {}
+        for (table, row_key), entry in touched.items():
+            if entry['operation'] == 'delete':
+                key = entry['old'].get(SYNC_KEYS[table])
+                if key:
+                    changes[(table, key)] = {'table': table, 'op': 'delete', 'key': key,
+                                             'changed_at': entry['changed_at']}
+                continue
+            
+            rows = self.rows(cursor, f'{self.select_sql(table)} WHERE t.{LOG_KEYS[table]} = ?', [row_key])
+            if rows:
+                self.add_upsert(changes, table, rows[0], entry['columns'], entry['changed_at'])
+        return changes.values()
+    
+    def select_sql(self, table):
+        """A table's rows, students with the name of their linked programme"""
+        if table == 'students':
+            return '''
+                SELECT t.*, pr.name AS programme_name
+                FROM students t
+                LEFT JOIN programmes pr ON pr.programme_id = t.programme_id
+            '''
+        return f'SELECT * FROM {table} t'
+    
+    def add_upsert(self, changes, table, row, columns, changed_at):
+        key = row.get(SYNC_KEYS[table])
+        if not key:
+            return
+        row.pop('payment_id', None)
+        changes[(table, key)] = {
+            'table': table, 'op': 'upsert', 'key': key, 'row': row,
+            'columns': {column: at for column, at in columns.items() if column != 'payment_id'},
+            'changed_at': changed_at
+        }
+    
+    def rows(self, cursor, sql, params=()):
+        cursor.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+    
+    def apply_changes(self, changeset):
+        """
+        Apply a peer's changeset in one transaction
+        
+        Returns:
+            dict: Counts of 'applied', 'conflicts' (local data kept) and
+                'skipped' (nothing to do, or the row is archived here)
+        """
+        prefix = self.require_prefix()
+        if changeset.get('format') != FORMAT:
+            raise SyncError("Unsupported changeset format")
+        desk = changeset['desk']
+        if desk == prefix:
+            raise SyncError(f"Another desk is also using the prefix {prefix}")
+        
+        summary = {'applied': 0, 'conflicts': 0, 'skipped': 0}
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            # Applied changes are labelled so they are never sent back out
+            cursor.execute('UPDATE change_source SET source = ? WHERE id = 1', [f'sync:{desk}'])
+            
+            # Names are unique (case-insensitively), so existing programmes are kept
+            for programme in changeset.get('programmes', []):
+                columns = [column for column in PROGRAMME_COLUMNS if column in programme]
+                if programme.get('name') and programme.get('code'):
+                    cursor.execute(f'''
+                        INSERT OR IGNORE INTO programmes ({", ".join(columns)})
+                        VALUES ({", ".join("?" for _ in columns)})
+                    ''', [programme[column] for column in columns])
+            
+            for change in changeset['changes']:
+                if change['op'] == 'delete':
+                    result = self.apply_delete(cursor, change, prefix, desk)
+                else:
+                    result = self.apply_upsert(cursor, change, prefix, desk)
+                summary[result] += 1
+            
+            cursor.execute('UPDATE change_source SET source = NULL WHERE id = 1')
+            cursor.execute('''
+                INSERT INTO sync_peers (prefix, last_seq, last_sync_at) VALUES (?, ?, ?)
+                ON CONFLICT(prefix) DO UPDATE SET
+                    last_seq = MAX(last_seq, excluded.last_seq),
+                    last_sync_at = excluded.last_sync_at
+            ''', [desk, changeset['to_seq'], datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+            
+            conn.commit()
+            return summary
+        
+        except Exception:
+            conn.rollback()
+            raise
+        
+        finally:
+            conn.close()
+    
+    def local_row(self, cursor, table, key):
+        rows = self.rows(cursor, f'SELECT * FROM {table} WHERE {SYNC_KEYS[table]} = ?', [key])
+        return rows[0] if rows else None
+    
+    def changed_here_after(self, cursor, table, row_key, changed_at, prefix, desk, column=None):
+        """True if a person here changed the row (or column) after the remote change"""
+        cursor.execute('''
+            SELECT changed_at, new_values FROM change_log
+            WHERE table_name = ? AND row_key = ? AND changed_at >= ?
+              AND source IS NULL AND operation != 'delete'
+        ''', [table, str(row_key), changed_at or ''])
+        
+        for local_at, new_values in cursor.fetchall():
+            if column is not None and column not in json.loads(new_values or '{}'):
+                continue
+            if local_at > (changed_at or '') or prefix > desk:
+                return True
+        return False
+    
+    def local_programme_id(self, cursor, name):
+        """This desk's id for a programme name, adding the programme if it is missing"""
+        if not name:
+            return None
+        cursor.execute('SELECT programme_id FROM programmes WHERE name = ?', [name])
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        
+        from database.programme_catalogue import make_programme_code
+        cursor.execute('INSERT INTO programmes (name, code) VALUES (?, ?)',
+                       [name, make_programme_code(name)])
+        return cursor.lastrowid
+    
+    def apply_upsert(self, cursor, change, prefix, desk):
+        table, key, row = change['table'], change['key'], dict(change['row'])
+        if table == 'students':
+            # The sender's programme_id means nothing here; link by name
+            name = row.pop('programme_name', None) or row.get('programme')
+            row['programme_id'] = self.local_programme_id(cursor, name)
+        local = self.local_row(cursor, table, key)
+        
+        if local is None:
+            reg_number = row.get('reg_number')
+            cursor.execute('SELECT 1 FROM archived_students WHERE reg_number = ?', [reg_number])
+            if cursor.fetchone():
+                return 'skipped'
+            if table == 'payments' and self.local_row(cursor, 'students', reg_number) is None:
+                return 'skipped'
+            
+            cursor.execute(f'PRAGMA table_info({table})')
+            columns = [column[1] for column in cursor.fetchall() if column[1] in row]
+            cursor.execute(f'''
+                INSERT INTO {table} ({", ".join(columns)})
+                VALUES ({", ".join("?" for _ in columns)})
+            ''', [row[column] for column in columns])
+            return 'applied'
+        
+        # Rows first seen in a peer's full listing are only inserted where missing
+        if not change['columns']:
+            same = all(local.get(column) == value for column, value in row.items()
+                       if column in ('name', 'reg_number', 'amount'))
+            return 'skipped' if same else 'conflicts'
+        
+        row_key = local[LOG_KEYS[table]]
+        columns = [column for column in change['columns']
+                   if column in local and column != SYNC_KEYS[table]]
+        winners = [column for column in columns
+                   if not self.changed_here_after(cursor, table, row_key, change['columns'][column],
+                                                  prefix, desk, column)]
+        updates = [column for column in winners if local[column] != row.get(column)]
+        if updates:
+            cursor.execute(f'''
+                UPDATE {table} SET {", ".join(f"{column} = ?" for column in updates)}
+                WHERE {LOG_KEYS[table]} = ?
+            ''', [row.get(column) for column in updates] + [row_key])
+        
+        if len(winners) < len(columns):
+            return 'conflicts'
+        return 'applied' if updates else 'skipped'
+    
+    def apply_delete(self, cursor, change, prefix, desk):
+        table, key = change['table'], change['key']
+        local = self.local_row(cursor, table, key)
+        if local is None:
+            return 'skipped'
+        
+        row_key = local[LOG_KEYS[table]]
+        kept = self.changed_here_after(cursor, table, row_key, change['changed_at'], prefix, desk)
+        
+        payment_ids = []
+        if table == 'students':
+            cursor.execute('SELECT payment_id FROM payments WHERE reg_number = ?', [key])
+            payment_ids = [row[0] for row in cursor.fetchall()]
+        
+        # Keep a student who has paid here since the peer deleted them
+        for payment_id in payment_ids:
+            if kept:
+                break
+            cursor.execute('''
+                SELECT 1 FROM change_log
+                WHERE table_name = 'payments' AND row_key = ? AND operation = 'insert'
+                  AND source IS NULL AND changed_at >= ?
+            ''', [str(payment_id), change['changed_at'] or ''])
+            kept = cursor.fetchone() is not None
+        
+        if kept:
+            self.resend(cursor, table, row_key)
+            for payment_id in payment_ids:
+                self.resend(cursor, 'payments', payment_id)
+            return 'conflicts'
+        
+        if table == 'students':
+            cursor.execute('DELETE FROM payments WHERE reg_number = ?', [key])
+        cursor.execute(f'DELETE FROM {table} WHERE {LOG_KEYS[table]} = ?', [row_key])
+        return 'applied'
+    
+    def resend(self, cursor, table, row_key):
+        """Log a row kept against a peer's delete as this desk's change, so
+        the next changeset offers it back to the desks that deleted it"""
+        cursor.execute('''
+            INSERT INTO change_log (changed_at, table_name, row_key, operation, new_values, source)
+            VALUES (datetime('now', 'localtime'), ?, ?, 'update', '{}', NULL)
+        ''', [table, str(row_key)])
+    
+    def sync(self, folder=None, peers=(), task=None):
+        """
+        Sync through the shared folder and with each peer desk ("host:port")
+        
+        Returns:
+            dict: Totals over every transport, plus 'failed' peers
+        """
+        summary = {'applied': 0, 'conflicts': 0, 'skipped': 0, 'exported': 0, 'failed': []}
+        results = []
+        if folder:
+            results.append(self.sync_folder(folder, task))
+        for peer in peers:
+            host, _, port = peer.strip().rpartition(':')
+            try:
+                results.append(self.sync_with(host, int(port)))
+            except (SyncError, OSError, ValueError) as e:
+                print(f"Sync with {peer} failed: {e}")
+                summary['failed'].append(peer)
+        
+        for result in results:
+            for name, count in result.items():
+                summary[name] += count
+        return summary
+    
+    def sync_folder(self, folder, task=None):
+        """
+        Write this desk's new changes to a shared folder, then apply every
+        other desk's changesets not yet applied here
+        
+        Returns:
+            dict: Totals as returned by apply_changes(), plus 'exported'
+        """
+        prefix = self.require_prefix()
+        summary = {'applied': 0, 'conflicts': 0, 'skipped': 0,
+                   'exported': self.write_changeset(folder)}
+        
+        watermarks = self.watermarks()
+        pending = []
+        for desk in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if desk == prefix or not PREFIX_PATTERN.match(desk):
+                continue
+            for name in sorted(os.listdir(os.path.join(folder, desk))):
+                if name.endswith('.json.gz') and int(name.split('.')[0]) > watermarks.get(desk, -1):
+                    pending.append(os.path.join(folder, desk, name))
+        
+        for done, path in enumerate(pending):
+            if task is not None:
+                task.report(done, len(pending), "Applying changes from other desks...")
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                changeset = json.load(f)
+            if (changeset['from_seq'] or 0) > self.watermarks().get(changeset['desk'], 0):
+                print(f"Sync: changes from desk {changeset['desk']} before "
+                      f"{changeset['from_seq']} are missing from {folder}")
+            for name, count in self.apply_changes(changeset).items():
+                summary[name] += count
+        
+        return summary
+    
+    def write_changeset(self, folder):
+        """Write changes since the last export to folder/<prefix>/; returns the count"""
+        prefix = self.require_prefix()
+        conn = self.connect()
+        try:
+            exported_seq = conn.execute('SELECT exported_seq FROM sync_desk WHERE id = 1').fetchone()[0]
+            last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+        finally:
+            conn.close()
+        
+        # Nothing new since the last file (the first one holds every row)
+        if exported_seq is not None and last_seq == exported_seq:
+            return 0
+        
+        changeset = self.export_changes(exported_seq)
+        
+        desk_folder = os.path.join(folder, prefix)
+        os.makedirs(desk_folder, exist_ok=True)
+        path = os.path.join(desk_folder, f"{changeset['to_seq']:012d}.json.gz")
+        partial = path + '.part'
+        with gzip.open(partial, 'wt', encoding='utf-8') as f:
+            json.dump(changeset, f)
+        os.replace(partial, path)
+        
+        conn = self.connect()
+        try:
+            conn.execute('UPDATE sync_desk SET exported_seq = ? WHERE id = 1', [changeset['to_seq']])
+            conn.commit()
+        finally:
+            conn.close()
+        return len(changeset['changes'])
+    
+    def send(self, sock, message):
+        data = gzip.compress(json.dumps(message).encode('utf-8'))
+        sock.sendall(struct.pack('>Q', len(data)) + data)
+    
+    def receive(self, sock, limit=MESSAGE_LIMIT):
+        """Read one message, refusing any over `limit` bytes sent or unpacked"""
+        size = struct.unpack('>Q', self.receive_exactly(sock, 8))[0]
+        if size > limit:
+            raise SyncError("The other desk sent a message that is too large")
+        
+        inflate = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            data = inflate.decompress(self.receive_exactly(sock, size), limit + 1)
+        except zlib.error as e:
+            raise SyncError(f"The other desk sent an unreadable message: {e}")
+        if len(data) > limit or inflate.unconsumed_tail:
+            raise SyncError("The other desk sent a message that is too large")
+        return json.loads(data)
+    
+    def receive_exactly(self, sock, size):
+        chunks = []
+        while size:
+            chunk = sock.recv(min(size, 1 << 20))
+            if not chunk:
+                raise SyncError("Peer closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+    
+    def exchange(self, sock, initiator):
+        """
+        Swap changes with a peer over a connected socket
+        
+        The desks first prove to each other that they hold the same key,
+        then each says which of the other's changes it already has and sends
+        only what the other is missing. The initiator always sends first, so
+        neither side blocks writing while the other writes.
+        """
+        desk = self.require_prefix()
+        if not self.key:
+            raise SyncError("Set a sync key before syncing with other desks")
+        
+        nonce = secrets.token_hex(16)
+        if initiator:
+            self.send(sock, {'format': FORMAT, 'desk': desk, 'nonce': nonce})
+            peer = self.receive(sock, HANDSHAKE_LIMIT)
+            self.check_proof(peer, 'server', nonce, peer.get('nonce'))
+            self.send(sock, {'proof': self.proof('client', nonce, peer['nonce']),
+                             'have': self.watermarks()})
+            peer.update(self.receive(sock, HANDSHAKE_LIMIT))
+        else:
+            peer = self.receive(sock, HANDSHAKE_LIMIT)
+            if peer.get('format') != FORMAT or not isinstance(peer.get('nonce'), str):
+                raise SyncError("Not a sync request this desk understands")
+            self.send(sock, {'format': FORMAT, 'desk': desk, 'nonce': nonce,
+                             'proof': self.proof('server', peer['nonce'], nonce)})
+            reply = self.receive(sock, HANDSHAKE_LIMIT)
+            self.check_proof(reply, 'client', peer['nonce'], nonce)
+            self.send(sock, {'have': self.watermarks()})
+            peer['have'] = reply.get('have', {})
+        
+        outgoing = self.export_changes(peer['have'].get(desk))
+        if initiator:
+            self.send(sock, outgoing)
+            incoming = self.receive(sock)
+        else:
+            incoming = self.receive(sock)
+            self.send(sock, outgoing)
+        
+        summary = self.apply_changes(incoming)
+        summary['exported'] = len(outgoing['changes'])
+        return summary
+    
+    def proof(self, role, client_nonce, server_nonce):
+        """HMAC showing this side holds the key; the role stops a proof being echoed back"""
+        message = f"{role}:{client_nonce}:{server_nonce}".encode('utf-8')
+        return hmac.new(self.key.encode('utf-8'), message, hashlib.sha256).hexdigest()
+    
+    def check_proof(self, message, role, client_nonce, server_nonce):
+        if not isinstance(server_nonce, str) or not isinstance(message.get('proof'), str) \
+                or not hmac.compare_digest(message['proof'],
+                                           self.proof(role, client_nonce, server_nonce)):
+            raise SyncError("The other desk uses a different sync key")
+    
+    def sync_with(self, host, port, timeout=60):
+        """Exchange changes with a desk running serve()"""
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            return self.exchange(sock, initiator=True)
+    
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Accept sync connections from other desks on a background thread
+        
+        Args:
+            port (int): Port to listen on
+            host (str, optional): Address to listen on; this machine only
+                unless the desk's LAN address is given
+        
+        Returns:
+            socketserver.TCPServer: Call shutdown() to stop it
+        """
+        if not self.key:
+            raise SyncError("Set a sync key before accepting other desks")
+        engine = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    self.request.settimeout(SERVE_TIMEOUT)
+                    summary = engine.exchange(self.request, initiator=False)
+                    print(f"Sync with {self.client_address[0]}: {summary}")
+                except (SyncError, OSError, ValueError, sqlite3.Error) as e:
+                    print(f"Sync with {self.client_address[0]} failed: {e}")
+        
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="impactech-sync", daemon=True).start()
+        return server
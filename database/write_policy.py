@@ -0,0 +1,61 @@
+import random
+import sqlite3
+import time
+from utils.settings import load_settings, get_setting
+
+
+def is_busy(error):
+    """True for the errors another writer holding the lock causes"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and (
+        'locked' in message or 'busy' in message)
+
+
+class WritePolicy:
+    """
+    How writes behave when another desk or job holds the database lock
+    
+    Each connection waits up to `busy_timeout` seconds for the lock. A
+    write that still finds the database busy is retried up to `retries`
+    more times after a random pause (full jitter, doubling each attempt) so
+    desks that collided do not collide again in step. Writes retried this
+    way must run in one transaction, begun with BEGIN IMMEDIATE when they
+    read before writing, so a failed attempt leaves nothing behind.
+    
+    Args:
+        busy_timeout (float, optional): Seconds a connection waits for the lock
+        retries (int, optional): Further attempts after a busy failure
+        backoff (float, optional): Upper bound in seconds of the first pause
+    """
+    
+    def __init__(self, busy_timeout=5.0, retries=3, backoff=0.05):
+        self.busy_timeout = busy_timeout
+        self.retries = retries
+        self.backoff = backoff
+    
+    @classmethod
+    def configured(cls, app_path):
+        """A policy using the busy timeout and retries from settings.json"""
+        settings = load_settings(app_path)
+        try:
+            return cls(busy_timeout=max(0.0, float(get_setting(settings, 'busy_timeout'))),
+                       retries=max(0, int(get_setting(settings, 'write_retries'))))
+        except (TypeError, ValueError):
+            return cls()
+    
+    def run(self, write, *args, **kwargs):
+        """
+        Call write(*args, **kwargs), retrying while the database is busy
+        
+        Raises:
+            sqlite3.OperationalError: The database was still busy after the
+                last retry, or the write failed for another reason
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return write(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == self.retries:
+                    raise
+                print(f"Database busy, retrying write: {e}")
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
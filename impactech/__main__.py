@@ -0,0 +1,279 @@
+"""Impactech command line, for batch jobs run without the desktop app
+
+Usage (from the application folder):
+    python -m impactech export students --format csv --gzip
+    python -m impactech report --output pack.xlsx
+    python -m impactech remind
+    python -m impactech backup
+    python -m impactech import students new_students.csv
+    python -m impactech verify --full --repair
+    python -m impactech regen-receipts
+
+Nothing here imports tkinter, and each command only imports what it uses,
+so jobs start quickly from the OS scheduler (cron, Task Scheduler).
+Exit status is 0 on success and 1 when the job failed or found problems.
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+# Let `python -m impactech` work from any folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ConsoleTask:
+    """Stands in for a background Task, showing progress on a terminal"""
+    
+    def __init__(self, quiet=False):
+        self.show = not quiet and sys.stderr.isatty()
+    
+    def report(self, done, total=None, message=None):
+        if self.show:
+            count = f" {done}/{total}" if total else ""
+            sys.stderr.write(f"\r{message or ''}{count}\033[K")
+            sys.stderr.flush()
+    
+    def finish(self):
+        if self.show:
+            sys.stderr.write("\r\033[K")
+
+
+class Headless:
+    """The parts of ImpactechApp that Database consumers need, without Tk"""
+    
+    def __init__(self, app_path):
+        from database.db_setup import Database
+        self.app_path = app_path
+        self.db = Database(app_path)
+        self._notification_system = None
+    
+    @property
+    def notification_system(self):
+        if self._notification_system is None:
+            from utils.notifications import NotificationSystem
+            self._notification_system = NotificationSystem(self)
+        return self._notification_system
+    
+    def default_path(self, folder, name):
+        os.makedirs(os.path.join(self.app_path, folder), exist_ok=True)
+        return os.path.join(self.app_path, folder, name)
+
+
+def timestamp():
+    return datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+def cmd_export(app, options, task):
+    from database.report_export import ReportExporter
+    suffix = '.csv.gz' if options.format == 'csv' and options.gzip else f'.{options.format}'
+    filepath = options.output or app.default_path("exports", f"{options.extract}_{timestamp()}{suffix}")
+    ReportExporter(app.db.db_path).export_extract(options.extract, filepath, options.format,
+                                                  compress=options.gzip, task=task)
+    print(filepath)
+    return 0
+
+
+def cmd_report(app, options, task):
+    if options.summary:
+        with app.db.report_session():
+            summary = app.db.get_financial_summary()
+        for row in summary:
+            print(f"{row['metric']}: {row['value'] or 0:,.2f}")
+        return 0
+    
+    from database.report_export import ReportExporter
+    filepath = options.output or app.default_path("exports", f"report_pack_{timestamp()}.xlsx")
+    ReportExporter(app.db.db_path).export(filepath, sheets=options.sheets,
+                                          charts=not options.no_charts, task=task)
+    print(filepath)
+    return 0
+
+
+def cmd_remind(app, options, task):
+    notifications = app.notification_system
+    if not options.progress_only:
+        print(f"Sent {notifications.send_payment_reminders()} payment reminder notifications")
+    if not options.payments_only:
+        print(f"Sent {notifications.send_course_progress_notifications()} course progress notifications")
+    return 0
+
+
+def cmd_backup(app, options, task):
+    from database.backup import BackupEngine, BackupError
+    engine = BackupEngine.configured(app.app_path, app.db, options.dest, options.keep,
+                                     options.incremental)
+    if options.if_due is not None and not engine.is_due(options.if_due):
+        print("No backup due")
+        return 0
+    try:
+        print(engine.backup(task))
+    except BackupError as e:
+        print(f"Backup failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_import(app, options, task):
+    from database.importer import CsvImporter, CsvImportError
+    importer = CsvImporter(app.db)
+    try:
+        if options.kind == 'students':
+            counts = importer.import_students(options.file, task)
+        else:
+            counts = importer.import_payments(options.file, task)
+    except CsvImportError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Imported {counts['imported']}, skipped {counts['skipped']} already present, "
+          f"rejected {counts['rejected']}")
+    return 1 if counts['rejected'] else 0
+
+
+def cmd_verify(app, options, task):
+    from database.integrity import IntegrityChecker
+    try:
+        report = IntegrityChecker(app.db.db_path, app.db.write_policy).run(
+            full=True if options.full else None, repair=options.repair, task=task)
+    except sqlite3.Error as e:
+        print(f"Check failed: {e}", file=sys.stderr)
+        return 1
+    if any(issue.repaired for issue in report.issues):
+        app.db.invalidate_caches()
+    for issue in report.issues:
+        action = "repaired" if issue.repaired else "needs attention"
+        print(f"{issue.check}: {issue.count} {issue.detail} - {action}")
+    print(f"{report.mode.capitalize()} check finished in {report.seconds:.1f}s, "
+          f"{len(report.issues)} issue(s)")
+    return 1 if any(not issue.repaired for issue in report.issues) else 0
+
+
+def cmd_regen_receipts(app, options, task):
+    conn = app.db.connect()
+    try:
+        # Running totals give each receipt the balance it showed when issued
+        rows = conn.execute('''
+            SELECT p.receipt_number, p.payment_date, p.amount, p.payment_note,
+                   s.reg_number, s.name, s.programme, s.programme_fee,
+                   SUM(p.amount) OVER (PARTITION BY p.reg_number
+                                       ORDER BY p.payment_date, p.payment_id)
+            FROM payments p
+            JOIN students s ON s.reg_number = p.reg_number
+            WHERE p.receipt_number IS NOT NULL
+              AND (? IS NULL OR p.reg_number = ?)
+            ORDER BY p.payment_id
+        ''', [options.reg_number] * 2).fetchall()
+    finally:
+        conn.close()
+    
+    generator = app.db.receipt_generator
+    written = failed = 0
+    for done, (receipt_number, payment_date, amount, note, reg_number, name, programme,
+               fee, total_paid) in enumerate(rows):
+        task.report(done, len(rows), "Regenerating receipts...")
+        path = os.path.join(generator.receipts_path, f"receipt_{receipt_number}.pdf")
+        if not options.all and os.path.exists(path):
+            continue
+        try:
+            generator.generate_receipt({
+                'receipt_number': receipt_number,
+                'payment_date': str(payment_date),
+                'amount': float(amount),
+                'total_paid': float(total_paid),
+                'balance': float((fee or 0) - total_paid),
+                'payment_note': note or ''
+            }, {
+                'reg_number': reg_number,
+                'name': name,
+                'programme': programme,
+                'programme_fee': float(fee or 0)
+            })
+            written += 1
+        except Exception as e:
+            print(f"Could not write {receipt_number}: {e}", file=sys.stderr)
+            failed += 1
+    
+    print(f"Wrote {written} receipts" + (f", {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m impactech",
+                                     description="Impactech batch jobs, without the desktop app")
+    parser.add_argument('--app-path', help="Folder holding impactech.db (default: ~/Documents/Impactech)")
+    parser.add_argument('--quiet', action='store_true', help="No progress output")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    export = commands.add_parser('export', help="Write a flat students, payments or notifications file")
+    export.add_argument('extract', choices=['students', 'payments', 'notifications'])
+    export.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    export.add_argument('--gzip', action='store_true', help="Compress (gzip CSV, zstd Parquet)")
+    export.add_argument('--output', help="Destination file (default: exports folder)")
+    export.set_defaults(run=cmd_export)
+    
+    report = commands.add_parser('report', help="Write the XLSX report pack")
+    report.add_argument('--output', help="Destination workbook (default: exports folder)")
+    report.add_argument('--sheets', nargs='+', help="Only these sheets")
+    report.add_argument('--no-charts', action='store_true')
+    report.add_argument('--summary', action='store_true', help="Print the financial summary instead")
+    report.set_defaults(run=cmd_report)
+    
+    remind = commands.add_parser('remind', help="Send payment reminders and progress updates")
+    which = remind.add_mutually_exclusive_group()
+    which.add_argument('--payments-only', action='store_true')
+    which.add_argument('--progress-only', action='store_true')
+    remind.set_defaults(run=cmd_remind)
+    
+    backup = commands.add_parser('backup', help="Take a verified backup")
+    backup.add_argument('--dest', help="Backup folder (default: from settings)")
+    backup.add_argument('--keep', type=int, help="Backups to keep (default: from settings)")
+    mode = backup.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', dest='incremental', action='store_true', default=None)
+    mode.add_argument('--full', dest='incremental', action='store_false')
+    backup.add_argument('--if-due', type=int, metavar='DAYS',
+                        help="Only back up if the last backup is at least this old")
+    backup.set_defaults(run=cmd_backup)
+    
+    load = commands.add_parser('import', help="Add students or payments from a CSV file")
+    load.add_argument('kind', choices=['students', 'payments'])
+    load.add_argument('file', help="CSV file (.csv or .csv.gz) with a header row")
+    load.set_defaults(run=cmd_import)
+    
+    verify = commands.add_parser('verify', help="Check database integrity")
+    verify.add_argument('--full', action='store_true', help="Check everything, not just recent changes")
+    verify.add_argument('--repair', action='store_true', help="Fix what can be fixed safely")
+    verify.set_defaults(run=cmd_verify)
+    
+    receipts = commands.add_parser('regen-receipts', help="Rebuild missing receipt PDFs")
+    receipts.add_argument('--all', action='store_true', help="Rebuild every receipt, not just missing ones")
+    receipts.add_argument('--reg-number', help="Only this student's receipts")
+    receipts.set_defaults(run=cmd_regen_receipts)
+    
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    
+    app_path = options.app_path
+    if app_path is None:
+        from utils.folder_setup import create_app_folders
+        with contextlib.redirect_stdout(sys.stderr):
+            app_path = create_app_folders()
+    
+    # Setup chatter (folder checks, migrations) stays off stdout, which
+    # carries only the command's own output
+    with contextlib.redirect_stdout(sys.stderr):
+        app = Headless(app_path)
+    
+    task = ConsoleTask(options.quiet)
+    try:
+        return options.run(app, options, task)
+    finally:
+        task.finish()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
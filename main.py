@@ -1,28 +1,53 @@
+import sys
+
+# Install the import timer before anything else is loaded
+if "--profile-startup" in sys.argv:
+    from utils.startup_profiler import start_profiling
+    start_profiling()
+
 import tkinter as tk
 from tkinter import ttk
 from utils.folder_setup import create_app_folders, reset_database
+from utils.startup_profiler import startup_phase
 from database.db_setup import Database
 from pages.home import HomePage
-from pages.registration import RegistrationDialog
-from pages.student_list import StudentListPage
-from pages.student_profile import StudentProfileDialog
-from pages.payment_history import PaymentHistoryPage
-from pages.programmes import ProgrammesPage
-import os
+import importlib.util
+from datetime import datetime, timedelta
 from tkinter import messagebox
 from utils.notifications import NotificationSystem
-import sqlite3
+from utils.tasks import TaskRunner, BusyIndicator
+from utils.settings import load_settings, save_settings, get_setting
+from utils.report_charts import ChartCache
+from database.change_watcher import ChangeWatcher
+
+# Page modules are imported on first navigation so that reportlab,
+# tkcalendar, pandas and matplotlib stay off the startup path.
+
+# Automatic backups are checked shortly after startup, then hourly
+AUTO_BACKUP_DELAY = 60 * 1000
+AUTO_BACKUP_INTERVAL = 60 * 60 * 1000
+
+# Incremental integrity check shortly after startup, then daily
+INTEGRITY_CHECK_DELAY = 2 * 60 * 1000
+INTEGRITY_CHECK_INTERVAL = 24 * 60 * 60 * 1000
+
+# Payment reminders and progress updates go out weekly, counted from the last
+# run saved in settings, so daily restarts do not postpone them
+NOTIFICATION_DELAY = 3 * 60 * 1000
+NOTIFICATION_INTERVAL = 7 * 24 * 60 * 60 * 1000
+
+# Multi-desk sync starts shortly after startup, then every sync_interval minutes
+SYNC_DELAY = 30 * 1000
 
 class ImpactechApp:
     def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("Impactech Academy")
-        self.root.geometry("1200x800")
+        with startup_phase("Tk root window"):
+            self.root = tk.Tk()
+            self.root.title("Impactech Academy")
+            self.root.geometry("1200x800")
         
-        # Check for matplotlib
-        try:
-            import matplotlib
-        except ImportError:
+        # Check for matplotlib without paying for the import
+        if importlib.util.find_spec("matplotlib") is None:
             messagebox.showinfo(
                 "Optional Dependency Missing",
                 "For better visualizations, install matplotlib:\n"
@@ -30,22 +55,56 @@ class ImpactechApp:
             )
         
         # Setup folders and database
-        self.app_path = create_app_folders()
-        self.db = Database(self.app_path)
+        with startup_phase("App folders"):
+            self.app_path = create_app_folders()
+        with startup_phase("Database"):
+            self.db = Database(self.app_path)
         
         # Configure styles
-        self.setup_styles()
+        with startup_phase("Styles"):
+            self.setup_styles()
         
         # Create main container
         self.main_container = ttk.Frame(self.root)
         self.main_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
+        # Background work (exports, charts, PDFs) and the strip showing its progress
+        self.tasks = TaskRunner(self.root)
+        self.busy_indicator = BusyIndicator(self.root, self.tasks, before=self.main_container)
+        
+        # Rendered report charts, kept while the data behind them is unchanged
+        self.chart_cache = ChartCache()
+        
+        # Notice writes from other windows and other front-desk instances
+        self.changes = ChangeWatcher(self.db.db_path)
+        self.changes.subscribe(('students', 'payments', 'programmes'), self.on_data_changed)
+        self.changes.start(self.root)
+        
         # Initialize homepage
         self.current_page = None
-        self.show_home_page()
+        with startup_phase("Home page"):
+            self.show_home_page()
         
         # Initialize Notification System
         self.notification_system = NotificationSystem(self)
+        self.root.after(NOTIFICATION_DELAY, self.check_notifications)
+        
+        # Scheduled backups; the first check waits until startup has settled
+        self.backup_task = None
+        self.root.after(AUTO_BACKUP_DELAY, self.check_auto_backup)
+        self.root.after(INTEGRITY_CHECK_DELAY, self.check_integrity)
+        
+        # Sync with the other front desks, if this desk is set up for it
+        self.sync_task = None
+        self.sync_server = None
+        self.start_sync_server()
+        self.root.after(SYNC_DELAY, self.check_sync)
+    
+    def on_data_changed(self, tables):
+        """Drop cached aggregates when another connection has written"""
+        self.db.invalidate_caches()
+        if 'programmes' in tables:
+            self.db.programmes.invalidate()
     
     def setup_styles(self):
         style = ttk.Style()
@@ -71,17 +130,133 @@ class ImpactechApp:
         style.configure("Subtitle.TLabel",
                        font=("Helvetica", 16))
                        
+    def backup_engine(self, backup_dir=None, keep=None, incremental=None):
+        """Backup engine for the configured (or given) location and retention"""
+        from database.backup import BackupEngine
+        return BackupEngine.configured(self.app_path, self.db, backup_dir, keep, incremental)
+    
+    def start_backup(self, backup_dir=None, keep=None, incremental=None,
+                     on_done=None, on_error=None):
+        """
+        Take a backup in the background
+        
+        Returns:
+            bool: False if a backup is already running
+        """
+        if self.backup_task is not None and not self.backup_task.future.done():
+            return False
+        
+        engine = self.backup_engine(backup_dir, keep, incremental)
+        self.backup_task = self.tasks.submit(
+            engine.backup,
+            message="Backing up database...",
+            with_task=True,
+            on_done=on_done,
+            on_error=on_error or (lambda e: print(f"Error backing up database: {e}"))
+        )
+        return True
+    
+    def check_auto_backup(self):
+        """Take a scheduled backup when one is due, then check again later"""
+        settings = load_settings(self.app_path)
+        if get_setting(settings, 'auto_backup'):
+            try:
+                frequency = int(get_setting(settings, 'backup_frequency'))
+            except ValueError:
+                frequency = 7
+            
+            if self.backup_engine().is_due(frequency):
+                self.start_backup(on_done=lambda archive: print(f"Automatic backup saved: {archive}"))
+        
+        self.root.after(AUTO_BACKUP_INTERVAL, self.check_auto_backup)
+    
+    def check_integrity(self):
+        """Run the integrity check quietly in the background, then again tomorrow"""
+        self.tasks.submit(self.db.check_and_fix_database, message=None, with_task=True,
+                          on_done=self.integrity_checked)
+        self.root.after(INTEGRITY_CHECK_INTERVAL, self.check_integrity)
+    
+    def integrity_checked(self, report):
+        if report is None:
+            return
+        for issue in report.issues:
+            action = "repaired" if issue.repaired else "needs attention"
+            print(f"Integrity check ({report.mode}): {issue.count} {issue.detail} - {action}")
+    
+    def sync_engine(self):
+        from database.sync import SyncEngine
+        settings = load_settings(self.app_path)
+        return SyncEngine(self.db.db_path, key=get_setting(settings, 'sync_key'))
+    
+    def start_sync_server(self):
+        """Accept syncs from other desks when a sync port is configured"""
+        from database.sync import SyncError
+        if self.sync_server is not None:
+            self.sync_server.shutdown()
+            self.sync_server.server_close()
+            self.sync_server = None
+        
+        settings = load_settings(self.app_path)
+        try:
+            port = int(get_setting(settings, 'sync_port') or 0)
+            engine = self.sync_engine()
+            if port and engine.prefix():
+                self.sync_server = engine.serve(port, get_setting(settings, 'sync_host') or '127.0.0.1')
+        except (SyncError, OSError, ValueError) as e:
+            print(f"Error starting sync server: {e}")
+    
+    def start_sync(self, folder=None, peers=None, on_done=None, on_error=None):
+        """
+        Sync with the shared folder and peer desks (configured, or given) in the background
+        
+        Returns:
+            bool: False if a sync is already running or none is configured
+        """
+        if self.sync_task is not None and not self.sync_task.future.done():
+            return False
+        
+        settings = load_settings(self.app_path)
+        if folder is None:
+            folder = get_setting(settings, 'sync_folder')
+        if peers is None:
+            peers = get_setting(settings, 'sync_peers')
+        peers = [peer for peer in peers.split(',') if peer.strip()]
+        engine = self.sync_engine()
+        if not (folder or peers) or not engine.prefix():
+            return False
+        
+        self.sync_task = self.tasks.submit(
+            engine.sync, folder, peers,
+            message=None,
+            with_task=True,
+            on_done=on_done,
+            on_error=on_error or (lambda e: print(f"Error syncing: {e}"))
+        )
+        return True
+    
+    def check_sync(self):
+        """Sync quietly in the background, then again after sync_interval minutes"""
+        self.start_sync()
+        settings = load_settings(self.app_path)
+        try:
+            minutes = max(1, int(get_setting(settings, 'sync_interval')))
+        except ValueError:
+            minutes = 5
+        self.root.after(minutes * 60 * 1000, self.check_sync)
+    
     def show_home_page(self):
         if self.current_page:
             self.current_page.destroy()
         self.current_page = HomePage(self.main_container, self)
         
     def show_registration_page(self):
+        from pages.registration import RegistrationDialog
         RegistrationDialog(self.root, self)
     
     def show_student_list_page(self):
         if self.current_page:
             self.current_page.destroy()
+        from pages.student_list import StudentListPage
         self.current_page = StudentListPage(self.main_container, self)
     
     def show_student_profile(self, reg_number):
@@ -92,12 +267,14 @@ class ImpactechApp:
     def show_payment_history(self):
         if self.current_page:
             self.current_page.destroy()
+        from pages.payment_history import PaymentHistoryPage
         self.current_page = PaymentHistoryPage(self.main_container, self)
     
     def show_programmes_page(self):
         """Show programmes page"""
         if self.current_page:
             self.current_page.destroy()
+        from pages.programmes import ProgrammesPage
         self.current_page = ProgrammesPage(self.main_container, self)
     
     def show_settings_page(self):
@@ -124,89 +301,37 @@ class ImpactechApp:
         from pages.notifications import NotificationsPage
         NotificationsPage(self.root, self)
     
-    def send_payment_reminder_notifications(self):
-        """
-        Send payment reminder notifications to students with outstanding balances
-        """
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            # Find students with outstanding balances
-            cursor.execute('''
-                SELECT 
-                    s.reg_number,
-                    s.name,
-                    s.programme_fee,
-                    COALESCE(SUM(p.amount), 0) as total_paid
-                FROM students s
-                LEFT JOIN payments p ON s.reg_number = p.reg_number
-                GROUP BY s.reg_number
-                HAVING total_paid < s.programme_fee
-            ''')
-            
-            students_with_balance = cursor.fetchall()
-            
-            # Send notifications
-            for reg_number, name, total_fee, paid_amount in students_with_balance:
-                self.notification_system.send_payment_reminder(reg_number)
-            
-            return len(students_with_balance)
-        
-        except sqlite3.Error as e:
-            print(f"Error sending payment reminders: {e}")
-            return 0
-        
-        finally:
-            conn.close()
-    
-    def send_course_progress_notifications(self):
-        """
-        Send course progress notifications to all active students
-        """
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        
+    def check_notifications(self):
+        """Send the weekly reminders and progress updates when due, then check again when next due"""
+        settings = load_settings(self.app_path)
         try:
-            # Find active students
-            cursor.execute('''
-                SELECT reg_number
-                FROM students
-                WHERE status = 'Active' OR status IS NULL
-            ''')
-            
-            active_students = cursor.fetchall()
-            
-            # Send notifications
-            for (reg_number,) in active_students:
-                self.notification_system.send_course_progress_notification(reg_number)
-            
-            return len(active_students)
-        
-        except sqlite3.Error as e:
-            print(f"Error sending course progress notifications: {e}")
-            return 0
+            last_run = datetime.fromisoformat(get_setting(settings, 'notifications_last_run'))
+        except (TypeError, ValueError):
+            last_run = None
         
-        finally:
-            conn.close()
+        now = datetime.now()
+        if last_run is None or now - last_run >= timedelta(milliseconds=NOTIFICATION_INTERVAL):
+            # The run is only recorded once it has finished, so a failed or
+            # interrupted run is tried again at the next startup
+            self.tasks.submit(self.notification_system.send_periodic_notifications, message=None,
+                              on_done=lambda result: self.notifications_sent(now),
+                              on_error=lambda e: print(f"Error sending notifications: {e}"))
+            wait = NOTIFICATION_INTERVAL
+        else:
+            wait = NOTIFICATION_INTERVAL - (now - last_run) // timedelta(milliseconds=1)
+        self.root.after(max(NOTIFICATION_DELAY, wait), self.check_notifications)
     
-    def schedule_periodic_notifications(self):
-        """
-        Schedule periodic notifications
-        """
-        # Send payment reminders every 7 days
-        payment_reminders = self.send_payment_reminder_notifications()
-        print(f"Sent {payment_reminders} payment reminder notifications")
-        
-        # Send course progress notifications monthly
-        progress_notifications = self.send_course_progress_notifications()
-        print(f"Sent {progress_notifications} course progress notifications")
+    def notifications_sent(self, started):
+        settings = load_settings(self.app_path)
+        settings['notifications_last_run'] = started.isoformat(timespec='seconds')
+        save_settings(self.app_path, settings)
     
     def run(self):
         self.root.mainloop()
-        
-        # Schedule periodic notifications
-        self.root.after(7 * 24 * 60 * 60 * 1000, self.schedule_periodic_notifications)  # 7 days
+        self.changes.close()
+        if self.sync_server is not None:
+            self.sync_server.shutdown()
+        self.tasks.shutdown()
 
 if __name__ == "__main__":
     # Uncomment the following line to reset the database
@@ -214,4 +339,19 @@ if __name__ == "__main__":
     # reset_database()
     
     app = ImpactechApp()
+    
+    # --profile-startup prints import and init timings once the window is drawn;
+    # adding --startup-check exits straight away, non-zero if over budget
+    if "--profile-startup" in sys.argv:
+        from utils import startup_profiler
+        app.root.update()
+        profiler = startup_profiler.profiler
+        profiler.mark_first_window()
+        profiler.uninstall()
+        print(profiler.report())
+        
+        if "--startup-check" in sys.argv:
+            app.root.destroy()
+            sys.exit(0 if profiler.within_budget() else 1)
+    
     app.run() 
\ No newline at end of file
@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from utils.constants import PROGRAMMES, SCHEDULES, STUDENT_STATUSES
+from utils.constants import SCHEDULES, STUDENT_STATUSES
 from datetime import datetime
 import os
 
@@ -35,7 +35,7 @@ class EditStudentDialog(tk.Toplevel):
             ("Name:", "name", "entry"),
             ("Age:", "age", "entry"),
             ("Gender:", "gender", "combobox", ["Male", "Female"]),
-            ("Programme:", "programme", "combobox", PROGRAMMES),
+            ("Programme:", "programme", "combobox", self.app.db.programmes.names()),
             ("Duration:", "duration", "entry"),
             ("Schedule:", "schedule", "combobox", SCHEDULES),
             ("Start Date:", "start_date", "entry"),
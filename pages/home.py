@@ -1,11 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, StringVar
 from tkinter import messagebox
-from pages.registration import RegistrationDialog
 from datetime import datetime
 import sqlite3
 
 class HomePage(ttk.Frame):
+    # Entries fetched per "Load more" click
+    ACTIVITY_PAGE_SIZE = 5
+    
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
@@ -18,8 +20,16 @@ class HomePage(ttk.Frame):
         self.create_navigation_buttons()
         self.create_recent_activities()
         
-        # Auto refresh timer
-        self.after(300000, self.refresh_stats)  # Refresh every 5 minutes
+        # Re-query only when the tables behind each panel change
+        self.subscriptions = [
+            self.app.changes.subscribe(('students',), self.refresh_stats),
+            self.app.changes.subscribe(('students', 'payments'), self.refresh_activities)
+        ]
+    
+    def destroy(self):
+        for token in self.subscriptions:
+            self.app.changes.unsubscribe(token)
+        super().destroy()
     
     def create_header(self):
         # Header frame with gradient effect
@@ -59,13 +69,15 @@ class HomePage(ttk.Frame):
         
         # Statistics with icons and colors
         stats_data = [
-            ("👥 Total Students", stats['total_students'], "#1976D2"),
-            ("✅ Active", stats['active_students'], "#2E7D32"),
-            ("🎓 Graduated", stats['graduated_students'], "#1565C0"),
-            ("❌ Dropped Out", stats['dropouts'], "#C62828")
+            ("👥 Total Students", 'total_students', "#1976D2"),
+            ("✅ Active", 'active_students', "#2E7D32"),
+            ("🎓 Graduated", 'graduated_students', "#1565C0"),
+            ("❌ Dropped Out", 'dropouts', "#C62828")
         ]
         
-        for i, (label, value, color) in enumerate(stats_data):
+        # Value labels are kept so refreshes update them in place
+        self.stat_labels = {}
+        for i, (label, key, color) in enumerate(stats_data):
             stat_container = ttk.Frame(stats_frame)
             stat_container.grid(row=0, column=i, padx=10, pady=5, sticky="nsew")
             
@@ -73,10 +85,11 @@ class HomePage(ttk.Frame):
                      text=label,
                      font=("Helvetica", 10)).pack()
             
-            tk.Label(stat_container,
-                    text=str(value),
-                    font=("Helvetica", 16, "bold"),
-                    fg=color).pack()
+            self.stat_labels[key] = tk.Label(stat_container,
+                                             text=str(stats[key]),
+                                             font=("Helvetica", 16, "bold"),
+                                             fg=color)
+            self.stat_labels[key].pack()
     
     def create_search_section(self):
         # Modern search frame
@@ -143,17 +156,46 @@ class HomePage(ttk.Frame):
     
     def create_recent_activities(self):
         # Recent activities section
-        activities_frame = ttk.LabelFrame(self, text="Recent Activities", padding=15)
-        activities_frame.pack(fill=tk.X, padx=50, pady=(0, 20))
+        self.activities_frame = ttk.LabelFrame(self, text="Recent Activities", padding=15)
+        self.activities_frame.pack(fill=tk.X, padx=50, pady=(0, 20))
+        self.activity_labels = []
+        self.activities = []
+        
+        self.activity_list = ttk.Frame(self.activities_frame)
+        self.activity_list.pack(fill=tk.X)
+        
+        self.load_more_button = ttk.Button(self.activities_frame,
+                                         text="Load more",
+                                         command=self.load_more_activities)
         
-        # Get recent activities (last 5)
+        # First page of the feed, newest first
         activities = self.get_recent_activities()
+        self.show_activities(activities, has_more=len(activities) == self.ACTIVITY_PAGE_SIZE)
+    
+    def show_activities(self, activities, has_more=False):
+        """Update the activity lines in place, adding or removing labels as needed"""
+        self.activities = activities
+        lines = [self.format_activity(activity) for activity in activities]
+        if not lines:
+            lines = ["No recent activities to display"]
         
-        for activity in activities:
-            activity_label = ttk.Label(activities_frame,
-                                     text=activity,
+        while len(self.activity_labels) < len(lines):
+            activity_label = ttk.Label(self.activity_list,
                                      font=("Helvetica", 9))
             activity_label.pack(anchor="w", pady=2)
+            self.activity_labels.append(activity_label)
+        
+        while len(self.activity_labels) > len(lines):
+            self.activity_labels.pop().destroy()
+        
+        for activity_label, line in zip(self.activity_labels, lines):
+            if activity_label.cget("text") != line:
+                activity_label.config(text=line)
+        
+        if has_more:
+            self.load_more_button.pack(anchor="w", pady=(10, 0))
+        else:
+            self.load_more_button.pack_forget()
     
     def add_placeholder(self, entry, placeholder):
         def on_focus_in(event):
@@ -173,6 +215,7 @@ class HomePage(ttk.Frame):
     
     def navigate(self, command):
         if command == "register_student":
+            from pages.registration import RegistrationDialog
             RegistrationDialog(self, self.app)
         elif command == "view_students":
             self.app.show_student_list_page()
@@ -233,75 +276,77 @@ class HomePage(ttk.Frame):
         messagebox.showinfo("Reports", 
                           "Reports functionality will be implemented here")
     
-    def get_recent_activities(self):
-        """Get list of recent activities from database"""
-        conn = sqlite3.connect(self.app.db.db_path)
-        cursor = conn.cursor()
-        
-        activities = []
-        try:
-            # Get recent payments
-            cursor.execute('''
-                SELECT 
-                    s.name,
-                    p.amount,
-                    p.payment_date,
-                    'payment' as type
-                FROM payments p
-                JOIN students s ON p.reg_number = s.reg_number
-                ORDER BY p.payment_date DESC
-                LIMIT 3
-            ''')
-            
-            for row in cursor.fetchall():
-                name, amount, date, _ = row
-                formatted_date = datetime.strptime(date, '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y')
-                activities.append(f"💰 Payment of ₦{amount:,.2f} by {name} on {formatted_date}")
-            
-            # Get recent registrations
-            cursor.execute('''
-                SELECT 
-                    name,
-                    programme,
-                    registration_date
-                FROM students
-                ORDER BY registration_date DESC
-                LIMIT 3
-            ''')
-            
-            for row in cursor.fetchall():
-                name, programme, date = row
-                formatted_date = datetime.strptime(date, '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y')
-                activities.append(f"📝 {name} registered for {programme} on {formatted_date}")
-            
-            # Sort all activities by date (most recent first)
-            return sorted(activities, reverse=True)
-            
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return ["No recent activities to display"]
-            
-        finally:
-            conn.close()
+    def get_recent_activities(self, before=None, limit=None):
+        """Get a page of the activity feed, newest first"""
+        return self.app.db.get_recent_activity(before=before,
+                                               limit=limit or self.ACTIVITY_PAGE_SIZE)
     
-    def refresh_stats(self):
-        """Refresh statistics periodically"""
+    def format_activity(self, activity):
+        """Turn an activity_log entry into a line for the feed"""
+        name = activity['name'] or activity['reg_number']
+        occurred_at = str(activity['occurred_at'])
         try:
-            # Update statistics
-            stats = self.app.db.get_student_statistics()
-            
-            # Update date/time
-            current_time = datetime.now().strftime("%d %B, %Y")
-            
-            # Optional: Update UI elements if needed
-            # For example, update labels or counters
-            
-            # Schedule next refresh
-            self.after(300000, self.refresh_stats)  # Every 5 minutes
-            
-        except Exception as e:
-            print(f"Error refreshing stats: {e}")
-            # Optionally, add a fallback or error handling
-            # Schedule next attempt even if this one fails
-            self.after(300000, self.refresh_stats)
-    
\ No newline at end of file
+            date = datetime.strptime(occurred_at[:10], '%Y-%m-%d').strftime('%d/%m/%Y')
+        except ValueError:
+            date = occurred_at
+        
+        kind = activity['kind']
+        if kind == 'registration':
+            return f"📝 {name} registered for {activity['detail']} on {date}"
+        if kind == 'payment':
+            return f"💰 Payment of ₦{activity['amount']:,.2f} by {name} on {date}"
+        if kind == 'status_change':
+            return f"🔄 {name} marked as {activity['detail']} on {date}"
+        if kind == 'student_deleted':
+            return f"🗑️ {name} ({activity['reg_number']}) removed on {date}"
+        if kind == 'payment_deleted':
+            return f"🗑️ Payment of ₦{activity['amount']:,.2f} by {name} removed on {date}"
+        if kind == 'archived':
+            return f"📦 {name} moved to the archive on {date}"
+        if kind == 'restored':
+            return f"📤 {name} restored from the archive on {date}"
+        return f"{kind}: {name} on {date}"
+    
+    def load_more_activities(self):
+        """Append the next older page of the feed"""
+        if not self.activities:
+            return
+        last = self.activities[-1]
+        self.load_more_button.state(['disabled'])
+        self.app.tasks.submit(self.get_recent_activities,
+                              (last['occurred_at'], last['activity_id']),
+                              message=None,
+                              on_done=self.append_activities)
+    
+    def append_activities(self, activities):
+        if not self.winfo_exists():
+            return
+        self.load_more_button.state(['!disabled'])
+        self.show_activities(self.activities + activities,
+                             has_more=len(activities) == self.ACTIVITY_PAGE_SIZE)
+    
+    def refresh_stats(self, tables=None):
+        """Re-read the student counters after the students table changed"""
+        self.app.tasks.submit(self.app.db.get_student_statistics,
+                              message=None,
+                              on_done=self.update_stats)
+    
+    def update_stats(self, stats):
+        if not self.winfo_exists():
+            return
+        for key, label in self.stat_labels.items():
+            value = str(stats[key])
+            if label.cget("text") != value:
+                label.config(text=value)
+    
+    def refresh_activities(self, tables=None):
+        """Re-read the feed after a change, keeping as many entries as are shown"""
+        limit = max(self.ACTIVITY_PAGE_SIZE, len(self.activities))
+        self.app.tasks.submit(self.get_recent_activities,
+                              limit=limit,
+                              message=None,
+                              on_done=lambda activities: self.update_activities(activities, limit))
+    
+    def update_activities(self, activities, limit):
+        if self.winfo_exists():
+            self.show_activities(activities, has_more=len(activities) == limit)
@@ -176,10 +176,9 @@ class NotificationsPage(ttk.Frame):
         # Programme selection
         ttk.Label(main_frame, text="Select Programme (Optional):").pack(anchor="w")
         programme_var = tk.StringVar()
-        from utils.constants import PROGRAMMES
         programme_combo = ttk.Combobox(main_frame, 
                                       textvariable=programme_var,
-                                      values=["All"] + PROGRAMMES,
+                                      values=["All"] + self.app.db.programmes.names(),
                                       state="readonly")
         programme_combo.set("All")
         programme_combo.pack(fill=tk.X, pady=(0, 10))
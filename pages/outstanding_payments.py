@@ -1,10 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from utils.constants import PROGRAMMES
 import platform
 import os
 import subprocess
 from datetime import datetime
+from database.paging import ListPageSource, typed_key, NUMBER
+from utils.virtual_treeview import VirtualTreeview
+from utils.live_filter import LiveFilterController
 
 class OutstandingPaymentsDialog(tk.Toplevel):
     def __init__(self, parent, app):
@@ -53,11 +55,24 @@ class OutstandingPaymentsDialog(tk.Toplevel):
         self.programme_var = tk.StringVar(value="All")
         programme_combo = ttk.Combobox(filter_frame,
                                      textvariable=self.programme_var,
-                                     values=["All"] + PROGRAMMES,
+                                     values=["All"] + self.app.db.programmes.names(),
                                      state="readonly",
                                      width=30)
         programme_combo.pack(side=tk.LEFT, padx=(0, 10))
-        programme_combo.bind("<<ComboboxSelected>>", self.apply_filter)
+        
+        # Search box
+        ttk.Label(filter_frame, text="Search:").pack(side=tk.LEFT, padx=(0, 5))
+        self.search_var = tk.StringVar()
+        ttk.Entry(filter_frame,
+                  textvariable=self.search_var,
+                  width=20).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Results update as the filters change; queries run off the Tk thread
+        self.live_filter = LiveFilterController(self,
+                                                params=self.get_filter_params,
+                                                query=self.search_outstanding,
+                                                on_result=self.show_search_results)
+        self.live_filter.watch(self.programme_var, self.search_var)
         
         # Right side - Action buttons
         button_frame = ttk.Frame(controls_frame)
@@ -73,12 +88,13 @@ class OutstandingPaymentsDialog(tk.Toplevel):
                   text="Export to Excel",
                   command=self.export_data).pack(side=tk.LEFT, padx=5)
         
-        # Create Treeview
+        # Create virtual Treeview; only the visible rows are materialised
         columns = ("name", "programme", "total_fee", "paid", "balance")
-        self.tree = ttk.Treeview(parent,
-                                columns=columns,
-                                show="headings",
-                                style="PaymentHistory.Treeview")
+        self.tree = VirtualTreeview(parent,
+                                   columns=columns,
+                                   formatter=self.format_student_row,
+                                   key=lambda student: student['reg_number'],
+                                   style="PaymentHistory.Treeview")
         
         # Configure columns
         column_configs = {
@@ -121,99 +137,117 @@ class OutstandingPaymentsDialog(tk.Toplevel):
         
         # Add alternating row colors
         self.tree.tag_configure('oddrow', background='#F5F5F5')
+        self.tree.enable_sorting()
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(parent,
-                                orient=tk.VERTICAL,
-                                command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        
-        # Pack widgets
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Pack widget (includes its own vertical scrollbar)
+        self.tree.pack(fill=tk.BOTH, expand=True)
         
         # Load data
         self.load_outstanding_payments()
         
     def apply_filter(self, event=None):
-        self.load_outstanding_payments()
-        
+        self.live_filter.run_now()
+        
+    def format_student_row(self, student):
+        """Format an outstanding balance record for display"""
+        return (
+            student['name'],
+            student['programme'],
+            f"₦{student['programme_fee']:,.2f}",
+            f"₦{student['amount_paid']:,.2f}",
+            f"₦{student['balance']:,.2f}"
+        )
+    
     def load_outstanding_payments(self):
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         # Get outstanding payments from database
-        students = self.app.db.get_outstanding_payments()
-        
-        # Apply programme filter
+        students = self.app.db.get_outstanding_payments(**self.get_filter_params())
+        self.tree.set_source(self.make_source(students))
+    
+    def make_source(self, students):
+        return ListPageSource(students, sort_keys={
+            'name': typed_key('name'),
+            'programme': typed_key('programme'),
+            'total_fee': typed_key('programme_fee', NUMBER),
+            'paid': typed_key('amount_paid', NUMBER),
+            'balance': typed_key('balance', NUMBER)
+        })
+    
+    def get_filter_params(self):
+        """Read the filter controls (Tk thread)"""
         programme_filter = self.programme_var.get()
-        if programme_filter != "All":
-            students = [s for s in students if s['programme'] == programme_filter]
-        
-        # Add to treeview with alternating colors
-        for i, student in enumerate(students):
-            tags = ('oddrow',) if i % 2 else ()
-            
-            values = (
-                student['name'],
-                student['programme'],
-                f"₦{student['programme_fee']:,.2f}",
-                f"₦{student['amount_paid']:,.2f}",
-                f"₦{student['balance']:,.2f}"
-            )
-            
-            self.tree.insert("", "end", values=values, tags=tags)
+        search_term = self.search_var.get().strip()
+        
+        return {
+            'programme_id': (self.app.db.programmes.get_id(programme_filter)
+                             if programme_filter != "All" else None),
+            'search_term': search_term or None
+        }
+    
+    def search_outstanding(self, params, token):
+        """Query and sort the filtered balances (worker thread)"""
+        source = self.make_source(self.app.db.get_outstanding_payments(**params))
+        return source, self.tree.preload(source)
+    
+    def show_search_results(self, result):
+        source, preloaded = result
+        self.tree.set_source(source, preloaded=preloaded)
     
     def export_data(self):
         """Export outstanding payments to Excel"""
-        try:
-            # Get filtered data
-            data = []
-            for item in self.tree.get_children():
-                values = self.tree.item(item)['values']
-                data.append({
-                    'Student Name': values[0],
-                    'Programme': values[1],
-                    'Programme Fee': values[2],
-                    'Amount Paid': values[3],
-                    'Balance': values[4]
-                })
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            programme = self.programme_var.get()
-            filename = f"outstanding_payments_{programme}_{timestamp}.xlsx"
-            
-            # Export to Excel using pandas
-            import pandas as pd
-            df = pd.DataFrame(data)
-            
-            # Create exports directory if it doesn't exist
-            export_dir = os.path.join(self.app.app_path, "exports")
-            os.makedirs(export_dir, exist_ok=True)
-            
-            # Save file
-            filepath = os.path.join(export_dir, filename)
-            df.to_excel(filepath, index=False)
-            
-            messagebox.showinfo("Success", 
-                              f"Outstanding payments exported successfully to:\n{filepath}")
-            
-            # Open the exported file
-            if platform.system() == 'Darwin':  # macOS
-                subprocess.run(['open', filepath])
-            elif platform.system() == 'Windows':
-                os.startfile(filepath)
-            else:  # Linux
-                subprocess.run(['xdg-open', filepath])
-                
-        except ImportError:
+        # Get filtered data (already in memory)
+        data = []
+        for student in self.tree.iter_rows():
+            data.append({
+                'Student Name': student['name'],
+                'Programme': student['programme'],
+                'Programme Fee': student['programme_fee'],
+                'Amount Paid': student['amount_paid'],
+                'Balance': student['balance']
+            })
+        
+        # Generate filename with timestamp
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        programme = self.programme_var.get()
+        filename = f"outstanding_payments_{programme}_{timestamp}.xlsx"
+        filepath = os.path.join(self.app.app_path, "exports", filename)
+        
+        self.app.tasks.submit(self.write_export, data, filepath,
+                              message="Exporting outstanding payments...",
+                              on_done=self.export_done,
+                              on_error=self.export_failed)
+    
+    def write_export(self, data, filepath):
+        """Write the export workbook (runs on a worker thread)"""
+        import pandas as pd
+        df = pd.DataFrame(data)
+        
+        # Create exports directory if it doesn't exist
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        # Save file
+        df.to_excel(filepath, index=False)
+        return filepath
+    
+    def export_done(self, filepath):
+        messagebox.showinfo("Success", 
+                          f"Outstanding payments exported successfully to:\n{filepath}")
+        
+        # Open the exported file
+        if platform.system() == 'Darwin':  # macOS
+            subprocess.run(['open', filepath])
+        elif platform.system() == 'Windows':
+            os.startfile(filepath)
+        else:  # Linux
+            subprocess.run(['xdg-open', filepath])
+    
+    def export_failed(self, error):
+        if isinstance(error, ImportError):
             messagebox.showerror("Error", "Please install pandas: pip install pandas")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export data: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to export data: {str(error)}")
     
     def clear_filter(self):
-        """Clear the programme filter"""
+        """Clear the programme and search filters"""
         self.programme_var.set("All")
-        self.load_outstanding_payments()
\ No newline at end of file
+        self.search_var.set("")
+        self.apply_filter()
\ No newline at end of file
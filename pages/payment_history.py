@@ -1,10 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-from utils.constants import PROGRAMMES
 import platform
 import os
 import subprocess
+from utils.virtual_treeview import VirtualTreeview
+from utils.live_filter import LiveFilterController
 
 class PaymentHistoryPage(ttk.Frame):
     def __init__(self, parent, app):
@@ -163,7 +164,7 @@ class PaymentHistoryPage(ttk.Frame):
         self.programme_var = tk.StringVar(value="All")
         programme_combo = ttk.Combobox(filter_frame,
                                      textvariable=self.programme_var,
-                                     values=["All"] + PROGRAMMES,
+                                     values=["All"] + self.app.db.programmes.names(),
                                      state="readonly",
                                      width=30)
         programme_combo.pack(side=tk.LEFT, padx=(0, 20))
@@ -176,6 +177,15 @@ class PaymentHistoryPage(ttk.Frame):
                                width=30)
         search_entry.pack(side=tk.LEFT, padx=(0, 5))
         
+        # Results update as the filters change; queries run off the Tk thread
+        self.live_filter = LiveFilterController(self,
+                                                params=self.get_filter_params,
+                                                query=self.search_payments,
+                                                on_result=self.show_search_results)
+        self.live_filter.watch(self.programme_var, self.search_var)
+        self.from_date.bind("<KeyRelease>", self.live_filter.schedule)
+        self.to_date.bind("<KeyRelease>", self.live_filter.schedule)
+        
         # Buttons frame
         button_frame = ttk.Frame(filters_frame)
         button_frame.pack(side=tk.RIGHT)
@@ -201,11 +211,13 @@ class PaymentHistoryPage(ttk.Frame):
             from_date = None
             to_date = None
             if self.from_date.get() and self.from_date.get() != "YYYY-MM-DD":
-                from_date = datetime.strptime(self.from_date.get(), '%Y-%m-%d')
+                from_date = self.from_date.get()
+                datetime.strptime(from_date, '%Y-%m-%d')
             if self.to_date.get() and self.to_date.get() != "YYYY-MM-DD":
-                to_date = datetime.strptime(self.to_date.get(), '%Y-%m-%d')
+                to_date = self.to_date.get()
+                datetime.strptime(to_date, '%Y-%m-%d')
             
-            self.load_payments(from_date, to_date)
+            self.live_filter.run_now()
         except ValueError:
             messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD")
     
@@ -216,29 +228,64 @@ class PaymentHistoryPage(ttk.Frame):
         self.to_date.insert(0, "YYYY-MM-DD")
         self.programme_var.set("All")
         self.search_var.set("")
-        self.load_payments()
+        self.live_filter.run_now()
     
-    def export_payments(self):
+    def read_date(self, entry):
+        """Return the entry's date as YYYY-MM-DD, or None while it is blank or incomplete"""
+        value = entry.get().strip()
         try:
-            filepath = self.app.db.export_payments_to_excel(
-                programme=self.programme_var.get() if self.programme_var.get() != "All" else None,
-                search_term=self.search_var.get(),
-                from_date=self.from_date.get() if self.from_date.get() != "YYYY-MM-DD" else None,
-                to_date=self.to_date.get() if self.to_date.get() != "YYYY-MM-DD" else None
-            )
-            
-            messagebox.showinfo("Success", f"Payments exported successfully to:\n{filepath}")
-            
-            # Open the exported file
-            if platform.system() == 'Darwin':  # macOS
-                subprocess.run(['open', filepath])
-            elif platform.system() == 'Windows':
-                os.startfile(filepath)
-            else:  # Linux
-                subprocess.run(['xdg-open', filepath])
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export payments: {str(e)}")
+            datetime.strptime(value, '%Y-%m-%d')
+            return value
+        except ValueError:
+            return None
+    
+    def get_filter_params(self):
+        """Read the filter controls (Tk thread)"""
+        programme_filter = self.programme_var.get()
+        search_term = self.search_var.get().strip()
+        
+        return {
+            'programme_id': (self.app.db.programmes.get_id(programme_filter)
+                             if programme_filter != "All" else None),
+            'search_term': search_term or None,
+            'from_date': self.read_date(self.from_date),
+            'to_date': self.read_date(self.to_date)
+        }
+    
+    def search_payments(self, params, token):
+        """Run the filtered query and read its first page (worker thread)"""
+        source = self.app.db.get_payment_page_source(**params)
+        token.on_cancel(source.interrupt)
+        return source, self.payment_tree.preload(source)
+    
+    def show_search_results(self, result):
+        source, preloaded = result
+        self.payment_tree.set_source(source, preloaded=preloaded)
+    
+    def export_payments(self):
+        # Read the filters here; the export itself runs on a worker thread
+        self.app.tasks.submit(
+            self.app.db.export_payments_to_excel,
+            programme=self.programme_var.get() if self.programme_var.get() != "All" else None,
+            search_term=self.search_var.get(),
+            from_date=self.from_date.get() if self.from_date.get() != "YYYY-MM-DD" else None,
+            to_date=self.to_date.get() if self.to_date.get() != "YYYY-MM-DD" else None,
+            message="Exporting payments...",
+            on_done=self.export_done,
+            on_error=lambda e: messagebox.showerror(
+                "Error", f"Failed to export payments: {str(e)}")
+        )
+    
+    def export_done(self, filepath):
+        messagebox.showinfo("Success", f"Payments exported successfully to:\n{filepath}")
+        
+        # Open the exported file
+        if platform.system() == 'Darwin':  # macOS
+            subprocess.run(['open', filepath])
+        elif platform.system() == 'Windows':
+            os.startfile(filepath)
+        else:  # Linux
+            subprocess.run(['xdg-open', filepath])
     
     def create_payment_table(self):
         # Create Treeview with style
@@ -251,12 +298,13 @@ class PaymentHistoryPage(ttk.Frame):
                        font=("Helvetica", 10),
                        rowheight=30)
         
-        # Create Treeview
+        # Create virtual Treeview; only the visible rows are materialised
         columns = ("date", "student", "amount", "receipt")
-        self.payment_tree = ttk.Treeview(self,
-                                       columns=columns,
-                                       show="headings",
-                                       style="PaymentHistory.Treeview")
+        self.payment_tree = VirtualTreeview(self,
+                                          columns=columns,
+                                          formatter=self.format_payment_row,
+                                          key=lambda payment: payment['payment_id'],
+                                          style="PaymentHistory.Treeview")
         
         # Configure columns
         column_configs = {
@@ -295,73 +343,40 @@ class PaymentHistoryPage(ttk.Frame):
         
         # Add alternating row colors
         self.payment_tree.tag_configure('oddrow', background='#F5F5F5')
+        self.payment_tree.enable_sorting()
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(self,
-                                orient=tk.VERTICAL,
-                                command=self.payment_tree.yview)
-        self.payment_tree.configure(yscrollcommand=scrollbar.set)
-        
-        # Pack widgets
-        self.payment_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=20)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Pack widget (includes its own vertical scrollbar)
+        self.payment_tree.pack(fill=tk.BOTH, expand=True, padx=20)
         
-        # Bind double-click to view receipt
-        self.payment_tree.bind("<Double-1>", self.view_receipt)
+        # Double-click to view receipt
+        self.payment_tree.on_row_activated(self.view_receipt)
+    
+    def format_payment_row(self, payment):
+        """Format a payment record for display"""
+        return (
+            datetime.strptime(payment['payment_date'], 
+                            '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
+            payment['student_name'],
+            f"₦{payment['amount']:,.2f}",
+            payment['receipt_number']
+        )
     
     def load_payments(self, from_date=None, to_date=None):
-        # Clear existing items
-        for item in self.payment_tree.get_children():
-            self.payment_tree.delete(item)
-        
-        # Get all payments
-        payments = self.app.db.get_all_payments()
-        
-        # Apply filters
+        # Filters are applied in SQL so only the visible page is fetched
         programme_filter = self.programme_var.get()
-        search_term = self.search_var.get().lower()
-        
-        filtered_payments = []
-        for payment in payments:
-            # Programme filter
-            if programme_filter != "All" and payment['programme'] != programme_filter:
-                continue
-            
-            # Search filter
-            if search_term and search_term not in payment['student_name'].lower() and \
-               search_term not in payment.get('programme', '').lower():
-                continue
-            
-            # Date filter
-            payment_date = datetime.strptime(payment['payment_date'], '%Y-%m-%d %H:%M:%S')
-            if from_date and payment_date.date() < datetime.strptime(from_date, '%Y-%m-%d').date():
-                continue
-            if to_date and payment_date.date() > datetime.strptime(to_date, '%Y-%m-%d').date():
-                continue
-            
-            filtered_payments.append(payment)
-        
-        # Add to treeview with alternating colors
-        for i, payment in enumerate(filtered_payments):
-            tags = ('oddrow',) if i % 2 else ()
-            
-            # Format values
-            values = (
-                datetime.strptime(payment['payment_date'], 
-                                '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
-                payment['student_name'],
-                f"₦{payment['amount']:,.2f}",
-                payment['receipt_number']
-            )
-            
-            self.payment_tree.insert("", "end", values=values, tags=tags)
+        search_term = self.search_var.get().strip()
+        
+        source = self.app.db.get_payment_page_source(
+            programme_id=(self.app.db.programmes.get_id(programme_filter)
+                          if programme_filter != "All" else None),
+            search_term=search_term or None,
+            from_date=from_date,
+            to_date=to_date
+        )
+        self.payment_tree.set_source(source)
     
-    def view_receipt(self, event):
-        selected = self.payment_tree.selection()
-        if not selected:
-            return
-        
-        receipt_number = self.payment_tree.item(selected[0])['values'][3]
+    def view_receipt(self, payment):
+        receipt_number = payment['receipt_number']
         receipt = self.app.db.get_receipt_by_number(receipt_number)
         
         if receipt and os.path.exists(receipt['filepath']):
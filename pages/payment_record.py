@@ -4,6 +4,8 @@ from datetime import datetime
 import os
 import subprocess
 import platform
+import uuid
+from utils.table_binding import KeyedTableBinding
 
 class PaymentRecordDialog(tk.Toplevel):
     def __init__(self, parent, app, student_data):
@@ -12,6 +14,11 @@ class PaymentRecordDialog(tk.Toplevel):
         self.student_data = student_data
         self.title("Payment Record")
         
+        # (amount, note, idempotency key) of the payment being entered; the key
+        # is kept until the payment is saved, so saving it again (a retry after
+        # an error) cannot record it twice, and replaced when it is edited
+        self.pending_payment = None
+        
         # Set dialog size
         dialog_width = 800
         dialog_height = 600
@@ -103,11 +110,11 @@ class PaymentRecordDialog(tk.Toplevel):
         self.note_text.grid(row=1, column=1, sticky="w", padx=5, pady=(0, 10))
         
         # Add Payment Button - Column 3
-        ttk.Button(form_frame, 
-                  text="Add Payment",
-                  command=self.add_payment,
-                  style="Modern.TButton").grid(
-                      row=1, column=2, sticky="w", padx=5, pady=(0, 10))
+        self.add_button = ttk.Button(form_frame, 
+                                     text="Add Payment",
+                                     command=self.add_payment,
+                                     style="Modern.TButton")
+        self.add_button.grid(row=1, column=2, sticky="w", padx=5, pady=(0, 10))
     
     def create_payment_history(self, parent):
         # Payment History Section
@@ -139,29 +146,35 @@ class PaymentRecordDialog(tk.Toplevel):
         self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # Rows are keyed by payment_id so a refresh only touches what changed
+        self.history_binding = KeyedTableBinding(
+            self.history_tree,
+            key=lambda payment: payment['payment_id'],
+            formatter=self.format_payment_row,
+            stripe=False
+        )
+        
         # Load payment history
         self.load_payment_history()
         
         # Add right-click menu for receipts
         self.create_context_menu()
     
+    def format_payment_row(self, payment):
+        return (
+            datetime.strptime(payment['payment_date'], 
+                            '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
+            f"₦{payment['amount']:,.2f}",
+            payment['receipt_number'],
+            f"₦{payment['balance']:,.2f}"
+        )
+    
     def load_payment_history(self):
-        # Clear existing items
-        for item in self.history_tree.get_children():
-            self.history_tree.delete(item)
-        
         # Get payment history
         payments = self.app.db.get_payment_history(self.student_data['reg_number'])
         
-        # Add to treeview
-        for payment in payments:
-            self.history_tree.insert("", 0, values=(
-                datetime.strptime(payment['payment_date'], 
-                                '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
-                f"₦{payment['amount']:,.2f}",
-                payment['receipt_number'],
-                f"₦{payment['balance']:,.2f}"
-            ))
+        # Oldest first; only new or changed payments are written to the tree
+        self.history_binding.bind(reversed(payments))
     
     def create_context_menu(self):
         self.context_menu = tk.Menu(self, tearoff=0)
@@ -182,31 +195,58 @@ class PaymentRecordDialog(tk.Toplevel):
             self.context_menu.grab_release()
     
     def add_payment(self):
+        # Ignore clicks while the last one is still being saved
+        if self.add_button.instate(['disabled']):
+            return
+        
         try:
             amount = float(self.amount_var.get())
             if amount <= 0:
                 raise ValueError("Amount must be greater than 0")
-                
-            # Get payment note
-            payment_note = self.note_text.get('1.0', 'end-1c').strip()
-            
-            # Save payment
-            success, receipt_path, error = self.app.db.save_payment(
-                self.student_data['reg_number'], amount, payment_note)
-            
-            if success:
-                messagebox.showinfo("Success", "Payment recorded successfully!")
-                self.amount_var.set("")  # Clear amount entry
-                self.load_payment_history()  # Refresh history
-                
-                # Show receipt options
-                if receipt_path:
-                    self.show_receipt_buttons(receipt_path)
-            else:
-                messagebox.showerror("Error", f"Failed to record payment: {error}")
-                
         except ValueError as e:
             messagebox.showerror("Error", "Please enter a valid amount")
+            return
+        
+        # Get payment note
+        payment_note = self.note_text.get('1.0', 'end-1c').strip()
+        
+        if self.pending_payment is None or self.pending_payment[:2] != (amount, payment_note):
+            self.pending_payment = (amount, payment_note, uuid.uuid4().hex)
+        
+        # Saved on a worker thread: a busy database can take a while
+        self.add_button.state(['disabled'])
+        self.app.tasks.submit(
+            self.app.db.save_payment,
+            self.student_data['reg_number'], amount, payment_note,
+            idempotency_key=self.pending_payment[2],
+            message="Saving payment...",
+            cancellable=False,
+            on_done=self.payment_saved,
+            on_error=self.payment_failed
+        )
+    
+    def payment_saved(self, result):
+        if not self.winfo_exists():
+            return
+        self.add_button.state(['!disabled'])
+        success, receipt_path, error = result
+        
+        if success:
+            self.pending_payment = None
+            messagebox.showinfo("Success", "Payment recorded successfully!")
+            self.amount_var.set("")  # Clear amount entry
+            self.load_payment_history()  # Refresh history
+            
+            # Show receipt options
+            if receipt_path:
+                self.show_receipt_buttons(receipt_path)
+        else:
+            messagebox.showerror("Error", f"Failed to record payment: {error}")
+    
+    def payment_failed(self, error):
+        if self.winfo_exists():
+            self.add_button.state(['!disabled'])
+            messagebox.showerror("Error", f"Failed to record payment: {error}")
     
     def preview_receipt(self):
         selected = self.history_tree.selection()
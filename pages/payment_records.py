@@ -4,7 +4,7 @@ from datetime import datetime
 import platform
 import os
 import subprocess
-import pandas as pd
+from utils.virtual_treeview import VirtualTreeview
 
 class PaymentRecordsDialog(tk.Toplevel):
     def __init__(self, parent, app):
@@ -93,12 +93,14 @@ class PaymentRecordsDialog(tk.Toplevel):
                        font=("Helvetica", 10),
                        rowheight=30)
         
-        # Create Treeview
+        # Create virtual Treeview; only the visible rows are materialised
         columns = ("date", "student", "amount", "receipt")
-        self.payment_tree = ttk.Treeview(table_frame,
-                                       columns=columns,
-                                       show="headings",
-                                       style="PaymentTable.Treeview")
+        self.payment_tree = VirtualTreeview(table_frame,
+                                          columns=columns,
+                                          formatter=self.format_payment_row,
+                                          key=lambda payment: payment['payment_id'],
+                                          style="PaymentTable.Treeview",
+                                          x_scroll=True)
         
         # Configure columns with exact widths
         column_configs = {
@@ -120,13 +122,12 @@ class PaymentRecordsDialog(tk.Toplevel):
             }
         }
         
-        # Apply configurations and set up sorting
+        # Apply configurations
         for col, config in column_configs.items():
             self.payment_tree.heading(
                 col, 
                 text=config["text"],
-                anchor=config["anchor"],
-                command=lambda c=col: self.sort_treeview(c)
+                anchor=config["anchor"]
             )
             self.payment_tree.column(
                 col,
@@ -145,59 +146,44 @@ class PaymentRecordsDialog(tk.Toplevel):
         
         self.payment_tree.tag_configure('oddrow', background='#F5F5F5')
         
-        # Add horizontal and vertical scrollbars
-        y_scrollbar = ttk.Scrollbar(table_frame,
-                                   orient=tk.VERTICAL,
-                                   command=self.payment_tree.yview)
-        x_scrollbar = ttk.Scrollbar(table_frame,
-                                   orient=tk.HORIZONTAL,
-                                   command=self.payment_tree.xview)
-        
-        self.payment_tree.configure(
-            yscrollcommand=y_scrollbar.set,
-            xscrollcommand=x_scrollbar.set
-        )
+        # Sort on heading click
+        self.payment_tree.enable_sorting()
         
-        # Pack widgets with proper spacing
-        self.payment_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        y_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        x_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        # Pack widget (includes its own scrollbars)
+        self.payment_tree.pack(fill=tk.BOTH, expand=True)
         
         # Enable column resizing by dragging
-        self.payment_tree.bind('<Motion>', self.check_resize_cursor)
-        self.payment_tree.bind('<Button-1>', self.start_resize)
-        self.payment_tree.bind('<B1-Motion>', self.do_resize)
-        self.payment_tree.bind('<ButtonRelease-1>', self.end_resize)
-        
-        # Bind double-click to view receipt
-        self.payment_tree.bind("<Double-1>", self.view_receipt)
-        
-        # Initialize sorting variables
-        self.sort_column = None
-        self.sort_reverse = False
+        tree = self.payment_tree.tree
+        tree.bind('<Motion>', self.check_resize_cursor)
+        tree.bind('<Button-1>', self.start_resize)
+        tree.bind('<B1-Motion>', self.do_resize)
+        tree.bind('<ButtonRelease-1>', self.end_resize)
+        
+        # Double-click to view receipt
+        self.payment_tree.on_row_activated(self.view_receipt)
     
     def check_resize_cursor(self, event):
         """Change cursor when over column divider"""
-        region = self.payment_tree.identify_region(event.x, event.y)
+        region = self.payment_tree.tree.identify_region(event.x, event.y)
         if region == "separator":
-            self.payment_tree.configure(cursor="sb_h_double_arrow")
+            self.payment_tree.tree.configure(cursor="sb_h_double_arrow")
         else:
-            self.payment_tree.configure(cursor="")
+            self.payment_tree.tree.configure(cursor="")
     
     def start_resize(self, event):
         """Start column resize operation"""
-        region = self.payment_tree.identify_region(event.x, event.y)
+        region = self.payment_tree.tree.identify_region(event.x, event.y)
         if region == "separator":
-            self.resize_column = self.payment_tree.identify_column(event.x)
+            self.resize_column = self.payment_tree.tree.identify_column(event.x)
             self.resize_x = event.x
     
     def do_resize(self, event):
         """Handle column resize drag"""
         if hasattr(self, 'resize_column'):
             diff = event.x - self.resize_x
-            x = self.payment_tree.column(self.resize_column, "width") + diff
+            x = self.payment_tree.tree.column(self.resize_column, "width") + diff
             if x > 50:  # Minimum column width
-                self.payment_tree.column(self.resize_column, width=x)
+                self.payment_tree.tree.column(self.resize_column, width=x)
                 self.resize_x = event.x
     
     def end_resize(self, event):
@@ -206,35 +192,6 @@ class PaymentRecordsDialog(tk.Toplevel):
             del self.resize_column
             del self.resize_x
     
-    def sort_treeview(self, col):
-        """Sort treeview when column header is clicked"""
-        if self.sort_column == col:
-            self.sort_reverse = not self.sort_reverse
-        else:
-            self.sort_column = col
-            self.sort_reverse = False
-        
-        items = [(self.payment_tree.set(item, col), item) 
-                 for item in self.payment_tree.get_children('')]
-        
-        # Custom sorting for amount column
-        if col == "amount":
-            items.sort(key=lambda x: float(x[0].replace('₦', '').replace(',', '')), 
-                      reverse=self.sort_reverse)
-        # Custom sorting for date column
-        elif col == "date":
-            items.sort(key=lambda x: datetime.strptime(x[0], '%d/%m/%Y %H:%M'), 
-                      reverse=self.sort_reverse)
-        else:
-            items.sort(reverse=self.sort_reverse)
-        
-        # Rearrange items
-        for index, (_, item) in enumerate(items):
-            self.payment_tree.move(item, '', index)
-            # Reapply alternating row colors
-            tags = ('oddrow',) if index % 2 else ()
-            self.payment_tree.item(item, tags=tags)
-    
     def create_action_buttons(self):
         # Buttons frame
         button_frame = ttk.Frame(self)
@@ -262,73 +219,90 @@ class PaymentRecordsDialog(tk.Toplevel):
         close_btn.pack(side=tk.RIGHT, padx=5)
     
     def export_to_excel(self):
+        # Try importing required packages
         try:
-            # Try importing required packages
-            try:
-                import pandas as pd
-                import openpyxl
-            except ImportError:
-                messagebox.showerror("Missing Dependencies", 
-                                   "Please install required packages:\n\n"
-                                   "pip install pandas openpyxl")
-                return
-            
-            # Get all payments
-            payments = self.app.db.get_all_payments()
-            
-            # Create DataFrame
-            df = pd.DataFrame(payments)
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"payment_records_{timestamp}.xlsx"
-            filepath = os.path.join(self.app.app_path, "exports", filename)
-            
-            # Ensure exports directory exists
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            # Export to Excel
-            df.to_excel(filepath, index=False, engine='openpyxl')
-            
-            messagebox.showinfo("Success", 
-                              f"Records exported successfully to:\n{filepath}")
-            
-            # Open the file
-            if platform.system() == 'Darwin':  # macOS
-                subprocess.run(['open', filepath])
-            elif platform.system() == 'Windows':
-                os.startfile(filepath)
-            else:  # Linux
-                subprocess.run(['xdg-open', filepath])
-                
-        except Exception as e:
-            messagebox.showerror("Error", 
-                               f"Failed to export records: {str(e)}\n\n"
-                               "Please ensure you have installed required packages:\n"
+            import pandas as pd
+            import openpyxl
+        except ImportError:
+            messagebox.showerror("Missing Dependencies", 
+                               "Please install required packages:\n\n"
                                "pip install pandas openpyxl")
+            return
+        
+        # Generate filename with timestamp
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"payment_records_{timestamp}.xlsx"
+        filepath = os.path.join(self.app.app_path, "exports", filename)
+        
+        self.app.tasks.submit(
+            self.write_records, filepath,
+            message="Exporting payment records...",
+            on_done=self.export_done,
+            on_error=lambda e: messagebox.showerror(
+                "Error", 
+                f"Failed to export records: {str(e)}\n\n"
+                "Please ensure you have installed required packages:\n"
+                "pip install pandas openpyxl")
+        )
+    
+    def write_records(self, filepath):
+        """Write all payments to a workbook (runs on a worker thread)"""
+        import pandas as pd
+        
+        # Get all payments
+        payments = self.app.db.get_all_payments()
+        
+        # Create DataFrame
+        df = pd.DataFrame(payments)
+        
+        # Ensure exports directory exists
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        # Export to Excel
+        df.to_excel(filepath, index=False, engine='openpyxl')
+        return filepath
+    
+    def export_done(self, filepath):
+        messagebox.showinfo("Success", 
+                          f"Records exported successfully to:\n{filepath}")
+        
+        # Open the file
+        if platform.system() == 'Darwin':  # macOS
+            subprocess.run(['open', filepath])
+        elif platform.system() == 'Windows':
+            os.startfile(filepath)
+        else:  # Linux
+            subprocess.run(['xdg-open', filepath])
     
     def print_records(self):
+        # Try importing required packages
+        try:
+            import pandas as pd
+            import openpyxl
+        except ImportError:
+            messagebox.showerror("Missing Dependencies", 
+                               "Please install required packages:\n\n"
+                               "pip install pandas openpyxl")
+            return
+        
+        # First export to Excel
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"payment_records_{timestamp}.xlsx"
+        filepath = os.path.join(self.app.app_path, "exports", filename)
+        
+        self.app.tasks.submit(
+            self.write_records, filepath,
+            message="Preparing records for printing...",
+            on_done=self.print_done,
+            on_error=lambda e: messagebox.showerror(
+                "Error", 
+                f"Failed to print records: {str(e)}\n\n"
+                "Please ensure you have installed required packages:\n"
+                "pip install pandas openpyxl")
+        )
+    
+    def print_done(self, filepath):
         try:
-            # Try importing required packages
-            try:
-                import pandas as pd
-                import openpyxl
-            except ImportError:
-                messagebox.showerror("Missing Dependencies", 
-                                   "Please install required packages:\n\n"
-                                   "pip install pandas openpyxl")
-                return
-            
-            # First export to Excel
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"payment_records_{timestamp}.xlsx"
-            filepath = os.path.join(self.app.app_path, "exports", filename)
-            
-            # Create DataFrame
-            payments = self.app.db.get_all_payments()
-            df = pd.DataFrame(payments)
-            df.to_excel(filepath, index=False, engine='openpyxl')
-            
             # Print the file
             if platform.system() == 'Darwin':  # macOS
                 subprocess.run(['lpr', filepath])
@@ -340,49 +314,29 @@ class PaymentRecordsDialog(tk.Toplevel):
             messagebox.showinfo("Success", "Records sent to printer")
             
         except Exception as e:
-            messagebox.showerror("Error", 
-                               f"Failed to print records: {str(e)}\n\n"
-                               "Please ensure you have installed required packages:\n"
-                               "pip install pandas openpyxl")
+            messagebox.showerror("Error", f"Failed to print records: {str(e)}")
+    
+    def format_payment_row(self, payment):
+        """Format a payment record for display"""
+        return (
+            datetime.strptime(payment['payment_date'], 
+                            '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
+            payment['student_name'],
+            f"₦{payment['amount']:,.2f}",
+            payment['receipt_number']
+        )
     
     def load_payments(self):
-        # Clear existing items
-        for item in self.payment_tree.get_children():
-            self.payment_tree.delete(item)
-        
-        # Get all payments
-        payments = self.app.db.get_all_payments()
-        
-        # Add to treeview with alternating colors
-        for i, payment in enumerate(payments):
-            tags = ('oddrow',) if i % 2 else ()
-            
-            # Format values with proper spacing
-            values = (
-                # Center-aligned date
-                datetime.strptime(payment['payment_date'], 
-                                '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
-                # Center-aligned name
-                payment['student_name'].center(40),
-                # Right-aligned amount with padding
-                f"₦{payment['amount']:,.2f}".rjust(15),
-                # Center-aligned receipt number
-                payment['receipt_number'].center(20)
-            )
-            
-            self.payment_tree.insert("", "end", values=values, tags=tags)
+        # Page through all payments
+        self.payment_tree.set_source(self.app.db.get_payment_page_source())
     
     def apply_filters(self):
         # TODO: Implement filters
         pass
     
-    def view_receipt(self, event):
-        selected = self.payment_tree.selection()
-        if not selected:
-            return
-        
+    def view_receipt(self, payment):
         try:
-            receipt_number = self.payment_tree.item(selected[0])['values'][3]
+            receipt_number = payment['receipt_number']
             receipt = self.app.db.get_receipt_by_number(receipt_number)
             
             if not receipt:
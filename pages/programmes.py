@@ -1,18 +1,9 @@
 import tkinter as tk
 from tkinter import ttk
-from utils.constants import PROGRAMMES
-import sqlite3
 from datetime import datetime
 from tkinter import messagebox
 import os
-
-# Optional matplotlib import
-try:
-    import matplotlib.pyplot as plt
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
+from utils.virtual_treeview import VirtualTreeview
 
 class ProgrammesPage(ttk.Frame):
     def __init__(self, parent, app):
@@ -120,19 +111,21 @@ class ProgrammesPage(ttk.Frame):
         for i in range(5):
             container.columnconfigure(i, weight=1)
         
+        # Statistics for every programme come from one shared snapshot
+        summary = self.app.db.programme_summary.all()
+        
         # Create grid of programme cards
-        for i, programme in enumerate(PROGRAMMES):
+        for i, stats in enumerate(summary):
+            programme = self.app.db.programmes.get(stats['programme_id'])
+            
             # Calculate row and column for 5-column layout
             row = i // 5
             col = i % 5
             
             # Create card frame with padding
-            card = ttk.LabelFrame(container, text=programme, padding=15)
+            card = ttk.LabelFrame(container, text=programme['name'], padding=15)
             card.grid(row=row, column=col, padx=8, pady=8, sticky="nsew")
             
-            # Get programme statistics
-            stats = self.get_programme_stats(programme)
-            
             # Create statistics visualization
             self.create_stats_visualization(card, stats)
             
@@ -155,6 +148,9 @@ class ProgrammesPage(ttk.Frame):
     
     def refresh_view(self):
         """Refresh the programme view"""
+        # Re-read programme statistics on the next render
+        self.app.db.invalidate_caches()
+        
         # Destroy and recreate content
         for widget in self.winfo_children():
             widget.destroy()
@@ -199,55 +195,6 @@ class ProgrammesPage(ttk.Frame):
         """Edit programme details"""
         EditProgrammeDialog(self, self.app, programme)
     
-    def get_programme_stats(self, programme):
-        """Get statistics for a specific programme"""
-        conn = sqlite3.connect(self.app.db.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            # Get total and active students
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'Active' OR status IS NULL THEN 1 ELSE 0 END) as active,
-                    SUM(CASE WHEN status = 'Graduated' THEN 1 ELSE 0 END) as completed,
-                    SUM(CASE WHEN status = 'Dropped Out' THEN 1 ELSE 0 END) as dropped,
-                    SUM(programme_fee) as total_fees,
-                    (SELECT COALESCE(SUM(amount), 0)
-                     FROM payments p
-                     JOIN students s ON p.reg_number = s.reg_number
-                     WHERE s.programme = ?) as paid_amount
-                FROM students
-                WHERE programme = ?
-            ''', (programme, programme))
-            
-            result = cursor.fetchone()
-            
-            if result:
-                total_fees = result[4] or 0
-                paid_amount = result[5] or 0
-                
-                return {
-                    'total_students': result[0] or 0,
-                    'active_students': result[1] or 0,
-                    'completed': result[2] or 0,
-                    'dropped_out': result[3] or 0,
-                    'total_revenue': paid_amount,
-                    'outstanding': total_fees - paid_amount
-                }
-            
-            return {
-                'total_students': 0,
-                'active_students': 0,
-                'completed': 0,
-                'dropped_out': 0,
-                'total_revenue': 0,
-                'outstanding': 0
-            }
-            
-        finally:
-            conn.close()
-    
     def view_programme_details(self, programme):
         """Open detailed view for a specific programme"""
         ProgrammeDetailsDialog(self, self.app, programme)
@@ -316,42 +263,47 @@ class ProgrammesPage(ttk.Frame):
     
     def export_to_excel(self):
         """Export programme statistics to Excel"""
-        try:
-            import pandas as pd
-            
-            # Collect data for all programmes
-            data = []
-            for programme in PROGRAMMES:
-                stats = self.get_programme_stats(programme)
-                data.append({
-                    'Programme': programme,
-                    'Total Students': stats['total_students'],
-                    'Active Students': stats['active_students'],
-                    'Completed': stats['completed'],
-                    'Dropped Out': stats['dropped_out'],
-                    'Total Revenue': stats['total_revenue'],
-                    'Outstanding': stats['outstanding']
-                })
-            
-            # Create DataFrame
-            df = pd.DataFrame(data)
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"programme_statistics_{timestamp}.xlsx"
-            filepath = os.path.join(self.app.app_path, "exports", filename)
-            
-            # Ensure exports directory exists
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            # Export to Excel
-            df.to_excel(filepath, index=False)
-            
-            messagebox.showinfo("Success", 
-                              f"Data exported successfully to:\n{filepath}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export data: {str(e)}")
+        self.app.tasks.submit(
+            self.write_excel_export,
+            message="Exporting programme statistics...",
+            on_done=lambda filepath: messagebox.showinfo(
+                "Success", f"Data exported successfully to:\n{filepath}"),
+            on_error=lambda e: messagebox.showerror(
+                "Error", f"Failed to export data: {str(e)}")
+        )
+    
+    def write_excel_export(self):
+        """Write the programme statistics workbook (runs on a worker thread)"""
+        import pandas as pd
+        
+        # Collect data for all programmes from the cached summary
+        data = []
+        for stats in self.app.db.programme_summary.all():
+            data.append({
+                'Programme': stats['programme'],
+                'Code': stats['code'],
+                'Total Students': stats['total_students'],
+                'Active Students': stats['active_students'],
+                'Completed': stats['completed'],
+                'Dropped Out': stats['dropped_out'],
+                'Total Revenue': stats['total_revenue'],
+                'Outstanding': stats['outstanding']
+            })
+        
+        # Create DataFrame
+        df = pd.DataFrame(data)
+        
+        # Generate filename with timestamp
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"programme_statistics_{timestamp}.xlsx"
+        filepath = os.path.join(self.app.app_path, "exports", filename)
+        
+        # Ensure exports directory exists
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        # Export to Excel
+        df.to_excel(filepath, index=False)
+        return filepath
     
     def export_to_pdf(self):
         """Export programme statistics to PDF"""
@@ -368,7 +320,7 @@ class ProgrammesPage(ttk.Frame):
         # Create a top-level dialog
         dialog = tk.Toplevel(self)
         dialog.title("Add New Programme")
-        dialog.geometry("400x250")
+        dialog.geometry("400x330")
         dialog.transient(self)
         dialog.grab_set()
         
@@ -384,6 +336,16 @@ class ProgrammesPage(ttk.Frame):
                                    width=50)
         programme_entry.pack(fill=tk.X, pady=(0, 10))
         
+        # Programme Code (registration number prefix)
+        ttk.Label(main_frame, text="Programme Code (optional):").pack(anchor="w")
+        code_var = tk.StringVar()
+        ttk.Entry(main_frame, textvariable=code_var, width=10).pack(anchor="w", pady=(0, 10))
+        
+        # Default Fee
+        ttk.Label(main_frame, text="Default Fee:").pack(anchor="w")
+        fee_var = tk.StringVar(value="0")
+        ttk.Entry(main_frame, textvariable=fee_var, width=20).pack(anchor="w", pady=(0, 10))
+        
         # Validation function
         def validate_and_add():
             new_programme = programme_var.get().strip()
@@ -393,9 +355,18 @@ class ProgrammesPage(ttk.Frame):
                 messagebox.showerror("Error", "Programme name cannot be empty")
                 return
             
-            # Add programme
-            from utils.constants import add_programme
-            success = add_programme(new_programme)
+            try:
+                default_fee = float(fee_var.get() or 0)
+            except ValueError:
+                messagebox.showerror("Error", "Default fee must be a number")
+                return
+            
+            # Add programme to the persistent catalogue
+            success = self.app.db.programmes.add_programme(
+                new_programme,
+                code=code_var.get().strip() or None,
+                default_fee=default_fee
+            )
             
             if success:
                 messagebox.showinfo("Success", 
@@ -425,7 +396,7 @@ class ProgrammeDetailsDialog(tk.Toplevel):
         super().__init__(parent)
         self.app = app
         self.programme = programme
-        self.title(f"Programme Details - {programme}")
+        self.title(f"Programme Details - {programme['name']}")
         
         # Set dialog size
         dialog_width = 800
@@ -450,16 +421,18 @@ class ProgrammeDetailsDialog(tk.Toplevel):
         
         # Title
         ttk.Label(main_frame,
-                 text=self.programme,
+                 text=self.programme['name'],
                  style="Title.TLabel").pack(pady=(0, 20))
         
         # Create student list
         self.create_student_list(main_frame)
     
     def create_student_list(self, parent):
-        # Create Treeview
+        # Create virtual Treeview; only the visible rows are materialised
         columns = ("reg_number", "name", "schedule", "start_date", "status", "payment")
-        self.tree = ttk.Treeview(parent, columns=columns, show="headings")
+        self.tree = VirtualTreeview(parent, columns=columns,
+                                   formatter=self.format_student_row,
+                                   key=lambda student: student['reg_number'])
         
         # Configure columns
         self.tree.heading("reg_number", text="Reg. Number")
@@ -468,62 +441,47 @@ class ProgrammeDetailsDialog(tk.Toplevel):
         self.tree.heading("start_date", text="Start Date")
         self.tree.heading("status", text="Status")
         self.tree.heading("payment", text="Payment Status")
+        self.tree.tag_configure('oddrow', background='#F5F5F5')
+        self.tree.enable_sorting()
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Pack widget (includes its own vertical scrollbar)
+        self.tree.pack(fill=tk.BOTH, expand=True)
         
-        # Pack widgets
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Double-click to open the student's profile
+        self.tree.on_row_activated(self.view_student_profile)
         
         # Load students
         self.load_students()
     
+    def format_student_row(self, student):
+        fee = student['programme_fee'] or 0
+        paid = student['paid_amount']
+        
+        # Calculate payment status
+        if paid >= fee:
+            payment_status = "Fully Paid"
+        elif paid > 0:
+            percentage = (paid / fee) * 100
+            payment_status = f"Partial ({percentage:.1f}%)"
+        else:
+            payment_status = "Unpaid"
+        
+        return (
+            student['reg_number'],
+            student['name'],
+            student['schedule'],
+            student['start_date'],
+            student['status'] or "Active",
+            payment_status
+        )
+    
     def load_students(self):
-        conn = sqlite3.connect(self.app.db.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                SELECT 
-                    s.reg_number,
-                    s.name,
-                    s.schedule,
-                    s.start_date,
-                    s.status,
-                    s.programme_fee,
-                    COALESCE(SUM(p.amount), 0) as paid_amount
-                FROM students s
-                LEFT JOIN payments p ON s.reg_number = p.reg_number
-                WHERE s.programme = ?
-                GROUP BY s.reg_number
-                ORDER BY s.name
-            ''', (self.programme,))
-            
-            for row in cursor.fetchall():
-                reg_number, name, schedule, start_date, status, fee, paid = row
-                
-                # Calculate payment status
-                if paid >= fee:
-                    payment_status = "Fully Paid"
-                elif paid > 0:
-                    percentage = (paid / fee) * 100
-                    payment_status = f"Partial ({percentage:.1f}%)"
-                else:
-                    payment_status = "Unpaid"
-                
-                self.tree.insert("", "end", values=(
-                    reg_number,
-                    name,
-                    schedule,
-                    start_date,
-                    status or "Active",
-                    payment_status
-                ))
-                
-        finally:
-            conn.close() 
+        self.tree.set_source(
+            self.app.db.get_programme_student_source(self.programme['programme_id']))
+    
+    def view_student_profile(self, student):
+        from pages.student_profile import StudentProfileDialog
+        StudentProfileDialog(self, self.app, student['reg_number'])
 
 
 class EditProgrammeDialog(tk.Toplevel):
@@ -532,7 +490,7 @@ class EditProgrammeDialog(tk.Toplevel):
         self.parent = parent
         self.app = app
         self.programme = programme
-        self.title(f"Edit Programme - {programme}")
+        self.title(f"Edit Programme - {programme['name']}")
         
         # Set dialog size
         self.geometry("500x600")
@@ -550,22 +508,35 @@ class EditProgrammeDialog(tk.Toplevel):
         
         # Programme details
         ttk.Label(main_frame, text="Programme Name:").pack(anchor="w")
-        self.name_var = tk.StringVar(value=self.programme)
+        self.name_var = tk.StringVar(value=self.programme['name'])
         ttk.Entry(main_frame, textvariable=self.name_var).pack(fill=tk.X, pady=(0, 10))
         
-        # Duration options
+        # Programme code (registration number prefix)
+        ttk.Label(main_frame, text="Programme Code:").pack(anchor="w")
+        self.code_var = tk.StringVar(value=self.programme['code'])
+        ttk.Entry(main_frame, textvariable=self.code_var, width=10).pack(anchor="w", pady=(0, 10))
+        
+        # Duration options (one per line)
         ttk.Label(main_frame, text="Duration Options:").pack(anchor="w")
         self.duration_text = tk.Text(main_frame, height=4)
+        self.duration_text.insert("1.0", "\n".join(self.programme['durations']))
         self.duration_text.pack(fill=tk.X, pady=(0, 10))
         
-        # Fee structure
-        ttk.Label(main_frame, text="Fee Structure:").pack(anchor="w")
-        self.fee_text = tk.Text(main_frame, height=4)
-        self.fee_text.pack(fill=tk.X, pady=(0, 10))
+        # Schedule options (one per line)
+        ttk.Label(main_frame, text="Schedule Options:").pack(anchor="w")
+        self.schedule_text = tk.Text(main_frame, height=4)
+        self.schedule_text.insert("1.0", "\n".join(self.programme['schedules']))
+        self.schedule_text.pack(fill=tk.X, pady=(0, 10))
+        
+        # Default fee
+        ttk.Label(main_frame, text="Default Fee:").pack(anchor="w")
+        self.fee_var = tk.StringVar(value=str(self.programme['default_fee']))
+        ttk.Entry(main_frame, textvariable=self.fee_var, width=20).pack(anchor="w", pady=(0, 10))
         
         # Description
         ttk.Label(main_frame, text="Programme Description:").pack(anchor="w")
         self.desc_text = tk.Text(main_frame, height=6)
+        self.desc_text.insert("1.0", self.programme['description'])
         self.desc_text.pack(fill=tk.X, pady=(0, 10))
         
         # Buttons
@@ -579,7 +550,33 @@ class EditProgrammeDialog(tk.Toplevel):
                   command=self.destroy).pack(side=tk.LEFT, padx=5)
     
     def save_changes(self):
-        # TODO: Implement saving changes to database
-        messagebox.showinfo("Success", "Changes saved successfully!")
-        self.parent.refresh_view()
-        self.destroy() 
\ No newline at end of file
+        name = self.name_var.get().strip()
+        if not name:
+            messagebox.showerror("Error", "Programme name cannot be empty")
+            return
+        
+        try:
+            default_fee = float(self.fee_var.get() or 0)
+        except ValueError:
+            messagebox.showerror("Error", "Default fee must be a number")
+            return
+        
+        def text_lines(widget):
+            return [line.strip() for line in widget.get("1.0", tk.END).splitlines()
+                    if line.strip()]
+        
+        updates = {
+            'name': name,
+            'code': self.code_var.get().strip().upper() or self.programme['code'],
+            'default_fee': default_fee,
+            'durations': text_lines(self.duration_text),
+            'schedules': text_lines(self.schedule_text),
+            'description': self.desc_text.get("1.0", tk.END).strip()
+        }
+        
+        if self.app.db.programmes.update_programme(self.programme['programme_id'], updates):
+            messagebox.showinfo("Success", "Changes saved successfully!")
+            self.parent.refresh_view()
+            self.destroy()
+        else:
+            messagebox.showerror("Error", "Failed to save programme changes")
\ No newline at end of file
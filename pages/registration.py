@@ -1,23 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
 from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 import os
 import platform
 import subprocess
-from utils.constants import PROGRAMMES, DURATIONS, GENDERS, SCHEDULES
+from utils.constants import DURATIONS, GENDERS, SCHEDULES
 
 class AdmissionLetterGenerator:
     @staticmethod
     def generate_admission_letter(student_data):
         """Generate PDF admission letter for a newly registered student"""
         try:
+            # reportlab is only needed once a letter is actually produced
+            from reportlab.lib.pagesizes import letter
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.enums import TA_CENTER
+            from reportlab.lib.units import inch
+            from reportlab.lib import colors
+            
             # Create exports directory if it doesn't exist
             exports_dir = os.path.join(
                 os.path.expanduser("~/Documents"), 
@@ -191,6 +192,9 @@ class AdmissionLetterGenerator:
     @staticmethod
     def create_letterhead(canvas, doc):
         """Create a custom letterhead for the admission letter"""
+        from reportlab.lib.units import inch
+        from reportlab.lib import colors
+        
         # Company details
         company_details = [
             "IMPACTTECH CODING ACADEMY",
@@ -337,30 +341,49 @@ class RegistrationDialog(tk.Toplevel):
         # Programme
         ttk.Label(prog_frame, text="Programme:").pack(anchor=tk.W)
         self.programme_var = tk.StringVar()
-        ttk.Combobox(prog_frame, textvariable=self.programme_var,
-                    values=PROGRAMMES, state="readonly", width=48).pack(
-            fill=tk.X, pady=(0, 10))
+        programme_combo = ttk.Combobox(prog_frame, textvariable=self.programme_var,
+                    values=self.app.db.programmes.names(), state="readonly", width=48)
+        programme_combo.pack(fill=tk.X, pady=(0, 10))
+        programme_combo.bind("<<ComboboxSelected>>", self.on_programme_selected)
         
         # Duration
         ttk.Label(prog_frame, text="Duration:").pack(anchor=tk.W)
         self.duration_var = tk.StringVar()
-        ttk.Combobox(prog_frame, textvariable=self.duration_var,
-                    values=DURATIONS, state="readonly", width=48).pack(
-            fill=tk.X, pady=(0, 10))
+        self.duration_combo = ttk.Combobox(prog_frame, textvariable=self.duration_var,
+                    values=DURATIONS, state="readonly", width=48)
+        self.duration_combo.pack(fill=tk.X, pady=(0, 10))
         
         # Schedule
         ttk.Label(prog_frame, text="Schedule:").pack(anchor=tk.W)
         self.schedule_var = tk.StringVar()
-        ttk.Combobox(prog_frame, textvariable=self.schedule_var,
-                    values=SCHEDULES, state="readonly", width=48).pack(
-            fill=tk.X, pady=(0, 10))
+        self.schedule_combo = ttk.Combobox(prog_frame, textvariable=self.schedule_var,
+                    values=SCHEDULES, state="readonly", width=48)
+        self.schedule_combo.pack(fill=tk.X, pady=(0, 10))
         
         # Start Date
+        from tkcalendar import DateEntry
         ttk.Label(prog_frame, text="Start Date:").pack(anchor=tk.W)
         self.start_date = DateEntry(prog_frame, width=48, background='darkblue',
                                   foreground='white', borderwidth=2)
         self.start_date.pack(fill=tk.X, pady=(0, 5))
     
+    def on_programme_selected(self, event=None):
+        """Offer the selected programme's durations, schedules and default fee"""
+        programme = self.app.db.programmes.get_by_name(self.programme_var.get())
+        if not programme:
+            return
+        
+        self.duration_combo.configure(values=programme['durations'])
+        if self.duration_var.get() not in programme['durations']:
+            self.duration_var.set("")
+        
+        self.schedule_combo.configure(values=programme['schedules'])
+        if self.schedule_var.get() not in programme['schedules']:
+            self.schedule_var.set("")
+        
+        if not self.fee_var.get().strip() and programme['default_fee']:
+            self.fee_var.set(f"{programme['default_fee']:.2f}")
+    
     def create_payment_info(self, parent):
         # Payment Information Section
         payment_frame = ttk.LabelFrame(parent, text="Payment Information", padding=10)
@@ -443,7 +466,7 @@ class RegistrationDialog(tk.Toplevel):
 
     def generate_reg_number(self, programme):
         year = datetime.now().year
-        prog_code = ''.join(word[0] for word in programme.split()[:3]).upper()
+        prog_code = self.app.db.programmes.get_code(programme)
         serial = self.app.db.generate_serial_number(programme, year)
         return f"IMPTECH-{prog_code}-{year}-{serial}"
 
@@ -474,29 +497,16 @@ class RegistrationDialog(tk.Toplevel):
         success, receipt_path, error = self.app.db.save_student(student_data)
         
         if success:
-            # Generate admission letter
-            admission_letter_path = AdmissionLetterGenerator.generate_admission_letter(student_data)
-            
-            # Show success message with admission letter option
-            response = messagebox.askyesno(
-                "Registration Successful", 
-                f"Student registered successfully!\n"
-                f"Registration Number: {reg_number}\n\n"
-                "Would you like to view the admission letter?"
+            # Build the admission letter in the background; the dialog closes straight away
+            self.app.tasks.submit(
+                AdmissionLetterGenerator.generate_admission_letter, student_data,
+                message="Generating admission letter...",
+                cancellable=False,
+                on_done=lambda path: self.admission_letter_ready(reg_number, path),
+                on_error=lambda e: messagebox.showerror(
+                    "Error", f"Failed to generate admission letter: {str(e)}")
             )
             
-            # Open admission letter if user chooses yes
-            if response and admission_letter_path:
-                try:
-                    if platform.system() == 'Darwin':  # macOS
-                        subprocess.run(['open', admission_letter_path])
-                    elif platform.system() == 'Windows':
-                        os.startfile(admission_letter_path)
-                    else:  # Linux
-                        subprocess.run(['xdg-open', admission_letter_path])
-                except Exception as e:
-                    messagebox.showerror("Error", f"Could not open admission letter: {str(e)}")
-            
             # Store receipt path if payment was made
             self.current_receipt_path = receipt_path
             
@@ -510,6 +520,27 @@ class RegistrationDialog(tk.Toplevel):
             messagebox.showerror("Error", 
                                f"Failed to register student: {error}")
 
+    def admission_letter_ready(self, reg_number, admission_letter_path):
+        # Show success message with admission letter option
+        response = messagebox.askyesno(
+            "Registration Successful", 
+            f"Student registered successfully!\n"
+            f"Registration Number: {reg_number}\n\n"
+            "Would you like to view the admission letter?"
+        )
+        
+        # Open admission letter if user chooses yes
+        if response and admission_letter_path:
+            try:
+                if platform.system() == 'Darwin':  # macOS
+                    subprocess.run(['open', admission_letter_path])
+                elif platform.system() == 'Windows':
+                    os.startfile(admission_letter_path)
+                else:  # Linux
+                    subprocess.run(['xdg-open', admission_letter_path])
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not open admission letter: {str(e)}")
+
     def show_receipt_buttons(self):
         # Clear the buttons frame
         for widget in self.winfo_children():
@@ -1,10 +1,8 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
+from tkinter import ttk, messagebox
 import os
-from datetime import datetime, timedelta
+import base64
+from datetime import datetime
 import platform
 import subprocess
 
@@ -35,6 +33,7 @@ class ReportsPage(ttk.Frame):
         # Create main layout
         self.create_header()
         self.create_report_sections()
+        self.create_chart_panel()
     
     def configure_styles(self):
         style = ttk.Style()
@@ -90,14 +89,15 @@ class ReportsPage(ttk.Frame):
     def create_report_sections(self):
         # Create notebook with modern styling
         notebook = ttk.Notebook(self, style='Modern.TNotebook')
-        notebook.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        notebook.pack(fill=tk.X, padx=20, pady=(20, 10))
         
         # Report sections with modern design
         report_sections = [
             ("Student Reports", self.create_student_reports_section),
             ("Financial Reports", self.create_financial_reports_section),
             ("Programme Reports", self.create_programme_reports_section),
-            ("Advanced Analytics", self.create_advanced_analytics_section)
+            ("Advanced Analytics", self.create_advanced_analytics_section),
+            ("Data Extracts", self.create_data_extracts_section)
         ]
         
         for title, section_method in report_sections:
@@ -105,6 +105,32 @@ class ReportsPage(ttk.Frame):
             section_method(frame)
             notebook.add(frame, text=title)
     
+    def create_chart_panel(self):
+        """Area below the report buttons where charts are drawn"""
+        panel = ttk.LabelFrame(self, text="Chart", padding=10)
+        panel.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+        
+        toolbar = ttk.Frame(panel)
+        toolbar.pack(fill=tk.X)
+        
+        self.chart_title = ttk.Label(toolbar,
+                                     text="Select a report to view its chart",
+                                     font=('Helvetica', 12, 'bold'))
+        self.chart_title.pack(side=tk.LEFT)
+        
+        self.export_chart_button = ModernButton(toolbar,
+                                                text="Export PNG",
+                                                command=self.export_chart)
+        self.export_chart_button.pack(side=tk.RIGHT)
+        self.export_chart_button.state(['disabled'])
+        
+        self.chart_label = ttk.Label(panel, anchor='center')
+        self.chart_label.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+        
+        # Report shown (or being drawn) in the panel, and decoded images by report
+        self.current_chart = None
+        self.chart_images = {}
+    
     def create_report_section(self, parent, reports):
         """
         Create a modern, grid-based report section
@@ -173,267 +199,240 @@ class ReportsPage(ttk.Frame):
         ]
         return self.create_report_section(parent, reports)
     
+    def create_data_extracts_section(self, parent):
+        reports = []
+        for name in ('students', 'payments', 'notifications'):
+            for format, label in (('csv', 'CSV'), ('parquet', 'Parquet')):
+                reports.append((f"{name.title()} ({label})",
+                                lambda name=name, format=format: self.export_extract(name, format)))
+        frame = self.create_report_section(parent, reports)
+        
+        self.compress_extracts = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame,
+                        text="Compress (gzip for CSV, zstd for Parquet)",
+                        variable=self.compress_extracts).grid(
+            row=len(reports) // 2, column=0, columnspan=2, padx=10, pady=10, sticky='w')
+        return frame
+    
+    def export_extract(self, name, format):
+        """Stream a flat extract to CSV or Parquet for use in other tools"""
+        from database.report_export import ReportExporter
+        
+        compress = self.compress_extracts.get()
+        extension = {'csv': '.csv.gz' if compress else '.csv', 'parquet': '.parquet'}[format]
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filepath = os.path.join(self.app.app_path, "exports", f"{name}_{timestamp}{extension}")
+        
+        self.app.tasks.submit(
+            ReportExporter(self.app.db.db_path).export_extract,
+            name, filepath, format, compress,
+            message=f"Exporting {name}...",
+            with_task=True,
+            on_done=lambda filepath: messagebox.showinfo(
+                "Export Successful",
+                f"{name.title()} exported to: {filepath}"
+            ),
+            on_error=lambda e: messagebox.showerror(
+                "Error", f"Failed to export {name}: {str(e)}")
+        )
+    
     def generate_student_status_report(self):
         """Generate pie chart of student statuses"""
-        try:
-            # Get statistics from database
-            stats = self.app.db.get_student_statistics()
-            
-            # Prepare data
-            labels = ['Active', 'Graduated', 'Dropped Out']
-            sizes = [
-                stats['active_students'], 
-                stats['graduated_students'], 
-                stats['dropouts']
-            ]
-            
-            # Create pie chart
-            plt.figure(figsize=(10, 6))
-            plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-            plt.title('Student Status Distribution')
-            
-            # Save and show report
-            self.save_and_show_plot('student_status_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        self.run_chart_report('student_status_report', self.app.db.get_student_statistics)
     
     def generate_age_distribution_report(self):
         """Generate histogram of student ages"""
-        try:
-            # Fetch student ages from database
-            ages = self.app.db.get_student_ages()
-            
-            plt.figure(figsize=(10, 6))
-            plt.hist(ages, bins=20, edgecolor='black')
-            plt.title('Student Age Distribution')
-            plt.xlabel('Age')
-            plt.ylabel('Number of Students')
-            
-            # Save and show report
-            self.save_and_show_plot('age_distribution_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        self.run_chart_report('age_distribution_report', self.app.db.get_student_ages)
     
     def generate_gender_distribution_report(self):
         """Generate bar chart of gender distribution"""
-        try:
-            # Get gender statistics
-            gender_stats = self.app.db.get_gender_distribution()
-            
-            plt.figure(figsize=(10, 6))
-            plt.bar(gender_stats.keys(), gender_stats.values())
-            plt.title('Gender Distribution')
-            plt.xlabel('Gender')
-            plt.ylabel('Number of Students')
-            
-            # Save and show report
-            self.save_and_show_plot('gender_distribution_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        self.run_chart_report('gender_distribution_report', self.app.db.get_gender_distribution)
     
     def export_full_student_list(self):
         """Export complete student list to Excel"""
-        try:
-            # Get full student list from database
-            students = self.app.db.export_students_to_excel()
-            
-            messagebox.showinfo(
+        self.app.tasks.submit(
+            lambda task: self.app.db.export_students_to_excel(progress=task.report),
+            message="Exporting student list...",
+            with_task=True,
+            on_done=lambda filepath: messagebox.showinfo(
                 "Export Successful", 
-                f"Student list exported to: {students}"
-            )
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export student list: {str(e)}")
+                f"Student list exported to: {filepath}"
+            ),
+            on_error=lambda e: messagebox.showerror(
+                "Error", f"Failed to export student list: {str(e)}")
+        )
     
     def generate_monthly_revenue_report(self):
         """Generate line chart of monthly revenue"""
-        try:
-            # Get monthly revenue data
-            revenue_data = self.app.db.get_monthly_revenue()
-            
-            plt.figure(figsize=(12, 6))
-            plt.plot(revenue_data.keys(), revenue_data.values(), marker='o')
-            plt.title('Monthly Revenue Analysis')
-            plt.xlabel('Month')
-            plt.ylabel('Revenue (₦)')
-            plt.xticks(rotation=45)
-            
-            # Save and show report
-            self.save_and_show_plot('monthly_revenue_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        self.run_chart_report('monthly_revenue_report', self.app.db.get_monthly_revenue)
     
     def generate_outstanding_payments_report(self):
         """Generate report of outstanding payments"""
-        try:
-            # Get outstanding payments
-            outstanding = self.app.db.get_outstanding_payments()
-            
-            # Export to Excel
-            df = pd.DataFrame(outstanding)
-            filename = f"outstanding_payments_{datetime.now().strftime('%Y%m%d')}.xlsx"
-            filepath = os.path.join(self.app.app_path, "exports", filename)
-            
-            df.to_excel(filepath, index=False)
-            
-            messagebox.showinfo(
+        filename = f"outstanding_payments_{datetime.now().strftime('%Y%m%d')}.xlsx"
+        filepath = os.path.join(self.app.app_path, "exports", filename)
+        
+        self.app.tasks.submit(
+            self.write_outstanding_payments_report, filepath,
+            message="Exporting outstanding payments...",
+            on_done=lambda filepath: messagebox.showinfo(
                 "Report Generated", 
                 f"Outstanding payments report saved to: {filepath}"
-            )
+            ),
+            on_error=lambda e: messagebox.showerror(
+                "Error", f"Failed to generate report: {str(e)}")
+        )
+    
+    def write_outstanding_payments_report(self, filepath):
+        """Write the outstanding payments workbook (runs on a worker thread)"""
+        from database.report_export import ReportExporter
         
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        return ReportExporter(self.app.db.db_path).export(filepath,
+                                                          sheets=['Outstanding'],
+                                                          charts=False)
     
     def generate_performance_correlation_report(self):
         """Generate correlation analysis between different student metrics"""
-        try:
-            # Fetch comprehensive student data
-            students_df = pd.DataFrame(self.app.db.get_student_performance_data())
-            
-            # Create correlation heatmap
-            plt.figure(figsize=(12, 10))
-            
-            if SEABORN_AVAILABLE:
-                # Use seaborn if available
-                sns.heatmap(
-                    students_df.corr(), 
-                    annot=True, 
-                    cmap='coolwarm', 
-                    linewidths=0.5
-                )
-            else:
-                # Fallback to matplotlib
-                plt.imshow(
-                    students_df.corr(), 
-                    cmap='coolwarm', 
-                    aspect='auto'
-                )
-                plt.colorbar()
-                plt.xticks(range(len(students_df.columns)), students_df.columns, rotation=45)
-                plt.yticks(range(len(students_df.columns)), students_df.columns)
-            
-            plt.title('Student Performance Correlation Analysis')
-            
-            # Save and show report
-            self.save_and_show_plot('performance_correlation_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate correlation report: {str(e)}")
+        self.run_chart_report('performance_correlation_report',
+                              self.app.db.get_student_performance_data)
     
     def generate_retention_prediction_report(self):
         """Generate predictive insights for student retention"""
-        try:
-            # Fetch retention data
-            retention_data = self.app.db.get_student_retention_data()
-            
-            # Create stacked bar chart
-            plt.figure(figsize=(12, 6))
-            retention_df = pd.DataFrame(retention_data)
-            
-            retention_df.plot(
-                kind='bar', 
-                stacked=True, 
-                x='programme', 
-                y=['retained', 'dropped']
-            )
-            plt.title('Student Retention Prediction by Programme')
-            plt.xlabel('Programme')
-            plt.ylabel('Number of Students')
-            plt.legend(title='Retention Status')
-            
-            # Save and show report
-            self.save_and_show_plot('retention_prediction_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate retention report: {str(e)}")
+        self.run_chart_report('retention_prediction_report',
+                              self.app.db.get_student_retention_data)
     
     def generate_cohort_analysis_report(self):
-        """Generate cohort analysis report"""
-        try:
-            # Fetch cohort data
-            cohort_data = self.app.db.get_student_cohort_data()
-            
-            # Create line plot for cohort progression
-            plt.figure(figsize=(12, 6))
-            cohort_df = pd.DataFrame(cohort_data)
-            
-            for cohort, data in cohort_df.groupby('cohort'):
-                plt.plot(data['period'], data['students'], label=cohort)
-            
-            plt.title('Student Cohort Progression')
-            plt.xlabel('Time Period')
-            plt.ylabel('Number of Students')
-            plt.legend(title='Cohort')
-            
-            # Save and show report
-            self.save_and_show_plot('cohort_analysis_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate cohort report: {str(e)}")
+        """Generate cohort retention, graduation and collection heatmaps"""
+        self.run_chart_report('cohort_analysis_report', self.app.db.get_cohort_extract,
+                              snapshot=True)
     
     def export_comprehensive_report(self):
         """Export a comprehensive report with multiple sections"""
-        try:
-            # Create Excel writer
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"comprehensive_report_{timestamp}.xlsx"
-            filepath = os.path.join(self.app.app_path, "exports", filename)
-            
-            with pd.ExcelWriter(filepath) as writer:
-                # Student Statistics
-                student_stats = pd.DataFrame(self.app.db.get_student_statistics())
-                student_stats.to_excel(writer, sheet_name='Student Statistics', index=False)
-                
-                # Financial Summary
-                financial_summary = pd.DataFrame(self.app.db.get_financial_summary())
-                financial_summary.to_excel(writer, sheet_name='Financial Summary', index=False)
-                
-                # Programme Performance
-                programme_performance = pd.DataFrame(
-                    self.app.db.generate_programme_completion_report()
-                )
-                programme_performance.to_excel(
-                    writer, 
-                    sheet_name='Programme Performance', 
-                    index=False
-                )
-            
-            messagebox.showinfo(
-                "Export Successful", 
-                f"Comprehensive report exported to: {filepath}"
-            )
-            
-            # Open the file
-            if platform.system() == 'Darwin':  # macOS
-                subprocess.run(['open', filepath])
-            elif platform.system() == 'Windows':
-                os.startfile(filepath)
-            else:  # Linux
-                subprocess.run(['xdg-open', filepath])
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export comprehensive report: {str(e)}")
-    
-    def save_and_show_plot(self, report_name):
-        """Save and optionally show matplotlib plot"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"comprehensive_report_{timestamp}.xlsx"
+        filepath = os.path.join(self.app.app_path, "exports", filename)
+        
+        self.app.tasks.submit(
+            self.write_comprehensive_report, filepath,
+            message="Exporting comprehensive report...",
+            with_task=True,
+            on_done=self.comprehensive_report_done,
+            on_error=lambda e: messagebox.showerror(
+                "Error", f"Failed to export comprehensive report: {str(e)}")
+        )
+    
+    def write_comprehensive_report(self, filepath, task=None):
+        """Write the full report pack (runs on a worker thread)"""
+        from database.report_export import ReportExporter
+        
+        return ReportExporter(self.app.db.db_path).export(filepath, task=task)
+    
+    def comprehensive_report_done(self, filepath):
+        messagebox.showinfo(
+            "Export Successful", 
+            f"Comprehensive report exported to: {filepath}"
+        )
+        
+        # Open the file
+        if platform.system() == 'Darwin':  # macOS
+            subprocess.run(['open', filepath])
+        elif platform.system() == 'Windows':
+            os.startfile(filepath)
+        else:  # Linux
+            subprocess.run(['xdg-open', filepath])
+    
+    def run_chart_report(self, report_name, load, snapshot=False):
+        """
+        Show a chart report in the panel without blocking the window
+        
+        A chart is only redrawn when the tables behind it have changed since
+        it was last drawn; otherwise the cached image is shown at once.
+        New charts have their data read on a worker thread and are drawn in
+        a worker process with the Agg backend (see utils.report_charts).
+        
+        Args:
+            report_name (str): Chart key
+            load (callable): Database method returning the report data
+            snapshot (bool, optional): Read through a report session, for
+                loads running several queries that must agree; those served
+                by the analytics snapshot or one query do not need it
+        """
+        from utils.report_charts import render_chart
+        
+        self.current_chart = report_name
+        version = self.app.db.get_table_versions()
+        png = self.app.chart_cache.get(report_name, version)
+        if png is not None:
+            self.show_chart(report_name, png)
+            return
+        
+        self.chart_title.config(text=f"{self.chart_name(report_name)} (loading...)")
+        self.export_chart_button.state(['disabled'])
+        
+        def on_error(e):
+            messagebox.showerror("Error", f"Failed to generate report: {str(e)}")
+        
+        def on_rendered(png):
+            self.app.chart_cache.put(report_name, version, png)
+            if self.winfo_exists() and self.current_chart == report_name:
+                self.show_chart(report_name, png)
+        
+        def render(data):
+            self.app.tasks.submit(render_chart, report_name, data,
+                                  process=True,
+                                  message="Drawing chart...",
+                                  on_done=on_rendered,
+                                  on_error=on_error)
+        
+        def read():
+            # The session's snapshot is only taken if a read reaches it
+            with self.app.db.report_session():
+                return load()
+        
+        self.app.tasks.submit(read if snapshot else load,
+                              message="Loading report data...",
+                              on_done=render,
+                              on_error=on_error)
+    
+    def chart_name(self, report_name):
+        return report_name.replace('_report', '').replace('_', ' ').title()
+    
+    def show_chart(self, report_name, png):
+        """Display a rendered chart, decoding each image only once"""
+        cached = self.chart_images.get(report_name)
+        if cached is None or cached[0] is not png:
+            image = tk.PhotoImage(data=base64.b64encode(png).decode('ascii'), format='png')
+            cached = self.chart_images[report_name] = (png, image)
+        
+        self.chart_label.config(image=cached[1])
+        self.chart_title.config(text=self.chart_name(report_name))
+        self.export_chart_button.state(['!disabled'])
+    
+    def export_chart(self):
+        """Save the chart currently shown to the exports folder"""
+        cached = self.chart_images.get(self.current_chart)
+        if cached is None:
+            return
+        
         # Ensure exports directory exists
         exports_dir = os.path.join(self.app.app_path, "exports")
         os.makedirs(exports_dir, exist_ok=True)
         
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{report_name}_{timestamp}.png"
+        filename = f"{self.current_chart}_{timestamp}.png"
         filepath = os.path.join(exports_dir, filename)
         
-        # Save plot
-        plt.tight_layout()
-        plt.savefig(filepath)
+        try:
+            with open(filepath, 'wb') as f:
+                f.write(cached[0])
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export chart: {str(e)}")
+            return
         
-        # Ask if user wants to view
+        self.show_report(filepath)
+    
+    def show_report(self, filepath):
+        """Offer to open a generated chart"""
         if messagebox.askyesno("Report Generated", 
                               f"Report saved to {filepath}.\n\nDo you want to view the report?"):
             try:
@@ -445,153 +444,23 @@ class ReportsPage(ttk.Frame):
                     subprocess.run(['xdg-open', filepath])
             except Exception as e:
                 messagebox.showerror("Error", f"Could not open file: {str(e)}")
-        
-        # Close the plot to free memory
-        plt.close()
     
     def generate_payment_trends_report(self):
         """Generate payment trends report"""
-        try:
-            # Get payment trends data from database
-            trends_data = self.app.db.generate_payment_trends_report()
-            
-            # Create line plot for payment trends
-            plt.figure(figsize=(12, 6))
-            
-            # Convert trends data to DataFrame for easier plotting
-            trends_df = pd.DataFrame(trends_data)
-            
-            # Plot payment count and total amount
-            plt.subplot(2, 1, 1)
-            plt.plot(trends_df['month'], trends_df['payment_count'], marker='o')
-            plt.title('Number of Payments per Month')
-            plt.xlabel('Month')
-            plt.ylabel('Payment Count')
-            plt.xticks(rotation=45)
-            
-            plt.subplot(2, 1, 2)
-            plt.plot(trends_df['month'], trends_df['total_amount'], marker='o', color='green')
-            plt.title('Total Payment Amount per Month')
-            plt.xlabel('Month')
-            plt.ylabel('Total Amount (₦)')
-            plt.xticks(rotation=45)
-            
-            plt.tight_layout()
-            
-            # Save and show report
-            self.save_and_show_plot('payment_trends_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate payment trends report: {str(e)}")
+        self.run_chart_report('payment_trends_report',
+                              self.app.db.generate_payment_trends_report)
     
     def generate_programme_enrollment_report(self):
         """Generate programme enrollment analysis report"""
-        try:
-            # Get programme enrollment data from database
-            enrollment_data = self.app.db.generate_programme_enrollment_report()
-            
-            # Create bar chart for programme enrollment
-            plt.figure(figsize=(12, 6))
-            
-            # Convert enrollment data to DataFrame
-            enrollment_df = pd.DataFrame(enrollment_data)
-            
-            # Plot total students and graduated students
-            plt.bar(
-                enrollment_df['programme'], 
-                enrollment_df['total_students'], 
-                label='Total Students'
-            )
-            plt.bar(
-                enrollment_df['programme'], 
-                enrollment_df['graduated_students'], 
-                label='Graduated Students'
-            )
-            
-            plt.title('Programme Enrollment and Graduation Analysis')
-            plt.xlabel('Programme')
-            plt.ylabel('Number of Students')
-            plt.xticks(rotation=45, ha='right')
-            plt.legend()
-            plt.tight_layout()
-            
-            # Save and show report
-            self.save_and_show_plot('programme_enrollment_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate programme enrollment report: {str(e)}")
+        self.run_chart_report('programme_enrollment_report',
+                              self.app.db.generate_programme_enrollment_report)
     
     def generate_programme_revenue_report(self):
         """Generate programme revenue breakdown report"""
-        try:
-            # Get programme revenue data from database
-            revenue_data = self.app.db.generate_programme_revenue_report()
-            
-            # Create bar chart for programme revenue
-            plt.figure(figsize=(12, 6))
-            
-            # Convert revenue data to DataFrame
-            revenue_df = pd.DataFrame(revenue_data)
-            
-            # Plot total revenue and total students
-            plt.subplot(1, 2, 1)
-            plt.bar(revenue_df['programme'], revenue_df['total_revenue'])
-            plt.title('Total Revenue by Programme')
-            plt.xlabel('Programme')
-            plt.ylabel('Total Revenue (₦)')
-            plt.xticks(rotation=45, ha='right')
-            
-            plt.subplot(1, 2, 2)
-            plt.bar(revenue_df['programme'], revenue_df['total_students'], color='green')
-            plt.title('Total Students by Programme')
-            plt.xlabel('Programme')
-            plt.ylabel('Number of Students')
-            plt.xticks(rotation=45, ha='right')
-            
-            plt.tight_layout()
-            
-            # Save and show report
-            self.save_and_show_plot('programme_revenue_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate programme revenue report: {str(e)}")
+        self.run_chart_report('programme_revenue_report',
+                              self.app.db.generate_programme_revenue_report)
     
     def generate_programme_completion_report(self):
         """Generate programme completion rates report"""
-        try:
-            # Get programme completion data from database
-            completion_data = self.app.db.generate_programme_completion_report()
-            
-            # Create bar chart for programme completion rates
-            plt.figure(figsize=(12, 6))
-            
-            # Convert completion data to DataFrame
-            completion_df = pd.DataFrame(completion_data)
-            
-            # Plot completion rates
-            plt.bar(
-                completion_df['programme'], 
-                completion_df['completion_rate']
-            )
-            
-            plt.title('Programme Completion Rates')
-            plt.xlabel('Programme')
-            plt.ylabel('Completion Rate (%)')
-            plt.xticks(rotation=45, ha='right')
-            
-            # Add value labels on top of each bar
-            for i, v in enumerate(completion_df['completion_rate']):
-                plt.text(
-                    i, v + 1, 
-                    f'{v:.1f}%', 
-                    ha='center', 
-                    va='bottom'
-                )
-            
-            plt.tight_layout()
-            
-            # Save and show report
-            self.save_and_show_plot('programme_completion_report')
-        
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate programme completion report: {str(e)}")
\ No newline at end of file
+        self.run_chart_report('programme_completion_report',
+                              self.app.db.generate_programme_completion_report)
@@ -1,7 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
 import os
+from utils.settings import load_settings, save_settings, get_setting
+from database.write_policy import WritePolicy
 
 class SettingsPage(ttk.Frame):
     def __init__(self, parent, app):
@@ -58,6 +59,16 @@ class SettingsPage(ttk.Frame):
         notebook.add(backup_frame, text="Backup")
         self.create_backup_settings(backup_frame)
         
+        # Archive Settings
+        archive_frame = ttk.Frame(notebook, padding=20)
+        notebook.add(archive_frame, text="Archive")
+        self.create_archive_settings(archive_frame)
+        
+        # Multi-desk Sync Settings
+        sync_frame = ttk.Frame(notebook, padding=20)
+        notebook.add(sync_frame, text="Sync")
+        self.create_sync_settings(sync_frame)
+        
         # Save button
         save_btn = ttk.Button(self,
                             text="Save Changes",
@@ -166,25 +177,242 @@ class SettingsPage(ttk.Frame):
         ttk.Spinbox(freq_frame, from_=1, to=30, width=5, textvariable=self.backup_freq_var).pack(side=tk.LEFT, padx=5)
         ttk.Label(freq_frame, text="days").pack(side=tk.LEFT)
         
+        self.incremental_var = tk.BooleanVar(value=get_setting(self.settings, 'backup_incremental'))
+        ttk.Checkbutton(backup_frame,
+                       text="Incremental backups (store only what changed since the last one)",
+                       variable=self.incremental_var).pack(anchor="w")
+        
+        # Retention
+        keep_frame = ttk.Frame(backup_frame)
+        keep_frame.pack(fill=tk.X)
+        
+        ttk.Label(keep_frame, text="Keep the last:").pack(side=tk.LEFT)
+        self.backup_keep_var = tk.StringVar(value=str(get_setting(self.settings, 'backup_keep')))
+        ttk.Spinbox(keep_frame, from_=1, to=100, width=5, textvariable=self.backup_keep_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(keep_frame, text="backups").pack(side=tk.LEFT)
+        
         # Manual Backup Button
         ttk.Button(backup_frame,
                   text="Backup Now",
                   command=self.manual_backup).pack(anchor="w", pady=10)
+        
+        self.last_backup_label = ttk.Label(backup_frame, text="")
+        self.last_backup_label.pack(anchor="w")
+        self.update_last_backup()
+    
+    def create_archive_settings(self, parent):
+        archive_frame = ttk.LabelFrame(parent, text="Student Archive", padding=10)
+        archive_frame.pack(fill=tk.X, pady=(0, 20))
+        
+        ttk.Label(archive_frame,
+                  text="Graduated and dropped-out students with no activity for a while are moved\n"
+                       "to archive.db. Reports still include them; search finds and restores them.",
+                  justify=tk.LEFT).pack(anchor="w", pady=(0, 10))
+        
+        # Cutoff
+        age_frame = ttk.Frame(archive_frame)
+        age_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(age_frame, text="Archive after:").pack(side=tk.LEFT)
+        self.archive_years_var = tk.StringVar(value=str(get_setting(self.settings, 'archive_after_years')))
+        ttk.Spinbox(age_frame, from_=1, to=20, width=5, textvariable=self.archive_years_var,
+                    command=self.update_archive_count).pack(side=tk.LEFT, padx=5)
+        ttk.Label(age_frame, text="years without activity").pack(side=tk.LEFT)
+        
+        self.archive_unpaid_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(archive_frame,
+                       text="Include students who still owe fees",
+                       variable=self.archive_unpaid_var,
+                       command=self.update_archive_count).pack(anchor="w")
+        
+        self.archive_count_label = ttk.Label(archive_frame, text="")
+        self.archive_count_label.pack(anchor="w", pady=(10, 0))
+        
+        ttk.Button(archive_frame,
+                  text="Archive Now",
+                  command=self.archive_students).pack(anchor="w", pady=10)
+        
+        self.update_archive_count()
+    
+    def archive_cutoff(self):
+        try:
+            years = int(self.archive_years_var.get())
+        except ValueError:
+            years = get_setting({}, 'archive_after_years')
+        return self.app.db.archive.cutoff(years)
+    
+    def update_archive_count(self):
+        """Show how many students the current options would archive"""
+        self.app.tasks.submit(
+            self.app.db.archive.count_candidates,
+            self.archive_cutoff(),
+            self.archive_unpaid_var.get(),
+            message=None,
+            on_done=lambda count: self.archive_count_label.configure(
+                text=f"{count} students can be archived")
+        )
+    
+    def archive_students(self):
+        """Move eligible students to the archive in the background"""
+        if not messagebox.askyesno("Archive Students",
+                                   "Move eligible students and their payments to the archive?"):
+            return
+        
+        self.app.tasks.submit(
+            self.app.db.archive.archive_students,
+            self.archive_cutoff(),
+            self.archive_unpaid_var.get(),
+            message="Archiving students...",
+            with_task=True,
+            on_done=self.archive_finished,
+            on_error=lambda e: messagebox.showerror("Error", f"Archiving failed: {e}")
+        )
+    
+    def archive_finished(self, count):
+        self.app.db.invalidate_caches()
+        self.update_archive_count()
+        messagebox.showinfo("Archive", f"{count} students archived.")
+    
+    def create_sync_settings(self, parent):
+        sync_frame = ttk.LabelFrame(parent, text="Front Desk Sync", padding=10)
+        sync_frame.pack(fill=tk.X, pady=(0, 20))
+        
+        ttk.Label(sync_frame,
+                  text="Desks that share students and payments each need their own prefix, which is\n"
+                       "added to the registration and receipt numbers they issue.",
+                  justify=tk.LEFT).pack(anchor="w", pady=(0, 10))
+        
+        # Desk prefix
+        prefix_frame = ttk.Frame(sync_frame)
+        prefix_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(prefix_frame, text="Desk prefix:").pack(side=tk.LEFT)
+        self.sync_prefix_var = tk.StringVar(value=self.app.db.desk_prefix())
+        ttk.Entry(prefix_frame, textvariable=self.sync_prefix_var, width=5).pack(side=tk.LEFT, padx=5)
+        ttk.Label(prefix_frame, text="(1 to 3 letters)").pack(side=tk.LEFT)
+        
+        # Shared folder
+        ttk.Label(sync_frame, text="Shared sync folder:").pack(anchor="w")
+        folder_frame = ttk.Frame(sync_frame)
+        folder_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.sync_folder_var = tk.StringVar(value=get_setting(self.settings, 'sync_folder'))
+        ttk.Entry(folder_frame, textvariable=self.sync_folder_var, width=40).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(folder_frame, text="Browse", command=self.browse_sync_folder).pack(side=tk.LEFT)
+        
+        # Direct connections
+        ttk.Label(sync_frame, text="Other desks (host:port, comma separated):").pack(anchor="w")
+        self.sync_peers_var = tk.StringVar(value=get_setting(self.settings, 'sync_peers'))
+        ttk.Entry(sync_frame, textvariable=self.sync_peers_var, width=40).pack(anchor="w", pady=(0, 10))
+        
+        port_frame = ttk.Frame(sync_frame)
+        port_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(port_frame, text="Accept desks on port:").pack(side=tk.LEFT)
+        self.sync_port_var = tk.StringVar(value=str(get_setting(self.settings, 'sync_port')))
+        ttk.Entry(port_frame, textvariable=self.sync_port_var, width=7).pack(side=tk.LEFT, padx=5)
+        ttk.Label(port_frame, text="(0 to turn off)").pack(side=tk.LEFT)
+        
+        host_frame = ttk.Frame(sync_frame)
+        host_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(host_frame, text="This desk's LAN address:").pack(side=tk.LEFT)
+        self.sync_host_var = tk.StringVar(value=get_setting(self.settings, 'sync_host'))
+        ttk.Entry(host_frame, textvariable=self.sync_host_var, width=16).pack(side=tk.LEFT, padx=5)
+        ttk.Label(host_frame, text="(blank: this computer only)").pack(side=tk.LEFT)
+        
+        key_frame = ttk.Frame(sync_frame)
+        key_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(key_frame, text="Sync key:").pack(side=tk.LEFT)
+        self.sync_key_var = tk.StringVar(value=get_setting(self.settings, 'sync_key'))
+        ttk.Entry(key_frame, textvariable=self.sync_key_var, width=20, show="*").pack(side=tk.LEFT, padx=5)
+        ttk.Label(key_frame, text="(needed to accept or make direct connections)").pack(side=tk.LEFT)
+        
+        # Frequency
+        interval_frame = ttk.Frame(sync_frame)
+        interval_frame.pack(fill=tk.X)
+        
+        ttk.Label(interval_frame, text="Sync every:").pack(side=tk.LEFT)
+        self.sync_interval_var = tk.StringVar(value=str(get_setting(self.settings, 'sync_interval')))
+        ttk.Spinbox(interval_frame, from_=1, to=120, width=5, textvariable=self.sync_interval_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(interval_frame, text="minutes").pack(side=tk.LEFT)
+        
+        ttk.Button(sync_frame,
+                  text="Sync Now",
+                  command=self.manual_sync).pack(anchor="w", pady=10)
+        
+        # Waiting on other desks' writes
+        busy_frame = ttk.LabelFrame(parent, text="Shared Database", padding=10)
+        busy_frame.pack(fill=tk.X, pady=(0, 20))
+        
+        ttk.Label(busy_frame,
+                  text="When another desk is saving, a save waits for it, then tries again a few times\n"
+                       "before reporting that the database is busy.",
+                  justify=tk.LEFT).pack(anchor="w", pady=(0, 10))
+        
+        timeout_frame = ttk.Frame(busy_frame)
+        timeout_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(timeout_frame, text="Wait up to:").pack(side=tk.LEFT)
+        self.busy_timeout_var = tk.StringVar(value=str(get_setting(self.settings, 'busy_timeout')))
+        ttk.Spinbox(timeout_frame, from_=1, to=60, width=5, textvariable=self.busy_timeout_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(timeout_frame, text="seconds").pack(side=tk.LEFT)
+        
+        retries_frame = ttk.Frame(busy_frame)
+        retries_frame.pack(fill=tk.X)
+        
+        ttk.Label(retries_frame, text="Then try again:").pack(side=tk.LEFT)
+        self.write_retries_var = tk.StringVar(value=str(get_setting(self.settings, 'write_retries')))
+        ttk.Spinbox(retries_frame, from_=0, to=10, width=5, textvariable=self.write_retries_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(retries_frame, text="times").pack(side=tk.LEFT)
+    
+    def save_desk_prefix(self):
+        """Store a changed desk prefix; False (after telling the user) if it is invalid"""
+        from database.sync import SyncError
+        prefix = self.sync_prefix_var.get().strip().upper()
+        if prefix == self.app.db.desk_prefix():
+            return True
+        try:
+            self.app.sync_engine().set_prefix(prefix)
+        except SyncError as e:
+            messagebox.showerror("Error", str(e))
+            return False
+        self.sync_prefix_var.set(prefix)
+        return True
+    
+    def manual_sync(self):
+        """Sync with the folder and desks entered above in the background"""
+        if not self.save_desk_prefix():
+            return
+        
+        started = self.app.start_sync(
+            folder=self.sync_folder_var.get(),
+            peers=self.sync_peers_var.get(),
+            on_done=self.sync_finished,
+            on_error=lambda e: messagebox.showerror("Error", f"Sync failed: {e}")
+        )
+        if not started:
+            messagebox.showinfo("Sync", "A sync is already in progress, or no folder or desk is set.")
+    
+    def sync_finished(self, summary):
+        self.app.db.invalidate_caches()
+        message = (f"Sent {summary['exported']} changes, applied {summary['applied']}.\n"
+                   f"{summary['conflicts']} conflicts kept this desk's data.")
+        if summary['failed']:
+            message += f"\nCould not reach: {', '.join(summary['failed'])}"
+        messagebox.showinfo("Sync", message)
     
     def load_settings(self):
         """Load settings from JSON file"""
-        settings_path = os.path.join(self.app.app_path, "config", "settings.json")
-        try:
-            if os.path.exists(settings_path):
-                with open(settings_path, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-        return {}
+        return load_settings(self.app.app_path)
     
     def save_settings(self):
         """Save settings to JSON file"""
-        settings = {
+        # Start from the file, not the copy loaded with the page, so values the
+        # app saved meanwhile (such as notifications_last_run) are kept
+        settings = {**self.settings, **self.load_settings()}
+        settings.update({
             'school_name': self.school_name_var.get(),
             'address': self.address_var.get(),
             'email': self.email_var.get(),
@@ -196,16 +424,28 @@ class SettingsPage(ttk.Frame):
             'auto_print': self.autoprint_var.get(),
             'backup_path': self.backup_path_var.get(),
             'auto_backup': self.autobackup_var.get(),
-            'backup_frequency': self.backup_freq_var.get()
-        }
+            'backup_frequency': self.backup_freq_var.get(),
+            'backup_keep': self.backup_keep_var.get(),
+            'backup_incremental': self.incremental_var.get(),
+            'archive_after_years': self.archive_years_var.get(),
+            'sync_folder': self.sync_folder_var.get(),
+            'sync_peers': self.sync_peers_var.get(),
+            'sync_port': self.sync_port_var.get(),
+            'sync_host': self.sync_host_var.get().strip(),
+            'sync_key': self.sync_key_var.get(),
+            'sync_interval': self.sync_interval_var.get(),
+            'busy_timeout': self.busy_timeout_var.get(),
+            'write_retries': self.write_retries_var.get()
+        })
+        
+        if not self.save_desk_prefix():
+            return
         
         try:
-            config_dir = os.path.join(self.app.app_path, "config")
-            os.makedirs(config_dir, exist_ok=True)
-            
-            settings_path = os.path.join(config_dir, "settings.json")
-            with open(settings_path, 'w') as f:
-                json.dump(settings, f, indent=4)
+            save_settings(self.app.app_path, settings)
+            self.settings = settings
+            self.app.start_sync_server()
+            self.app.db.write_policy = WritePolicy.configured(self.app.app_path)
             
             messagebox.showinfo("Success", "Settings saved successfully!")
             
@@ -229,7 +469,38 @@ class SettingsPage(ttk.Frame):
         if dirname:
             self.backup_path_var.set(dirname)
     
+    def browse_sync_folder(self):
+        """Browse for the shared sync folder"""
+        from tkinter import filedialog
+        dirname = filedialog.askdirectory(title="Select Sync Folder")
+        if dirname:
+            self.sync_folder_var.set(dirname)
+    
     def manual_backup(self):
-        """Perform manual backup"""
-        # TODO: Implement backup functionality
-        messagebox.showinfo("Backup", "Backup functionality will be implemented soon!") 
\ No newline at end of file
+        """Back up the database and receipts in the background"""
+        started = self.app.start_backup(
+            backup_dir=self.backup_path_var.get(),
+            keep=self.backup_keep_var.get(),
+            incremental=self.incremental_var.get(),
+            on_done=self.backup_finished,
+            on_error=self.backup_failed
+        )
+        if not started:
+            messagebox.showinfo("Backup", "A backup is already in progress.")
+    
+    def backup_finished(self, archive):
+        self.update_last_backup()
+        messagebox.showinfo("Backup", f"Backup saved:\n{archive}")
+    
+    def backup_failed(self, error):
+        messagebox.showerror("Error", f"Backup failed: {error}")
+    
+    def update_last_backup(self):
+        """Show when the newest backup in the chosen location was taken"""
+        backups = self.app.backup_engine(backup_dir=self.backup_path_var.get(),
+                                         incremental=self.incremental_var.get()).backups()
+        if backups:
+            text = f"Last backup: {backups[0][0].strftime('%Y-%m-%d %H:%M')}"
+        else:
+            text = "No backups yet"
+        self.last_backup_label.configure(text=text)
@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from utils.constants import PROGRAMMES, SCHEDULES
+from utils.constants import SCHEDULES
+from utils.virtual_treeview import VirtualTreeview
+from utils.live_filter import LiveFilterController
 from datetime import datetime
 
 class StudentListPage(ttk.Frame):
@@ -133,7 +135,7 @@ class StudentListPage(ttk.Frame):
         self.programme_var = tk.StringVar()
         programme_combo = ttk.Combobox(controls_frame,
                                      textvariable=self.programme_var,
-                                     values=["All"] + PROGRAMMES,
+                                     values=["All"] + self.app.db.programmes.names(),
                                      state="readonly",
                                      width=30)
         programme_combo.set("All")
@@ -158,10 +160,27 @@ class StudentListPage(ttk.Frame):
                                width=30)
         search_entry.pack(side=tk.LEFT, padx=5)
         
+        # Results update as the filters change; queries run off the Tk thread
+        self.live_filter = LiveFilterController(self,
+                                                params=self.get_filter_params,
+                                                query=self.search_students,
+                                                on_result=self.show_search_results)
+        self.live_filter.watch(self.programme_var, self.schedule_var, self.search_var)
+        
         # Right side - Action buttons
         button_frame = ttk.Frame(filter_frame)
         button_frame.pack(side=tk.RIGHT)
         
+        # Number of students matching the filters
+        self.result_label = ttk.Label(button_frame, text="")
+        self.result_label.pack(side=tk.LEFT, padx=10)
+        
+        # Archived students matching the search, shown on demand
+        self.archived_matches = []
+        self.archived_button = ttk.Button(button_frame,
+                                          text="Archived Matches",
+                                          command=self.show_archived_matches)
+        
         # Apply Filter button
         ttk.Button(button_frame,
                    text="Apply Filter",
@@ -179,28 +198,8 @@ class StudentListPage(ttk.Frame):
         self.schedule_var.set("All")
         self.search_var.set("")
         
-        # Clear the table
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
-        
         # Reload all students
-        students = self.app.db.get_all_students()
-        
-        # Add all students back to treeview with alternating colors
-        for i, student in enumerate(students):
-            tags = ('oddrow',) if i % 2 else ()
-            
-            # Format values with proper spacing
-            values = (
-                student['reg_number'].center(15),
-                student['name'].ljust(40),
-                student['programme'].center(30),
-                student['schedule'].center(15),
-                datetime.strptime(student['start_date'], 
-                                '%Y-%m-%d').strftime('%d/%m/%Y').center(15)
-            )
-            
-            self.student_tree.insert("", "end", values=values, tags=tags)
+        self.filter_students()
     
     def create_student_table(self):
         # Table frame
@@ -217,12 +216,13 @@ class StudentListPage(ttk.Frame):
                        font=("Helvetica", 10),
                        rowheight=30)
         
-        # Create Treeview
+        # Create virtual Treeview; only the visible rows are materialised
         columns = ("reg_number", "name", "programme", "schedule", "start_date")
-        self.student_tree = ttk.Treeview(table_frame,
-                                       columns=columns,
-                                       show="headings",
-                                       style="StudentTable.Treeview")
+        self.student_tree = VirtualTreeview(table_frame,
+                                          columns=columns,
+                                          formatter=self.format_student_row,
+                                          key=lambda student: student['reg_number'],
+                                          style="StudentTable.Treeview")
         
         # Configure columns with exact widths and centered alignment
         column_configs = {
@@ -265,96 +265,104 @@ class StudentListPage(ttk.Frame):
         
         # Add alternating row colors
         self.student_tree.tag_configure('oddrow', background='#F5F5F5')
+        self.student_tree.enable_sorting()
         
-        # Add vertical scrollbar only
-        y_scrollbar = ttk.Scrollbar(table_frame,
-                                   orient=tk.VERTICAL,
-                                   command=self.student_tree.yview)
-        
-        self.student_tree.configure(yscrollcommand=y_scrollbar.set)
-        
-        # Pack widgets
-        self.student_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        y_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Pack widget (includes its own vertical scrollbar)
+        self.student_tree.pack(fill=tk.BOTH, expand=True)
         
-        # Bind double-click to view student profile
-        self.student_tree.bind("<Double-1>", self.view_student_profile)
+        # Double-click to view student profile
+        self.student_tree.on_row_activated(self.view_student_profile)
+    
+    def format_student_row(self, student):
+        """Format a student record for display"""
+        try:
+            start_date = datetime.strptime(student['start_date'],
+                                           '%Y-%m-%d').strftime('%d/%m/%Y')
+        except (TypeError, ValueError):
+            start_date = student['start_date'] or ''
+        
+        return (
+            student['reg_number'],
+            student['name'],
+            student['programme'],
+            student['schedule'],
+            start_date
+        )
     
     def load_students(self):
-        # Clear existing items
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
-        
-        # Get all students
-        students = self.app.db.get_all_students()
-        
-        # Add to treeview with alternating colors
-        for i, student in enumerate(students):
-            tags = ('oddrow',) if i % 2 else ()
-            
-            # Format values with center alignment
-            values = (
-                student['reg_number'].center(15),
-                student['name'].center(40),
-                student['programme'].center(30),
-                student['schedule'].center(15),
-                datetime.strptime(student['start_date'], 
-                                '%Y-%m-%d').strftime('%d/%m/%Y').center(15)
-            )
-            
-            self.student_tree.insert("", "end", values=values, tags=tags)
+        # Page through all students
+        self.student_tree.set_source(self.app.db.get_student_page_source())
+        self.result_label.config(text=f"{self.student_tree.total} students")
     
     def filter_students(self):
-        """Filter students based on selected criteria"""
-        # Clear the current table
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
-        
-        # Get filter values
+        """Filter students based on selected criteria without waiting for the debounce"""
+        self.live_filter.run_now()
+    
+    def get_filter_params(self):
+        """Read the filter controls (Tk thread)"""
         selected_programme = self.programme_var.get()
         selected_schedule = self.schedule_var.get()
-        search_term = self.search_var.get().lower()
-        
-        # Fetch all students
-        students = self.app.db.get_all_students()
+        search_term = self.search_var.get().strip()
         
-        # Apply filters
-        filtered_students = []
-        for student in students:
-            # Programme filter
-            if selected_programme != "All" and student['programme'] != selected_programme:
-                continue
-            
-            # Schedule filter
-            if selected_schedule != "All" and student['schedule'] != selected_schedule:
-                continue
-            
-            # Search filter (check if search term is in name or reg number)
-            if search_term and (search_term not in student['name'].lower() and 
-                                search_term not in student['reg_number'].lower()):
-                continue
-            
-            filtered_students.append(student)
-        
-        # Add filtered students to treeview with alternating colors
-        for i, student in enumerate(filtered_students):
-            tags = ('oddrow',) if i % 2 else ()
-            
-            # Format values with proper spacing
-            values = (
-                student['reg_number'].center(15),
-                student['name'].ljust(40),
-                student['programme'].center(30),
-                student['schedule'].center(15),
-                datetime.strptime(student['start_date'], 
-                                '%Y-%m-%d').strftime('%d/%m/%Y').center(15)
-            )
-            
-            self.student_tree.insert("", "end", values=values, tags=tags)
-        
-        # Show number of filtered results
-        messagebox.showinfo("Filter Results", 
-                           f"Found {len(filtered_students)} students matching the filter criteria.")
+        return {
+            'programme_id': (self.app.db.programmes.get_id(selected_programme)
+                             if selected_programme not in ("", "All") else None),
+            'schedule': selected_schedule if selected_schedule not in ("", "All") else None,
+            'search_term': search_term or None
+        }
+    
+    def search_students(self, params, token):
+        """Run the filtered query and read its first page (worker thread)"""
+        # Filters are applied in SQL so only the visible page is fetched
+        source = self.app.db.get_student_page_source(**params)
+        token.on_cancel(source.interrupt)
+        preloaded = self.student_tree.preload(source)
+        
+        archived = self.app.db.archive.search(params['search_term']) if params['search_term'] else []
+        return source, preloaded, archived
+    
+    def show_search_results(self, result):
+        source, preloaded, archived = result
+        self.student_tree.set_source(source, preloaded=preloaded)
+        self.result_label.config(text=f"{self.student_tree.total} students")
+        
+        self.archived_matches = archived
+        if archived:
+            self.archived_button.config(text=f"Archived Matches ({len(archived)})")
+            self.archived_button.pack(side=tk.LEFT, padx=5, before=self.result_label)
+        else:
+            self.archived_button.pack_forget()
+    
+    def show_archived_matches(self):
+        """List archived students matching the search, with a way to restore them"""
+        dialog = tk.Toplevel(self)
+        dialog.title("Archived Students")
+        dialog.geometry("700x350")
+        dialog.transient(self)
+        
+        columns = ("reg_number", "name", "programme", "status", "archived_at")
+        tree = ttk.Treeview(dialog, columns=columns, show="headings", selectmode="browse")
+        for col, text in zip(columns, ("Registration Number", "Name", "Programme",
+                                       "Status", "Archived")):
+            tree.heading(col, text=text)
+            tree.column(col, width=130, anchor="center")
+        for student in self.archived_matches:
+            tree.insert("", tk.END, iid=student['reg_number'],
+                        values=[student[col] or '' for col in columns])
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        def restore():
+            selection = tree.selection()
+            if not selection:
+                return
+            if self.app.db.archive.restore_student(selection[0]):
+                tree.delete(selection[0])
+                self.app.db.invalidate_caches()
+                self.filter_students()
+            else:
+                messagebox.showerror("Error", "Failed to restore student", parent=dialog)
+        
+        ttk.Button(dialog, text="Restore Selected", command=restore).pack(pady=(0, 10))
     
     def get_payment_status(self, total_paid, total_fee):
         """Calculate payment status based on payments"""
@@ -365,14 +373,9 @@ class StudentListPage(ttk.Frame):
             return f"Partial ({percentage:.1f}%)"
         return "Not Paid"
     
-    def view_student_profile(self, event):
+    def view_student_profile(self, student):
         """Open student profile when double-clicked"""
-        selection = self.student_tree.selection()
-        if not selection:
-            return
-            
-        item = selection[0]
-        reg_number = self.student_tree.item(item)['values'][0]
+        reg_number = student['reg_number']
         
         # Import here to avoid circular imports
         from pages.student_profile import StudentProfileDialog
@@ -380,38 +383,17 @@ class StudentListPage(ttk.Frame):
     
     def export_to_excel(self):
         """Export student list to Excel"""
-        try:
-            filepath = self.app.db.export_students_to_excel()
-            messagebox.showinfo("Success", 
-                              f"Student records exported successfully to:\n{filepath}")
-        except Exception as e:
-            messagebox.showerror("Error", 
-                               f"Failed to export student records: {str(e)}") 
-    
-    def sort_treeview(self, col):
-        """Sort treeview when column header is clicked"""
-        if self.sort_column == col:
-            self.sort_reverse = not self.sort_reverse
-        else:
-            self.sort_column = col
-            self.sort_reverse = False
-        
-        items = [(self.student_tree.set(item, col), item) 
-                 for item in self.student_tree.get_children('')]
-        
-        # Custom sorting for date column
-        if col == "start_date":
-            items.sort(key=lambda x: datetime.strptime(x[0], '%d/%m/%Y'), 
-                      reverse=self.sort_reverse)
-        else:
-            items.sort(reverse=self.sort_reverse)
-        
-        # Rearrange items
-        for index, (_, item) in enumerate(items):
-            self.student_tree.move(item, '', index)
-            # Reapply alternating row colors
-            tags = ('oddrow',) if index % 2 else ()
-            self.student_tree.item(item, tags=tags)
+        self.app.tasks.submit(
+            lambda task: self.app.db.export_students_to_excel(progress=task.report),
+            message="Exporting student records...",
+            with_task=True,
+            on_done=lambda filepath: messagebox.showinfo(
+                "Success", 
+                f"Student records exported successfully to:\n{filepath}"),
+            on_error=lambda e: messagebox.showerror(
+                "Error", 
+                f"Failed to export student records: {str(e)}")
+        )
     
     def show_schedule_reports(self):
         """Show detailed schedule reports"""
@@ -4,6 +4,7 @@ from datetime import datetime
 import os
 import platform
 import subprocess
+from utils.table_binding import KeyedTableBinding
 
 class StudentProfileDialog(tk.Toplevel):
     def __init__(self, parent, app, reg_number):
@@ -353,108 +354,116 @@ class StudentProfileDialog(tk.Toplevel):
 
     def export_pdf(self):
         """Export student profile as PDF"""
-        try:
-            from reportlab.lib import colors
-            from reportlab.lib.pagesizes import A4
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"student_profile_{self.reg_number}_{timestamp}.pdf"
-            filepath = os.path.join(self.app.app_path, "exports", filename)
-            
-            # Ensure exports directory exists
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            # Create PDF
-            doc = SimpleDocTemplate(filepath, pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # Title
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                alignment=1
-            )
-            story.append(Paragraph("Student Profile", title_style))
-            story.append(Spacer(1, 20))
-            
-            # Student Details
-            data = [
-                ["Registration Number:", self.student_data.get('reg_number', '')],
-                ["Name:", self.student_data.get('name', '')],
-                ["Age:", str(self.student_data.get('age', ''))],
-                ["Gender:", self.student_data.get('gender', '')],
-                ["Programme:", self.student_data.get('programme', '')],
-                ["Schedule:", self.student_data.get('schedule', '')],
-                ["Duration:", self.student_data.get('duration', '')],
-                ["Start Date:", self.format_date(self.student_data.get('start_date', ''))],
-                ["Programme Fee:", f"₦{self.student_data.get('programme_fee', 0):,.2f}"],
-                ["Status:", self.get_student_status()]
-            ]
+        # Generate filename with timestamp
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"student_profile_{self.reg_number}_{timestamp}.pdf"
+        filepath = os.path.join(self.app.app_path, "exports", filename)
+        
+        self.app.tasks.submit(
+            self.build_profile_pdf, filepath,
+            message="Building profile PDF...",
+            on_done=self.export_pdf_done,
+            on_error=lambda e: messagebox.showerror(
+                "Error", f"Failed to export profile: {str(e)}")
+        )
+    
+    def build_profile_pdf(self, filepath):
+        """Write the profile PDF (runs on a worker thread)"""
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        
+        # Ensure exports directory exists
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        # Create PDF
+        doc = SimpleDocTemplate(filepath, pagesize=A4)
+        styles = getSampleStyleSheet()
+        story = []
+        
+        # Title
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=30,
+            alignment=1
+        )
+        story.append(Paragraph("Student Profile", title_style))
+        story.append(Spacer(1, 20))
+        
+        # Student Details
+        data = [
+            ["Registration Number:", self.student_data.get('reg_number', '')],
+            ["Name:", self.student_data.get('name', '')],
+            ["Age:", str(self.student_data.get('age', ''))],
+            ["Gender:", self.student_data.get('gender', '')],
+            ["Programme:", self.student_data.get('programme', '')],
+            ["Schedule:", self.student_data.get('schedule', '')],
+            ["Duration:", self.student_data.get('duration', '')],
+            ["Start Date:", self.format_date(self.student_data.get('start_date', ''))],
+            ["Programme Fee:", f"₦{self.student_data.get('programme_fee', 0):,.2f}"],
+            ["Status:", self.get_student_status()]
+        ]
+        
+        # Create table
+        table = Table(data, colWidths=[150, 300])
+        table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+            ('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke),
+            ('PADDING', (0, 0), (-1, -1), 12)
+        ]))
+        story.append(table)
+        
+        # Add payment history
+        story.append(Spacer(1, 30))
+        story.append(Paragraph("Payment History", title_style))
+        story.append(Spacer(1, 20))
+        
+        payments = self.app.db.get_payment_history(self.reg_number)
+        if payments:
+            payment_data = [["Date", "Amount", "Receipt", "Balance"]]
+            for payment in payments:
+                payment_data.append([
+                    datetime.strptime(payment['payment_date'], 
+                                    '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y'),
+                    f"₦{payment['amount']:,.2f}",
+                    payment['receipt_number'],
+                    f"₦{payment['balance']:,.2f}"
+                ])
             
-            # Create table
-            table = Table(data, colWidths=[150, 300])
-            table.setStyle(TableStyle([
+            payment_table = Table(payment_data, colWidths=[100, 100, 150, 100])
+            payment_table.setStyle(TableStyle([
                 ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
                 ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
                 ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-                ('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke),
                 ('PADDING', (0, 0), (-1, -1), 12)
             ]))
-            story.append(table)
-            
-            # Add payment history
-            story.append(Spacer(1, 30))
-            story.append(Paragraph("Payment History", title_style))
-            story.append(Spacer(1, 20))
-            
-            payments = self.app.db.get_payment_history(self.reg_number)
-            if payments:
-                payment_data = [["Date", "Amount", "Receipt", "Balance"]]
-                for payment in payments:
-                    payment_data.append([
-                        datetime.strptime(payment['payment_date'], 
-                                        '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y'),
-                        f"₦{payment['amount']:,.2f}",
-                        payment['receipt_number'],
-                        f"₦{payment['balance']:,.2f}"
-                    ])
-                
-                payment_table = Table(payment_data, colWidths=[100, 100, 150, 100])
-                payment_table.setStyle(TableStyle([
-                    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-                    ('PADDING', (0, 0), (-1, -1), 12)
-                ]))
-                story.append(payment_table)
-            
-            # Build PDF
-            doc.build(story)
-            
-            # Open the generated PDF
-            if platform.system() == 'Darwin':  # macOS
-                subprocess.run(['open', filepath])
-            elif platform.system() == 'Windows':
-                os.startfile(filepath)
-            else:  # Linux
-                subprocess.run(['xdg-open', filepath])
-            
-            messagebox.showinfo("Success", 
-                              f"Profile exported successfully to:\n{filepath}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export profile: {str(e)}")
+            story.append(payment_table)
+        
+        # Build PDF
+        doc.build(story)
+        return filepath
+    
+    def export_pdf_done(self, filepath):
+        # Open the generated PDF
+        if platform.system() == 'Darwin':  # macOS
+            subprocess.run(['open', filepath])
+        elif platform.system() == 'Windows':
+            os.startfile(filepath)
+        else:  # Linux
+            subprocess.run(['xdg-open', filepath])
+        
+        messagebox.showinfo("Success", 
+                          f"Profile exported successfully to:\n{filepath}")
 
     def create_payment_section(self, parent):
         # Payment Section
@@ -562,31 +571,31 @@ class StudentProfileDialog(tk.Toplevel):
         # Bind double-click to view receipt
         self.payment_tree.bind("<Double-1>", self.view_receipt)
         
+        # Rows are keyed by payment_id so a refresh only touches what changed
+        self.payment_binding = KeyedTableBinding(
+            self.payment_tree,
+            key=lambda payment: payment['payment_id'],
+            formatter=self.format_payment_row
+        )
+        
         # Load payment history
         self.load_payment_history()
 
+    def format_payment_row(self, payment):
+        return (
+            datetime.strptime(payment['payment_date'], 
+                            '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
+            f"₦{payment['amount']:,.2f}",
+            payment['receipt_number'],
+            f"₦{payment['balance']:,.2f}"
+        )
+
     def load_payment_history(self):
-        # Clear existing items
-        for item in self.payment_tree.get_children():
-            self.payment_tree.delete(item)
-        
         # Get payment history
         payments = self.app.db.get_payment_history(self.reg_number)
         
-        # Add to treeview with alternating colors
-        for i, payment in enumerate(payments):
-            tags = ('oddrow',) if i % 2 else ()
-            
-            # Format values
-            values = (
-                datetime.strptime(payment['payment_date'], 
-                                '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M'),
-                f"₦{payment['amount']:,.2f}",
-                payment['receipt_number'],
-                f"₦{payment['balance']:,.2f}"
-            )
-            
-            self.payment_tree.insert("", "end", values=values, tags=tags)
+        # Diff against the rows on screen (alternating colours applied by the binding)
+        self.payment_binding.bind(payments)
 
     def view_receipt(self, event):
         selected = self.payment_tree.selection()
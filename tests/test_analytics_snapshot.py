@@ -0,0 +1,97 @@
+"""Reports answered from the analytics snapshot match the SQL they replace"""
+import contextlib
+import io
+import json
+import sqlite3
+
+import pytest
+
+pytest.importorskip('numpy')
+
+# Database report methods answered from AnalyticsSnapshot when it is available
+REPORTS = {
+    'get_student_ages': 'student_ages',
+    'get_gender_distribution': 'gender_distribution',
+    'get_monthly_revenue': 'monthly_revenue',
+    'generate_payment_trends_report': 'payment_trends',
+    'generate_programme_enrollment_report': 'programme_enrollment',
+    'generate_programme_revenue_report': 'programme_revenue',
+    'generate_programme_completion_report': 'programme_completion',
+    'get_student_performance_data': 'performance',
+    'get_student_retention_data': 'retention',
+}
+
+# Web Development, Robotics and Data Analytics are in the default catalogue;
+# Data Science and Cyber Security are not, so their students have no
+# programme_id, as after a CSV import
+STUDENTS = [
+    ('IMPTECH-SNAP-001', 19, 'Female', 'Robotics', 'Active', 50000),
+    ('IMPTECH-SNAP-002', 24, 'Male', 'Web Development', 'Graduated', 20000),
+    ('IMPTECH-SNAP-003', 31, 'Female', 'Data Science', 'Graduated', 0),
+    ('IMPTECH-SNAP-004', None, 'Male', 'Data Science', 'Dropped Out', 15000),
+    ('IMPTECH-SNAP-005', 22, 'Female', 'Data Analytics', 'Active', 0),
+    ('IMPTECH-SNAP-006', 27, 'Male', 'Cyber Security', 'Graduated', 30000),
+    ('IMPTECH-SNAP-007', 35, 'Female', 'Robotics', 'Dropped Out', 0),
+    ('IMPTECH-SNAP-008', 41, 'Male', 'Web Development', 'Active', 10000),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    from database.db_setup import Database
+    # Startup chatter (folder checks, migrations) is not part of the test
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = Database(str(tmp_path))
+    
+    for reg_number, age, gender, programme, status, paid in STUDENTS:
+        success, _, error = db.save_student({
+            'reg_number': reg_number, 'name': reg_number, 'age': age, 'gender': gender,
+            'programme': programme, 'start_date': None, 'duration': None,
+            'schedule': 'Weekday', 'programme_fee': 100000, 'initial_payment': 0
+        })
+        assert success, error
+        if paid:
+            success, _, error = db.save_payment(reg_number, paid)
+            assert success, error
+        if status != 'Active':
+            assert db.update_student_status(reg_number, status)
+    
+    conn = sqlite3.connect(db.db_path)
+    try:
+        # An older row left outside the catalogue under a catalogued name, and
+        # one with neither status nor fee
+        conn.execute("UPDATE students SET programme_id = NULL WHERE reg_number = 'IMPTECH-SNAP-007'")
+        conn.execute("UPDATE students SET status = NULL, programme_fee = NULL "
+                     "WHERE reg_number = 'IMPTECH-SNAP-008'")
+        conn.commit()
+    finally:
+        conn.close()
+    return db
+
+
+def typed(value):
+    """value with the type of every number spelled out, so 25 != 25.0"""
+    if isinstance(value, dict):
+        return {key: typed(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [typed(item) for item in value]
+    return (type(value).__name__, value)
+
+
+@pytest.mark.parametrize('report', sorted(REPORTS))
+def test_snapshot_matches_sql(db, report):
+    snapshot = getattr(db, report)()
+    assert snapshot is not None
+    
+    # Without the snapshot the report falls back to its SQL query
+    setattr(db.analytics, REPORTS[report], lambda: None)
+    sql = getattr(db, report)()
+    
+    assert typed(snapshot) == typed(sql)
+    json.dumps(snapshot)
+
+
+def test_programmes_outside_the_catalogue_keep_their_own_rows(db):
+    assert [row['programme'] for row in db.generate_programme_enrollment_report()] == [
+        'Cyber Security', 'Data Analytics', 'Data Science', 'Robotics', 'Robotics',
+        'Web Development']
@@ -0,0 +1,101 @@
+"""Several processes saving payments to one database file at the same time"""
+import contextlib
+import io
+import multiprocessing
+import sqlite3
+
+import pytest
+
+PROCESSES = 6
+PAYMENTS = 15
+REG_NUMBER = 'IMPTECH-STRESS-001'
+
+
+def open_database(path):
+    from database.db_setup import Database
+    # Startup chatter (folder checks, migrations) is not part of the test
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Database(path)
+
+
+def save_payments(path, worker):
+    """Save this worker's own payments and the payments every worker shares"""
+    db = open_database(path)
+    results = []
+    for i in range(PAYMENTS):
+        # Each shared payment is saved by every worker under the same key,
+        # as a retry or a second desk replaying it would
+        for key in (f'own-{worker}-{i}', f'shared-{i}'):
+            success, _, error = db.save_payment(REG_NUMBER, 10, key, idempotency_key=key)
+            results.append((key, success, error))
+    return results
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    db = open_database(str(tmp_path))
+    success, _, error = db.save_student({
+        'reg_number': REG_NUMBER, 'name': 'Stress Test', 'age': 20, 'gender': 'Female',
+        'programme': 'Web Development', 'start_date': None, 'duration': None,
+        'schedule': 'Weekday', 'programme_fee': 100000, 'initial_payment': 0
+    })
+    assert success, error
+    return str(tmp_path), db.db_path
+
+
+def test_concurrent_payments_are_neither_lost_nor_duplicated(database_path):
+    app_path, db_file = database_path
+    
+    with multiprocessing.get_context('spawn').Pool(PROCESSES) as pool:
+        batches = pool.starmap(save_payments, [(app_path, worker) for worker in range(PROCESSES)])
+    
+    failures = [(key, error) for batch in batches for key, success, error in batch if not success]
+    assert failures == []
+    
+    conn = sqlite3.connect(db_file)
+    try:
+        keys = [row[0] for row in conn.execute(
+            'SELECT idempotency_key FROM payments WHERE reg_number = ?', [REG_NUMBER])]
+        receipts = conn.execute(
+            'SELECT COUNT(DISTINCT receipt_number) FROM payments WHERE reg_number = ?',
+            [REG_NUMBER]).fetchone()[0]
+        total_paid = conn.execute(
+            'SELECT total_paid FROM student_balances WHERE reg_number = ?',
+            [REG_NUMBER]).fetchone()[0]
+    finally:
+        conn.close()
+    
+    expected = ({f'own-{worker}-{i}' for worker in range(PROCESSES) for i in range(PAYMENTS)}
+                | {f'shared-{i}' for i in range(PAYMENTS)})
+    assert sorted(keys) == sorted(expected)
+    assert receipts == len(expected)
+    assert total_paid == 10 * len(expected)
+
+
+def test_reused_key_for_another_payment_is_refused(database_path):
+    app_path, db_file = database_path
+    db = open_database(app_path)
+    success, _, error = db.save_student({
+        'reg_number': 'IMPTECH-STRESS-002', 'name': 'Other Student', 'age': 21,
+        'gender': 'Male', 'programme': 'Web Development', 'start_date': None,
+        'duration': None, 'schedule': 'Weekday', 'programme_fee': 100000,
+        'initial_payment': 0
+    })
+    assert success, error
+    
+    assert db.save_payment(REG_NUMBER, 10, idempotency_key='first')[0]
+    assert db.save_payment(REG_NUMBER, 10, idempotency_key='first')[0]
+    
+    # Same key, other student or other amount: refused, and nothing recorded
+    for reg_number, amount in (('IMPTECH-STRESS-002', 999), ('IMPTECH-STRESS-002', 10),
+                               (REG_NUMBER, 999)):
+        success, receipt, error = db.save_payment(reg_number, amount, idempotency_key='first')
+        assert (success, receipt) == (False, None)
+        assert error
+    
+    conn = sqlite3.connect(db_file)
+    try:
+        payments = conn.execute('SELECT reg_number, amount FROM payments').fetchall()
+    finally:
+        conn.close()
+    assert payments == [(REG_NUMBER, 10)]
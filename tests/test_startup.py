@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from utils.startup_profiler import STARTUP_BUDGET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pages opened on first navigation, and the libraries they bring in
+LAZY_PAGES = ['pages.registration', 'pages.student_list', 'pages.student_profile',
+              'pages.payment_history', 'pages.programmes', 'pages.settings',
+              'pages.reports', 'pages.notifications', 'pages.payment_record']
+HEAVY_LIBRARIES = ['reportlab', 'tkcalendar', 'pandas', 'matplotlib']
+
+# Runs in a fresh interpreter, so nothing the other tests imported counts
+PROFILE_STARTUP = '''
+import json, sys
+from utils.startup_profiler import start_profiling
+profiler = start_profiling()
+import main
+result = {"import": profiler.imports["main"][0]}
+if "--window" in sys.argv:
+    app = main.ImpactechApp()
+    app.root.update()
+    profiler.mark_first_window()
+    result["window"] = profiler.first_window
+profiler.uninstall()
+result["modules"] = sorted(sys.modules)
+print(json.dumps(result))
+'''
+
+
+def profile_startup(home, *args):
+    """Import main (and draw the first window, with --window) under the startup profiler"""
+    env = dict(os.environ, HOME=str(home),
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run([sys.executable, '-c', PROFILE_STARTUP, *args], cwd=ROOT, env=env,
+                               capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def assert_lazy(modules):
+    assert sorted(set(LAZY_PAGES) & set(modules)) == []
+    assert sorted(set(HEAVY_LIBRARIES) & {module.split('.')[0] for module in modules}) == []
+
+
+def test_importing_main_is_within_budget_and_lazy(tmp_path):
+    result = profile_startup(tmp_path)
+    assert result["import"] <= STARTUP_BUDGET
+    assert_lazy(result["modules"])
+
+
+@pytest.mark.skipif(sys.platform.startswith('linux') and not os.environ.get('DISPLAY'),
+                    reason="drawing the window needs a display")
+def test_first_window_is_within_budget_and_lazy(tmp_path):
+    result = profile_startup(tmp_path, '--window')
+    assert result["window"] <= STARTUP_BUDGET
+    assert_lazy(result["modules"])
@@ -1,3 +1,5 @@
+# Default programmes used to seed the programmes table on first run.
+# At runtime use the catalogue on Database.programmes instead.
 PROGRAMMES = [
     "Web Development",
     "Robotics",
@@ -33,28 +35,3 @@ STUDENT_STATUSES = [
     'Graduated',
     'Dropped Out'
 ]
-
-def add_programme(new_programme):
-    """
-    Add a new programme to the PROGRAMMES list
-    
-    Args:
-        new_programme (str): Name of the new programme to add
-    
-    Returns:
-        bool: True if programme was added successfully, False if it already exists
-    """
-    # Convert to title case and strip whitespace
-    new_programme = new_programme.strip().title()
-    
-    # Check if programme already exists (case-insensitive)
-    if new_programme.lower() in [p.lower() for p in PROGRAMMES]:
-        return False
-    
-    # Add the new programme
-    PROGRAMMES.append(new_programme)
-    
-    # Optional: Sort the list alphabetically
-    PROGRAMMES.sort()
-    
-    return True 
\ No newline at end of file
@@ -0,0 +1,136 @@
+import queue
+import threading
+import tkinter as tk
+
+
+class QueryToken:
+    """Cancellation flag handed to a live-filter query
+    
+    Queries register cleanup with on_cancel (for example a page source's
+    interrupt) so a superseded statement stops instead of running to the end.
+    """
+    
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+    
+    def on_cancel(self, callback):
+        """Call `callback()` when the query is superseded"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+    
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class LiveFilterController:
+    """Re-run a filter query as the user types without blocking the Tk thread
+    
+    Each change is debounced with after(), then the query runs on a worker
+    thread. Starting a new query cancels the one before it, so only the latest
+    result is ever shown. Results come back to the Tk thread through a queue
+    that is polled with after(); Tk itself is never touched from the worker.
+    
+    Args:
+        widget: Widget used for scheduling (usually the page)
+        params (callable): Reads the current filter values; runs on the Tk thread
+        query (callable): query(params, token) -> result; runs on the worker thread
+        on_result (callable): on_result(result); runs on the Tk thread
+        delay (int, optional): Debounce delay in milliseconds
+    """
+    
+    POLL_INTERVAL = 15
+    
+    def __init__(self, widget, params, query, on_result, delay=75):
+        self.widget = widget
+        self.params = params
+        self.query = query
+        self.on_result = on_result
+        self.delay = delay
+        
+        self.generation = 0
+        self._pending = None
+        self._polling = None
+        self._token = None
+        self._results = queue.Queue()
+    
+    def watch(self, *variables):
+        """Schedule a query whenever any of the Tk variables change"""
+        for variable in variables:
+            variable.trace_add("write", lambda *args: self.schedule())
+    
+    def schedule(self, event=None):
+        """Run the query once input has been idle for the debounce delay"""
+        if self._pending is not None:
+            self.widget.after_cancel(self._pending)
+        self._pending = self.widget.after(self.delay, self.run_now)
+    
+    def run_now(self):
+        """Start the query immediately, superseding any query in flight"""
+        if self._pending is not None:
+            self.widget.after_cancel(self._pending)
+            self._pending = None
+        
+        self.cancel()
+        self.generation += 1
+        self._token = QueryToken()
+        
+        worker = threading.Thread(target=self._run,
+                                  args=(self.generation, self.params(), self._token),
+                                  daemon=True)
+        worker.start()
+        
+        if self._polling is None:
+            self._polling = self.widget.after(self.POLL_INTERVAL, self._poll)
+    
+    def cancel(self):
+        """Abandon the query in flight, if any"""
+        if self._token is not None:
+            self._token.cancel()
+            self._token = None
+    
+    def _run(self, generation, params, token):
+        try:
+            result = self.query(params, token)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        
+        if not token.cancelled:
+            self._results.put((generation, result, error))
+    
+    def _poll(self):
+        self._polling = None
+        try:
+            if not self.widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        
+        while True:
+            try:
+                generation, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            
+            # Anything older than the latest request has been superseded
+            if generation != self.generation:
+                continue
+            self._token = None
+            if error is not None:
+                print(f"Live filter error: {error}")
+            else:
+                self.on_result(result)
+        
+        if self._token is not None:
+            self._polling = self.widget.after(self.POLL_INTERVAL, self._poll)
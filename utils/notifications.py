@@ -1,7 +1,4 @@
 import sqlite3
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 from datetime import datetime, timedelta
 
@@ -15,29 +12,8 @@ class NotificationSystem:
         """
         self.app = app
         self.db_path = app.db.db_path
-        
-        # Create notifications table if not exists
-        self._create_notifications_table()
-    
-    def _create_notifications_table(self):
-        """Create notifications table in the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                reg_number TEXT NOT NULL,
-                message TEXT NOT NULL,
-                type TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_read BOOLEAN DEFAULT 0,
-                FOREIGN KEY (reg_number) REFERENCES students(reg_number)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        # The notifications table is created by migrate_notifications with the
+        # rest of the schema
     
     def send_payment_reminder(self, reg_number):
         """
@@ -46,7 +22,7 @@ class NotificationSystem:
         Args:
             reg_number (str): Student registration number
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.app.db.connect()
         cursor = conn.cursor()
         
         try:
@@ -66,15 +42,8 @@ class NotificationSystem:
             student = cursor.fetchone()
             
             if student:
-                name, programme, total_fee, paid_amount = student
-                balance = total_fee - paid_amount
-                
                 # Create notification message
-                message = (f"Payment Reminder for {name}\n"
-                          f"Programme: {programme}\n"
-                          f"Total Fee: ₦{total_fee:,.2f}\n"
-                          f"Paid Amount: ₦{paid_amount:,.2f}\n"
-                          f"Remaining Balance: ₦{balance:,.2f}")
+                message = self.payment_reminder_message(*student)
                 
                 # Insert notification
                 cursor.execute('''
@@ -102,7 +71,7 @@ class NotificationSystem:
         Args:
             reg_number (str): Student registration number
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.app.db.connect()
         cursor = conn.cursor()
         
         try:
@@ -120,21 +89,8 @@ class NotificationSystem:
             student = cursor.fetchone()
             
             if student:
-                name, programme, start_date, duration = student
-                
-                # Calculate progress
-                start = datetime.strptime(start_date, '%Y-%m-%d')
-                months = int(duration.split()[0])
-                end_date = start + timedelta(days=months*30)
-                total_days = (end_date - start).days
-                current_days = (datetime.now() - start).days
-                progress_percentage = min(max(0, current_days / total_days * 100), 100)
-                
                 # Create progress message
-                message = (f"Course Progress Update for {name}\n"
-                          f"Programme: {programme}\n"
-                          f"Duration: {duration}\n"
-                          f"Progress: {progress_percentage:.1f}%")
+                message = self.course_progress_message(*student)
                 
                 # Insert notification
                 cursor.execute('''
@@ -155,6 +111,129 @@ class NotificationSystem:
         finally:
             conn.close()
     
+    def payment_reminder_message(self, name, programme, total_fee, paid_amount):
+        balance = total_fee - paid_amount
+        return (f"Payment Reminder for {name}\n"
+                f"Programme: {programme}\n"
+                f"Total Fee: ₦{total_fee:,.2f}\n"
+                f"Paid Amount: ₦{paid_amount:,.2f}\n"
+                f"Remaining Balance: ₦{balance:,.2f}")
+    
+    def course_progress_message(self, name, programme, start_date, duration):
+        # Calculate progress
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        months = int(duration.split()[0])
+        end_date = start + timedelta(days=months*30)
+        total_days = (end_date - start).days
+        current_days = (datetime.now() - start).days
+        progress_percentage = min(max(0, current_days / total_days * 100), 100)
+        
+        return (f"Course Progress Update for {name}\n"
+                f"Programme: {programme}\n"
+                f"Duration: {duration}\n"
+                f"Progress: {progress_percentage:.1f}%")
+    
+    def send_payment_reminders(self):
+        """
+        Send payment reminder notifications to students with outstanding balances
+        
+        Returns:
+            int: Number of reminders sent
+        """
+        conn = self.app.db.connect()
+        cursor = conn.cursor()
+        
+        try:
+            # Find students with outstanding balances
+            cursor.execute('''
+                SELECT s.reg_number, s.name, s.programme, s.programme_fee,
+                       COALESCE(b.total_paid, 0) as total_paid
+                FROM students s
+                LEFT JOIN student_balances b ON b.reg_number = s.reg_number
+                WHERE COALESCE(b.total_paid, 0) < s.programme_fee
+            ''')
+            
+            reminders = [
+                (reg_number, self.payment_reminder_message(name, programme, fee, paid),
+                 'payment_reminder')
+                for reg_number, name, programme, fee, paid in cursor.fetchall()
+            ]
+            
+            # One transaction for the lot
+            cursor.executemany('''
+                INSERT INTO notifications (reg_number, message, type)
+                VALUES (?, ?, ?)
+            ''', reminders)
+            
+            conn.commit()
+            return len(reminders)
+        
+        except sqlite3.Error as e:
+            print(f"Error sending payment reminders: {e}")
+            return 0
+        
+        finally:
+            conn.close()
+    
+    def send_course_progress_notifications(self):
+        """
+        Send course progress notifications to all active students
+        
+        Returns:
+            int: Number of notifications sent
+        """
+        conn = self.app.db.connect()
+        cursor = conn.cursor()
+        
+        try:
+            # Find active students
+            cursor.execute('''
+                SELECT reg_number, name, programme, start_date, duration
+                FROM students
+                WHERE status = 'Active' OR status IS NULL
+            ''')
+            
+            notifications = []
+            for reg_number, *student in cursor.fetchall():
+                try:
+                    message = self.course_progress_message(*student)
+                except (ValueError, TypeError, IndexError, ZeroDivisionError):
+                    # Start date or duration the progress can't be worked out from
+                    continue
+                notifications.append((reg_number, message, 'course_progress'))
+            
+            cursor.executemany('''
+                INSERT INTO notifications (reg_number, message, type)
+                VALUES (?, ?, ?)
+            ''', notifications)
+            
+            conn.commit()
+            return len(notifications)
+        
+        except sqlite3.Error as e:
+            print(f"Error sending course progress notifications: {e}")
+            return 0
+        
+        finally:
+            conn.close()
+    
+    def send_periodic_notifications(self):
+        """
+        Send the periodic payment reminders and course progress updates
+        
+        Returns:
+            tuple: (payment reminders sent, progress notifications sent)
+        """
+        # Send payment reminders every 7 days
+        payment_reminders = self.send_payment_reminders()
+        print(f"Sent {payment_reminders} payment reminder notifications")
+        
+        # Send course progress notifications monthly
+        progress_notifications = self.send_course_progress_notifications()
+        print(f"Sent {progress_notifications} course progress notifications")
+        
+        return payment_reminders, progress_notifications
+    
     def get_student_notifications(self, reg_number):
         """
         Retrieve notifications for a specific student
@@ -165,7 +244,7 @@ class NotificationSystem:
         Returns:
             list: List of notification dictionaries
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.app.db.connect()
         cursor = conn.cursor()
         
         try:
@@ -210,7 +289,7 @@ class NotificationSystem:
         Returns:
             bool: True if successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.app.db.connect()
         cursor = conn.cursor()
         
         try:
@@ -241,7 +320,7 @@ class NotificationSystem:
         Returns:
             int: Number of notifications sent
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.app.db.connect()
         cursor = conn.cursor()
         
         try:
@@ -251,8 +330,8 @@ class NotificationSystem:
             
             # Add programme filter if specified
             if programme:
-                query += " WHERE programme = ?"
-                params.append(programme)
+                query += " WHERE programme_id = ?"
+                params.append(self.app.db.programmes.get_id(programme))
             
             cursor.execute(query, params)
             students = cursor.fetchall()
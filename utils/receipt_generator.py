@@ -1,9 +1,3 @@
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, mm
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT
 import os
 from datetime import datetime
 
@@ -11,10 +5,22 @@ class ReceiptGenerator:
     def __init__(self, app_path):
         self.base_path = os.path.dirname(app_path) if os.path.isfile(app_path) else app_path
         self.receipts_path = os.path.join(self.base_path, "receipts")
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        # reportlab styles are built on the first receipt, not at startup
+        self._styles = None
+    
+    @property
+    def styles(self):
+        if self._styles is None:
+            from reportlab.lib.styles import getSampleStyleSheet
+            self._styles = getSampleStyleSheet()
+            self._setup_custom_styles()
+        return self._styles
         
     def _setup_custom_styles(self):
+        from reportlab.lib import colors
+        from reportlab.lib.styles import ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+        
         # Title style
         self.styles.add(ParagraphStyle(
             name='ReceiptTitle',
@@ -76,6 +82,11 @@ class ReceiptGenerator:
 
     def generate_receipt(self, payment_data, student_data):
         """Generate a receipt PDF"""
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+        from reportlab.lib.units import inch, mm
+        
         os.makedirs(self.receipts_path, exist_ok=True)
         filename = f"receipt_{payment_data['receipt_number']}.pdf"
         filepath = os.path.join(self.receipts_path, filename)
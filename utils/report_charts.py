@@ -0,0 +1,317 @@
+# Chart builders for the reports page. They use matplotlib's object-oriented
+# API rather than pyplot, so a chart can be drawn on a worker thread or in a
+# worker process without touching the Tk backend.
+
+import io
+import threading
+
+# Resolution of the embedded chart images
+CHART_DPI = 80
+
+# Figures are reused between renders; one set per worker thread
+_figures = threading.local()
+
+
+def new_figure(width, height):
+    """Return a cleared figure of the given size, reusing an earlier one"""
+    from matplotlib.figure import Figure
+    
+    figures = getattr(_figures, 'by_size', None)
+    if figures is None:
+        figures = _figures.by_size = {}
+    
+    figure = figures.get((width, height))
+    if figure is None:
+        figure = figures[(width, height)] = Figure(figsize=(width, height))
+    else:
+        figure.clear()
+    return figure
+
+
+def student_status_chart(stats):
+    figure = new_figure(10, 6)
+    ax = figure.add_subplot()
+    labels = ['Active', 'Graduated', 'Dropped Out']
+    sizes = [
+        stats['active_students'],
+        stats['graduated_students'],
+        stats['dropouts']
+    ]
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
+    ax.set_title('Student Status Distribution')
+    return figure
+
+
+def age_distribution_chart(ages):
+    figure = new_figure(10, 6)
+    ax = figure.add_subplot()
+    ax.hist(ages, bins=20, edgecolor='black')
+    ax.set_title('Student Age Distribution')
+    ax.set_xlabel('Age')
+    ax.set_ylabel('Number of Students')
+    return figure
+
+
+def gender_distribution_chart(gender_stats):
+    figure = new_figure(10, 6)
+    ax = figure.add_subplot()
+    ax.bar([str(gender) for gender in gender_stats.keys()], list(gender_stats.values()))
+    ax.set_title('Gender Distribution')
+    ax.set_xlabel('Gender')
+    ax.set_ylabel('Number of Students')
+    return figure
+
+
+def monthly_revenue_chart(revenue_data):
+    figure = new_figure(12, 6)
+    ax = figure.add_subplot()
+    ax.plot(list(revenue_data.keys()), list(revenue_data.values()), marker='o')
+    ax.set_title('Monthly Revenue Analysis')
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Revenue (₦)')
+    ax.tick_params(axis='x', labelrotation=45)
+    return figure
+
+
+def performance_correlation_chart(performance_data):
+    import pandas as pd
+    
+    students_df = pd.DataFrame(performance_data)
+    correlation = students_df.corr()
+    
+    figure = new_figure(12, 10)
+    ax = figure.add_subplot()
+    
+    # Seaborn is optional
+    try:
+        import seaborn as sns
+    except ImportError:
+        sns = None
+    
+    if sns is not None:
+        sns.heatmap(correlation, annot=True, cmap='coolwarm', linewidths=0.5, ax=ax)
+    else:
+        image = ax.imshow(correlation, cmap='coolwarm', aspect='auto')
+        figure.colorbar(image, ax=ax)
+        ax.set_xticks(range(len(students_df.columns)))
+        ax.set_xticklabels(students_df.columns, rotation=45)
+        ax.set_yticks(range(len(students_df.columns)))
+        ax.set_yticklabels(students_df.columns)
+    
+    ax.set_title('Student Performance Correlation Analysis')
+    return figure
+
+
+def retention_prediction_chart(retention_data):
+    figure = new_figure(12, 6)
+    ax = figure.add_subplot()
+    programmes = [row['programme'] for row in retention_data]
+    retained = [row['retained'] for row in retention_data]
+    dropped = [row['dropped'] for row in retention_data]
+    
+    # Stacked bars: dropped sits on top of retained
+    ax.bar(programmes, retained, label='retained')
+    ax.bar(programmes, dropped, bottom=retained, label='dropped')
+    ax.set_title('Student Retention Prediction by Programme')
+    ax.set_xlabel('Programme')
+    ax.set_ylabel('Number of Students')
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.legend(title='Retention Status')
+    return figure
+
+
+def cohort_analysis_chart(cohort_data):
+    figure = new_figure(12, 6)
+    ax = figure.add_subplot()
+    
+    cohorts = {}
+    for row in cohort_data:
+        cohorts.setdefault(row['cohort'], []).append(row)
+    for cohort, rows in cohorts.items():
+        ax.plot([row['period'] for row in rows], [row['students'] for row in rows],
+                label=cohort)
+    
+    ax.set_title('Student Cohort Progression')
+    ax.set_xlabel('Time Period')
+    ax.set_ylabel('Number of Students')
+    ax.legend(title='Cohort')
+    return figure
+
+
+def cohort_retention_chart(extract):
+    from database.cohort_analysis import cohort_matrices
+    
+    matrices = cohort_matrices(extract)
+    figure = new_figure(12, 10)
+    panels = [
+        ('retention', 'Retention (%)', 'Greens'),
+        ('graduation', 'Graduated (%)', 'Blues'),
+        ('collection', 'Fees Collected (%)', 'Oranges')
+    ]
+    
+    for position, (key, title, cmap) in enumerate(panels, start=1):
+        ax = figure.add_subplot(1, 3, position)
+        matrix = matrices[key]
+        if matrix.empty:
+            ax.set_title(title)
+            continue
+        
+        image = ax.imshow(matrix.to_numpy(dtype=float), cmap=cmap, vmin=0, vmax=100,
+                          aspect='auto', interpolation='nearest')
+        figure.colorbar(image, ax=ax, fraction=0.05)
+        
+        # Label at most ~24 cohorts so the axis stays readable
+        step = max(1, len(matrix.index) // 24)
+        ax.set_yticks(range(0, len(matrix.index), step))
+        ax.set_yticklabels(matrix.index[::step])
+        ax.set_title(title)
+        ax.set_xlabel('Months Since Registration')
+    
+    figure.axes[0].set_ylabel('Registration Cohort')
+    figure.suptitle('Student Cohort Analysis')
+    return figure
+
+
+def payment_trends_chart(trends_data):
+    figure = new_figure(12, 6)
+    months = [row['month'] for row in trends_data]
+    
+    # Payment count and total amount
+    ax = figure.add_subplot(2, 1, 1)
+    ax.plot(months, [row['payment_count'] for row in trends_data], marker='o')
+    ax.set_title('Number of Payments per Month')
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Payment Count')
+    ax.tick_params(axis='x', labelrotation=45)
+    
+    ax = figure.add_subplot(2, 1, 2)
+    ax.plot(months, [row['total_amount'] for row in trends_data], marker='o', color='green')
+    ax.set_title('Total Payment Amount per Month')
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Total Amount (₦)')
+    ax.tick_params(axis='x', labelrotation=45)
+    return figure
+
+
+def programme_enrollment_chart(enrollment_data):
+    figure = new_figure(12, 6)
+    ax = figure.add_subplot()
+    programmes = [row['programme'] for row in enrollment_data]
+    
+    # Total students and graduated students
+    ax.bar(programmes, [row['total_students'] for row in enrollment_data],
+           label='Total Students')
+    ax.bar(programmes, [row['graduated_students'] for row in enrollment_data],
+           label='Graduated Students')
+    
+    ax.set_title('Programme Enrollment and Graduation Analysis')
+    ax.set_xlabel('Programme')
+    ax.set_ylabel('Number of Students')
+    ax.set_xticks(range(len(programmes)))
+    ax.set_xticklabels(programmes, rotation=45, ha='right')
+    ax.legend()
+    return figure
+
+
+def programme_revenue_chart(revenue_data):
+    figure = new_figure(12, 6)
+    programmes = [row['programme'] for row in revenue_data]
+    
+    # Total revenue and total students
+    ax = figure.add_subplot(1, 2, 1)
+    ax.bar(programmes, [row['total_revenue'] for row in revenue_data])
+    ax.set_title('Total Revenue by Programme')
+    ax.set_xlabel('Programme')
+    ax.set_ylabel('Total Revenue (₦)')
+    ax.set_xticks(range(len(programmes)))
+    ax.set_xticklabels(programmes, rotation=45, ha='right')
+    
+    ax = figure.add_subplot(1, 2, 2)
+    ax.bar(programmes, [row['total_students'] for row in revenue_data], color='green')
+    ax.set_title('Total Students by Programme')
+    ax.set_xlabel('Programme')
+    ax.set_ylabel('Number of Students')
+    ax.set_xticks(range(len(programmes)))
+    ax.set_xticklabels(programmes, rotation=45, ha='right')
+    return figure
+
+
+def programme_completion_chart(completion_data):
+    figure = new_figure(12, 6)
+    ax = figure.add_subplot()
+    programmes = [row['programme'] for row in completion_data]
+    rates = [row['completion_rate'] for row in completion_data]
+    
+    ax.bar(programmes, rates)
+    ax.set_title('Programme Completion Rates')
+    ax.set_xlabel('Programme')
+    ax.set_ylabel('Completion Rate (%)')
+    ax.set_xticks(range(len(programmes)))
+    ax.set_xticklabels(programmes, rotation=45, ha='right')
+    
+    # Add value labels on top of each bar
+    for i, rate in enumerate(rates):
+        ax.text(i, rate + 1, f'{rate:.1f}%', ha='center', va='bottom')
+    return figure
+
+
+CHARTS = {
+    'student_status_report': student_status_chart,
+    'age_distribution_report': age_distribution_chart,
+    'gender_distribution_report': gender_distribution_chart,
+    'monthly_revenue_report': monthly_revenue_chart,
+    'performance_correlation_report': performance_correlation_chart,
+    'retention_prediction_report': retention_prediction_chart,
+    'cohort_analysis_report': cohort_retention_chart,
+    'cohort_progression_report': cohort_analysis_chart,
+    'payment_trends_report': payment_trends_chart,
+    'programme_enrollment_report': programme_enrollment_chart,
+    'programme_revenue_report': programme_revenue_chart,
+    'programme_completion_report': programme_completion_chart
+}
+
+
+def render_chart(report_name, data, dpi=CHART_DPI):
+    """Draw a report chart with the Agg backend
+    
+    Args:
+        report_name (str): Key into CHARTS
+        data: Report data as returned by the database
+        dpi (int, optional): Output resolution
+    
+    Returns:
+        bytes: PNG image
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    figure = CHARTS[report_name](data)
+    FigureCanvasAgg(figure)
+    figure.tight_layout()
+    
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """Rendered report charts, valid until the data behind them changes
+    
+    Each entry is keyed on the report and the table_versions counters read
+    before its data was loaded, so a chart is only redrawn after a write.
+    """
+    
+    def __init__(self):
+        self.charts = {}
+    
+    def get(self, report_name, version):
+        """Return the cached PNG for this data version, or None"""
+        entry = self.charts.get(report_name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+    
+    def put(self, report_name, version, png):
+        self.charts[report_name] = (version, png)
+    
+    def clear(self):
+        self.charts.clear()
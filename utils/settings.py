@@ -0,0 +1,51 @@
+import json
+import os
+
+
+# Defaults for settings read outside the settings page
+DEFAULTS = {
+    'auto_backup': True,
+    'backup_frequency': '7',
+    'backup_path': '',
+    'backup_keep': 10,
+    'backup_incremental': True,
+    'archive_after_years': 3,
+    'sync_folder': '',
+    'sync_peers': '',
+    'sync_port': 0,
+    'sync_host': '',
+    'sync_key': '',
+    'sync_interval': 5,
+    'notifications_last_run': '',
+    'busy_timeout': 5,
+    'write_retries': 3
+}
+
+
+def settings_path(app_path):
+    return os.path.join(app_path, "config", "settings.json")
+
+
+def load_settings(app_path):
+    """Load settings from JSON file"""
+    path = settings_path(app_path)
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Error loading settings: {e}")
+    return {}
+
+
+def save_settings(app_path, settings):
+    """Save settings to JSON file"""
+    path = settings_path(app_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=4)
+
+
+def get_setting(settings, key):
+    """Read a setting, falling back to DEFAULTS"""
+    return settings.get(key, DEFAULTS.get(key))
@@ -0,0 +1,119 @@
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+
+# Time from launch to the first drawn window we are prepared to accept (seconds)
+STARTUP_BUDGET = 2.0
+
+
+class StartupProfiler:
+    """Record per-module import time and init phases up to the first window"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = {}
+        self.phases = []
+        self.first_window = None
+        self._original_import = None
+        self._stack = []
+    
+    def install(self):
+        """Start timing every import made through the import statement"""
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+    
+    def uninstall(self):
+        """Restore the original import hook"""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+    
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Already-loaded modules cost nothing worth reporting
+        if level == 0 and name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        
+        label = name
+        if level:
+            package = (globals or {}).get('__package__') or ''
+            label = f"{package}.{name}" if name else package
+        
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            
+            total, own = self.imports.get(label, (0.0, 0.0))
+            self.imports[label] = (total + elapsed, own + elapsed - children)
+    
+    @contextmanager
+    def phase(self, label):
+        """Time a named block of startup work"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((label, time.perf_counter() - start))
+    
+    def mark_first_window(self):
+        """Record the moment the main window has been drawn"""
+        if self.first_window is None:
+            self.first_window = time.perf_counter() - self.started
+    
+    def within_budget(self, budget=STARTUP_BUDGET):
+        """Check time-to-first-window against the startup budget"""
+        return self.first_window is not None and self.first_window <= budget
+    
+    def report(self, limit=15, budget=STARTUP_BUDGET):
+        """Build a plain-text startup report"""
+        lines = ["Startup profile", "=" * 60]
+        
+        lines.append(f"{'Module':<40}{'Total (ms)':>10}{'Self (ms)':>10}")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (total, own) in slowest[:limit]:
+            lines.append(f"{name[:39]:<40}{total * 1000:>10.1f}{own * 1000:>10.1f}")
+        
+        lines.append("")
+        lines.append(f"{'Init phase':<40}{'Time (ms)':>10}")
+        for label, elapsed in self.phases:
+            lines.append(f"{label[:39]:<40}{elapsed * 1000:>10.1f}")
+        
+        lines.append("")
+        if self.first_window is None:
+            lines.append("First window: not reached")
+        else:
+            status = "OK" if self.within_budget(budget) else "OVER BUDGET"
+            lines.append(f"First window: {self.first_window:.2f}s "
+                         f"(budget {budget:.2f}s) {status}")
+        
+        return "\n".join(lines)
+
+
+# Shared instance; phases are no-ops unless profiling was switched on
+profiler = None
+
+
+def start_profiling():
+    """Create and install the shared startup profiler"""
+    global profiler
+    if profiler is None:
+        profiler = StartupProfiler()
+        profiler.install()
+    return profiler
+
+
+@contextmanager
+def startup_phase(label):
+    """Time a startup phase when profiling is active"""
+    if profiler is None:
+        yield
+    else:
+        with profiler.phase(label):
+            yield
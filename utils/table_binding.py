@@ -0,0 +1,83 @@
+class KeyedTableBinding:
+    """Keep a ttk.Treeview in step with a keyed result set
+    
+    Each row is shown under an item id derived from its primary key
+    (reg_number, payment_id, ...). Binding a new result set diffs it against
+    what is on screen and applies only the inserts, updates, deletes and
+    moves needed, so selection and scroll position survive a refresh.
+    
+    Args:
+        tree (ttk.Treeview): Tree to manage
+        key (callable): Returns the primary key of a row
+        formatter (callable): Turns a row into the tuple of displayed values
+        row_tags (callable, optional): Extra tags for a row
+        stripe (bool, optional): Tag every other row 'oddrow'
+    """
+    
+    def __init__(self, tree, key, formatter, row_tags=None, stripe=True):
+        self.tree = tree
+        self.key = key
+        self.formatter = formatter
+        self.row_tags = row_tags
+        self.stripe = stripe
+        self.rows = {}
+        self._shown = {}
+    
+    def bind(self, rows, start=0):
+        """Show `rows` in order, touching only the items that changed
+        
+        Args:
+            rows (iterable): Rows in display order
+            start (int, optional): Absolute position of the first row, used for striping
+        
+        Returns:
+            tuple: (inserted, updated, deleted) item counts
+        """
+        wanted = []
+        new_rows = {}
+        for position, row in enumerate(rows):
+            iid = str(self.key(row))
+            tags = ('oddrow',) if self.stripe and (start + position) % 2 else ()
+            if self.row_tags:
+                tags += tuple(self.row_tags(row))
+            wanted.append((iid, tuple(self.formatter(row)), tags))
+            new_rows[iid] = row
+        
+        # Drop items that are no longer in the result set
+        stale = [iid for iid in self._shown if iid not in new_rows]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self._shown[iid]
+        
+        inserted = updated = 0
+        for iid, values, tags in wanted:
+            shown = self._shown.get(iid)
+            
+            if shown is None:
+                self.tree.insert("", "end", iid=iid, values=values, tags=tags)
+                inserted += 1
+            elif shown != (values, tags):
+                self.tree.item(iid, values=values, tags=tags)
+                updated += 1
+            
+            self._shown[iid] = (values, tags)
+        
+        # Re-order in one call rather than moving items one at a time
+        order = [iid for iid, _, _ in wanted]
+        if list(self.tree.get_children()) != order:
+            self.tree.set_children("", *order)
+        
+        self.rows = new_rows
+        return inserted, updated, len(stale)
+    
+    def row(self, iid):
+        """Return the row shown under an item id, or None"""
+        return self.rows.get(iid)
+    
+    def clear(self):
+        """Remove every bound item"""
+        if self._shown:
+            self.tree.delete(*self._shown)
+        self._shown = {}
+        self.rows = {}
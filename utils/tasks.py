@@ -0,0 +1,253 @@
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, CancelledError
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task once the user has cancelled it"""
+
+
+class Task:
+    """Handle for one piece of background work
+    
+    Thread tasks submitted with_task=True get this handle as a `task`
+    keyword and call report() as they go. report() raises TaskCancelled once cancel() has been
+    called, so any loop that reports progress also stops promptly.
+    """
+    
+    def __init__(self, runner, message, on_done=None, on_error=None,
+                 on_progress=None, cancellable=True):
+        self.runner = runner
+        self.message = message
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancellable = cancellable
+        self.future = None
+        self._cancelled = threading.Event()
+    
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+    
+    def cancel(self):
+        """Ask the task to stop; work that has not started yet never runs"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+    
+    def report(self, done, total=None, message=None):
+        """Publish progress from the worker (safe to call from any thread)"""
+        if self.cancelled:
+            raise TaskCancelled()
+        self.runner._events.put(("progress", self, (done, total, message)))
+
+
+class TaskRunner:
+    """Run slow work off the Tk thread and hand results back to it
+    
+    Work goes to a thread pool, or to a process pool for CPU-bound jobs whose
+    function and arguments can be pickled. Completion, errors and progress
+    are queued and delivered to callbacks on the Tk thread by polling with
+    after(), so callbacks may touch widgets freely.
+    
+    Args:
+        root: Tk root window
+        max_threads (int, optional): Size of the thread pool
+        max_processes (int, optional): Size of the process pool
+    """
+    
+    POLL_INTERVAL = 50
+    
+    def __init__(self, root, max_threads=4, max_processes=2):
+        self.root = root
+        self.max_processes = max_processes
+        self.threads = ThreadPoolExecutor(max_workers=max_threads,
+                                          thread_name_prefix="impactech-task")
+        self.processes = None
+        self.active = []
+        self.indicator = None
+        
+        self._events = queue.Queue()
+        self._polling = None
+    
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None,
+               message="Working...", process=False, with_task=False,
+               cancellable=True, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` in the background
+        
+        Args:
+            fn (callable): Work to run
+            on_done (callable, optional): on_done(result) on the Tk thread
+            on_error (callable, optional): on_error(exception) on the Tk thread
+            on_progress (callable, optional): on_progress(done, total, message) on the Tk thread
+            message (str, optional): Text shown in the busy indicator; None runs
+                the task quietly, without the indicator
+            process (bool, optional): Run in the process pool instead of a thread
+            with_task (bool, optional): Pass the Task to fn as `task` so a thread
+                task can report progress and notice cancellation
+            cancellable (bool, optional): Offer a Cancel button while running
+        
+        Returns:
+            Task: Handle that can cancel the work
+        """
+        task = Task(self, message, on_done, on_error, on_progress, cancellable)
+        
+        if with_task and not process:
+            kwargs["task"] = task
+        
+        executor = self._process_pool() if process else self.threads
+        task.future = executor.submit(fn, *args, **kwargs)
+        task.future.add_done_callback(lambda future: self._events.put(("done", task, None)))
+        
+        self.active.append(task)
+        self._update_indicator()
+        if self._polling is None:
+            self._polling = self.root.after(self.POLL_INTERVAL, self._poll)
+        return task
+    
+    def cancel_all(self):
+        for task in list(self.active):
+            task.cancel()
+    
+    def shutdown(self):
+        """Cancel outstanding work and stop the pools"""
+        self.cancel_all()
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False, cancel_futures=True)
+    
+    def _process_pool(self):
+        if self.processes is None:
+            try:
+                self.processes = ProcessPoolExecutor(max_workers=self.max_processes)
+            except (OSError, NotImplementedError) as e:
+                # Frozen or restricted environments: fall back to threads
+                print(f"Process pool unavailable, using threads: {e}")
+                self.processes = self.threads
+        return self.processes
+    
+    def _poll(self):
+        self._polling = None
+        while True:
+            try:
+                kind, task, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            
+            if kind == "progress":
+                if task.on_progress is not None and not task.cancelled:
+                    task.on_progress(*payload)
+                if self.indicator is not None:
+                    self.indicator.show_progress(task, *payload)
+            else:
+                self._finish(task)
+        
+        if self.active:
+            self._polling = self.root.after(self.POLL_INTERVAL, self._poll)
+    
+    def _finish(self, task):
+        if task in self.active:
+            self.active.remove(task)
+        self._update_indicator()
+        
+        try:
+            result = task.future.result()
+        except (CancelledError, TaskCancelled):
+            return
+        except Exception as e:
+            if task.cancelled:
+                return
+            if task.on_error is not None:
+                task.on_error(e)
+            else:
+                print(f"Background task failed: {e}")
+            return
+        
+        if not task.cancelled and task.on_done is not None:
+            task.on_done(result)
+    
+    def _update_indicator(self):
+        if self.indicator is None:
+            return
+        try:
+            self.indicator.update_tasks(self.active)
+        except tk.TclError:
+            # The indicator was destroyed along with its window
+            self.indicator = None
+
+
+class BusyIndicator(ttk.Frame):
+    """Status strip shown while background tasks are running
+    
+    Shows the latest task's message with a progress bar (indeterminate
+    until the task reports a total) and a Cancel button, and switches the
+    window to a busy cursor.
+    """
+    
+    def __init__(self, parent, runner, before=None):
+        super().__init__(parent, padding=(20, 5))
+        self.runner = runner
+        self.before = before
+        self.current = None
+        
+        self.label = ttk.Label(self, text="")
+        self.label.pack(side=tk.LEFT)
+        
+        self.cancel_button = ttk.Button(self, text="Cancel", command=self.cancel)
+        self.cancel_button.pack(side=tk.RIGHT)
+        
+        self.progress = ttk.Progressbar(self, mode="indeterminate", length=200)
+        self.progress.pack(side=tk.RIGHT, padx=10)
+        
+        runner.indicator = self
+    
+    def update_tasks(self, tasks):
+        """Show or hide the strip for the given active tasks"""
+        toplevel = self.winfo_toplevel()
+        tasks = [task for task in tasks if task.message]
+        
+        if not tasks:
+            self.current = None
+            self.progress.stop()
+            self.pack_forget()
+            toplevel.config(cursor="")
+            return
+        
+        task = tasks[-1]
+        if task is not self.current:
+            self.current = task
+            self.progress.config(mode="indeterminate", value=0)
+            self.progress.start(15)
+        
+        others = len(tasks) - 1
+        text = task.message + (f" (+{others} more)" if others else "")
+        self.label.config(text=text)
+        
+        if task.cancellable:
+            self.cancel_button.pack(side=tk.RIGHT, before=self.progress)
+        else:
+            self.cancel_button.pack_forget()
+        
+        if not self.winfo_ismapped():
+            options = {"side": tk.BOTTOM, "fill": tk.X}
+            if self.before is not None and self.before.winfo_exists():
+                options["before"] = self.before
+            self.pack(**options)
+        toplevel.config(cursor="watch")
+    
+    def show_progress(self, task, done, total=None, message=None):
+        if task is not self.current:
+            return
+        if total:
+            self.progress.stop()
+            self.progress.config(mode="determinate", maximum=total, value=done)
+        if message:
+            self.label.config(text=message)
+    
+    def cancel(self):
+        if self.current is not None:
+            self.current.cancel()
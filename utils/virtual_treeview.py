@@ -0,0 +1,295 @@
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+from utils.table_binding import KeyedTableBinding
+
+
+class VirtualTreeview(ttk.Frame):
+    """Treeview that only materialises the rows currently on screen
+    
+    Rows come from a page source (see database.paging) and are fetched a page
+    at a time. A few pages either side of the viewport stay cached and only
+    the visible window is inserted into the underlying ttk.Treeview, so the
+    widget costs the same with fifty rows or fifty thousand. Scrolling and
+    refreshing go through a KeyedTableBinding, so only rows that actually
+    enter, leave or change are touched.
+    
+    Args:
+        parent: Parent widget
+        columns (tuple): Column identifiers
+        formatter (callable): Turns a row into the tuple of displayed values
+        key (callable, optional): Returns a row's primary key, used as its item id
+        row_tags (callable, optional): Extra tags for a row
+        page_size (int, optional): Rows fetched from the source per request
+        cached_pages (int, optional): Pages kept in memory
+        style (str, optional): ttk style for the Treeview
+        x_scroll (bool, optional): Add a horizontal scrollbar
+    """
+    
+    HEADING_HEIGHT = 28
+    WHEEL_ROWS = 3
+    
+    def __init__(self, parent, columns, formatter, key=None, row_tags=None,
+                 page_size=100, cached_pages=6, style=None, x_scroll=False):
+        super().__init__(parent)
+        self.key = key or id
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        
+        self.source = None
+        self.total = 0
+        self.offset = 0
+        self.visible = 1
+        self.selected_index = None
+        self.selected_key = None
+        self.sort_column = None
+        self.sort_reverse = False
+        self._selected_row = None
+        self._pages = OrderedDict()
+        self._row_activated = None
+        
+        tree_options = {"columns": columns, "show": "headings", "selectmode": "browse"}
+        if style:
+            tree_options["style"] = style
+        self.tree = ttk.Treeview(self, **tree_options)
+        self.row_height = self._lookup_row_height(style or "Treeview")
+        self.binding = KeyedTableBinding(self.tree, lambda row: self.key(row),
+                                         formatter, row_tags)
+        
+        # The scrollbar drives our offset rather than the Treeview's own view
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        if x_scroll:
+            x_scrollbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+            self.tree.configure(xscrollcommand=x_scrollbar.set)
+            x_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-self.WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(self.WHEEL_ROWS))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self.visible))
+        self.tree.bind("<Home>", lambda e: self._move_selection(-self.total))
+        self.tree.bind("<End>", lambda e: self._move_selection(self.total))
+        self.tree.bind("<Double-1>", self._on_activate)
+        self.tree.bind("<Return>", self._on_activate)
+    
+    def _lookup_row_height(self, style):
+        try:
+            return int(ttk.Style().lookup(style, "rowheight") or 20)
+        except (ValueError, tk.TclError):
+            return 20
+    
+    # Treeview passthroughs used by the pages to configure columns and tags
+    def heading(self, column, **kwargs):
+        return self.tree.heading(column, **kwargs)
+    
+    def column(self, column, **kwargs):
+        return self.tree.column(column, **kwargs)
+    
+    def tag_configure(self, tag, **kwargs):
+        return self.tree.tag_configure(tag, **kwargs)
+    
+    def preload(self, source):
+        """Sort a new source the way this table is sorted and read its first page
+        
+        Only touches the source, so it can run on a worker thread ahead of
+        set_source(source, preloaded=...).
+        
+        Returns:
+            tuple: (sort state, first page rows)
+        """
+        sort_state = (self.sort_column, self.sort_reverse)
+        if sort_state[0] and source.can_sort(sort_state[0]):
+            source.sort(*sort_state)
+        source.count()
+        return sort_state, source.fetch(0, self.page_size)
+    
+    def set_source(self, source, preloaded=None):
+        """Show rows from a new page source, starting at the top"""
+        self.source = source
+        self.offset = 0
+        self._clear_selection()
+        self._pages.clear()
+        
+        if preloaded is not None and preloaded[0] == (self.sort_column, self.sort_reverse):
+            self._pages[0] = preloaded[1]
+        elif self.sort_column and source.can_sort(self.sort_column):
+            source.sort(self.sort_column, self.sort_reverse)
+        
+        self.total = source.count()
+        self._clamp_offset()
+        self._render()
+    
+    def refresh(self):
+        """Re-read the source, keeping scroll position and selection where possible"""
+        self._pages.clear()
+        if self.source is None:
+            self.total = 0
+        else:
+            self.source.invalidate()
+            self.total = self.source.count()
+        self._clamp_offset()
+        self._render()
+    
+    def enable_sorting(self, columns=None):
+        """Sort on heading click for the given (or all sortable) columns"""
+        for column in columns or self.tree["columns"]:
+            self.tree.heading(column, command=lambda c=column: self.sort_by(c))
+    
+    def sort_by(self, column):
+        """Sort by a column, toggling direction on repeated clicks"""
+        if self.source is None or not self.source.can_sort(column):
+            return
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        
+        self.source.sort(column, self.sort_reverse)
+        self.offset = 0
+        self._clear_selection()
+        self._pages.clear()
+        self._render()
+    
+    def on_row_activated(self, callback):
+        """Call `callback(row)` on double-click or Return"""
+        self._row_activated = callback
+    
+    def selected_row(self):
+        """Return the row behind the current selection, or None"""
+        return self._selected_row
+    
+    def row_at(self, index):
+        """Return the row at an absolute position, fetching its page if needed"""
+        if index < 0 or index >= self.total:
+            return None
+        page = self._page(index // self.page_size)
+        position = index % self.page_size
+        return page[position] if position < len(page) else None
+    
+    def iter_rows(self):
+        """Yield every row from the source, a page at a time"""
+        if self.source is None:
+            return
+        for offset in range(0, self.total, self.page_size):
+            for row in self.source.fetch(offset, self.page_size):
+                yield row
+    
+    def scroll_rows(self, amount):
+        self.offset += amount
+        self._clamp_offset()
+        self._render()
+        return "break"
+    
+    def _page(self, number):
+        if number in self._pages:
+            self._pages.move_to_end(number)
+            return self._pages[number]
+        
+        rows = self.source.fetch(number * self.page_size, self.page_size)
+        self._pages[number] = rows
+        while len(self._pages) > self.cached_pages:
+            self._pages.popitem(last=False)
+        return rows
+    
+    def _clamp_offset(self):
+        self.offset = max(0, min(self.offset, self.total - self.visible))
+    
+    def _clear_selection(self):
+        self.selected_index = None
+        self.selected_key = None
+        self._selected_row = None
+    
+    def _select(self, index, row):
+        self.selected_index = index
+        self.selected_key = str(self.key(row))
+        self._selected_row = row
+    
+    def _render(self):
+        rows = []
+        end = min(self.total, self.offset + self.visible + 1)
+        for index in range(self.offset, end):
+            row = self.row_at(index)
+            if row is None:
+                break
+            rows.append(row)
+        
+        self.binding.bind(rows, start=self.offset)
+        
+        # Re-attach the selection when its row is in the window
+        if self.selected_key is not None and self.selected_key in self.binding.rows:
+            position = list(self.binding.rows).index(self.selected_key)
+            self._select(self.offset + position, self.binding.rows[self.selected_key])
+            if self.tree.selection() != (self.selected_key,):
+                self.tree.selection_set(self.selected_key)
+            self.tree.focus(self.selected_key)
+        
+        # Keep the Treeview's own view pinned; our offset does the scrolling
+        self.tree.yview_moveto(0)
+        
+        if self.total:
+            first = self.offset / self.total
+            last = min(1.0, (self.offset + self.visible) / self.total)
+            self.scrollbar.set(first, last)
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.HEADING_HEIGHT) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self._clamp_offset()
+            self._render()
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * self.total)
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.offset += int(amount) * step
+        self._clamp_offset()
+        self._render()
+    
+    def _on_mousewheel(self, event):
+        return self.scroll_rows(-self.WHEEL_ROWS if event.delta > 0 else self.WHEEL_ROWS)
+    
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.binding.rows:
+            position = list(self.binding.rows).index(selection[0])
+            self._select(self.offset + position, self.binding.rows[selection[0]])
+    
+    def _move_selection(self, step):
+        if not self.total:
+            return "break"
+        current = self.selected_index if self.selected_index is not None else self.offset - 1
+        index = max(0, min(self.total - 1, current + step))
+        row = self.row_at(index)
+        if row is None:
+            return "break"
+        self._select(index, row)
+        
+        # Scroll just enough to bring the new selection into view
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible:
+            self.offset = index - self.visible + 1
+        self._clamp_offset()
+        self._render()
+        return "break"
+    
+    def _on_activate(self, event):
+        if event.type == tk.EventType.ButtonPress and \
+                self.tree.identify_region(event.x, event.y) != "cell":
+            return
+        row = self.selected_row()
+        if row is not None and self._row_activated:
+            self._row_activated(row)